@@ -0,0 +1,5 @@
+import time
+
+# Taken when the first app module is imported, before FastAPI and the rest;
+# app/main.py measures its imports from here for the startup report
+IMPORTS_STARTED = time.perf_counter()
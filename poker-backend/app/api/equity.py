@@ -0,0 +1,137 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from fastapi.concurrency import run_in_threadpool
+from typing import List, Optional
+import time
+import uuid
+
+from app.schemas.equity import (
+    AllInEVSchema,
+    AllInPlayerEVSchema,
+    EquityCacheStatsSchema,
+    EquityOptionsSchema,
+    EquityRequestSchema,
+    EquityResponseSchema,
+    PreflopEquitySchema,
+    StreetEquitySchema,
+)
+from app.services.allin_ev import all_in_ev
+from app.services.equity import EquityBudget, compute_equity, exact_cache_stats
+from app.services.hand_logic import extract_board
+from app.services.preflop import CLASS_NAMES, MAX_OPPONENTS, heads_up_equity, matrix_info, multiway_equity, parse_class
+from app.repositories.hand_repository import HandRepository, call_repository
+from app.models.hand import HandData
+from app.core.config import EQUITY_DEFAULT_ITERATIONS, EQUITY_DEFAULT_TIME_MS
+from app.api.hand import get_hand_repository
+
+router = APIRouter(
+    prefix="/equity",
+    tags=["equity"],
+    responses={404: {"description": "Not found"}},
+)
+
+def _budget(options: EquityOptionsSchema) -> EquityBudget:
+    return EquityBudget(
+        max_iterations=options.max_iterations or EQUITY_DEFAULT_ITERATIONS,
+        max_time_ms=options.max_time_ms or EQUITY_DEFAULT_TIME_MS,
+        target_ci=options.target_ci,
+        confidence=options.confidence,
+    )
+
+async def _equity_response(hole_cards, board: List[str], options: EquityOptionsSchema, hand_id: Optional[uuid.UUID] = None) -> EquityResponseSchema:
+    start = time.perf_counter()
+    try:
+        # Sampling blocks on the worker processes; keep it off the event loop
+        streets = await run_in_threadpool(compute_equity, hole_cards, board, _budget(options), options.mode)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    return EquityResponseSchema(
+        hand_id=hand_id,
+        streets=[StreetEquitySchema.model_validate(street) for street in streets],
+        elapsed_ms=(time.perf_counter() - start) * 1000,
+    )
+
+@router.post("/", response_model=EquityResponseSchema)
+async def equity_endpoint(request: EquityRequestSchema):
+    """
+    Computes each player's win/tie probability and pot equity at every street
+    of the given board (preflop, flop, turn, river as far as it goes). The board
+    is read from action_sequence when not given explicitly. Streets are sampled
+    or enumerated exactly according to mode.
+    """
+    board = request.board
+    if board is None:
+        board = extract_board(request.action_sequence) if request.action_sequence else []
+    return await _equity_response(request.hole_cards, board, request)
+
+@router.post("/hands/{hand_id}", response_model=EquityResponseSchema)
+async def hand_equity_endpoint(
+    hand_id: uuid.UUID,
+    options: Optional[EquityOptionsSchema] = None,
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """Street-by-street equity for a stored hand, using its hole cards and board."""
+    hand: Optional[HandData] = await call_repository(repo.get_hand_by_id, hand_id)
+    if hand is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hand with ID {hand_id} not found.")
+    return await _equity_response(hand.hole_cards, extract_board(hand.action_sequence), options or EquityOptionsSchema(), hand_id)
+
+@router.get("/cache", response_model=EquityCacheStatsSchema)
+def equity_cache_stats_endpoint():
+    """Hit ratio and size of this worker's exact-equity cache."""
+    return EquityCacheStatsSchema(**exact_cache_stats())
+
+@router.get("/preflop", response_model=PreflopEquitySchema)
+def preflop_equity_endpoint(
+    hand: str = Query(..., description="Starting-hand class: 'QQ', 'AKs', 'AKo'"),
+    vs: Optional[str] = Query(None, description="Opposing class for a heads-up lookup"),
+    opponents: int = Query(1, ge=1, le=MAX_OPPONENTS, description="Random opponents, when vs is omitted"),
+):
+    """
+    All-in preflop equity of a starting-hand class against another class or
+    against random hands, read from the precomputed matrix.
+    """
+    try:
+        hand_class = parse_class(hand)
+        other_class = parse_class(vs) if vs is not None else None
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    if other_class is not None:
+        equity, opponents = heads_up_equity(hand_class, other_class), 1
+    else:
+        equity = multiway_equity(hand_class, opponents)
+    if equity is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The preflop equity matrix has not been built; run python -m app.jobs.build_preflop_matrix",
+        )
+    info = matrix_info()
+    return PreflopEquitySchema(
+        hand=CLASS_NAMES[hand_class],
+        vs=CLASS_NAMES[other_class] if other_class is not None else None,
+        opponents=opponents,
+        equity=equity,
+        exact=info["exact"] if opponents == 1 else False,
+    )
+
+@router.get("/hands/{hand_id}/allin", response_model=AllInEVSchema)
+async def hand_all_in_ev_endpoint(hand_id: uuid.UUID, repo: HandRepository = Depends(get_hand_repository)):
+    """
+    All-in EV of a stored hand that ended with two players all-in: each
+    player's expected result from their equity at the all-in, next to the
+    stored winnings.
+    """
+    hand: Optional[HandData] = await call_repository(repo.get_hand_by_id, hand_id)
+    if hand is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hand with ID {hand_id} not found.")
+    try:
+        result = await run_in_threadpool(all_in_ev, hand)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    return AllInEVSchema(
+        hand_id=hand_id,
+        street=result.street,
+        board=result.board,
+        pot=result.pot,
+        source=result.source,
+        players={player: AllInPlayerEVSchema.model_validate(ev) for player, ev in result.players.items()},
+    )
@@ -1,12 +1,40 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
+from datetime import datetime
+import inspect
+import itertools
+import logging
+import json
 import uuid
-from pydantic import TypeAdapter # Import TypeAdapter
 
-from app.schemas.hand import HandCreateSchema, HandResponseSchema, HandListResponseSchema
+from app.schemas.hand import (
+    HandCreateSchema,
+    HandResponseSchema,
+    HandListResponseSchema,
+    BatchItemResultSchema,
+    BatchCreateResponseSchema,
+    HandCacheStatsSchema,
+    HandReplaySchema,
+    IngestAcceptedSchema,
+    IngestHandStatusSchema,
+    IngestStatsSchema,
+    ImportStatsSchema,
+)
 from app.services.hand_logic import process_hand
-from app.repositories.hand_repository import HandRepository
-from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository, call_repository, decode_cursor
+from app.repositories.cached_hand_repository import CachedHandRepository, get_cached_repository
+from app.models.hand import HandData, HandFilters, HandPage, ReplayPage
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, EXPORT_CHUNK_SIZE, MAX_BATCH_SIZE, INGEST_MODE
+from app.services.hand_export import EXPORT_FORMATS, aiter_export, iter_export
+from app.services.hand_json import HandJSONResponse, dumps, encode_hand, encode_hand_list
+from app.services.hand_replay import build_replay
+from app.services.hand_import import HandImportError, get_executor as get_import_executor, import_stream
+from app.services.ingest import IngestClosedError, IngestQueueFullError, IngestWriter, get_ingest_writer
+from app.db.pool import PoolTimeoutError
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/hands",
@@ -14,58 +42,219 @@ router = APIRouter(
     responses={404: {"description": "Not found"}},
 )
 
-# Dependency to get the repository instance
+# Dependency to get the repository instance (shared for the whole process, behind the read-through cache).
+# Endpoints are async and go through call_repository, so either driver's repository works.
 def get_hand_repository() -> HandRepository:
-    return HandRepository()
+    return get_cached_repository()
 
-# Create a TypeAdapter for the list response
-hand_list_adapter = TypeAdapter(List[HandResponseSchema])
-
-@router.post("/", response_model=HandResponseSchema, status_code=status.HTTP_201_CREATED)
-def create_hand_endpoint(
+@router.post(
+    "/",
+    response_model=HandResponseSchema,
+    status_code=status.HTTP_201_CREATED,
+    responses={status.HTTP_202_ACCEPTED: {"model": IngestAcceptedSchema, "description": "Queued for writing (INGEST_MODE=async)"}},
+)
+async def create_hand_endpoint(
     hand_input: HandCreateSchema,
-    repo: HandRepository = Depends(get_hand_repository)
+    repo: HandRepository = Depends(get_hand_repository),
+    writer: Optional[IngestWriter] = Depends(get_ingest_writer),
 ):
     """
     Receives hand data from the client, calculates winnings using pokerkit,
     saves the completed hand to the database, and returns the saved hand data.
+    With INGEST_MODE=async the settled hand is only queued: the response is
+    202 with its ID, and GET /hands/ingest/{id} reports when it is stored.
     """
     try:
-        processed_hand_data: HandData = process_hand(hand_input)
-        saved_hand: Optional[HandData] = repo.create_hand(processed_hand_data)
+        if INGEST_MODE == "async" and writer is None:
+            # Startup has not reached the writer yet; never fall back to a synchronous insert
+            raise IngestClosedError("the writer has not started yet")
+        # Settlement is CPU-bound; keep it off the event loop
+        processed_hand_data: HandData = await run_in_threadpool(process_hand, hand_input)
+        if writer is not None:
+            await writer.submit(processed_hand_data)
+            return HandJSONResponse(
+                dumps({"id": processed_hand_data.id, "status": "queued"}),
+                status_code=status.HTTP_202_ACCEPTED,
+                headers={"Location": f"/hands/ingest/{processed_hand_data.id}"},
+            )
+
+        saved_hand: Optional[HandData] = await call_repository(repo.create_hand, processed_hand_data)
 
         if not saved_hand:
             if not repo.table_exists:
                  raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Database table \'hands\' does not exist. Cannot save hand.")
             raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to save hand data to database.")
 
-        # Use Pydantic V2 model_validate for single object
-        return HandResponseSchema.model_validate(saved_hand)
+        # HandData already has the response's shape; encode it directly (see app/services/hand_json.py)
+        return HandJSONResponse(encode_hand(saved_hand), status_code=status.HTTP_201_CREATED)
 
     except ValueError as ve:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    except (IngestQueueFullError, IngestClosedError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Hand queue is not accepting hands, please retry: {e}",
+            headers={"Retry-After": "1"},
+        )
+    except PoolTimeoutError:
+        raise
     except Exception as e:
-        print(f"Error in create_hand_endpoint: {e}")
+        logger.exception("Error in create_hand_endpoint: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"An unexpected error occurred while processing the hand: {type(e).__name__} - {e}")
 
+def _parse_batch_body(body: bytes, content_type: str) -> list:
+    """
+    Decode a batch body: a JSON array, or NDJSON (one hand per line) when the
+    content type says so. Malformed NDJSON lines become ValueError entries so
+    they are reported per item instead of failing the whole batch.
+    """
+    if "ndjson" in content_type or "jsonl" in content_type:
+        items = []
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            try:
+                items.append(json.loads(line))
+            except ValueError as e:
+                items.append(ValueError(f"Invalid JSON line: {e}"))
+        return items
+
+    try:
+        items = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON body: {e}")
+    if not isinstance(items, list):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Batch body must be a JSON array of hands.")
+    return items
+
+def _settle_batch(items: list):
+    """Validate and settle every hand; invalid ones get their error result right away."""
+    results: List[Optional[BatchItemResultSchema]] = [None] * len(items)
+    processed: List[HandData] = []
+    processed_indexes: List[int] = []
+
+    for index, item in enumerate(items):
+        try:
+            if isinstance(item, Exception):
+                raise item
+            hand_input = HandCreateSchema.model_validate(item)
+            processed.append(process_hand(hand_input))
+            processed_indexes.append(index)
+        except ValueError as ve: # Includes pydantic ValidationError
+            results[index] = BatchItemResultSchema(index=index, status="error", error=str(ve))
+    return results, processed, processed_indexes
+
+async def _process_batch(items: list, repo: HandRepository) -> BatchCreateResponseSchema:
+    """Validate and settle every hand, then store the valid ones in one bulk transaction."""
+    results, processed, processed_indexes = await run_in_threadpool(_settle_batch, items)
+
+    error = None
+    try:
+        if processed and await call_repository(repo.create_hands_bulk, processed) != len(processed):
+            error = "Database table 'hands' does not exist. Cannot save hand."
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.exception("Error in create_hands_batch_endpoint: %s", e)
+        error = f"Failed to save hand data to database: {type(e).__name__} - {e}"
+
+    for index, hand in zip(processed_indexes, processed):
+        if error:
+            results[index] = BatchItemResultSchema(index=index, status="error", id=hand.id, error=error)
+        else:
+            results[index] = BatchItemResultSchema(index=index, status="created", id=hand.id)
+
+    created = sum(1 for result in results if result.status == "created")
+    return BatchCreateResponseSchema(created=created, failed=len(results) - created, results=results)
+
+@router.post("/batch", response_model=BatchCreateResponseSchema)
+async def create_hands_batch_endpoint(
+    request: Request,
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """
+    Receives many hands at once, as a JSON array or as NDJSON
+    (Content-Type: application/x-ndjson), settles each one and stores all valid
+    hands in a single transaction. Returns a result per submitted hand; invalid
+    hands are reported without affecting the rest of the batch.
+    """
+    items = _parse_batch_body(await request.body(), request.headers.get("content-type", ""))
+    if len(items) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch of {len(items)} hands exceeds the limit of {MAX_BATCH_SIZE}.",
+        )
+    return await _process_batch(items, repo)
+
+@router.post("/import", response_model=ImportStatsSchema)
+async def import_hands_endpoint(
+    request: Request,
+    source: str = Query("upload", max_length=200, description="Name reported back for the upload, e.g. its file name"),
+    repo: HandRepository = Depends(get_hand_repository),
+    executor = Depends(get_import_executor),
+):
+    """
+    Imports a PokerStars hand-history text file sent as the request body. The
+    body is split into hands as it arrives; hands are settled on the import
+    worker pool and stored in batches of IMPORT_BATCH_SIZE. Hands that were
+    imported before are skipped, and hands that cannot be imported are counted
+    and reported with their byte offset without stopping the import.
+    """
+    try:
+        stats = await import_stream(request.stream(), repo, executor, source)
+    except HandImportError as e:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.exception("Error in import_hands_endpoint: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Import failed: {type(e).__name__} - {e}")
+    return stats.as_dict()
+
+def get_hand_filters(
+    player: Optional[str] = Query(None, description="Only hands this player took part in"),
+    created_from: Optional[datetime] = Query(None, description="Only hands created at or after this time"),
+    created_to: Optional[datetime] = Query(None, description="Only hands created before this time"),
+    min_pot: Optional[int] = Query(None, ge=0, description="Minimum chips won in the hand"),
+    max_pot: Optional[int] = Query(None, ge=0, description="Maximum chips won in the hand"),
+) -> HandFilters:
+    return HandFilters(
+        player=player,
+        created_from=created_from,
+        created_to=created_to,
+        min_pot=min_pot,
+        max_pot=max_pot,
+    )
+
 @router.get("/", response_model=HandListResponseSchema)
-def get_all_hands_endpoint(
+async def get_all_hands_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Page size"),
+    cursor: Optional[str] = Query(None, description="Continuation token from a previous page's next_cursor"),
+    filters: HandFilters = Depends(get_hand_filters),
     repo: HandRepository = Depends(get_hand_repository)
 ):
     """
-    Retrieves all saved hand histories from the database.
+    Retrieves saved hand histories, newest first, one page at a time.
+    Pass the returned next_cursor back as cursor to fetch the following page.
     """
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as ve:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+
     try:
-        hands: List[HandData] = repo.get_all_hands()
-        if not repo.table_exists and not hands:
+        page: HandPage = await call_repository(repo.get_hands_page, limit=limit, cursor=cursor, filters=filters)
+        if not repo.table_exists and not page.hands:
              return HandListResponseSchema(hands=[])
-             
-        # Use TypeAdapter for list validation/conversion from attributes
-        validated_hands = hand_list_adapter.validate_python(hands, from_attributes=True)
-        return HandListResponseSchema(hands=validated_hands)
+
+        # Encoded straight from the dataclasses, skipping per-hand Pydantic models and response_model re-validation
+        return HandJSONResponse(encode_hand_list(page.hands, page.next_cursor))
         
+    except PoolTimeoutError:
+        raise
     except Exception as e:
-        print(f"Error in get_all_hands_endpoint: {e}")
+        logger.exception("Error in get_all_hands_endpoint: %s", e)
         # Add more detail to the exception message if possible
         error_detail = f"Failed to retrieve hand histories: {type(e).__name__} - {e}"
         # Check for specific Pydantic validation errors
@@ -73,8 +262,76 @@ def get_all_hands_endpoint(
             error_detail += f" Validation Errors: {e.errors()}"
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=error_detail)
 
+@router.get("/export")
+async def export_hands_endpoint(
+    format: Literal["ndjson", "csv"] = Query("ndjson", description="Export format"),
+    filters: HandFilters = Depends(get_hand_filters),
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """
+    Streams every matching hand, newest first, as NDJSON or CSV.
+    Rows are read in chunks from a server-side cursor, so memory use is bounded.
+    """
+    hands = repo.iter_hands(filters=filters, chunk_size=EXPORT_CHUNK_SIZE)
+    try:
+        # Pull the first chunk now so connection or query errors still produce a proper status code
+        if inspect.isasyncgen(hands):
+            body = aiter_export(hands, format)
+            first_chunk = await anext(body, b"")
+        else:
+            body = iter_export(hands, format)
+            first_chunk = await run_in_threadpool(next, body, b"")
+    except PoolTimeoutError:
+        raise
+    except Exception as e:
+        logger.exception("Error in export_hands_endpoint: %s", e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to export hand histories: {type(e).__name__} - {e}")
+
+    return StreamingResponse(
+        _prepend(first_chunk, body) if inspect.isasyncgen(body) else itertools.chain([first_chunk], body),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="hands.{format}"'},
+    )
+
+@router.get("/cache", response_model=HandCacheStatsSchema)
+def hand_cache_stats_endpoint(repo: HandRepository = Depends(get_hand_repository)):
+    """Hit/miss counters of this worker's read-through hand cache."""
+    if not isinstance(repo, CachedHandRepository):
+        return HandCacheStatsSchema(enabled=False)
+    return HandCacheStatsSchema(enabled=True, **repo.cache_stats())
+
+@router.get("/ingest", response_model=IngestStatsSchema)
+def ingest_stats_endpoint(writer: Optional[IngestWriter] = Depends(get_ingest_writer)):
+    """This worker's write-behind queue: depth, oldest wait, throughput counters and spool usage."""
+    if writer is None:
+        return IngestStatsSchema(mode="sync")
+    return IngestStatsSchema(mode="async", **writer.stats())
+
+@router.get("/ingest/{hand_id}", response_model=IngestHandStatusSchema)
+async def ingest_status_endpoint(
+    hand_id: uuid.UUID,
+    writer: Optional[IngestWriter] = Depends(get_ingest_writer),
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """
+    Whether a hand accepted with 202 is still queued, failed, or stored. Only
+    the worker that accepted a hand knows it as queued or failed; every worker
+    can report it as stored.
+    """
+    known = writer.status(hand_id) if writer is not None else None
+    if known is not None:
+        return IngestHandStatusSchema(id=hand_id, **known)
+    if await call_repository(repo.get_hand_by_id, hand_id) is not None:
+        return IngestHandStatusSchema(id=hand_id, status="stored")
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hand with ID {hand_id} not found.")
+
+async def _prepend(first_chunk: bytes, body):
+    yield first_chunk
+    async for chunk in body:
+        yield chunk
+
 @router.get("/{hand_id}", response_model=HandResponseSchema)
-def get_hand_by_id_endpoint(
+async def get_hand_by_id_endpoint(
     hand_id: uuid.UUID,
     repo: HandRepository = Depends(get_hand_repository)
 ):
@@ -82,17 +339,50 @@ def get_hand_by_id_endpoint(
     Retrieves a specific hand history by its UUID.
     """
     try:
-        hand: Optional[HandData] = repo.get_hand_by_id(hand_id)
+        hand: Optional[HandData] = await call_repository(repo.get_hand_by_id, hand_id)
         if hand is None:
              if not repo.table_exists:
                   raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hand with ID {hand_id} not found (table missing).")
              raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hand with ID {hand_id} not found.")
 
-        # Use Pydantic V2 model_validate for single object
-        return HandResponseSchema.model_validate(hand)
-    except HTTPException as he:
-        raise he
+        return HandJSONResponse(encode_hand(hand))
+    except (HTTPException, PoolTimeoutError):
+        raise
     except Exception as e:
-        print(f"Error in get_hand_by_id_endpoint: {e}")
+        logger.exception("Error in get_hand_by_id_endpoint: %s", e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Failed to retrieve hand history: {type(e).__name__} - {e}")
 
+
+@router.get("/{hand_id}/replay", response_model=HandReplaySchema)
+async def get_hand_replay_endpoint(
+    hand_id: uuid.UUID,
+    start: int = Query(0, ge=0, description="First step to return"),
+    end: Optional[int] = Query(None, ge=0, description="Step to stop before (default: the last step)"),
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """
+    Step-by-step snapshots of a hand (pot, stacks, bets, board, player to act
+    and their legal actions) for steps start <= step < end. The replay is
+    computed through pokerkit on the first request and stored, so later
+    requests for any range only read snapshots.
+    """
+    page: Optional[ReplayPage] = await call_repository(repo.get_replay_steps, hand_id, start, end)
+    if page is None:
+        hand: Optional[HandData] = await call_repository(repo.get_hand_by_id, hand_id)
+        if hand is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Hand with ID {hand_id} not found.")
+        try:
+            steps = await run_in_threadpool(build_replay, hand)
+        except ValueError as ve:
+            raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Hand cannot be replayed: {ve}")
+        try:
+            await call_repository(repo.save_replay_steps, hand_id, steps)
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            # Still answer; the replay is simply computed again next time
+            logger.error("Error storing replay for hand %s: %s", hand_id, e)
+        page = ReplayPage(total_steps=len(steps), steps=steps[start:end])
+
+    # Snapshots are plain JSON values already; encode them without re-validating
+    return HandJSONResponse(dumps({"hand_id": hand_id, "total_steps": page.total_steps, "steps": page.steps}))
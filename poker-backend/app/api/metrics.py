@@ -0,0 +1,103 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from typing import Iterator
+
+from app.core.config import DB_DRIVER
+from app.core.log import logging_stats
+from app.core.metrics import REGISTRY, Family
+from app.core.startup import startup_report
+from app.db.async_database import get_async_pool_stats
+from app.db.database import get_pool_stats
+from app.repositories.cached_hand_repository import cached_repository_stats
+from app.services.action_parser import parse_cache_stats
+from app.services.ingest import get_ingest_writer
+
+router = APIRouter(tags=["metrics"])
+
+# Pool statistics keys and the series they are exported as (keys a driver does not report are skipped)
+POOL_SERIES = {
+    "size": ("db_pool_size", "gauge", "Open connections, including ones being opened."),
+    "max_size": ("db_pool_max_size", "gauge", "Largest number of connections the pool may open."),
+    "waiting": ("db_pool_waiting", "gauge", "Requests waiting for a connection."),
+    "checkouts": ("db_pool_checkouts_total", "counter", "Connections checked out of the pool."),
+    "timeouts": ("db_pool_timeouts_total", "counter", "Checkouts that gave up waiting (answered with 503)."),
+    "connections_opened": ("db_pool_connections_opened_total", "counter", "Physical connections opened."),
+    "connections_closed": ("db_pool_connections_closed_total", "counter", "Physical connections closed."),
+    "health_check_failures": ("db_pool_health_check_failures_total", "counter", "Idle connections found dead on checkout."),
+}
+
+def _single(name: str, type: str, help: str, value: float, **labels) -> Family:
+    return Family(name, type, help, [("", labels, value)])
+
+def collect_pool() -> Iterator[Family]:
+    stats = get_async_pool_stats() if DB_DRIVER == "asyncpg" else get_pool_stats()
+    if not stats:
+        return
+    yield Family("db_pool_connections", "gauge", "Pooled connections by state.", [
+        ("", {"state": "idle"}, stats["idle"]),
+        ("", {"state": "in_use"}, stats["in_use"]),
+    ])
+    for key, (name, type, help) in POOL_SERIES.items():
+        if key in stats:
+            yield _single(name, type, help, stats[key])
+
+def collect_caches() -> Iterator[Family]:
+    parse = parse_cache_stats()
+    yield _single("action_parse_cache_hits_total", "counter", "Action sequences served from the parse cache.", parse["hits"])
+    yield _single("action_parse_cache_misses_total", "counter", "Action sequences parsed.", parse["misses"])
+    yield _single("action_parse_cache_entries", "gauge", "Parsed sequences held.", parse["size"])
+
+    hand = cached_repository_stats()
+    if hand is None:
+        return
+    kinds = ("hand", "page", "replay")
+    yield Family("hand_cache_hits_total", "counter", "Hand cache hits by entry kind.", [("", {"kind": kind}, hand[f"{kind}_hits"]) for kind in kinds])
+    yield Family("hand_cache_misses_total", "counter", "Hand cache misses by entry kind.", [("", {"kind": kind}, hand[f"{kind}_misses"]) for kind in kinds])
+    yield _single("hand_cache_invalidations_total", "counter", "Inserts that orphaned the cached list pages.", hand["invalidations"])
+    if "size" in hand: # The in-process backend reports its own occupancy
+        yield _single("hand_cache_entries", "gauge", "Entries held by this worker's hand cache.", hand["size"])
+        yield _single("hand_cache_evictions_total", "counter", "Least recently used entries evicted.", hand["evictions"])
+        yield _single("hand_cache_expirations_total", "counter", "Entries dropped after their TTL.", hand["expirations"])
+
+def collect_logging() -> Iterator[Family]:
+    stats = logging_stats()
+    if not stats:
+        return
+    yield _single("log_queue_depth", "gauge", "Log records waiting for the writer thread.", stats["queued"])
+    yield _single("log_records_dropped_total", "counter", "Log records dropped because the queue was full.", stats["dropped"])
+    yield _single("log_records_suppressed_total", "counter", "Log records suppressed by the per-call-site rate limit.", stats["suppressed"])
+
+def collect_ingest() -> Iterator[Family]:
+    writer = get_ingest_writer()
+    if writer is None:
+        return
+    stats = writer.stats()
+    yield _single("ingest_queue_depth", "gauge", "Hands waiting for the write-behind writer.", stats["queued"])
+    yield _single("ingest_oldest_queued_seconds", "gauge", "How long the oldest queued hand has waited.", stats["oldest_queued_seconds"])
+    yield Family("ingest_hands_total", "counter", "Hands by ingest outcome.", [
+        ("", {"outcome": outcome}, stats[outcome]) for outcome in ("accepted", "rejected", "recovered", "committed", "failed")
+    ])
+    yield _single("ingest_retries_total", "counter", "Group commits retried after connection-level errors.", stats["retries"])
+
+def collect_startup() -> Iterator[Family]:
+    report = startup_report()
+    yield _single("startup_complete", "gauge", "1 once every startup phase has finished.", 1 if report.complete else 0)
+    yield Family("startup_phase_seconds", "gauge", "Duration of each finished startup phase.", [
+        ("", {"phase": name}, seconds) for name, seconds in report.phases.items()
+    ])
+
+REGISTRY.register_collector(collect_pool)
+REGISTRY.register_collector(collect_caches)
+REGISTRY.register_collector(collect_logging)
+REGISTRY.register_collector(collect_ingest)
+REGISTRY.register_collector(collect_startup)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    This worker's metrics in the Prometheus text format: request latency per
+    route, database connect/checkout/query/commit timings, rows per query,
+    process_hand duration, group commits, startup phase durations, and pool,
+    cache, ingest queue and logging statistics.
+    """
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
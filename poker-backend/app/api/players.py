@@ -0,0 +1,42 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import List, Literal, Optional
+
+from app.schemas.player_stats import LeaderboardEntrySchema, LeaderboardSchema, PlayerStatsSchema
+from app.models.player_stats import PlayerStats
+from app.repositories.hand_repository import HandRepository, call_repository
+from app.services.player_stats import summarize
+from app.core.config import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.api.hand import get_hand_repository
+
+router = APIRouter(
+    tags=["players"],
+    responses={404: {"description": "Not found"}},
+)
+
+@router.get("/players/{player_id}/stats", response_model=PlayerStatsSchema)
+async def player_stats_endpoint(
+    player_id: str,
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """
+    Aggregates for one player across all stored hands: hands played, net
+    winnings, VPIP, PFR, postflop aggression factor and showdown frequency.
+    Served from the player_stats table, which every insert keeps current.
+    """
+    stats: Optional[PlayerStats] = await call_repository(repo.get_player_stats, player_id)
+    if stats is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No hands stored for player {player_id}.")
+    return PlayerStatsSchema(**summarize(stats))
+
+@router.get("/leaderboard", response_model=LeaderboardSchema)
+async def leaderboard_endpoint(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Number of players"),
+    order_by: Literal["net_winnings", "hands"] = Query("net_winnings", description="Ranking column"),
+    repo: HandRepository = Depends(get_hand_repository)
+):
+    """Top players by net winnings (or hands played), read off an index on player_stats."""
+    players: List[PlayerStats] = await call_repository(repo.get_leaderboard, limit, order_by)
+    return LeaderboardSchema(
+        order_by=order_by,
+        players=[LeaderboardEntrySchema(rank=rank, **summarize(stats)) for rank, stats in enumerate(players, 1)],
+    )
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Depends, Response, status
+import random
+import uuid
+
+from app.schemas.simulation import SimulationListSchema, SimulationRequestSchema, SimulationStatusSchema
+from app.services.hand_json import HandJSONResponse
+from app.services.simulation import (
+    SimulationConfig,
+    SimulationJob,
+    get_executor as get_simulation_executor,
+    get_job,
+    list_jobs,
+    start_job,
+    validate_config,
+)
+from app.repositories.hand_repository import HandRepository
+from app.core.config import BIG_BLIND
+from app.api.hand import get_hand_repository
+
+router = APIRouter(
+    prefix="/simulations",
+    tags=["simulations"],
+    responses={404: {"description": "Not found"}},
+)
+
+def _job(job_id: uuid.UUID) -> SimulationJob:
+    job = get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Simulation with ID {job_id} not found.")
+    return job
+
+@router.post("/", response_model=SimulationStatusSchema, status_code=status.HTTP_202_ACCEPTED)
+async def start_simulation_endpoint(
+    request: SimulationRequestSchema,
+    response: Response,
+    repo: HandRepository = Depends(get_hand_repository),
+    executor = Depends(get_simulation_executor),
+):
+    """
+    Starts a self-play job and answers 202 with its status; poll the Location
+    for progress. Hands are dealt from the seed, so the same request with the
+    same seed plays the same hands. Jobs live in the server worker that
+    started them.
+    """
+    stacks = request.stacks or [100 * BIG_BLIND] * request.players
+    policies = [request.policies[seat % len(request.policies)] for seat in range(request.players)]
+    try:
+        validate_config(request.players, stacks, policies)
+    except ValueError as ve:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(ve))
+    seed = request.seed if request.seed is not None else random.randrange(2 ** 32)
+    config = SimulationConfig(request.players, tuple(stacks), tuple(policies), seed)
+    job = start_job(SimulationJob(config, request.hands, request.persist, request.keep_hands), repo, executor)
+    response.headers["Location"] = f"/simulations/{job.id}"
+    return job.progress()
+
+@router.get("/", response_model=SimulationListSchema)
+def list_simulations_endpoint():
+    """This worker's jobs, oldest first."""
+    return SimulationListSchema(simulations=[job.progress() for job in list_jobs()])
+
+@router.get("/{job_id}", response_model=SimulationStatusSchema)
+def get_simulation_endpoint(job_id: uuid.UUID):
+    """Progress and throughput of a job."""
+    return _job(job_id).progress()
+
+@router.get("/{job_id}/hands")
+def get_simulation_hands_endpoint(job_id: uuid.UUID):
+    """
+    The hands the job kept (keep_hands), in hand order: HandCreateSchema
+    fields, plus id, created_at and winnings when the job stored them.
+    """
+    return HandJSONResponse(content={"hands": _job(job_id).kept})
+
+@router.delete("/{job_id}", response_model=SimulationStatusSchema)
+def cancel_simulation_endpoint(job_id: uuid.UUID):
+    """Stops a running job; hands it already stored stay stored."""
+    job = _job(job_id)
+    if not job.cancel():
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Simulation {job_id} has already finished.")
+    return job.progress()
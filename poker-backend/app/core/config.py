@@ -6,3 +6,107 @@ load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://poker_user:password@db:5432/pokerdb")
 SECRET_KEY = os.getenv("SECRET_KEY", "your_secret_key_here")
 
+# Database driver for the request path: "psycopg2" (sync, served from the threadpool)
+# or "asyncpg" (native async). Migrations always run through psycopg2.
+DB_DRIVER = os.getenv("DB_DRIVER", "psycopg2")
+
+# Connection pool settings (sizes are per worker process, times in seconds)
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_MAX_LIFETIME = float(os.getenv("DB_POOL_MAX_LIFETIME", "1800"))
+DB_POOL_HEALTH_CHECK_IDLE = float(os.getenv("DB_POOL_HEALTH_CHECK_IDLE", "30"))
+
+# Seconds between catalog re-checks while the hands table is known to be missing
+SCHEMA_RECHECK_INTERVAL = float(os.getenv("SCHEMA_RECHECK_INTERVAL", "30"))
+
+# Page sizes for GET /hands/
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+# Rows fetched per round trip by the streaming export
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "1000"))
+
+# Largest number of hands accepted by POST /hands/batch
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "10000"))
+
+# Blinds used when replaying hands for settlement (the frontend plays 20/40)
+SMALL_BLIND = int(os.getenv("SMALL_BLIND", "20"))
+BIG_BLIND = int(os.getenv("BIG_BLIND", "40"))
+
+# Directory for derived data files (e.g. the hand rank lookup table); created on demand
+CACHE_DIR = os.getenv("CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), ".cache"))
+
+# Monte Carlo equity: worker processes (0 = one per CPU core, 1 = in-process),
+# runouts per worker per round, and the default/maximum per-request budgets
+EQUITY_WORKERS = int(os.getenv("EQUITY_WORKERS", "0"))
+EQUITY_BATCH_SIZE = int(os.getenv("EQUITY_BATCH_SIZE", "5000"))
+EQUITY_DEFAULT_ITERATIONS = int(os.getenv("EQUITY_DEFAULT_ITERATIONS", "100000"))
+EQUITY_MAX_ITERATIONS = int(os.getenv("EQUITY_MAX_ITERATIONS", "2000000"))
+EQUITY_DEFAULT_TIME_MS = int(os.getenv("EQUITY_DEFAULT_TIME_MS", "2000"))
+EQUITY_MAX_TIME_MS = int(os.getenv("EQUITY_MAX_TIME_MS", "10000"))
+
+# Exact equity: largest enumeration allowed per street, and how many canonical
+# spots each worker keeps memoized
+EQUITY_EXACT_MAX_RUNOUTS = int(os.getenv("EQUITY_EXACT_MAX_RUNOUTS", "2000000"))
+EQUITY_CACHE_SIZE = int(os.getenv("EQUITY_CACHE_SIZE", "4096"))
+
+# Parsed action sequences kept in memory, keyed by the sequence string
+ACTION_PARSE_CACHE_SIZE = int(os.getenv("ACTION_PARSE_CACHE_SIZE", "65536"))
+
+# Read-through cache for hand lookups and first list pages: entries per worker
+# (0 disables it), TTLs in seconds, and an optional Redis URL to share it
+HAND_CACHE_SIZE = int(os.getenv("HAND_CACHE_SIZE", "10000"))
+HAND_CACHE_TTL = float(os.getenv("HAND_CACHE_TTL", "3600"))
+HAND_CACHE_PAGE_TTL = float(os.getenv("HAND_CACHE_PAGE_TTL", "5"))
+HAND_CACHE_URL = os.getenv("HAND_CACHE_URL", "")
+
+# Add a Server-Timing header with per-request trace spans (db, settle, ...) to every response
+TRACE_REQUESTS = os.getenv("TRACE_REQUESTS", "false").lower() in ("1", "true", "yes")
+
+# Logging: root level, per-module overrides ("app.db=DEBUG,app.repositories=WARNING"),
+# "json" or "text" lines, records buffered for the writer thread, and at most
+# LOG_RATE_LIMIT records per call site every LOG_RATE_WINDOW seconds (0 = no limit)
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_RATE_LIMIT = int(os.getenv("LOG_RATE_LIMIT", "10"))
+LOG_RATE_WINDOW = float(os.getenv("LOG_RATE_WINDOW", "60"))
+
+# Hand ingestion: "sync" commits each POST /hands/ before responding; "async"
+# answers 202 once the hand is queued and a background writer commits queued
+# hands in groups of up to INGEST_BATCH_SIZE, waiting at most
+# INGEST_FLUSH_INTERVAL seconds to fill a group. INGEST_QUEUE_SIZE hands may
+# wait per worker before new ones are refused with 503. INGEST_SPOOL_DIR
+# enables the crash-safe spool file (fsync'd before the 202 when
+# INGEST_SPOOL_FSYNC is set); INGEST_DRAIN_TIMEOUT bounds the flush at shutdown
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.05"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "10000"))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "")
+INGEST_SPOOL_FSYNC = os.getenv("INGEST_SPOOL_FSYNC", "false").lower() in ("1", "true", "yes")
+INGEST_DRAIN_TIMEOUT = float(os.getenv("INGEST_DRAIN_TIMEOUT", "10"))
+
+# Hand-history import (POST /hands/import, app/jobs/import_hands.py): worker
+# processes converting hands (0 = one per CPU core, 1 = in-process), hands
+# stored per transaction, and bytes read from a file at a time
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "0"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_READ_SIZE = int(os.getenv("IMPORT_READ_SIZE", "1048576"))
+
+# Self-play simulation (POST /simulations): worker processes (0 = one per CPU
+# core, 1 = a thread of the server), hands per task sent to a worker, the
+# largest job, hands a job may keep for GET /simulations/{id}/hands, and
+# finished jobs remembered per server worker
+SIMULATION_WORKERS = int(os.getenv("SIMULATION_WORKERS", "0"))
+SIMULATION_CHUNK_SIZE = int(os.getenv("SIMULATION_CHUNK_SIZE", "500"))
+SIMULATION_MAX_HANDS = int(os.getenv("SIMULATION_MAX_HANDS", "1000000"))
+SIMULATION_MAX_KEPT_HANDS = int(os.getenv("SIMULATION_MAX_KEPT_HANDS", "10000"))
+SIMULATION_JOB_HISTORY = int(os.getenv("SIMULATION_JOB_HISTORY", "100"))
+
+# Startup: "background" serves /live at once and runs migrations, pools and
+# table loading as a task (/ready answers 503 until it is done); "blocking"
+# finishes them before the worker accepts requests
+STARTUP_MODE = os.getenv("STARTUP_MODE", "background")
@@ -0,0 +1,238 @@
+"""
+Structured logging with a background writer.
+
+configure_logging() puts a single QueueHandler on the root logger. Callers
+only resolve the message and enqueue the record; a QueueListener thread
+formats it (JSON lines by default, LOG_FORMAT=text for local development) and
+writes it to stdout, so request threads and the event loop never block on
+console I/O. When the queue is full, records are dropped and counted instead
+of blocking.
+
+Two filters run in the caller before a record is queued:
+- ContextFilter stamps the request ID of the current request (set by
+  RequestIdMiddleware from X-Request-ID, or generated) so every line can be
+  correlated, including lines logged from the threadpool.
+- RateLimitFilter lets through at most LOG_RATE_LIMIT records per call site
+  per LOG_RATE_WINDOW seconds. The first record after a window carries a
+  "suppressed" count, so error storms cost one dict lookup per repeat.
+
+Levels: LOG_LEVEL for everything, LOG_LEVELS for per-module overrides such as
+"app.db=DEBUG,app.repositories=WARNING".
+"""
+import atexit
+import copy
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Callable, Dict, Optional
+
+import orjson
+
+from app.core.config import LOG_FORMAT, LOG_LEVEL, LOG_LEVELS, LOG_QUEUE_SIZE, LOG_RATE_LIMIT, LOG_RATE_WINDOW
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Client-supplied request IDs are echoed into logs and headers, so only accept plain tokens
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is logged as a field
+_STANDARD_ATTRS = frozenset(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "suppressed"}
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the current request ID (None outside requests)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+class RateLimitFilter(logging.Filter):
+    """
+    Allow at most `limit` records per call site (file and line) per `window`
+    seconds; the rest are counted and reported on the next record let through.
+    """
+
+    def __init__(self, limit: int, window: float, clock: Callable[[], float] = time.monotonic):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._clock = clock
+        self._sites: Dict[tuple, list] = {} # (pathname, lineno) -> [window start, passed, suppressed]
+        self._lock = threading.Lock()
+        self.suppressed_total = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.limit <= 0:
+            return True
+        key = (record.pathname, record.lineno)
+        now = self._clock()
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                if site is not None and site[2]:
+                    record.suppressed = site[2]
+                self._sites[key] = [now, 1, 0]
+                return True
+            if site[1] < self.limit:
+                site[1] += 1
+                return True
+            site[2] += 1
+            self.suppressed_total += 1
+            return False
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request ID, extra fields, traceback."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            entry["suppressed"] = suppressed
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return orjson.dumps(entry, default=str).decode()
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not getattr(record, "request_id", None):
+            record.request_id = "-"
+        text = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        return f"{text} ({suppressed} similar suppressed)" if suppressed else text
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks or formats: full queue means the record is dropped and counted."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message now, as its arguments may change; formatting (and tracebacks) happen in the writer
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """'app.db=DEBUG,uvicorn=WARNING' -> {logger: level}. Raises ValueError on malformed entries."""
+    levels = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, sep, level = entry.partition("=")
+        resolved = logging.getLevelName(level.strip().upper())
+        if not sep or not name.strip() or not isinstance(resolved, int):
+            raise ValueError(f"Invalid LOG_LEVELS entry {entry!r}; expected logger=LEVEL")
+        levels[name.strip()] = resolved
+    return levels
+
+_handler: Optional[DroppingQueueHandler] = None
+_rate_limit: Optional[RateLimitFilter] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    """Install the queue handler and start the writer thread (once per process)."""
+    global _handler, _rate_limit, _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        writer = logging.StreamHandler(sys.stdout)
+        writer.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JSONFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        _handler = DroppingQueueHandler(log_queue)
+        _rate_limit = RateLimitFilter(LOG_RATE_LIMIT, LOG_RATE_WINDOW)
+        _handler.addFilter(_rate_limit)
+        _handler.addFilter(ContextFilter())
+
+        root = logging.getLogger()
+        root.addHandler(_handler)
+        root.setLevel(LOG_LEVEL.upper())
+        for name, level in parse_levels(LOG_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        _listener = logging.handlers.QueueListener(log_queue, writer)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Write out everything still queued and stop the writer thread."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+            logging.getLogger().removeHandler(_handler)
+
+def logging_stats() -> dict:
+    """Queue depth plus records dropped (queue full) and suppressed (rate limit) so far."""
+    if _handler is None:
+        return {}
+    return {
+        "queued": _handler.queue.qsize(),
+        "dropped": _handler.dropped,
+        "suppressed": _rate_limit.suppressed_total,
+    }
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving every request an ID for log correlation: the
+    client's X-Request-ID when it is a plain token, otherwise a new one. The
+    ID is returned in the X-Request-ID response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _VALID_REQUEST_ID.match(candidate):
+                    request_id = candidate
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        token = _request_id.set(request_id)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _request_id.reset(token)
@@ -0,0 +1,286 @@
+"""
+In-process metrics in the Prometheus text format, and optional request traces.
+
+A small registry of labelled histograms plus collectors that read counters and
+gauges such as pool and cache statistics at scrape time; GET /metrics
+renders all of it (see app/api/metrics.py). Observing a value is a dict lookup,
+a bisect and a locked increment, cheap enough for every query and request.
+Histograms are per worker process, as with any Prometheus client
+without a multiprocess mode: scrape each worker, or aggregate in Prometheus.
+
+Tracing is opt-in (TRACE_REQUESTS): MetricsMiddleware then collects spans
+recorded by span(), db_operation() and observed() during a request and returns
+them in a Server-Timing header, summed per span name.
+"""
+import bisect
+import functools
+import inspect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from app.core.config import TRACE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+class Family(NamedTuple):
+    """One metric as rendered: name, type, help and (suffix, labels, value) samples."""
+    name: str
+    type: str # "counter", "gauge" or "histogram"
+    help: str
+    samples: List[Tuple[str, Dict[str, str], float]]
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._default = self._children[()] = self._new_child()
+
+    def labels(self, *values: str):
+        """The child series for these label values (positional, in labelnames order)."""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def collect(self) -> Family:
+        samples = []
+        for values, child in list(self._children.items()):
+            for suffix, extra, value in child.samples():
+                samples.append((suffix, {**dict(zip(self.labelnames, values)), **extra}, value))
+        return Family(self.name, self.type, self.help, samples)
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1) # Last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def samples(self):
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative = 0
+        for bound, count in zip(self._bounds + (float("inf"),), counts):
+            cumulative += count
+            yield "_bucket", {"le": _format_value(float(bound))}, cumulative
+        yield "_sum", {}, total
+        yield "_count", {}, cumulative
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default.observe(value)
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Add a function called on every scrape (for values read from elsewhere, e.g. pool stats)."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+        families = [metric.collect() for metric in list(self._metrics.values())]
+        for collector in list(self._collectors):
+            try:
+                families.extend(collector())
+            except Exception as e:
+                logger.error("Error collecting metrics from %s: %s", getattr(collector, '__name__', collector), e)
+        lines = []
+        for family in families:
+            lines.append(f"# HELP {family.name} {family.help}")
+            lines.append(f"# TYPE {family.name} {family.type}")
+            for suffix, labels, value in family.samples:
+                lines.append(f"{family.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labelnames, buckets))
+
+# Series recorded on the request path
+HTTP_REQUEST_SECONDS = histogram("http_request_duration_seconds", "Request latency by route template.", ("method", "route", "status"))
+DB_CONNECT_SECONDS = histogram("db_connect_seconds", "Time to open a new database connection.", ("driver",))
+DB_POOL_WAIT_SECONDS = histogram("db_pool_wait_seconds", "Time to check a connection out of the pool.", ("driver",))
+DB_QUERY_SECONDS = histogram("db_query_seconds", "Statement execution time by repository operation.", ("operation",))
+DB_COMMIT_SECONDS = histogram("db_commit_seconds", "Transaction commit time.")
+DB_ROWS_RETURNED = histogram("db_rows_returned", "Rows returned per query by repository operation.", ("operation",), ROW_BUCKETS)
+PROCESS_HAND_SECONDS = histogram("process_hand_seconds", "Time to parse and settle a submitted hand.")
+INGEST_COMMIT_SECONDS = histogram("ingest_commit_seconds", "Time to store one group of queued hands (INGEST_MODE=async).")
+INGEST_BATCH_HANDS = histogram("ingest_batch_hands", "Hands stored per group commit.", buckets=(1, 10, 50, 100, 250, 500, 1000, 5000))
+
+# -- request traces and operation labels ---------------------------------------
+
+_spans: ContextVar[Optional[list]] = ContextVar("trace_spans", default=None)
+_operation: ContextVar[str] = ContextVar("db_operation", default="other")
+
+def current_operation() -> str:
+    """The repository operation running in this context, for labelling query metrics."""
+    return _operation.get()
+
+@contextmanager
+def span(name: str):
+    """Time the block as a span of the current request's trace (a no-op when not tracing)."""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - started))
+
+def observed(histogram: Histogram, span_name: str):
+    """Decorator: observe a function's duration in histogram and record it as a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                with span(span_name):
+                    return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started)
+        return wrapper
+    return decorator
+
+def db_operation(name: str):
+    """
+    Decorator for repository methods (sync or async): queries issued inside
+    are labelled with the operation name, and the call is traced as a "db" span.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                token = _operation.set(name)
+                try:
+                    with span("db"):
+                        return await fn(*args, **kwargs)
+                finally:
+                    _operation.reset(token)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            token = _operation.set(name)
+            try:
+                with span("db"):
+                    return fn(*args, **kwargs)
+            finally:
+                _operation.reset(token)
+        return wrapper
+    return decorator
+
+def server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    """Server-Timing header value: spans summed per name, in first-seen order, then the total."""
+    durations: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for name, duration in spans:
+        durations[name] = durations.get(name, 0.0) + duration
+        counts[name] = counts.get(name, 0) + 1
+    entries = [f'{name};dur={durations[name] * 1000:.2f};desc="{counts[name]}x"' for name in durations]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording http_request_duration_seconds per route template
+    (unmatched paths share one label, so arbitrary URLs cannot create series)
+    and, when tracing, adding the Server-Timing header.
+    """
+
+    def __init__(self, app, trace: bool = TRACE_REQUESTS):
+        self.app = app
+        self.trace = trace
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        spans = [] if self.trace else None
+        token = _spans.set(spans)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if spans is not None:
+                    value = server_timing(spans, time.perf_counter() - started)
+                    # Timing-Allow-Origin lets the frontend's origin read the timings too
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", value.encode("latin-1")),
+                        (b"timing-allow-origin", b"*"),
+                    ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(scope["method"], route, str(status_code)).observe(time.perf_counter() - started)
@@ -0,0 +1,104 @@
+"""
+Startup phases and the startup report.
+
+The lifespan runs the slow parts of startup (migrations, pools, the evaluator
+table, the preflop matrix, the pokerkit import) as timed phases. With
+STARTUP_MODE=background they run in a task after the worker starts serving,
+so /live answers at once and /ready reports 503 until every phase has
+finished. The report (status, seconds per phase, errors) is part of the /ready
+response and of /metrics, and is logged when startup completes.
+
+A failing phase is logged and recorded, and the remaining phases still run,
+as startup always did: readiness then reports what is missing. Errors a phase
+declares retryable (the database not being reachable yet) are recorded too,
+and the phase runs again with backoff until it succeeds.
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Tuple, Type
+
+from fastapi.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY = 30.0
+
+class StartupReport:
+    def __init__(self):
+        self.status = "starting" # starting, complete, cancelled
+        self.phases: Dict[str, float] = {} # Seconds per finished phase, in the order they finished
+        self.errors: Dict[str, str] = {}
+        self.started = time.perf_counter()
+        self.seconds: Optional[float] = None # From the start of the imports until every phase finished
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None):
+        self.phases[name] = seconds
+        if error is not None:
+            self.errors[name] = error
+        else:
+            self.errors.pop(name, None) # A retried phase that succeeded
+
+    @property
+    def complete(self) -> bool:
+        return self.status == "complete"
+
+    def finish(self, status: str = "complete"):
+        self.status = status
+        self.seconds = self.phases.get("imports", 0.0) + time.perf_counter() - self.started
+        logger.info(
+            "Startup %s in %.2fs: %s", status, self.seconds,
+            ", ".join(f"{name} {seconds:.3f}s" for name, seconds in self.phases.items()),
+        )
+
+    def as_dict(self) -> dict:
+        return {
+            "status": self.status,
+            "seconds": self.seconds if self.seconds is not None else self.phases.get("imports", 0.0) + time.perf_counter() - self.started,
+            "phases": dict(self.phases),
+            "errors": dict(self.errors),
+        }
+
+_report = StartupReport()
+
+def startup_report() -> StartupReport:
+    return _report
+
+def reset_startup_report(imports_seconds: float = 0.0) -> StartupReport:
+    """Start a new report (called at the start of the lifespan, with the time spent importing the app)."""
+    global _report
+    _report = StartupReport()
+    _report.record("imports", imports_seconds)
+    return _report
+
+async def phase(name: str, function, *args, retry: Tuple[Type[BaseException], ...] = ()):
+    """
+    Run one startup step and record its duration. Coroutine functions are
+    awaited, anything else runs in the threadpool so the event loop keeps
+    serving. Errors are logged and recorded instead of raised; returns None then.
+    Errors of the ``retry`` types are recorded and the step runs again after a
+    growing delay, until it succeeds or startup is cancelled.
+    """
+    started = time.perf_counter()
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            if asyncio.iscoroutinefunction(function):
+                result = await function(*args)
+            else:
+                result = await run_in_threadpool(function, *args)
+        except asyncio.CancelledError:
+            raise
+        except retry as e:
+            delay = min(MAX_RETRY_DELAY, 0.5 * 2 ** (attempt - 1))
+            logger.warning("Startup phase %s failed (attempt %d), retrying in %.1fs: %s", name, attempt, delay, e)
+            _report.record(name, time.perf_counter() - started, str(e))
+            await asyncio.sleep(delay)
+            continue
+        except Exception as e:
+            logger.error("Startup phase %s failed: %s", name, e)
+            _report.record(name, time.perf_counter() - started, str(e))
+            return None
+        _report.record(name, time.perf_counter() - started)
+        return result
@@ -0,0 +1,87 @@
+"""
+asyncpg connection pool, used when DB_DRIVER=asyncpg.
+
+asyncpg is imported lazily so the default psycopg2 stack does not need it
+installed. Schema migrations still run through psycopg2 at startup; this pool
+only serves the request path.
+"""
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+from app.core.config import DATABASE_URL, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT
+from app.core.metrics import DB_POOL_WAIT_SECONDS, DB_QUERY_SECONDS, current_operation
+from app.db.pool import PoolTimeoutError
+
+_pool = None
+_checkouts = 0
+_timeouts = 0
+_pool_wait_seconds = DB_POOL_WAIT_SECONDS.labels("asyncpg")
+
+def _log_query(record):
+    # Scheduled by asyncpg with the issuing task's context, so the operation label is still set
+    DB_QUERY_SECONDS.labels(current_operation()).observe(record.elapsed)
+
+async def _init_connection(conn):
+    # Exchange JSONB as Python objects, matching what psycopg2's Json adapter and decoder do
+    await conn.set_type_codec("jsonb", encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+    conn.add_query_logger(_log_query)
+
+async def init_async_pool():
+    """Creates the process-wide asyncpg pool (called from the app lifespan)."""
+    global _pool
+    if _pool is None:
+        import asyncpg
+        _pool = await asyncpg.create_pool(
+            DATABASE_URL,
+            min_size=DB_POOL_MIN_SIZE,
+            max_size=DB_POOL_MAX_SIZE,
+            init=_init_connection,
+        )
+    return _pool
+
+async def close_async_pool():
+    """Closes the process-wide asyncpg pool."""
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await pool.close()
+
+def get_async_pool_stats() -> dict:
+    """Returns pool statistics, or an empty dict when no pool has been created."""
+    pool = _pool
+    if pool is None:
+        return {}
+    size, idle = pool.get_size(), pool.get_idle_size()
+    return {
+        "driver": "asyncpg",
+        "min_size": pool.get_min_size(),
+        "max_size": pool.get_max_size(),
+        "size": size,
+        "idle": idle,
+        "in_use": size - idle,
+        "checkouts": _checkouts,
+        "timeouts": _timeouts,
+    }
+
+@asynccontextmanager
+async def async_connection():
+    """
+    Checks out a connection for the duration of the block. Waiting longer than
+    DB_POOL_TIMEOUT raises PoolTimeoutError, which the API answers with 503.
+    """
+    global _checkouts, _timeouts
+    pool = _pool if _pool is not None else await init_async_pool()
+    started = time.perf_counter()
+    try:
+        conn = await pool.acquire(timeout=DB_POOL_TIMEOUT)
+    except asyncio.TimeoutError:
+        _timeouts += 1
+        raise PoolTimeoutError(f"No database connection available within {DB_POOL_TIMEOUT}s")
+    _pool_wait_seconds.observe(time.perf_counter() - started)
+    _checkouts += 1
+    try:
+        yield conn
+    finally:
+        await pool.release(conn)
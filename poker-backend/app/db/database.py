@@ -1,49 +1,136 @@
+import logging
 import psycopg2
 import psycopg2.extras
-import os
-import uuid
-import json
+import threading
+import time
 from contextlib import contextmanager
-from app.core.config import DATABASE_URL
+from typing import Optional
+from app.core.config import (
+    DATABASE_URL,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_POOL_MAX_LIFETIME,
+    DB_POOL_HEALTH_CHECK_IDLE,
+)
+from app.core.metrics import (
+    DB_COMMIT_SECONDS,
+    DB_CONNECT_SECONDS,
+    DB_POOL_WAIT_SECONDS,
+    DB_QUERY_SECONDS,
+    DB_ROWS_RETURNED,
+    current_operation,
+)
+from app.db.pool import ConnectionPool, PoolTimeoutError
+from app.db.migrations import APPLIED_VERSION_QUERY, MIGRATIONS_TABLE_EXISTS_QUERY, run_migrations
+
+logger = logging.getLogger(__name__)
+
+# UUID adaptation is registered globally, so it only needs to happen once per process
+psycopg2.extras.register_uuid()
+
+# Errors about reaching the database rather than about the statements: worth retrying
+CONNECTION_ERRORS = (PoolTimeoutError, OSError, psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+_connect_seconds = DB_CONNECT_SECONDS.labels("psycopg2")
+_pool_wait_seconds = DB_POOL_WAIT_SECONDS.labels("psycopg2")
+
+def _connect():
+    started = time.perf_counter()
+    conn = psycopg2.connect(DATABASE_URL)
+    _connect_seconds.observe(time.perf_counter() - started)
+    return conn
+
+class InstrumentedCursor(psycopg2.extras.DictCursor):
+    """DictCursor that records statement time and result size under the current repository operation."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            operation = current_operation()
+            DB_QUERY_SECONDS.labels(operation).observe(time.perf_counter() - started)
+            if self.description is not None: # Statements that return rows
+                DB_ROWS_RETURNED.labels(operation).observe(max(self.rowcount, 0))
+
+@contextmanager
+def _checkout():
+    started = time.perf_counter()
+    with get_pool().connection() as conn:
+        _pool_wait_seconds.observe(time.perf_counter() - started)
+        yield conn
+
+def init_pool() -> ConnectionPool:
+    """Creates the process-wide connection pool (called from the app lifespan)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed:
+            _pool = ConnectionPool(
+                DATABASE_URL,
+                min_size=DB_POOL_MIN_SIZE,
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,
+                max_lifetime=DB_POOL_MAX_LIFETIME,
+                health_check_idle=DB_POOL_HEALTH_CHECK_IDLE,
+                connect=_connect,
+            )
+            try:
+                _pool.open()
+            except Exception as e:
+                logger.warning("Could not pre-open database connections: %s", e)
+        return _pool
+
+def get_pool() -> ConnectionPool:
+    """Returns the connection pool, creating it on first use outside the app lifespan."""
+    pool = _pool
+    if pool is None or pool.closed:
+        pool = init_pool()
+    return pool
+
+def close_pool():
+    """Closes the process-wide connection pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+def get_pool_stats() -> dict:
+    """Returns pool statistics, or an empty dict when no pool has been created."""
+    pool = _pool
+    return pool.stats() if pool is not None else {}
 
 @contextmanager
 def get_db_connection():
-    conn = None
     try:
-        psycopg2.extras.register_uuid()
-        conn = psycopg2.connect(DATABASE_URL)
-        # Set autocommit to False for regular operations
-        conn.autocommit = False 
-        yield conn
+        with _checkout() as conn:
+            yield conn
+    except PoolTimeoutError:
+        raise
     except Exception as e:
-        print(f"Database connection error: {e}")
+        logger.error("Database connection error: %s", e)
         raise
-    finally:
-        if conn:
-            conn.close()
 
 @contextmanager
 def get_db_cursor(commit=False):
-    conn = None
-    cursor = None
-    try:
-        conn = psycopg2.connect(DATABASE_URL)
-        conn.autocommit = False # Ensure transactions are handled explicitly
-        psycopg2.extras.register_uuid()
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        yield cursor
-        if commit:
-            conn.commit()
-    except Exception as e:
-        print(f"Database cursor error: {e}")
-        if conn:
+    with _checkout() as conn:
+        cursor = conn.cursor(cursor_factory=InstrumentedCursor)
+        try:
+            yield cursor
+            if commit:
+                started = time.perf_counter()
+                conn.commit()
+                DB_COMMIT_SECONDS.observe(time.perf_counter() - started)
+        except Exception as e:
+            logger.error("Database cursor error: %s", e)
             conn.rollback()
-        raise
-    finally:
-        if cursor:
+            raise
+        finally:
             cursor.close()
-        if conn:
-            conn.close()
 
 def check_table_exists(table_name: str) -> bool:
     """Checks if a table exists in the database."""
@@ -54,64 +141,46 @@ def check_table_exists(table_name: str) -> bool:
                 (table_name,)
             )
             return cursor.fetchone()[0]
+    except PoolTimeoutError:
+        raise
     except Exception as e:
-        print(f"Error checking if table 	{table_name}	 exists: {e}")
+        logger.error("Error checking if table %s exists: %s", table_name, e)
         return False
 
-def initialize_database():
-    """Attempts to create the necessary tables if they don't exist."""
-    conn = None
+def check_schema_version() -> Optional[int]:
+    """Highest version recorded in schema_migrations (0 before the first migration, None if it cannot be read)."""
     try:
-        # Connect with autocommit specifically for table creation
-        conn = psycopg2.connect(DATABASE_URL)
-        conn.autocommit = True
-        psycopg2.extras.register_uuid()
-        print("Database connection successful for initialization.")
-        
-        with conn.cursor() as cursor:
-            # Check if table exists
-            try:
-                cursor.execute("SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = 'hands');")
-                exists = cursor.fetchone()[0]
-            except Exception as e:
-                print(f"Error checking if table exists during init: {e}")
-                exists = False # Assume it doesn't exist if check fails
-            
-            if not exists:
-                print("Hands table does not exist. Attempting to create...")
-                # Try the simplified table creation directly
-                try:
-                    cursor.execute("""
-                    CREATE TABLE hands (
-                        id TEXT PRIMARY KEY,
-                        created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-                        stack_settings TEXT,
-                        player_roles TEXT,
-                        hole_cards TEXT,
-                        action_sequence TEXT,
-                        winnings TEXT
-                    );
-                    """)
-                    print("Created simplified hands table with TEXT fields.")
-                except psycopg2.Error as e:
-                    # Check for permission denied error specifically
-                    if "permission denied" in str(e).lower():
-                        print("****************************************************************")
-                        print("ERROR: Database user lacks permission to create tables.")
-                        print("Please create the 'hands' table manually using a privileged user.")
-                        print("See the project documentation or summary for the SQL command.")
-                        print("****************************************************************")
-                    else:
-                        print(f"Critical error creating table: {e}")
-                    # Indicate that the table might still be missing
-                    print("The application will continue but database operations might fail if the table is missing.")
-                except Exception as e:
-                    print(f"Unexpected critical error creating table: {e}")
-            else:
-                print("Hands table already exists.")
+        with get_db_cursor() as cursor:
+            cursor.execute(MIGRATIONS_TABLE_EXISTS_QUERY)
+            if not cursor.fetchone()[0]:
+                return 0
+            cursor.execute(APPLIED_VERSION_QUERY)
+            return cursor.fetchone()[0]
+    except PoolTimeoutError:
+        raise
     except Exception as e:
-        print(f"Error during database initialization: {e}")
-        print("The application will continue but database operations may fail.")
-    finally:
-        if conn:
-            conn.close()
+        logger.error("Error reading the schema version: %s", e)
+        return None
+
+def initialize_database() -> int:
+    """
+    Brings the database schema up to date by applying any pending migrations
+    and returns the schema version. Errors are raised, for the startup phase
+    to record (and to retry while the database cannot be reached).
+    """
+    try:
+        with get_db_connection() as conn:
+            # Autocommit for DDL and CREATE INDEX CONCURRENTLY; the pool resets it on return
+            conn.autocommit = True
+            logger.info("Database connection successful for initialization.")
+            version = run_migrations(conn)
+            logger.info("Database schema is at version %s.", version)
+            return version
+    except psycopg2.Error as e:
+        # Check for permission denied error specifically
+        if "permission denied" in str(e).lower():
+            logger.error(
+                "Database user lacks permission to migrate the schema; "
+                "apply app/db/init.sql manually using a privileged user."
+            )
+        raise
@@ -1,9 +1,54 @@
+-- Schema as produced by app/db/migrations.py (version 7). The application applies
+-- migrations itself on startup; use this only when its database user lacks DDL rights.
 CREATE TABLE IF NOT EXISTS hands (
-    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    id UUID PRIMARY KEY,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     stack_settings JSONB,
     player_roles JSONB,
-    hole_cards JSONB,
+    hole_cards SMALLINT[], -- Card codes, two per player (app/services/cards.py)
     action_sequence TEXT,
-    winnings JSONB
-);
\ No newline at end of file
+    winnings JSONB,
+    pot BIGINT
+);
+
+CREATE INDEX IF NOT EXISTS hands_created_at_id_idx ON hands (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS hands_pot_idx ON hands (pot);
+CREATE INDEX IF NOT EXISTS hands_players_idx ON hands USING GIN (stack_settings);
+
+CREATE TABLE IF NOT EXISTS player_stats (
+    player_id TEXT PRIMARY KEY,
+    hands BIGINT NOT NULL DEFAULT 0,
+    net_winnings BIGINT NOT NULL DEFAULT 0,
+    vpip_hands BIGINT NOT NULL DEFAULT 0,
+    pfr_hands BIGINT NOT NULL DEFAULT 0,
+    postflop_aggressive BIGINT NOT NULL DEFAULT 0,
+    postflop_passive BIGINT NOT NULL DEFAULT 0,
+    showdowns BIGINT NOT NULL DEFAULT 0,
+    showdowns_won BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS player_stats_net_winnings_idx ON player_stats (net_winnings DESC, player_id);
+CREATE INDEX IF NOT EXISTS player_stats_hands_idx ON player_stats (hands DESC, player_id);
+
+CREATE TABLE IF NOT EXISTS hand_replay_steps (
+    hand_id UUID NOT NULL REFERENCES hands (id) ON DELETE CASCADE,
+    step INTEGER NOT NULL,
+    snapshot JSONB NOT NULL,
+    PRIMARY KEY (hand_id, step)
+);
+
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+INSERT INTO schema_migrations (version, name) VALUES
+    (1, 'create_hands_table'),
+    (2, 'add_pot_column'),
+    (3, 'convert_to_native_types'),
+    (4, 'create_hands_indexes'),
+    (5, 'create_player_stats'),
+    (6, 'create_hand_replay_steps'),
+    (7, 'encode_hole_cards')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,351 @@
+"""
+Versioned schema migrations for the hands, player_stats and hand_replay_steps tables.
+
+Each migration runs once, in order, and is recorded in schema_migrations.
+Migrations are written to be idempotent so a run interrupted half-way can
+simply be repeated. They are executed on an autocommit connection (required
+for CREATE INDEX CONCURRENTLY); migrations that need atomicity open their own
+short transactions.
+"""
+import logging
+from dataclasses import dataclass
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key for pg_advisory_lock so concurrently starting workers migrate one at a time
+MIGRATION_LOCK_ID = 727_001
+
+BACKFILL_BATCH_SIZE = 5000
+
+# Columns that older deployments created as TEXT and their native types
+NATIVE_COLUMN_TYPES = {
+    "id": "uuid",
+    "stack_settings": "jsonb",
+    "player_roles": "jsonb",
+    "hole_cards": "jsonb",
+    "winnings": "jsonb",
+}
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[object], None] # Receives an autocommit psycopg2 connection
+
+def _column_types(cursor, table: str) -> dict:
+    cursor.execute(
+        "SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s;",
+        (table,)
+    )
+    return {name: data_type for name, data_type in cursor.fetchall()}
+
+def _drop_invalid_index(cursor, name: str):
+    """
+    A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind, which
+    IF NOT EXISTS would then skip; drop it so the repeated run rebuilds it.
+    """
+    cursor.execute(
+        "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+        "WHERE pg_class.relname = %s AND NOT pg_index.indisvalid;",
+        (name,)
+    )
+    if cursor.fetchone() is not None:
+        logger.warning("Dropping invalid index %s left by an interrupted migration", name)
+        cursor.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+
+def _create_hands_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS hands (
+            id UUID PRIMARY KEY,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+            stack_settings JSONB,
+            player_roles JSONB,
+            hole_cards JSONB,
+            action_sequence TEXT,
+            winnings JSONB,
+            pot BIGINT
+        );
+        """)
+
+def _backfill_in_batches(cursor, set_clause: str):
+    """
+    Runs UPDATE hands SET <set_clause> over every existing row, walking the
+    primary key BACKFILL_BATCH_SIZE rows at a time. On an autocommit connection
+    each batch is its own short transaction, so rows are never all locked at once.
+    """
+    last_id = None
+    while True:
+        after = "WHERE id > %s" if last_id is not None else ""
+        params = (last_id, BACKFILL_BATCH_SIZE) if last_id is not None else (BACKFILL_BATCH_SIZE,)
+        cursor.execute(f"""
+            WITH batch AS (
+                SELECT id FROM hands {after} ORDER BY id LIMIT %s
+            ), touched AS (
+                UPDATE hands SET {set_clause} FROM batch WHERE hands.id = batch.id
+            )
+            SELECT (SELECT id FROM batch ORDER BY id DESC LIMIT 1), (SELECT count(*) FROM batch);
+        """, params)
+        batch_last_id, count = cursor.fetchone()
+        if not count:
+            break
+        last_id = batch_last_id
+
+def _add_pot_column(conn):
+    """Adds the pot column used by the list filters and backfills it."""
+    with conn.cursor() as cursor:
+        cursor.execute("ALTER TABLE hands ADD COLUMN IF NOT EXISTS pot BIGINT;")
+        _backfill_in_batches(cursor, """pot = (
+            SELECT COALESCE(SUM(value::bigint), 0)
+            FROM jsonb_each_text(COALESCE(hands.winnings::jsonb, '{}'::jsonb))
+            WHERE value::bigint > 0
+        )""")
+
+def _convert_to_native_types(conn):
+    """
+    Moves TEXT-encoded columns to native UUID/JSONB without a long table lock:
+
+    1. expand   - add shadow columns and a trigger that keeps them in sync for new writes
+    2. backfill - touch existing rows in primary-key order, BACKFILL_BATCH_SIZE per transaction
+    3. swap     - in one short transaction, drop the old columns and rename the shadows
+    """
+    with conn.cursor() as cursor:
+        types = _column_types(cursor, "hands")
+        pending = {
+            column: native for column, native in NATIVE_COLUMN_TYPES.items()
+            if column in types and types[column] != native and types.get(f"{column}_native") is None
+        }
+        # A previous run may have stopped after the expand step
+        pending.update({
+            column: native for column, native in NATIVE_COLUMN_TYPES.items()
+            if types.get(f"{column}_native") is not None
+        })
+        if not pending:
+            return
+
+        # -- expand ----------------------------------------------------------
+        for column, native in pending.items():
+            cursor.execute(f"ALTER TABLE hands ADD COLUMN IF NOT EXISTS {column}_native {native.upper()};")
+        assignments = "\n".join(
+            f"    NEW.{column}_native := NEW.{column}::{native};" for column, native in pending.items()
+        )
+        cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION hands_sync_native_columns() RETURNS trigger AS $$
+        BEGIN
+        {assignments}
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS hands_sync_native_columns ON hands;")
+        cursor.execute("""
+        CREATE TRIGGER hands_sync_native_columns
+        BEFORE INSERT OR UPDATE ON hands
+        FOR EACH ROW EXECUTE FUNCTION hands_sync_native_columns();
+        """)
+
+        # -- backfill --------------------------------------------------------
+        # A no-op UPDATE fires the trigger, which fills the shadow columns
+        _backfill_in_batches(cursor, "id = hands.id")
+
+        if "id" in pending:
+            # Build the future primary key without blocking writes. The validated
+            # CHECK lets SET NOT NULL below skip its full-table scan under the lock.
+            _drop_invalid_index(cursor, "hands_id_native_key")
+            cursor.execute("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS hands_id_native_key ON hands (id_native);")
+            cursor.execute("ALTER TABLE hands DROP CONSTRAINT IF EXISTS hands_id_native_not_null;")
+            cursor.execute("ALTER TABLE hands ADD CONSTRAINT hands_id_native_not_null CHECK (id_native IS NOT NULL) NOT VALID;")
+            cursor.execute("ALTER TABLE hands VALIDATE CONSTRAINT hands_id_native_not_null;")
+
+    # -- swap ----------------------------------------------------------------
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE hands IN ACCESS EXCLUSIVE MODE;")
+            cursor.execute("DROP TRIGGER IF EXISTS hands_sync_native_columns ON hands;")
+            cursor.execute("DROP FUNCTION IF EXISTS hands_sync_native_columns();")
+            for column in pending:
+                cursor.execute(f"ALTER TABLE hands DROP COLUMN {column};")
+                cursor.execute(f"ALTER TABLE hands RENAME COLUMN {column}_native TO {column};")
+            if "id" in pending:
+                cursor.execute("ALTER TABLE hands ALTER COLUMN id SET NOT NULL;")
+                cursor.execute("ALTER TABLE hands DROP CONSTRAINT hands_id_native_not_null;")
+                cursor.execute("ALTER TABLE hands ADD CONSTRAINT hands_pkey PRIMARY KEY USING INDEX hands_id_native_key;")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+def _create_indexes(conn):
+    """Indexes for keyset pagination, pot range filters and player lookups."""
+    with conn.cursor() as cursor:
+        _drop_invalid_index(cursor, "hands_created_at_id_idx")
+        cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS hands_created_at_id_idx ON hands (created_at DESC, id DESC);")
+        _drop_invalid_index(cursor, "hands_pot_idx")
+        cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS hands_pot_idx ON hands (pot);")
+        _drop_invalid_index(cursor, "hands_players_idx")
+        cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS hands_players_idx ON hands USING GIN (stack_settings);")
+        _drop_invalid_index(cursor, "hands_hole_cards_idx")
+        cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS hands_hole_cards_idx ON hands USING GIN (hole_cards);")
+
+def _create_player_stats(conn):
+    """
+    Per-player aggregates maintained on every insert. Existing hands are not
+    counted until `python -m app.jobs.backfill_player_stats` has run.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS player_stats (
+            player_id TEXT PRIMARY KEY,
+            hands BIGINT NOT NULL DEFAULT 0,
+            net_winnings BIGINT NOT NULL DEFAULT 0,
+            vpip_hands BIGINT NOT NULL DEFAULT 0,
+            pfr_hands BIGINT NOT NULL DEFAULT 0,
+            postflop_aggressive BIGINT NOT NULL DEFAULT 0,
+            postflop_passive BIGINT NOT NULL DEFAULT 0,
+            showdowns BIGINT NOT NULL DEFAULT 0,
+            showdowns_won BIGINT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+        );
+        """)
+        # Leaderboards read the top N rows straight off these indexes
+        _drop_invalid_index(cursor, "player_stats_net_winnings_idx")
+        cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS player_stats_net_winnings_idx ON player_stats (net_winnings DESC, player_id);")
+        _drop_invalid_index(cursor, "player_stats_hands_idx")
+        cursor.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS player_stats_hands_idx ON player_stats (hands DESC, player_id);")
+
+def _create_replay_steps(conn):
+    """Replay snapshots, written the first time a hand's replay is requested."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS hand_replay_steps (
+            hand_id UUID NOT NULL REFERENCES hands (id) ON DELETE CASCADE,
+            step INTEGER NOT NULL,
+            snapshot JSONB NOT NULL,
+            PRIMARY KEY (hand_id, step)
+        );
+        """)
+
+# Same layout as app/services/cards.py: rank * 4 + suit, two per player in
+# byte-order player order, -1 where a player's cards are unknown
+ENCODE_HOLE_CARDS_FUNCTION = """
+CREATE OR REPLACE FUNCTION hands_encode_hole_cards(stack_settings JSONB, hole_cards JSONB) RETURNS SMALLINT[] AS $$
+    SELECT COALESCE(array_agg(
+        COALESCE(
+            ((strpos('23456789TJQKA', substr(hole_cards -> player ->> i, 1, 1)) - 1) * 4
+                + strpos('cdhs', substr(hole_cards -> player ->> i, 2, 1)) - 1)::SMALLINT,
+            -1
+        ) ORDER BY player COLLATE "C", i
+    ), '{}')
+    FROM jsonb_object_keys(COALESCE(stack_settings, '{}')) AS player, generate_series(0, 1) AS i
+$$ LANGUAGE sql IMMUTABLE;
+"""
+
+def _encode_hole_cards(conn):
+    """
+    Replaces the hole_cards JSONB object with a SMALLINT[] of card codes, using
+    the same expand/backfill/swap steps as _convert_to_native_types. The GIN
+    index on the old column goes with it; nothing filters on hole cards.
+    """
+    with conn.cursor() as cursor:
+        types = _column_types(cursor, "hands")
+        if types.get("hole_cards") == "ARRAY" and "hole_cards_codes" not in types:
+            return
+
+        # -- expand ----------------------------------------------------------
+        cursor.execute("ALTER TABLE hands ADD COLUMN IF NOT EXISTS hole_cards_codes SMALLINT[];")
+        cursor.execute(ENCODE_HOLE_CARDS_FUNCTION)
+        cursor.execute("""
+        CREATE OR REPLACE FUNCTION hands_sync_hole_cards_codes() RETURNS trigger AS $$
+        BEGIN
+            NEW.hole_cards_codes := hands_encode_hole_cards(NEW.stack_settings, NEW.hole_cards);
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql;
+        """)
+        cursor.execute("DROP TRIGGER IF EXISTS hands_sync_hole_cards_codes ON hands;")
+        cursor.execute("""
+        CREATE TRIGGER hands_sync_hole_cards_codes
+        BEFORE INSERT OR UPDATE ON hands
+        FOR EACH ROW EXECUTE FUNCTION hands_sync_hole_cards_codes();
+        """)
+
+        # -- backfill --------------------------------------------------------
+        _backfill_in_batches(cursor, "id = hands.id")
+
+    # -- swap ----------------------------------------------------------------
+    conn.autocommit = False
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("LOCK TABLE hands IN ACCESS EXCLUSIVE MODE;")
+            cursor.execute("DROP TRIGGER IF EXISTS hands_sync_hole_cards_codes ON hands;")
+            cursor.execute("DROP FUNCTION IF EXISTS hands_sync_hole_cards_codes();")
+            cursor.execute("DROP FUNCTION IF EXISTS hands_encode_hole_cards(JSONB, JSONB);")
+            cursor.execute("ALTER TABLE hands DROP COLUMN hole_cards;")
+            cursor.execute("ALTER TABLE hands RENAME COLUMN hole_cards_codes TO hole_cards;")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.autocommit = True
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create_hands_table", _create_hands_table),
+    Migration(2, "add_pot_column", _add_pot_column),
+    Migration(3, "convert_to_native_types", _convert_to_native_types),
+    Migration(4, "create_hands_indexes", _create_indexes),
+    Migration(5, "create_player_stats", _create_player_stats),
+    Migration(6, "create_hand_replay_steps", _create_replay_steps),
+    Migration(7, "encode_hole_cards", _encode_hole_cards),
+]
+
+LATEST_VERSION = MIGRATIONS[-1].version
+
+# hands.hole_cards holds card codes from this version on; before it, the JSONB
+# object (during migration 7's backfill its trigger derives the codes from it)
+HOLE_CARD_CODES_VERSION = 7
+
+# The applied version as recorded in schema_migrations, whoever applied it (this
+# runner, another worker, or app/db/init.sql). Two statements: the second one
+# fails to plan while the table does not exist.
+MIGRATIONS_TABLE_EXISTS_QUERY = "SELECT to_regclass('schema_migrations') IS NOT NULL;"
+APPLIED_VERSION_QUERY = "SELECT COALESCE(MAX(version), 0) FROM schema_migrations;"
+
+def run_migrations(conn) -> int:
+    """
+    Applies all pending migrations on an autocommit connection and returns the
+    resulting schema version.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+            );
+            """)
+            cursor.execute(APPLIED_VERSION_QUERY)
+            current = cursor.fetchone()[0]
+
+        for migration in MIGRATIONS:
+            if migration.version <= current:
+                continue
+            logger.info("Applying migration %s: %s...", migration.version, migration.name)
+            migration.apply(conn)
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s) ON CONFLICT (version) DO NOTHING;",
+                    (migration.version, migration.name)
+                )
+            current = migration.version
+        return current
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
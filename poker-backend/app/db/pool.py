@@ -0,0 +1,286 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Optional
+
+import psycopg2
+import psycopg2.extensions
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection could be checked out before the timeout."""
+
+
+class PoolClosedError(Exception):
+    """Raised when a connection is requested from a closed pool."""
+
+
+class _PooledConnection:
+    """Bookkeeping for a single physical connection owned by the pool."""
+
+    __slots__ = ("conn", "created_at", "last_used")
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class ConnectionPool:
+    """
+    A thread-safe pool of psycopg2 connections.
+
+    Connections are opened lazily up to ``max_size`` (``min_size`` of them are
+    opened up front by ``open()``), handed out LIFO so warm connections are
+    reused first, health-checked on checkout when they have been idle for a
+    while, and recycled once they exceed ``max_lifetime`` seconds.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        max_lifetime: float = 1800.0,
+        health_check_idle: float = 30.0,
+        connect: Optional[Callable[[], object]] = None,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Invalid pool size: min_size={min_size}, max_size={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self._connect = connect or (lambda: psycopg2.connect(self.dsn))
+
+        self._cond = threading.Condition()
+        self._idle: Deque[_PooledConnection] = deque()
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._size = 0  # open connections plus slots reserved for connections being opened
+        self._waiting = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._connections_opened = 0
+        self._connections_closed = 0
+        self._health_check_failures = 0
+        self._wait_time_total = 0.0
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def open(self) -> None:
+        """Pre-open ``min_size`` connections. Failures are left for checkout to retry."""
+        opened = []
+        try:
+            while True:
+                with self._cond:
+                    if self._size >= self.min_size:
+                        break
+                    self._size += 1
+                try:
+                    opened.append(self._open_connection())
+                except Exception:
+                    self._release_slot()
+                    raise
+        finally:
+            with self._cond:
+                for rec in opened:
+                    self._idle.append(rec)
+                self._cond.notify_all()
+
+    def close(self) -> None:
+        """Close all idle connections; checked-out connections are closed when returned."""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for rec in idle:
+            self._close_connection(rec)
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    # -- checkout / checkin --------------------------------------------------
+
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        Check a connection out of the pool.
+
+        Waits up to ``timeout`` seconds (the pool default when omitted) for a
+        connection to become available and raises PoolTimeoutError otherwise.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        while True:
+            rec = self._acquire(deadline)
+            if rec is None:
+                try:
+                    rec = self._open_connection()
+                except Exception:
+                    self._release_slot()
+                    raise
+            elif not self._is_healthy(rec):
+                with self._cond:
+                    self._health_check_failures += 1
+                self._discard(rec)
+                continue
+
+            with self._cond:
+                self._in_use[id(rec.conn)] = rec
+                self._checkouts += 1
+                self._wait_time_total += time.monotonic() - started
+            return rec.conn
+
+    def putconn(self, conn, discard: bool = False) -> None:
+        """Return a connection to the pool, resetting any open transaction."""
+        with self._cond:
+            rec = self._in_use.pop(id(conn), None)
+        if rec is None:
+            raise ValueError("Connection does not belong to this pool")
+
+        if not discard and not self._closed and not conn.closed and not self._is_expired(rec):
+            try:
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                if conn.autocommit:
+                    conn.autocommit = False
+            except Exception:
+                discard = True
+        else:
+            discard = True
+
+        if discard:
+            self._discard(rec)
+            return
+
+        rec.last_used = time.monotonic()
+        with self._cond:
+            self._idle.append(rec)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager that checks a connection out and always returns it."""
+        conn = self.getconn(timeout)
+        discard = False
+        try:
+            yield conn
+        except psycopg2.InterfaceError:
+            discard = True
+            raise
+        except psycopg2.OperationalError:
+            # Usually a dropped server connection; don't hand it out again.
+            discard = True
+            raise
+        finally:
+            self.putconn(conn, discard=discard)
+
+    def stats(self) -> Dict[str, float]:
+        """Return a snapshot of pool usage counters."""
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiting,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "connections_opened": self._connections_opened,
+                "connections_closed": self._connections_closed,
+                "health_check_failures": self._health_check_failures,
+                "wait_time_total": round(self._wait_time_total, 6),
+                "closed": self._closed,
+            }
+
+    # -- internals -----------------------------------------------------------
+
+    def _acquire(self, deadline: float) -> Optional[_PooledConnection]:
+        """
+        Take an idle connection, or reserve a slot for a new one (returns None).
+        Expired idle connections are closed on the way.
+        """
+        expired = []
+        try:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise PoolClosedError("Connection pool is closed")
+                    while self._idle:
+                        rec = self._idle.pop()
+                        if self._is_expired(rec):
+                            self._size -= 1
+                            expired.append(rec)
+                            continue
+                        return rec
+                    if self._size < self.max_size:
+                        self._size += 1
+                        return None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeoutError(
+                            f"Timed out waiting for a database connection "
+                            f"(pool size {self.max_size}, all in use)"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+        finally:
+            for rec in expired:
+                self._close_connection(rec)
+
+    def _open_connection(self) -> _PooledConnection:
+        conn = self._connect()
+        conn.autocommit = False
+        with self._cond:
+            self._connections_opened += 1
+        return _PooledConnection(conn)
+
+    def _release_slot(self) -> None:
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def _discard(self, rec: _PooledConnection) -> None:
+        self._close_connection(rec)
+        self._release_slot()
+
+    def _close_connection(self, rec: _PooledConnection) -> None:
+        try:
+            if not rec.conn.closed:
+                rec.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._connections_closed += 1
+
+    def _is_expired(self, rec: _PooledConnection) -> bool:
+        return bool(self.max_lifetime) and time.monotonic() - rec.created_at > self.max_lifetime
+
+    def _is_healthy(self, rec: _PooledConnection) -> bool:
+        """Cheap liveness check; only pings the server when the connection sat idle."""
+        conn = rec.conn
+        if conn.closed:
+            return False
+        if time.monotonic() - rec.last_used < self.health_check_idle:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
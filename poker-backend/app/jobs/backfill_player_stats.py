@@ -0,0 +1,67 @@
+"""
+Rebuild player_stats from every stored hand.
+
+Run once after upgrading to schema version 5 (inserts keep the table current
+from then on), or at any time to repair it:
+
+    python -m app.jobs.backfill_player_stats [--chunk-size 1000]
+
+The rebuild is one transaction. player_stats is locked against writes for its
+duration, so concurrent hand inserts wait (and are then counted exactly once)
+while readers keep seeing the previous totals until the commit.
+"""
+import argparse
+import time
+import uuid
+
+import psycopg2.extras
+
+from app.core.config import EXPORT_CHUNK_SIZE
+from app.core.log import configure_logging
+from app.db.database import close_pool, get_db_connection
+from app.repositories.hand_repository import HAND_COLUMNS, PLAYER_STATS_UPSERT, HandRepository, player_stats_rows
+
+def backfill_player_stats(chunk_size: int = EXPORT_CHUNK_SIZE) -> dict:
+    """Recompute player_stats from the hands table. Returns counts of hands read and players written."""
+    repo = HandRepository()
+    counts = {"hands": 0, "players": 0}
+
+    def stream(db_cursor):
+        for row in db_cursor:
+            counts["hands"] += 1
+            yield repo._row_to_hand_data(row)
+
+    with get_db_connection() as conn:
+        try:
+            with conn.cursor() as cursor:
+                # Blocks the stats upserts of concurrent inserts (they wait for the commit), not readers
+                cursor.execute("LOCK TABLE player_stats IN EXCLUSIVE MODE;")
+                cursor.execute("DELETE FROM player_stats;")
+            with conn.cursor(name=f"player_stats_backfill_{uuid.uuid4().hex}", cursor_factory=psycopg2.extras.DictCursor) as db_cursor:
+                db_cursor.itersize = chunk_size
+                db_cursor.execute(f"SELECT {HAND_COLUMNS} FROM hands")
+                rows = player_stats_rows(stream(db_cursor))
+            with conn.cursor() as cursor:
+                psycopg2.extras.execute_values(cursor, PLAYER_STATS_UPSERT.format(values="%s"), rows, page_size=1000)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    counts["players"] = len(rows)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE, help="Hands fetched per round trip")
+    args = parser.parse_args()
+    configure_logging()
+    start = time.perf_counter()
+    try:
+        counts = backfill_player_stats(args.chunk_size)
+    finally:
+        close_pool()
+    elapsed = time.perf_counter() - start
+    print(f"Rebuilt player_stats for {counts['players']} players from {counts['hands']} hands in {elapsed:.1f}s.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Precompute the preflop equity matrix of the 169 starting-hand classes.
+
+    python -m app.jobs.build_preflop_matrix [--boards N] [--multiway-samples N]
+        [--workers N] [--output FILE]
+
+By default every board is counted for the heads-up matrix, which takes about
+ten CPU-minutes, spread over --workers processes. --boards samples that many
+boards instead, for a quick approximate build. Equity against 2 to 9 random
+hands is sampled with --multiway-samples per cell. The file is written to
+CACHE_DIR, where the service memory-maps it at startup.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from app.services.preflop import CLASS_NAMES, build_matrix, matrix_path, parse_class, write_matrix
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--boards", type=int, default=0, help="Boards to sample for the heads-up matrix (0 = every board, exact)")
+    parser.add_argument("--multiway-samples", type=int, default=20000, help="Deals sampled per class and opponent count (0 = skip)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes to build with (1 = in-process)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=matrix_path(), help="Matrix file to write")
+    args = parser.parse_args()
+
+    def progress(done: int, total: int):
+        print(f"\r{done}/{total} jobs, {time.perf_counter() - start:.0f}s", end="", file=sys.stderr, flush=True)
+
+    start = time.perf_counter()
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn")) if args.workers > 1 else None
+    try:
+        matrix = build_matrix(args.boards, args.multiway_samples, executor, args.workers, args.seed, progress)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    print(file=sys.stderr)
+    write_matrix(args.output, matrix)
+    aces, kings = parse_class("AA"), parse_class("KK")
+    print(
+        f"Wrote {args.output} in {time.perf_counter() - start:.0f}s "
+        f"({'exact' if not args.boards else f'{args.boards} sampled boards'}): "
+        f"{CLASS_NAMES[aces]} vs {CLASS_NAMES[kings]} {matrix.heads_up[aces, kings]:.4f}, "
+        f"{CLASS_NAMES[aces]} vs one random hand {matrix.multiway[aces, 0]:.4f}"
+    )
+
+if __name__ == "__main__":
+    main()
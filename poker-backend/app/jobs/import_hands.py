@@ -0,0 +1,64 @@
+"""
+Import PokerStars hand-history files into the hands table.
+
+    python -m app.jobs.import_hands PATH [PATH ...] [--checkpoint FILE]
+        [--pattern '*.txt'] [--workers N] [--batch-size N]
+
+Directories are searched recursively for files matching --pattern. Each batch
+of hands is stored in one transaction; with --checkpoint the offset reached in
+every file is saved after each batch, so re-running the same command after an
+interruption (or after the client appended new hands) continues where it left
+off. Hands imported before are skipped either way. One line per file reports
+the counts and throughput.
+"""
+import argparse
+import sys
+import time
+
+from app.core.config import IMPORT_BATCH_SIZE
+from app.core.log import configure_logging
+from app.db.database import close_pool
+from app.repositories.hand_repository import HandRepository
+from app.services.hand_import import Checkpoint, create_executor, history_files, import_file, worker_count
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="Hand-history files or directories")
+    parser.add_argument("--checkpoint", help="JSON file recording how far each file has been imported")
+    parser.add_argument("--pattern", default="*.txt", help="File name pattern inside directories")
+    parser.add_argument("--workers", type=int, default=worker_count(), help="Processes converting hands (1 = in-process)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE, help="Hands stored per transaction")
+    args = parser.parse_args()
+    configure_logging()
+
+    repo = HandRepository()
+    checkpoint = Checkpoint(args.checkpoint) if args.checkpoint else None
+    executor = create_executor(args.workers)
+    totals = {"hands": 0, "imported": 0, "duplicates": 0, "failed": 0}
+    start = time.perf_counter()
+    try:
+        for path in history_files(args.paths, args.pattern):
+            stats = import_file(path, repo, executor, checkpoint, args.batch_size)
+            for key in totals:
+                totals[key] += getattr(stats, key)
+            resumed = f" (resumed at byte {stats.resumed_from})" if stats.resumed_from else ""
+            unfinished = ", last hand unfinished (read again next run)" if stats.unfinished else ""
+            print(
+                f"{path}{resumed}: {stats.imported} imported, {stats.duplicates} already stored, "
+                f"{stats.failed} failed of {stats.hands} hands in {stats.seconds:.1f}s "
+                f"({stats.hands_per_second:.0f} hands/s, {stats.megabytes_per_second:.1f} MB/s){unfinished}"
+            )
+            for error in stats.errors[:5]:
+                print(f"    byte {error['offset']}: {error['error']}", file=sys.stderr)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        close_pool()
+    elapsed = time.perf_counter() - start
+    print(
+        f"Imported {totals['imported']} of {totals['hands']} hands ({totals['duplicates']} already stored, "
+        f"{totals['failed']} failed) in {elapsed:.1f}s."
+    )
+
+if __name__ == "__main__":
+    main()
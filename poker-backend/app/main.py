@@ -1,23 +1,97 @@
-from fastapi import FastAPI
-from contextlib import asynccontextmanager
+import asyncio
+import logging
+import time
+
+from fastapi import FastAPI, Request, status
+from contextlib import asynccontextmanager, suppress
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
+from app import IMPORTS_STARTED
 from app.api import hand as hand_api
-from app.db.database import initialize_database
+from app.api import equity as equity_api
+from app.api import players as players_api
+from app.api import metrics as metrics_api
+from app.api import simulations as simulations_api
+from app.db.database import CONNECTION_ERRORS, initialize_database, init_pool, close_pool, get_pool_stats
+from app.db.async_database import init_async_pool, close_async_pool, get_async_pool_stats
+from app.db.pool import PoolTimeoutError
+from app.db.migrations import LATEST_VERSION
+from app.repositories.hand_repository import call_repository, get_repository
+from app.repositories.cached_hand_repository import get_cached_repository
+from app.core.config import DB_DRIVER, INGEST_MODE, STARTUP_MODE
+from app.core.log import RequestIdMiddleware, configure_logging, shutdown_logging
+from app.core.metrics import MetricsMiddleware
+from app.core.startup import phase, reset_startup_report, startup_report
+from app.services.evaluator import load_tables
+from app.services.preflop import load_matrix
+from app.services.equity import shutdown_executor
+from app.services.hand_import import shutdown_executor as shutdown_import_executor
+from app.services.ingest import start_ingest_writer, stop_ingest_writer
+from app.services.settlement import warm_up as warm_up_settlement
+from app.services.simulation import stop_simulations
+
+IMPORTS_SECONDS = time.perf_counter() - IMPORTS_STARTED # The first phase of the startup report
+
+configure_logging() # Before anything logs, so every record goes through the queue
+logger = logging.getLogger(__name__)
+
+async def _start_database():
+    await phase("db_pool", init_pool) # Create the connection pool once per worker
+    # Retried while the database cannot be reached; other errors (no DDL permission, say) are final
+    await phase("migrations", initialize_database, retry=CONNECTION_ERRORS)
+    if DB_DRIVER == "asyncpg":
+        await phase("async_pool", init_async_pool)
+        close_pool() # psycopg2 was only needed for the migrations
+    repo = get_repository()
+    await phase("schema_state", call_repository, repo.refresh_schema_state) # Cache schema state for the request path
+    logger.info("Database initialization check complete.")
+    if INGEST_MODE == "async":
+        # Through the cache wrapper, so group commits invalidate cached list pages like single inserts
+        await phase("ingest_writer", start_ingest_writer, get_cached_repository())
+
+async def _load_tables():
+    source = await phase("evaluator_table", load_tables) # Map the evaluator table before the first showdown
+    logger.info("Hand rank table ready (%s).", source)
+    if await phase("preflop_matrix", load_matrix) == "missing":
+        logger.warning("No preflop equity matrix; run python -m app.jobs.build_preflop_matrix to enable preflop lookups.")
+    await phase("pokerkit", warm_up_settlement) # Import pokerkit before the first hand is settled
+
+async def _start():
+    """Every startup phase; the database and the CPU-bound loading overlap."""
+    try:
+        await asyncio.gather(_start_database(), _load_tables())
+    except asyncio.CancelledError:
+        startup_report().finish("cancelled")
+        raise
+    startup_report().finish()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run on startup
-    print("Application startup...")
-    try:
-        initialize_database() # Initialize DB tables on startup
-        print("Database initialization check complete.")
-    except Exception as e:
-        print(f"Error during database initialization: {e}")
-        # Depending on severity, you might want to prevent the app from starting
+    logger.info("Application startup...")
+    if INGEST_MODE not in ("sync", "async"):
+        raise ValueError(f"Unsupported INGEST_MODE {INGEST_MODE!r}; expected 'sync' or 'async'")
+    if STARTUP_MODE not in ("background", "blocking"):
+        raise ValueError(f"Unsupported STARTUP_MODE {STARTUP_MODE!r}; expected 'background' or 'blocking'")
+    reset_startup_report(IMPORTS_SECONDS)
+    startup = asyncio.create_task(_start(), name="startup")
+    if STARTUP_MODE == "blocking":
+        await startup
     yield
     # Code to run on shutdown
-    print("Application shutdown...")
+    logger.info("Application shutdown...")
+    if not startup.done():
+        startup.cancel() # Phases already in the threadpool finish on their own
+        with suppress(asyncio.CancelledError):
+            await startup
+    await stop_simulations() # Before the pools close: a job may be storing a chunk
+    await stop_ingest_writer() # Flush queued hands while the pools are still open
+    close_pool()
+    await close_async_pool()
+    shutdown_executor()
+    shutdown_import_executor()
+    shutdown_logging() # Flush queued records before the process exits
 
 app = FastAPI(
     title="Poker Hand API",
@@ -35,14 +109,67 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include the API router for hand endpoints
+# Wraps CORS and the routes, so request latency covers them; adds Server-Timing when TRACE_REQUESTS is set
+app.add_middleware(MetricsMiddleware)
+
+# Added last so it wraps everything: logs from every layer carry the request ID
+app.add_middleware(RequestIdMiddleware)
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError):
+    """All pooled connections are busy: tell the client to retry instead of failing with a 500."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": f"Database is busy, please retry: {exc}"},
+        headers={"Retry-After": "1"},
+    )
+
+# Include the API routers
 app.include_router(hand_api.router)
+app.include_router(equity_api.router)
+app.include_router(players_api.router)
+app.include_router(metrics_api.router)
+app.include_router(simulations_api.router)
 
 @app.get("/", tags=["Health Check"])
 def read_root():
     """Root endpoint for basic health check."""
     return {"status": "ok", "message": "Welcome to the Poker Hand API"}
 
+@app.get("/live", tags=["Health Check"])
+def liveness():
+    """
+    Liveness probe: the worker is up and its event loop answers. Never
+    touches the database, so a database outage does not get workers restarted.
+    """
+    return {"status": "alive"}
+
+@app.get("/ready", tags=["Health Check"])
+async def readiness():
+    """
+    Readiness probe. Ready once every startup phase has finished and the
+    schema is current; reports the startup phases, the cached schema state and
+    pool statistics. The catalog and schema_migrations are only queried again
+    while the schema is not current, at most every SCHEMA_RECHECK_INTERVAL, so
+    a schema migrated by another worker or by app/db/init.sql is picked up.
+    """
+    report = startup_report()
+    repo = get_repository()
+    if report.complete and repo.schema_refresh_due:
+        await call_repository(repo.refresh_schema_state)
+    schema = repo.schema_state()
+    schema["expected_version"] = LATEST_VERSION
+    ready = report.complete and schema["table_exists"] is True and schema["version"] == LATEST_VERSION
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "startup": report.as_dict(),
+            "schema": schema,
+            "pool": get_async_pool_stats() if DB_DRIVER == "asyncpg" else get_pool_stats(),
+        },
+    )
+
 # If you were running this directly with uvicorn:
 # import uvicorn
 # if __name__ == "__main__":
@@ -14,3 +14,24 @@ class HandData:
     action_sequence: str = ""
     winnings: Dict[str, int] = field(default_factory=dict) # {player_id: amount_won_or_lost}
 
+
+@dataclass
+class HandFilters:
+    """Optional server-side filters applied when listing or exporting hands."""
+    player: Optional[str] = None # Player ID that took part in the hand
+    created_from: Optional[datetime] = None # Inclusive lower bound on created_at
+    created_to: Optional[datetime] = None # Exclusive upper bound on created_at
+    min_pot: Optional[int] = None
+    max_pot: Optional[int] = None
+
+@dataclass
+class HandPage:
+    """One page of hands plus the opaque cursor for the next page (None on the last page)."""
+    hands: List[HandData] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+
+@dataclass
+class ReplayPage:
+    """A range of a hand's replay snapshots plus the hand's total step count."""
+    total_steps: int
+    steps: List[dict] = field(default_factory=list)
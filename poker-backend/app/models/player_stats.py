@@ -0,0 +1,14 @@
+from dataclasses import dataclass
+
+@dataclass
+class PlayerStats:
+    """Aggregated counters for one player, as stored in player_stats."""
+    player_id: str
+    hands: int = 0
+    net_winnings: int = 0
+    vpip_hands: int = 0
+    pfr_hands: int = 0
+    postflop_aggressive: int = 0
+    postflop_passive: int = 0
+    showdowns: int = 0
+    showdowns_won: int = 0
@@ -0,0 +1,413 @@
+import itertools
+import logging
+import re
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import AsyncIterator, List, Optional, Set
+
+from app.core.config import SCHEMA_RECHECK_INTERVAL
+from app.core.metrics import db_operation
+from app.db.async_database import async_connection
+from app.db.migrations import APPLIED_VERSION_QUERY, HOLE_CARD_CODES_VERSION, LATEST_VERSION, MIGRATIONS_TABLE_EXISTS_QUERY
+from app.db.pool import PoolTimeoutError
+from app.models.hand import HandData, HandFilters, HandPage, ReplayPage
+from app.models.player_stats import PlayerStats
+from app.services.cards import encode_hole_cards
+from app.services.player_stats import STAT_COLUMNS
+from app.repositories.hand_repository import (
+    HAND_COLUMNS,
+    LEADERBOARD_ORDERS,
+    PLAYER_STATS_COLUMNS,
+    PLAYER_STATS_UPSERT,
+    REPLAY_STEPS_INSERT,
+    build_filter_clause,
+    decode_cursor,
+    encode_cursor,
+    hand_pot,
+    player_stats_rows,
+    row_hole_cards,
+)
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"%s")
+
+_PLAYER_STATS_UPSERT = PLAYER_STATS_UPSERT.format(
+    values="(" + ", ".join(f"${i}" for i in range(1, len(STAT_COLUMNS) + 2)) + ")" # player_id + counters
+)
+
+def numbered_placeholders(sql: str) -> str:
+    """Rewrite psycopg2 '%s' placeholders as asyncpg's '$1, $2, ...'."""
+    counter = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda _: f"${next(counter)}", sql)
+
+def _utc(value):
+    # timestamptz parameters must be aware; naive datetimes in this app are UTC
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _is_missing_schema_error(error: Exception) -> bool:
+    # asyncpg.UndefinedTableError / UndefinedColumnError, matched by SQLSTATE so asyncpg stays optional here
+    return getattr(error, "sqlstate", None) in ("42P01", "42703")
+
+class AsyncHandRepository:
+    """
+    HandRepository counterpart on the asyncpg pool: the same queries and the
+    same results, but every method is a coroutine so requests never occupy a
+    threadpool slot while waiting on Postgres.
+    """
+
+    def __init__(self, table_name: str = "hands"):
+        self.table_name = table_name
+        # Schema state is probed once (at startup) and cached; None means "not checked yet"
+        self._table_exists: Optional[bool] = None
+        self._schema_version: Optional[int] = None # From schema_migrations; None while the table is missing
+        self._schema_checked_at: Optional[datetime] = None
+        self._schema_checked_monotonic = 0.0
+
+    @property
+    def table_exists(self) -> bool:
+        """Cached table-existence state; refreshed by the query methods, never queried here."""
+        return bool(self._table_exists)
+
+    async def _ensure_table(self) -> bool:
+        """The cached state, re-validated when unknown, or when missing and SCHEMA_RECHECK_INTERVAL has elapsed."""
+        state = self._table_exists
+        if state is None or (
+            not state and time.monotonic() - self._schema_checked_monotonic >= SCHEMA_RECHECK_INTERVAL
+        ):
+            return await self.refresh_schema_state()
+        return state
+
+    @property
+    def schema_refresh_due(self) -> bool:
+        """
+        True when the cached schema state is unknown, or when it is not current
+        (table missing or migrations behind) and SCHEMA_RECHECK_INTERVAL has elapsed.
+        """
+        if self._table_exists is None:
+            return True
+        current = self._table_exists and self._schema_version == LATEST_VERSION
+        return not current and time.monotonic() - self._schema_checked_monotonic >= SCHEMA_RECHECK_INTERVAL
+
+    @db_operation("refresh_schema_state")
+    async def refresh_schema_state(self) -> bool:
+        """Query the catalog for the table and the applied schema version, and cache the result."""
+        version = None
+        try:
+            async with async_connection() as conn:
+                exists = await conn.fetchval(
+                    "SELECT EXISTS (SELECT FROM information_schema.tables WHERE table_name = $1);",
+                    self.table_name,
+                )
+                if exists:
+                    version = 0
+                    if await conn.fetchval(MIGRATIONS_TABLE_EXISTS_QUERY):
+                        version = await conn.fetchval(APPLIED_VERSION_QUERY)
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error checking if table %s exists: %s", self.table_name, e)
+            exists = False
+        self._table_exists = exists
+        self._schema_version = version
+        self._schema_checked_at = datetime.now(timezone.utc)
+        self._schema_checked_monotonic = time.monotonic()
+        if not exists:
+            logger.warning("Table %s does not exist. Database operations will fail until the table is created", self.table_name)
+        return exists
+
+    def schema_state(self) -> dict:
+        """Report the cached schema state without touching the database."""
+        return {
+            "table": self.table_name,
+            "table_exists": self._table_exists,
+            "version": self._schema_version,
+            "checked_at": self._schema_checked_at.isoformat() if self._schema_checked_at else None,
+        }
+
+    def _on_query_error(self, error: Exception):
+        """
+        A query against a missing table means the cached state is wrong:
+        re-validate on next use. So does any error while the cached schema is
+        behind, as another worker may have migrated it since.
+        """
+        if _is_missing_schema_error(error):
+            self._table_exists = None
+        elif self._schema_version is not None and self._schema_version < LATEST_VERSION:
+            self._table_exists = None
+
+    def _stored_hole_cards(self, hand: HandData):
+        """
+        Hole cards in the column's current format: codes, or the JSONB object
+        until migration 7 has run. The JSONB codec would otherwise accept the
+        code list as a JSON array, which the migration cannot decode.
+        """
+        if self._schema_version is not None and self._schema_version < HOLE_CARD_CODES_VERSION:
+            return hand.hole_cards
+        return encode_hole_cards(hand.stack_settings, hand.hole_cards)
+
+    @db_operation("create_hand")
+    async def create_hand(self, hand: HandData) -> Optional[HandData]:
+        """
+        Save a hand to the database.
+        """
+        if not await self._ensure_table():
+            logger.error("Cannot create hand, table %s does not exist", self.table_name)
+            return None
+
+        try:
+            async with async_connection() as conn:
+                async with conn.transaction():
+                    row = await conn.fetchrow(
+                        f"""
+                        INSERT INTO {self.table_name} (id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings, pot)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                        RETURNING {HAND_COLUMNS}
+                        """,
+                        *self._hand_values(hand)
+                    )
+                    await self._upsert_player_stats(conn, [hand])
+            return self._row_to_hand_data(row) if row else None
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error creating hand in repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+    @db_operation("create_hands_bulk")
+    async def create_hands_bulk(self, hands: List[HandData]) -> int:
+        """
+        Save many hands in a single transaction. executemany pipelines the rows
+        over one connection, so this costs one round trip per batch rather than
+        per hand. Either every hand is stored or none is.
+        """
+        if not hands:
+            return 0
+        if not await self._ensure_table():
+            logger.error("Cannot create hands, table %s does not exist", self.table_name)
+            return 0
+
+        rows = [self._hand_values(hand) for hand in hands]
+        try:
+            async with async_connection() as conn:
+                async with conn.transaction():
+                    await conn.executemany(
+                        f"""
+                        INSERT INTO {self.table_name} (id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings, pot)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                        """,
+                        rows,
+                    )
+                    await self._upsert_player_stats(conn, hands)
+            return len(rows)
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error bulk creating hands in repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+    @db_operation("get_hands_page")
+    async def get_hands_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[HandFilters] = None,
+    ) -> HandPage:
+        """
+        Retrieve one page of hands, newest first, using keyset pagination on
+        (created_at, id). Raises ValueError for a malformed cursor.
+        """
+        conditions, params = build_filter_clause(filters)
+        if cursor:
+            after_created_at, after_id = decode_cursor(cursor)
+            conditions.append("(created_at, id) < (%s, %s)")
+            params.extend([after_created_at, uuid.UUID(after_id)])
+
+        if not await self._ensure_table():
+            logger.error("Cannot get hands, table %s does not exist", self.table_name)
+            return HandPage()
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            async with async_connection() as conn:
+                # Fetch one extra row to learn whether another page exists
+                rows = await conn.fetch(
+                    numbered_placeholders(
+                        f"""
+                        SELECT {HAND_COLUMNS}
+                        FROM {self.table_name}
+                        {where}
+                        ORDER BY created_at DESC, id DESC
+                        LIMIT %s
+                        """
+                    ),
+                    *map(_utc, params), limit + 1
+                )
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error getting hands page from repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+        hands = [self._row_to_hand_data(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return HandPage(hands=hands, next_cursor=next_cursor)
+
+    async def iter_hands(self, filters: Optional[HandFilters] = None, chunk_size: int = 1000) -> AsyncIterator[HandData]:
+        """
+        Stream hands, newest first, through a server-side cursor prefetching
+        chunk_size rows at a time. The pooled connection is held until the
+        generator is exhausted or closed.
+        """
+        if not await self._ensure_table():
+            logger.error("Cannot export hands, table %s does not exist", self.table_name)
+            return
+
+        conditions, params = build_filter_clause(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            async with async_connection() as conn:
+                # Cursors require a transaction; it is read-only and rolled back on exit
+                async with conn.transaction(readonly=True):
+                    async for row in conn.cursor(
+                        numbered_placeholders(
+                            f"""
+                            SELECT {HAND_COLUMNS}
+                            FROM {self.table_name}
+                            {where}
+                            ORDER BY created_at DESC, id DESC
+                            """
+                        ),
+                        *map(_utc, params),
+                        prefetch=chunk_size,
+                    ):
+                        yield self._row_to_hand_data(row)
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error streaming hands from repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+    @db_operation("get_hand_by_id")
+    async def get_hand_by_id(self, hand_id: uuid.UUID) -> Optional[HandData]:
+        """
+        Retrieve a specific hand by ID.
+        """
+        if not await self._ensure_table():
+            logger.error("Cannot get hand by ID, table %s does not exist", self.table_name)
+            return None
+
+        try:
+            async with async_connection() as conn:
+                row = await conn.fetchrow(
+                    f"""
+                    SELECT {HAND_COLUMNS}
+                    FROM {self.table_name}
+                    WHERE id = $1
+                    """,
+                    hand_id if isinstance(hand_id, uuid.UUID) else uuid.UUID(str(hand_id))
+                )
+            return self._row_to_hand_data(row) if row else None
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error getting hand by ID from repository: %s", e)
+            self._on_query_error(e)
+            return None
+
+    @staticmethod
+    async def _upsert_player_stats(conn, hands: List[HandData]):
+        """Fold the hands into player_stats inside the caller's insert transaction."""
+        rows = player_stats_rows(hands)
+        if rows:
+            await conn.executemany(_PLAYER_STATS_UPSERT, rows)
+
+    @db_operation("existing_hand_ids")
+    async def existing_hand_ids(self, hand_ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+        """The subset of hand_ids that is already stored (one primary-key probe per id)."""
+        if not hand_ids:
+            return set()
+        async with async_connection() as conn:
+            rows = await conn.fetch(f"SELECT id FROM {self.table_name} WHERE id = ANY($1::uuid[])", list(hand_ids))
+        return {row["id"] for row in rows}
+
+    @db_operation("get_player_stats")
+    async def get_player_stats(self, player_id: str) -> Optional[PlayerStats]:
+        """One player's aggregates (a primary-key lookup), or None if they have no stored hands."""
+        async with async_connection() as conn:
+            row = await conn.fetchrow(f"SELECT {PLAYER_STATS_COLUMNS} FROM player_stats WHERE player_id = $1", player_id)
+        return PlayerStats(**row) if row else None
+
+    @db_operation("get_leaderboard")
+    async def get_leaderboard(self, limit: int, order_by: str = "net_winnings") -> List[PlayerStats]:
+        """Top players by order_by (one of LEADERBOARD_ORDERS), read off its index."""
+        if order_by not in LEADERBOARD_ORDERS:
+            raise ValueError(f"Cannot rank players by {order_by!r}")
+        async with async_connection() as conn:
+            rows = await conn.fetch(
+                f"SELECT {PLAYER_STATS_COLUMNS} FROM player_stats ORDER BY {order_by} DESC, player_id LIMIT $1",
+                limit,
+            )
+        return [PlayerStats(**row) for row in rows]
+
+    @db_operation("get_replay_steps")
+    async def get_replay_steps(self, hand_id: uuid.UUID, start: int = 0, stop: Optional[int] = None) -> Optional[ReplayPage]:
+        """
+        Stored replay snapshots start <= step < stop (stop=None reads to the
+        end), or None if the hand's replay has not been stored yet.
+        """
+        async with async_connection() as conn:
+            last_step = await conn.fetchval("SELECT max(step) FROM hand_replay_steps WHERE hand_id = $1", hand_id)
+            if last_step is None:
+                return None
+            stop = last_step + 1 if stop is None else min(stop, last_step + 1)
+            rows = await conn.fetch(
+                "SELECT snapshot FROM hand_replay_steps WHERE hand_id = $1 AND step >= $2 AND step < $3 ORDER BY step",
+                hand_id, start, stop,
+            )
+        return ReplayPage(total_steps=last_step + 1, steps=[row["snapshot"] for row in rows])
+
+    @db_operation("save_replay_steps")
+    async def save_replay_steps(self, hand_id: uuid.UUID, steps: List[dict]):
+        """Store a hand's full replay (a no-op for steps another request stored first)."""
+        async with async_connection() as conn:
+            await conn.executemany(
+                REPLAY_STEPS_INSERT.format(values="($1, $2, $3)"),
+                [(hand_id, snapshot["step"], snapshot) for snapshot in steps],
+            )
+
+    def _hand_values(self, hand: HandData) -> tuple:
+        """Insert parameters for a hand; the JSONB codec encodes the structured fields, hole cards go in as codes."""
+        return (
+            hand.id,
+            _utc(hand.created_at),
+            hand.stack_settings,
+            hand.player_roles,
+            self._stored_hole_cards(hand),
+            hand.action_sequence,
+            hand.winnings,
+            hand_pot(hand.winnings),
+        )
+
+    @staticmethod
+    def _row_to_hand_data(row) -> HandData:
+        """Convert an asyncpg Record to a HandData object."""
+        return HandData(
+            id=uuid.UUID(bytes=row['id'].bytes), # asyncpg's own UUID type; the response encoder expects uuid.UUID
+            created_at=row['created_at'],
+            stack_settings=row['stack_settings'] or {},
+            player_roles=row['player_roles'] or {},
+            hole_cards=row_hole_cards(row),
+            action_sequence=row['action_sequence'] or "",
+            winnings=row['winnings'] or {}
+        )
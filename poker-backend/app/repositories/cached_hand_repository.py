@@ -0,0 +1,152 @@
+import threading
+import uuid
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import HAND_CACHE_SIZE, HAND_CACHE_TTL, HAND_CACHE_PAGE_TTL, HAND_CACHE_URL
+from app.models.hand import HandData, HandFilters, HandPage, ReplayPage
+from app.repositories.hand_repository import call_repository, get_repository
+from app.services.cache import CacheBackend, LocalCache, RedisCache
+
+# Bumped on every insert; list-page keys embed it, so one increment invalidates every cached page
+GENERATION_KEY = "hands:generation"
+
+class CachedHandRepository:
+    """
+    Read-through cache in front of a hand repository (sync or async).
+
+    Stored hands never change, so get_hand_by_id results are cached by id for
+    HAND_CACHE_TTL and newly created hands are written straight into the cache.
+    First pages of the list (no cursor) are cached per limit and filters under
+    the current generation; any insert bumps the generation, which orphans
+    every cached page at once. Replays are immutable too: a stored replay is
+    cached whole under its hand id and step ranges are sliced from it. With the in-process LocalCache, other workers
+    only see an insert once their pages outlive HAND_CACHE_PAGE_TTL; with
+    RedisCache the generation is shared, so invalidation reaches every worker.
+    Everything else is delegated to the wrapped repository unchanged.
+    """
+
+    def __init__(self, repository, cache: CacheBackend):
+        self._repository = repository
+        self._cache = cache
+        self._counts = {"hand_hits": 0, "hand_misses": 0, "page_hits": 0, "page_misses": 0,
+                        "replay_hits": 0, "replay_misses": 0, "invalidations": 0}
+        self._counts_lock = threading.Lock()
+
+    def __getattr__(self, name):
+        # table_exists, schema_state, refresh_schema_state, iter_hands, ...
+        return getattr(self._repository, name)
+
+    async def _cache_call(self, method, *args):
+        if self._cache.blocking:
+            return await run_in_threadpool(method, *args)
+        return method(*args)
+
+    def _count(self, name: str):
+        with self._counts_lock:
+            self._counts[name] += 1
+
+    async def get_hand_by_id(self, hand_id: uuid.UUID) -> Optional[HandData]:
+        key = f"hand:{hand_id}"
+        hand = await self._cache_call(self._cache.get, key)
+        if hand is not None:
+            self._count("hand_hits")
+            return hand
+        self._count("hand_misses")
+        hand = await call_repository(self._repository.get_hand_by_id, hand_id)
+        if hand is not None:
+            await self._cache_call(self._cache.set, key, hand, HAND_CACHE_TTL)
+        return hand
+
+    async def get_hands_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[HandFilters] = None,
+    ) -> HandPage:
+        if cursor:
+            # Deep pages are rarely re-read; only first pages are worth the cache space
+            return await call_repository(self._repository.get_hands_page, limit=limit, cursor=cursor, filters=filters)
+
+        generation = await self._cache_call(self._cache.counter, GENERATION_KEY)
+        key = f"hands:page:{generation}:{limit}:{filters!r}"
+        page = await self._cache_call(self._cache.get, key)
+        if page is not None:
+            self._count("page_hits")
+            return page
+        self._count("page_misses")
+        page = await call_repository(self._repository.get_hands_page, limit=limit, cursor=cursor, filters=filters)
+        if page.hands or self._repository.table_exists:
+            await self._cache_call(self._cache.set, key, page, HAND_CACHE_PAGE_TTL)
+        return page
+
+    async def get_replay_steps(self, hand_id: uuid.UUID, start: int = 0, stop: Optional[int] = None) -> Optional[ReplayPage]:
+        steps = await self._cache_call(self._cache.get, f"replay:{hand_id}")
+        if steps is not None:
+            self._count("replay_hits")
+            return ReplayPage(total_steps=len(steps), steps=steps[start:stop])
+        self._count("replay_misses")
+        # Only the requested range comes back from the database, so nothing is cached here
+        return await call_repository(self._repository.get_replay_steps, hand_id, start, stop)
+
+    async def save_replay_steps(self, hand_id: uuid.UUID, steps: List[dict]):
+        await call_repository(self._repository.save_replay_steps, hand_id, steps)
+        await self._cache_call(self._cache.set, f"replay:{hand_id}", steps, HAND_CACHE_TTL)
+
+    async def create_hand(self, hand: HandData) -> Optional[HandData]:
+        saved = await call_repository(self._repository.create_hand, hand)
+        if saved is not None:
+            await self.invalidate_pages()
+            await self._cache_call(self._cache.set, f"hand:{saved.id}", saved, HAND_CACHE_TTL)
+        return saved
+
+    async def create_hands_bulk(self, hands: List[HandData], *args, **kwargs) -> int:
+        written = await call_repository(self._repository.create_hands_bulk, hands, *args, **kwargs)
+        if written:
+            await self.invalidate_pages()
+        return written
+
+    async def invalidate_pages(self):
+        """Orphan every cached list page (called after each insert)."""
+        await self._cache_call(self._cache.incr, GENERATION_KEY)
+        self._count("invalidations")
+
+    def cache_stats(self) -> dict:
+        """Hit/miss counters for this worker plus the backend's own statistics."""
+        with self._counts_lock:
+            stats = dict(self._counts)
+        for kind in ("hand", "page", "replay"):
+            lookups = stats[f"{kind}_hits"] + stats[f"{kind}_misses"]
+            stats[f"{kind}_hit_ratio"] = stats[f"{kind}_hits"] / lookups if lookups else 0.0
+        stats.update(self._cache.stats())
+        return stats
+
+
+_cached_repository: Optional[CachedHandRepository] = None
+_cached_repository_lock = threading.Lock()
+
+def build_cache() -> CacheBackend:
+    """The backend named by configuration: Redis when HAND_CACHE_URL is set, else an in-process LRU."""
+    if HAND_CACHE_URL:
+        return RedisCache(HAND_CACHE_URL)
+    return LocalCache(HAND_CACHE_SIZE)
+
+def get_cached_repository():
+    """
+    Returns the process-wide repository wrapped in the read-through cache, or
+    the bare repository when HAND_CACHE_SIZE is 0.
+    """
+    global _cached_repository
+    if HAND_CACHE_SIZE <= 0:
+        return get_repository()
+    if _cached_repository is None:
+        with _cached_repository_lock:
+            if _cached_repository is None:
+                _cached_repository = CachedHandRepository(get_repository(), build_cache())
+    return _cached_repository
+
+def cached_repository_stats() -> Optional[dict]:
+    """Statistics of the process-wide cache, or None while it is disabled or not yet created."""
+    repository = _cached_repository
+    return repository.cache_stats() if repository is not None else None
@@ -1,99 +1,261 @@
+import base64
+import inspect
 import json
+import logging
+import threading
+import time
 import uuid
-from typing import List, Optional
-from datetime import datetime
-from app.db.database import get_db_cursor, check_table_exists # Import check_table_exists
-from app.models.hand import HandData
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from fastapi.concurrency import run_in_threadpool
+from datetime import datetime, timezone
+import psycopg2.errors
+import psycopg2.extras
+from psycopg2.extras import Json
+from app.core.config import DB_DRIVER, SCHEMA_RECHECK_INTERVAL
+from app.db.database import get_db_connection, get_db_cursor, check_schema_version, check_table_exists
+from app.db.migrations import HOLE_CARD_CODES_VERSION, LATEST_VERSION
+from app.core.metrics import db_operation
+from app.db.pool import PoolTimeoutError
+from app.models.hand import HandData, HandFilters, HandPage, ReplayPage
+from app.models.player_stats import PlayerStats
+from app.services.cards import decode_hole_cards, encode_hole_cards
+from app.services.player_stats import STAT_COLUMNS, PlayerHandStats, add_stats, hand_stats
+
+logger = logging.getLogger(__name__)
+
+HAND_COLUMNS = "id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings"
+
+PLAYER_STATS_COLUMNS = "player_id, " + ", ".join(STAT_COLUMNS)
+
+# Adds per-hand deltas to the running totals; VALUES is filled in by the driver-specific caller
+PLAYER_STATS_UPSERT = f"""
+    INSERT INTO player_stats ({PLAYER_STATS_COLUMNS})
+    VALUES {{values}}
+    ON CONFLICT (player_id) DO UPDATE SET
+        {", ".join(f"{column} = player_stats.{column} + EXCLUDED.{column}" for column in STAT_COLUMNS)},
+        updated_at = CURRENT_TIMESTAMP
+"""
+
+LEADERBOARD_ORDERS = ("net_winnings", "hands")
+
+# Concurrent first requests for the same replay compute identical steps; the first insert wins
+REPLAY_STEPS_INSERT = "INSERT INTO hand_replay_steps (hand_id, step, snapshot) VALUES {values} ON CONFLICT DO NOTHING"
+
+def hand_pot(winnings: dict) -> int:
+    """Chips won in a hand: the sum of all positive net winnings."""
+    return sum(amount for amount in winnings.values() if amount > 0)
+
+def row_hole_cards(row) -> Dict[str, List[str]]:
+    """
+    Hole cards of a stored row: the smallint[] column (see
+    app/services/cards.py), or the JSONB object of a row read while
+    migration 7 has not run yet.
+    """
+    stored = row['hole_cards']
+    if isinstance(stored, dict):
+        return stored
+    return decode_hole_cards(row['stack_settings'] or {}, stored)
+
+def encode_cursor(created_at: datetime, hand_id) -> str:
+    """Encode a keyset position (created_at, id) as an opaque URL-safe token."""
+    raw = json.dumps([created_at.isoformat(), str(hand_id)], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Decode a token produced by encode_cursor. Raises ValueError on malformed input."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, hand_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(uuid.UUID(hand_id))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {cursor!r}") from e
+
+def player_stats_rows(hands: Iterable[HandData]) -> List[tuple]:
+    """
+    Summed player_stats deltas for the hands being inserted, one row per player,
+    sorted by player so concurrent inserts lock player_stats rows in the same
+    order and cannot deadlock. A hand whose stats cannot be derived is stored
+    anyway and only left out of the aggregates.
+    """
+    totals: Dict[str, PlayerHandStats] = {}
+    for hand in hands:
+        try:
+            add_stats(totals, hand_stats(hand))
+        except ValueError as e:
+            logger.warning("Hand %s left out of player stats: %s", hand.id, e)
+    return [(player, *totals[player]) for player in sorted(totals)]
+
+def build_filter_clause(filters: Optional[HandFilters]) -> Tuple[List[str], list]:
+    """Translate HandFilters into SQL conditions (to be AND-ed) and their parameters."""
+    conditions: List[str] = []
+    params: list = []
+    if filters is None:
+        return conditions, params
+    if filters.player:
+        # Served by the GIN index on stack_settings
+        conditions.append("stack_settings ? %s")
+        params.append(filters.player)
+    if filters.created_from is not None:
+        conditions.append("created_at >= %s")
+        params.append(filters.created_from)
+    if filters.created_to is not None:
+        conditions.append("created_at < %s")
+        params.append(filters.created_to)
+    if filters.min_pot is not None:
+        conditions.append("pot >= %s")
+        params.append(filters.min_pot)
+    if filters.max_pot is not None:
+        conditions.append("pot <= %s")
+        params.append(filters.max_pot)
+    return conditions, params
 
 class HandRepository:
-    def __init__(self):
-        self.table_name = "hands"
-        self.table_exists = check_table_exists(self.table_name)
-        if not self.table_exists:
-            print(f"Warning: Table 	{self.table_name}	 does not exist. Database operations will fail until the table is created.")
+    def __init__(self, table_name: str = "hands"):
+        self.table_name = table_name
+        # Schema state is probed once (at startup) and cached; None means "not checked yet"
+        self._table_exists: Optional[bool] = None
+        self._schema_version: Optional[int] = None # From schema_migrations; None while the table is missing
+        self._schema_checked_at: Optional[datetime] = None
+        self._schema_checked_monotonic = 0.0
+        self._schema_lock = threading.Lock()
+
+    @property
+    def table_exists(self) -> bool:
+        """
+        Cached table-existence state. The catalog is only queried when the state
+        is unknown or stale, or when the table was missing at the last check and
+        SCHEMA_RECHECK_INTERVAL has elapsed since.
+        """
+        state = self._table_exists
+        if state is None or (
+            not state and time.monotonic() - self._schema_checked_monotonic >= SCHEMA_RECHECK_INTERVAL
+        ):
+            return self.refresh_schema_state()
+        return state
+
+    @property
+    def schema_refresh_due(self) -> bool:
+        """
+        True when the cached schema state is unknown, or when it is not current
+        (table missing or migrations behind) and SCHEMA_RECHECK_INTERVAL has elapsed.
+        """
+        if self._table_exists is None:
+            return True
+        current = self._table_exists and self._schema_version == LATEST_VERSION
+        return not current and time.monotonic() - self._schema_checked_monotonic >= SCHEMA_RECHECK_INTERVAL
+
+    @db_operation("refresh_schema_state")
+    def refresh_schema_state(self) -> bool:
+        """Query the catalog for the table and the applied schema version, and cache the result."""
+        with self._schema_lock:
+            exists = check_table_exists(self.table_name)
+            self._table_exists = exists
+            self._schema_version = check_schema_version() if exists else None
+            self._schema_checked_at = datetime.now(timezone.utc)
+            self._schema_checked_monotonic = time.monotonic()
+        if not exists:
+            logger.warning("Table %s does not exist. Database operations will fail until the table is created", self.table_name)
+        return exists
 
+    def schema_state(self) -> dict:
+        """Report the cached schema state without touching the database."""
+        return {
+            "table": self.table_name,
+            "table_exists": self._table_exists,
+            "version": self._schema_version,
+            "checked_at": self._schema_checked_at.isoformat() if self._schema_checked_at else None,
+        }
+
+    def _on_query_error(self, error: Exception):
+        """
+        A query against a missing table means the cached state is wrong:
+        re-validate on next use. So does any error while the cached schema is
+        behind, as another worker may have migrated it since (a write in the
+        old hole_cards format then fails against the new column).
+        """
+        if isinstance(error, (psycopg2.errors.UndefinedTable, psycopg2.errors.UndefinedColumn)):
+            self._table_exists = None
+        elif self._schema_version is not None and self._schema_version < LATEST_VERSION:
+            self._table_exists = None
+
+    def _stored_hole_cards(self, hand: HandData):
+        """Hole cards in the column's current format: codes, or the JSONB object until migration 7 has run."""
+        if self._schema_version is not None and self._schema_version < HOLE_CARD_CODES_VERSION:
+            return Json(hand.hole_cards)
+        return encode_hole_cards(hand.stack_settings, hand.hole_cards)
+
+    @db_operation("create_hand")
     def create_hand(self, hand: HandData) -> Optional[HandData]:
         """
         Save a hand to the database.
         """
         if not self.table_exists:
-            print(f"Error: Cannot create hand, table 	{self.table_name}	 does not exist.")
+            logger.error("Cannot create hand, table %s does not exist", self.table_name)
             return None
             
         try:
             with get_db_cursor(commit=True) as cursor:
-                try:
-                    # Convert UUID to string to avoid adaptation issues
-                    hand_id = str(hand.id)
-                    
-                    # Convert datetime to ISO format string
-                    created_at = hand.created_at.isoformat()
-                    
-                    # Convert dictionaries to JSON strings
-                    stack_settings = json.dumps(hand.stack_settings)
-                    player_roles = json.dumps(hand.player_roles)
-                    hole_cards = json.dumps(hand.hole_cards)
-                    winnings = json.dumps(hand.winnings)
-                    
-                    cursor.execute(
-                        f"""
-                        INSERT INTO {self.table_name} (id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s)
-                        RETURNING id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings
-                        """,
-                        (hand_id, created_at, stack_settings, player_roles, hole_cards, hand.action_sequence, winnings)
-                    )
-                    
-                    result = cursor.fetchone()
-                    if result:
-                        # Convert row to HandData
-                        return self._row_to_hand_data(result)
-                    return None
-                except Exception as e:
-                    print(f"Error in database operation: {e}")
-                    # Try with a more direct approach if the first attempt failed
-                    try:
-                        print("Attempting alternative insert approach...")
-                        # Ensure all values are strings to avoid type issues
-                        hand_id = str(hand.id)
-                        created_at = hand.created_at.isoformat()
-                        stack_settings = json.dumps(hand.stack_settings)
-                        player_roles = json.dumps(hand.player_roles)
-                        hole_cards = json.dumps(hand.hole_cards)
-                        action_sequence = hand.action_sequence
-                        winnings = json.dumps(hand.winnings)
-                        
-                        cursor.execute(
-                            f"""
-                            INSERT INTO {self.table_name} (id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s)
-                            """,
-                            (hand_id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings)
-                        )
-                        
-                        # Return a reconstructed hand object since we might not have RETURNING capability
-                        return HandData(
-                            id=uuid.UUID(hand_id),
-                            created_at=datetime.fromisoformat(created_at),
-                            stack_settings=hand.stack_settings,
-                            player_roles=hand.player_roles,
-                            hole_cards=hand.hole_cards,
-                            action_sequence=action_sequence,
-                            winnings=hand.winnings
-                        )
-                    except Exception as e2:
-                        print(f"Alternative insert also failed: {e2}")
-                        raise
+                cursor.execute(
+                    f"""
+                    INSERT INTO {self.table_name} (id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings, pot)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                    RETURNING {HAND_COLUMNS}
+                    """,
+                    self._hand_params(hand)
+                )
+                result = cursor.fetchone()
+                self._upsert_player_stats(cursor, [hand])
+                if result:
+                    # Convert row to HandData
+                    return self._row_to_hand_data(result)
+                return None
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error creating hand in repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+    @db_operation("create_hands_bulk")
+    def create_hands_bulk(self, hands: List[HandData], page_size: int = 1000) -> int:
+        """
+        Save many hands in a single transaction using multi-row INSERTs.
+        Either every hand is stored or none is. Returns the number of rows written.
+        """
+        if not hands:
+            return 0
+        if not self.table_exists:
+            logger.error("Cannot create hands, table %s does not exist", self.table_name)
+            return 0
+
+        rows = [self._hand_params(hand) for hand in hands]
+        try:
+            with get_db_cursor(commit=True) as cursor:
+                psycopg2.extras.execute_values(
+                    cursor,
+                    f"""
+                    INSERT INTO {self.table_name} (id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings, pot)
+                    VALUES %s
+                    """,
+                    rows,
+                    page_size=page_size,
+                )
+                self._upsert_player_stats(cursor, hands)
+            return len(rows)
+        except PoolTimeoutError:
+            raise
         except Exception as e:
-            print(f"Error creating hand in repository: {e}")
+            logger.error("Error bulk creating hands in repository: %s", e)
+            self._on_query_error(e)
             raise
 
+    @db_operation("get_all_hands")
     def get_all_hands(self) -> List[HandData]:
         """
         Retrieve all hands from the database.
         """
         if not self.table_exists:
-            print(f"Error: Cannot get hands, table 	{self.table_name}	 does not exist.")
+            logger.error("Cannot get hands, table %s does not exist", self.table_name)
             return []
             
         try:
@@ -101,7 +263,7 @@ class HandRepository:
                 try:
                     cursor.execute(
                         f"""
-                        SELECT id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings
+                        SELECT {HAND_COLUMNS}
                         FROM {self.table_name}
                         ORDER BY created_at DESC
                         """
@@ -110,21 +272,117 @@ class HandRepository:
                     rows = cursor.fetchall()
                     return [self._row_to_hand_data(row) for row in rows]
                 except Exception as e:
-                    print(f"Error in SELECT query: {e}")
+                    logger.error("Error in SELECT query: %s", e)
+                    self._on_query_error(e)
                     # Return empty list if table doesn't exist or other issues
-                    print("Returning empty hands list due to database error")
+                    logger.warning("Returning empty hands list due to database error")
                     return []
+        except PoolTimeoutError:
+            # Surface pool exhaustion as a 503 instead of an empty result
+            raise
         except Exception as e:
-            print(f"Error getting all hands from repository: {e}")
+            logger.error("Error getting all hands from repository: %s", e)
             # Return empty list on error to avoid breaking the frontend
             return []
 
+    @db_operation("get_hands_page")
+    def get_hands_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        filters: Optional[HandFilters] = None,
+    ) -> HandPage:
+        """
+        Retrieve one page of hands, newest first, using keyset pagination on
+        (created_at, id) so every page costs the same regardless of depth.
+        Raises ValueError for a malformed cursor.
+        """
+        conditions, params = build_filter_clause(filters)
+        if cursor:
+            after_created_at, after_id = decode_cursor(cursor)
+            conditions.append("(created_at, id) < (%s, %s)")
+            params.extend([after_created_at, after_id])
+
+        if not self.table_exists:
+            logger.error("Cannot get hands, table %s does not exist", self.table_name)
+            return HandPage()
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with get_db_cursor() as db_cursor:
+                # Fetch one extra row to learn whether another page exists
+                db_cursor.execute(
+                    f"""
+                    SELECT {HAND_COLUMNS}
+                    FROM {self.table_name}
+                    {where}
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT %s
+                    """,
+                    (*params, limit + 1)
+                )
+                rows = db_cursor.fetchall()
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error getting hands page from repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+        hands = [self._row_to_hand_data(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last['created_at'], last['id'])
+        return HandPage(hands=hands, next_cursor=next_cursor)
+
+    def iter_hands(self, filters: Optional[HandFilters] = None, chunk_size: int = 1000) -> Iterator[HandData]:
+        """
+        Stream hands, newest first, through a named server-side cursor.
+        Rows are fetched chunk_size at a time, so memory use stays bounded no
+        matter how large the table is. The pooled connection is held until the
+        generator is exhausted or closed.
+        """
+        if not self.table_exists:
+            logger.error("Cannot export hands, table %s does not exist", self.table_name)
+            return
+
+        conditions, params = build_filter_clause(filters)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        try:
+            with get_db_connection() as conn:
+                # Named cursors live on the server and require a transaction, which the pool rolls back on return
+                with conn.cursor(name=f"hands_export_{uuid.uuid4().hex}", cursor_factory=psycopg2.extras.DictCursor) as db_cursor:
+                    db_cursor.itersize = chunk_size
+                    db_cursor.execute(
+                        f"""
+                        SELECT {HAND_COLUMNS}
+                        FROM {self.table_name}
+                        {where}
+                        ORDER BY created_at DESC, id DESC
+                        """,
+                        params
+                    )
+                    while True:
+                        rows = db_cursor.fetchmany(chunk_size)
+                        if not rows:
+                            break
+                        for row in rows:
+                            yield self._row_to_hand_data(row)
+        except PoolTimeoutError:
+            raise
+        except Exception as e:
+            logger.error("Error streaming hands from repository: %s", e)
+            self._on_query_error(e)
+            raise
+
+    @db_operation("get_hand_by_id")
     def get_hand_by_id(self, hand_id: uuid.UUID) -> Optional[HandData]:
         """
         Retrieve a specific hand by ID.
         """
         if not self.table_exists:
-            print(f"Error: Cannot get hand by ID, table 	{self.table_name}	 does not exist.")
+            logger.error("Cannot get hand by ID, table %s does not exist", self.table_name)
             return None
             
         try:
@@ -134,7 +392,7 @@ class HandRepository:
                     id_str = str(hand_id)
                     cursor.execute(
                         f"""
-                        SELECT id, created_at, stack_settings, player_roles, hole_cards, action_sequence, winnings
+                        SELECT {HAND_COLUMNS}
                         FROM {self.table_name}
                         WHERE id = %s
                         """,
@@ -146,91 +404,138 @@ class HandRepository:
                         return self._row_to_hand_data(row)
                     return None
                 except Exception as e:
-                    print(f"Error in SELECT by ID query: {e}")
+                    logger.error("Error in SELECT by ID query: %s", e)
+                    self._on_query_error(e)
                     return None
+        except PoolTimeoutError:
+            # Surface pool exhaustion as a 503 instead of an empty result
+            raise
         except Exception as e:
-            print(f"Error getting hand by ID from repository: {e}")
+            logger.error("Error getting hand by ID from repository: %s", e)
             return None
 
-    def _row_to_hand_data(self, row) -> HandData:
+    @db_operation("existing_hand_ids")
+    def existing_hand_ids(self, hand_ids: List[uuid.UUID]) -> Set[uuid.UUID]:
+        """The subset of hand_ids that is already stored (one primary-key probe per id)."""
+        if not hand_ids:
+            return set()
+        with get_db_cursor() as cursor:
+            cursor.execute(f"SELECT id FROM {self.table_name} WHERE id = ANY(%s::uuid[])", ([str(i) for i in hand_ids],))
+            return {row["id"] for row in cursor.fetchall()}
+
+    @staticmethod
+    def _upsert_player_stats(cursor, hands: List[HandData]):
+        """Fold the hands into player_stats inside the caller's insert transaction."""
+        rows = player_stats_rows(hands)
+        if rows:
+            psycopg2.extras.execute_values(cursor, PLAYER_STATS_UPSERT.format(values="%s"), rows, page_size=1000)
+
+    @db_operation("get_player_stats")
+    def get_player_stats(self, player_id: str) -> Optional[PlayerStats]:
+        """One player's aggregates (a primary-key lookup), or None if they have no stored hands."""
+        with get_db_cursor() as cursor:
+            cursor.execute(f"SELECT {PLAYER_STATS_COLUMNS} FROM player_stats WHERE player_id = %s", (player_id,))
+            row = cursor.fetchone()
+        return PlayerStats(**row) if row else None
+
+    @db_operation("get_leaderboard")
+    def get_leaderboard(self, limit: int, order_by: str = "net_winnings") -> List[PlayerStats]:
+        """Top players by order_by (one of LEADERBOARD_ORDERS), read off its index."""
+        if order_by not in LEADERBOARD_ORDERS:
+            raise ValueError(f"Cannot rank players by {order_by!r}")
+        with get_db_cursor() as cursor:
+            cursor.execute(
+                f"SELECT {PLAYER_STATS_COLUMNS} FROM player_stats ORDER BY {order_by} DESC, player_id LIMIT %s",
+                (limit,)
+            )
+            return [PlayerStats(**row) for row in cursor.fetchall()]
+
+    @db_operation("get_replay_steps")
+    def get_replay_steps(self, hand_id: uuid.UUID, start: int = 0, stop: Optional[int] = None) -> Optional[ReplayPage]:
         """
-        Convert a database row to a HandData object with robust error handling.
+        Stored replay snapshots start <= step < stop (stop=None reads to the
+        end), or None if the hand's replay has not been stored yet.
         """
-        try:
-            # Handle both tuple and dict-like cursor results
-            if hasattr(row, 'keys'):
-                # DictCursor
-                id_val = row['id']
-                created_at = row['created_at']
-                stack_settings = row['stack_settings']
-                player_roles = row['player_roles']
-                hole_cards = row['hole_cards']
-                action_sequence = row['action_sequence']
-                winnings = row['winnings']
-            else:
-                # Regular cursor (tuple)
-                id_val = row[0]
-                created_at = row[1]
-                stack_settings = row[2]
-                player_roles = row[3]
-                hole_cards = row[4]
-                action_sequence = row[5]
-                winnings = row[6]
-            
-            # Parse JSON strings if needed (assuming TEXT storage)
-            try:
-                stack_settings = json.loads(stack_settings) if isinstance(stack_settings, str) else stack_settings or {}
-                player_roles = json.loads(player_roles) if isinstance(player_roles, str) else player_roles or {}
-                hole_cards = json.loads(hole_cards) if isinstance(hole_cards, str) else hole_cards or {}
-                winnings = json.loads(winnings) if isinstance(winnings, str) else winnings or {}
-            except json.JSONDecodeError as e:
-                print(f"JSON decode error: {e}")
-                # Provide default values if JSON parsing fails
-                stack_settings = stack_settings if isinstance(stack_settings, dict) else {}
-                player_roles = player_roles if isinstance(player_roles, dict) else {}
-                hole_cards = hole_cards if isinstance(hole_cards, dict) else {}
-                winnings = winnings if isinstance(winnings, dict) else {}
-                
-            # Convert string ID to UUID if needed
-            try:
-                if isinstance(id_val, str):
-                    id_val = uuid.UUID(id_val)
-            except ValueError:
-                # If UUID conversion fails, generate a new one
-                print(f"Invalid UUID format: {id_val}, generating new UUID")
-                id_val = uuid.uuid4()
-                
-            # Convert string timestamp to datetime if needed
-            try:
-                if isinstance(created_at, str):
-                    created_at = datetime.fromisoformat(created_at)
-                elif not isinstance(created_at, datetime):
-                     # Fallback if it's not a string or datetime
-                     print(f"Invalid datetime format: {created_at}, using current time")
-                     created_at = datetime.utcnow()
-            except ValueError:
-                # If datetime parsing fails, use current time
-                print(f"Invalid datetime format: {created_at}, using current time")
-                created_at = datetime.utcnow()
-                
-            return HandData(
-                id=id_val,
-                created_at=created_at,
-                stack_settings=stack_settings,
-                player_roles=player_roles,
-                hole_cards=hole_cards,
-                action_sequence=action_sequence,
-                winnings=winnings
-            )
-        except Exception as e:
-            print(f"Error converting row to HandData: {e}")
-            # Return a minimal valid HandData object to avoid breaking the application
-            return HandData(
-                id=uuid.uuid4(),
-                created_at=datetime.utcnow(),
-                stack_settings={},
-                player_roles={},
-                hole_cards={},
-                action_sequence="",
-                winnings={}
+        with get_db_cursor() as cursor:
+            # The last step comes off the primary key index
+            cursor.execute("SELECT max(step) AS last_step FROM hand_replay_steps WHERE hand_id = %s", (str(hand_id),))
+            last_step = cursor.fetchone()["last_step"]
+            if last_step is None:
+                return None
+            stop = last_step + 1 if stop is None else min(stop, last_step + 1)
+            cursor.execute(
+                "SELECT snapshot FROM hand_replay_steps WHERE hand_id = %s AND step >= %s AND step < %s ORDER BY step",
+                (str(hand_id), start, stop)
             )
+            return ReplayPage(total_steps=last_step + 1, steps=[row["snapshot"] for row in cursor.fetchall()])
+
+    @db_operation("save_replay_steps")
+    def save_replay_steps(self, hand_id: uuid.UUID, steps: List[dict]):
+        """Store a hand's full replay (a no-op for steps another request stored first)."""
+        rows = [(str(hand_id), snapshot["step"], Json(snapshot)) for snapshot in steps]
+        with get_db_cursor(commit=True) as cursor:
+            psycopg2.extras.execute_values(cursor, REPLAY_STEPS_INSERT.format(values="%s"), rows, page_size=1000)
+
+    def _hand_params(self, hand: HandData) -> tuple:
+        """Insert parameters for a hand; structured fields are adapted to JSONB, hole cards to codes."""
+        created_at = hand.created_at
+        if created_at.tzinfo is None:
+            # HandData timestamps are naive UTC; don't let the session time zone reinterpret them
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        return (
+            hand.id,
+            created_at,
+            Json(hand.stack_settings),
+            Json(hand.player_roles),
+            self._stored_hole_cards(hand),
+            hand.action_sequence,
+            Json(hand.winnings),
+            hand_pot(hand.winnings),
+        )
+
+    def _row_to_hand_data(self, row) -> HandData:
+        """
+        Convert a database row to a HandData object. The driver already returns
+        UUID, datetime and decoded JSONB values, so no parsing happens here.
+        """
+        return HandData(
+            id=row['id'],
+            created_at=row['created_at'],
+            stack_settings=row['stack_settings'] or {},
+            player_roles=row['player_roles'] or {},
+            hole_cards=row_hole_cards(row),
+            action_sequence=row['action_sequence'] or "",
+            winnings=row['winnings'] or {}
+        )
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+def get_repository():
+    """
+    Returns the process-wide repository for DB_DRIVER, creating it on first use:
+    a HandRepository for psycopg2, an AsyncHandRepository for asyncpg.
+    """
+    global _repository
+    if _repository is None:
+        with _repository_lock:
+            if _repository is None:
+                if DB_DRIVER == "asyncpg":
+                    from app.repositories.async_hand_repository import AsyncHandRepository
+                    _repository = AsyncHandRepository()
+                elif DB_DRIVER == "psycopg2":
+                    _repository = HandRepository()
+                else:
+                    raise ValueError(f"Unsupported DB_DRIVER {DB_DRIVER!r}; expected 'psycopg2' or 'asyncpg'")
+    return _repository
+
+async def call_repository(method, *args, **kwargs):
+    """
+    Call a repository method from async code: coroutines of the async
+    repository are awaited directly, blocking methods of the sync one run in
+    the threadpool so they never stall the event loop.
+    """
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await run_in_threadpool(method, *args, **kwargs)
@@ -0,0 +1,71 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+import uuid
+
+class EquityOptionsSchema(BaseModel):
+    mode: Literal["auto", "exact", "monte_carlo"] = Field("auto", description="auto enumerates every runout from the flop on and samples preflop")
+    max_iterations: Optional[int] = Field(None, ge=1, description="Runouts to sample per street (capped by EQUITY_MAX_ITERATIONS)")
+    max_time_ms: Optional[int] = Field(None, ge=1, description="Time budget for the whole request (capped by EQUITY_MAX_TIME_MS)")
+    target_ci: float = Field(0.005, gt=0, le=0.5, description="Stop sampling once every equity is known to +/- this much")
+    confidence: float = Field(0.95, gt=0, lt=1)
+
+class EquityRequestSchema(EquityOptionsSchema):
+    hole_cards: Dict[str, List[str]] = Field(..., example={"Player1": ["As", "Ad"], "Player2": ["Kc", "Kd"]})
+    board: Optional[List[str]] = Field(None, example=["2s", "7d", "9c"])
+    action_sequence: Optional[str] = Field(None, description="Used to read the board when `board` is omitted")
+
+class PlayerEquitySchema(BaseModel):
+    win: float
+    tie: float
+    equity: float # Expected share of the pot
+
+    class Config:
+        from_attributes = True
+
+class StreetEquitySchema(BaseModel):
+    street: str
+    board: List[str]
+    iterations: int
+    exact: bool
+    ci_half_width: float
+    players: Dict[str, PlayerEquitySchema]
+
+    class Config:
+        from_attributes = True
+
+class EquityResponseSchema(BaseModel):
+    hand_id: Optional[uuid.UUID] = None
+    streets: List[StreetEquitySchema]
+    elapsed_ms: float
+
+class EquityCacheStatsSchema(BaseModel):
+    hits: int
+    misses: int
+    hit_ratio: float
+    size: int # Canonical spots currently memoized
+    max_size: int
+
+class PreflopEquitySchema(BaseModel):
+    hand: str # Starting-hand class, e.g. "AKs"
+    vs: Optional[str] = None # Opposing class, for a heads-up lookup
+    opponents: int # 1 for heads-up, else random opponents
+    equity: float # Expected share of the pot
+    exact: bool # False when the value was sampled
+
+class AllInPlayerEVSchema(BaseModel):
+    equity: float
+    invested: int
+    ev: float
+    winnings: int
+    luck: float # winnings - ev
+
+    class Config:
+        from_attributes = True
+
+class AllInEVSchema(BaseModel):
+    hand_id: uuid.UUID
+    street: str
+    board: List[str]
+    pot: int
+    source: Literal["matrix", "exact", "monte_carlo"]
+    players: Dict[str, AllInPlayerEVSchema]
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Dict, List, Optional
+from typing import Dict, List, Literal, Optional
 import uuid
 from datetime import datetime
 
@@ -26,6 +26,109 @@ class HandResponseSchema(BaseModel):
 
 class HandListResponseSchema(BaseModel):
     hands: List[HandResponseSchema]
+    next_cursor: Optional[str] = None # Pass back as ?cursor= to fetch the next page
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BatchItemResultSchema(BaseModel):
+    index: int # Position of the hand in the submitted batch
+    status: Literal["created", "error"]
+    id: Optional[uuid.UUID] = None
+    error: Optional[str] = None
+
+class BatchCreateResponseSchema(BaseModel):
+    created: int
+    failed: int
+    results: List[BatchItemResultSchema]
+
+class HandCacheStatsSchema(BaseModel):
+    enabled: bool
+    hand_hits: int = 0
+    hand_misses: int = 0
+    hand_hit_ratio: float = 0.0
+    page_hits: int = 0
+    page_misses: int = 0
+    page_hit_ratio: float = 0.0
+    replay_hits: int = 0
+    replay_misses: int = 0
+    replay_hit_ratio: float = 0.0
+    invalidations: int = 0 # Inserts that orphaned the cached list pages
+    backend: Optional[str] = None # "local" or "redis"
+    size: Optional[int] = None # Entries held (local backend only)
+    max_size: Optional[int] = None
+    evictions: Optional[int] = None
+    expirations: Optional[int] = None
+
+class ReplayLegalActionsSchema(BaseModel):
+    fold: bool
+    call: int # Chips needed to continue; 0 means check
+    raise_to: Optional[List[int]] = None # [min, max] bet/raise-to amounts, None if raising is not allowed
+
+class ReplayStepSchema(BaseModel):
+    step: int
+    street: Literal["preflop", "flop", "turn", "river"]
+    actor: Optional[str] = None # Player who acted; None for the deal and board cards
+    action: Optional[str] = None # Short action token, e.g. 'r200'
+    board: List[str]
+    pot: int # Includes the current street's bets
+    stacks: Dict[str, int]
+    bets: Dict[str, int]
+    active: List[str] # Players who have not folded
+    to_act: Optional[str] = None
+    legal: Optional[ReplayLegalActionsSchema] = None # What to_act may do
+
+class HandReplaySchema(BaseModel):
+    hand_id: uuid.UUID
+    total_steps: int
+    steps: List[ReplayStepSchema]
+
+class IngestAcceptedSchema(BaseModel):
+    id: uuid.UUID
+    status: Literal["queued"]
+
+class IngestHandStatusSchema(BaseModel):
+    id: uuid.UUID
+    status: Literal["queued", "failed", "stored"]
+    error: Optional[str] = None # Why the writer gave up on the hand
+
+class IngestSpoolStatsSchema(BaseModel):
+    directory: str
+    fsync: bool
+    segments: int # Spool files held by this worker
+    bytes: int
+
+class IngestStatsSchema(BaseModel):
+    mode: Literal["sync", "async"]
+    running: bool = False
+    queued: int = 0 # Hands waiting for the writer, including ones being spooled
+    capacity: int = 0
+    oldest_queued_seconds: float = 0.0
+    batch_size: int = 0
+    flush_interval: float = 0.0
+    accepted: int = 0
+    rejected: int = 0 # Refused with 503 because the queue was full
+    recovered: int = 0 # Read back from spool files of dead processes
+    committed: int = 0
+    failed: int = 0
+    batches: int = 0
+    retries: int = 0
+    last_error: Optional[str] = None
+    spool: Optional[IngestSpoolStatsSchema] = None
+
+class ImportErrorSchema(BaseModel):
+    offset: int # Byte offset of the hand in the upload
+    error: str
+
+class ImportStatsSchema(BaseModel):
+    source: str
+    resumed_from: int = 0
+    bytes: int
+    hands: int
+    imported: int
+    duplicates: int # Already stored by an earlier import
+    failed: int
+    seconds: float
+    hands_per_second: float
+    megabytes_per_second: float
+    errors: List[ImportErrorSchema] # The first failures, all of them are counted in failed
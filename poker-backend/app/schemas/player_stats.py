@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+class PlayerStatsSchema(BaseModel):
+    player_id: str
+    hands: int
+    net_winnings: int
+    vpip_hands: int
+    pfr_hands: int
+    postflop_aggressive: int
+    postflop_passive: int
+    showdowns: int
+    showdowns_won: int
+    vpip: Optional[float] = None # Share of hands with a voluntary preflop call or raise
+    pfr: Optional[float] = None # Share of hands raised preflop
+    aggression_factor: Optional[float] = None # Postflop (bets + raises) / calls; None without calls
+    showdown_frequency: Optional[float] = None # Share of hands that went to showdown
+    showdown_win_rate: Optional[float] = None # Share of showdowns finished ahead
+
+class LeaderboardEntrySchema(PlayerStatsSchema):
+    rank: int
+
+class LeaderboardSchema(BaseModel):
+    order_by: Literal["net_winnings", "hands"]
+    players: List[LeaderboardEntrySchema]
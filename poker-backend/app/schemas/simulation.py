@@ -0,0 +1,38 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import uuid
+
+from app.core.config import SIMULATION_MAX_HANDS, SIMULATION_MAX_KEPT_HANDS
+
+class SimulationRequestSchema(BaseModel):
+    players: int = Field(6, ge=2, le=10)
+    hands: int = Field(..., ge=1, le=SIMULATION_MAX_HANDS)
+    stacks: Optional[List[int]] = Field(None, description="Starting stack per seat; 100 big blinds each when omitted", example=[10000, 10000, 5000])
+    policies: List[str] = Field(["random"], min_length=1, description="Policy per seat, repeated when shorter than the table: random, calling_station, aggressive, tight")
+    seed: Optional[int] = Field(None, ge=0, description="Same seed and settings, same hands; drawn at random when omitted")
+    persist: bool = Field(False, description="Settle every hand and store it like POST /hands/")
+    keep_hands: int = Field(0, ge=0, le=SIMULATION_MAX_KEPT_HANDS, description="Keep the first hands for GET /simulations/{id}/hands")
+
+class SimulationStatusSchema(BaseModel):
+    id: uuid.UUID
+    status: Literal["pending", "running", "completed", "failed", "cancelled"]
+    players: int
+    stacks: List[int]
+    policies: List[str]
+    seed: int
+    hands: int
+    persist: bool
+    done: int # Hands played so far, including failed ones
+    stored: int
+    failed: int # Hands that could not be settled
+    progress: float # done / hands
+    workers: int
+    elapsed_seconds: float
+    cpu_seconds: float # CPU time the workers spent playing (and settling) hands
+    hands_per_second: float
+    hands_per_core_second: float # hands / cpu_seconds: throughput of one core
+    errors: List[str] # The first settlement errors
+    error: Optional[str] = None # Why the job failed
+
+class SimulationListSchema(BaseModel):
+    simulations: List[SimulationStatusSchema]
@@ -0,0 +1,181 @@
+"""
+Single-pass tokenizer for action sequences.
+
+Grammar (whitespace between tokens is free)::
+
+    sequence := segment ("/" segment)*
+    segment  := [street] action*
+    street   := ("Flop" | "Turn" | "River") ":" "[" card ("," card)* "]"
+    action   := [actor ":"] ("f" | "x" | "c" | "allin" | ("b" | "r") amount)
+
+Example: ``r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x``.
+Streets must appear in order, each at most once; several segments on the same
+street are concatenated. Board cards come out as card codes
+(app/services/cards.py), validated by the same dictionary lookup that encodes
+them. The string is scanned once, each distinct action word is matched against
+the grammar only once, and parsed sequences are cached by their text, so
+re-processing stored hands is cheap.
+"""
+import re
+from functools import lru_cache
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from app.core.config import ACTION_PARSE_CACHE_SIZE
+from app.services.cards import CARD_CODES
+
+STREETS = ("preflop", "flop", "turn", "river")
+BOARD_SIZES = {"flop": 3, "turn": 1, "river": 1}
+VERBS = ("f", "x", "c", "b", "r", "allin")
+
+# One C-level split cuts a sequence into [preflop actions, street, cards, actions,
+# street, cards, actions, ...]; actions are then split on whitespace and looked up
+# word by word, so only never-seen-before words go through a regex.
+_STREET_SPLIT = re.compile(r"/\s*(Flop|Turn|River)\s*:\s*\[([^\]]*)\]")
+_STREET = re.compile(r"\s*(?P<street>Flop|Turn|River)\s*:\s*\[(?P<cards>[^\]]*)\]")
+_NEXT_STREET = {"preflop": "flop", "flop": "turn", "turn": "river"}
+_ACTION = re.compile(r"(?:(?P<actor>[A-Za-z_][\w.-]*):)?(?P<verb>allin|[fxc]|[br](?P<amount>\d+))")
+
+class ActionSequenceError(ValueError):
+    """Raised for malformed action sequences; `position` is the offending character offset."""
+
+    def __init__(self, message: str, sequence: str, position: int):
+        self.position = position
+        snippet = sequence[position:position + 12]
+        super().__init__(f"{message} at position {position} (near '{snippet}')")
+
+class Action(NamedTuple):
+    verb: str # One of VERBS
+    amount: Optional[int] = None # Bet/raise-to amount for 'b' and 'r'
+    actor: Optional[str] = None # Set when the sequence names the player ("Player1:r200")
+
+    @property
+    def token(self) -> str:
+        """The action in its short form, e.g. 'r200'."""
+        return f"{self.verb}{self.amount}" if self.amount is not None else self.verb
+
+class Street(NamedTuple):
+    name: str # One of STREETS
+    board: Tuple[int, ...] # Codes of the cards dealt at the start of this street (empty preflop)
+    actions: Tuple[Action, ...]
+
+class ParsedSequence(NamedTuple):
+    streets: Tuple[Street, ...] # Preflop first, then only the streets that were dealt
+
+    def street(self, name: str) -> Optional[Street]:
+        for street in self.streets:
+            if street.name == name:
+                return street
+        return None
+
+    @property
+    def board(self) -> Tuple[int, ...]:
+        return tuple(card for street in self.streets for card in street.board)
+
+_WORD_CACHE_SIZE = 4096
+_word_actions: dict = {}
+
+def _word_action(word: str) -> Optional[Action]:
+    """The Action a word spells, or None. Words repeat constantly ('c', 'x', 'r200'), so each is matched once."""
+    action = _word_actions.get(word)
+    if action is None:
+        match = _ACTION.fullmatch(word)
+        if match is None:
+            return None
+        verb, amount = match.group("verb"), match.group("amount")
+        action = Action(verb[0] if amount else verb, int(amount) if amount else None, match.group("actor"))
+        if len(_word_actions) >= _WORD_CACHE_SIZE:
+            _word_actions.clear() # Unusual amounts/actors must not grow this without bound
+        _word_actions[word] = action
+    return action
+
+def _parse_cards(sequence: str, street: str, header, offset: int) -> Tuple[int, ...]:
+    codes = tuple(map(CARD_CODES.get, header.group("cards").replace(" ", "").split(",")))
+    if len(codes) == BOARD_SIZES[street] and None not in codes:
+        return codes
+    position = offset + header.start("cards")
+    for raw in header.group("cards").split(","):
+        if raw.strip() not in CARD_CODES:
+            raise ActionSequenceError(f"Invalid card '{raw.strip()}' on the {street}", sequence, position + len(raw) - len(raw.lstrip()))
+        position += len(raw) + 1
+    raise ActionSequenceError(
+        f"The {street} deals {BOARD_SIZES[street]} card(s), got {len(codes)}", sequence, offset + header.start("cards")
+    )
+
+def _word_position(sequence: str, start: int, word: str) -> int:
+    return re.compile(r"(?<!\S)" + re.escape(word) + r"(?![^\s/])").search(sequence, start).start()
+
+def _raise_positioned_error(sequence: str):
+    """
+    Walks a sequence that failed the fast path segment by segment, tracking
+    offsets, and raises an ActionSequenceError pointing at the first problem.
+    """
+    name = "preflop"
+    offset = 0 # Where the current segment starts in the sequence
+    for index, segment in enumerate(sequence.split("/")):
+        body_start = 0
+        header = _STREET.match(segment) if index else None
+        if header:
+            next_name = header.group("street").lower()
+            if next_name != _NEXT_STREET.get(name):
+                raise ActionSequenceError(
+                    f"{header.group('street')} cannot follow the {name}", sequence, offset + header.start("street")
+                )
+            _parse_cards(sequence, next_name, header, offset)
+            name = next_name
+            body_start = header.end()
+        for word in segment[body_start:].split():
+            if _word_action(word) is None:
+                raise ActionSequenceError(
+                    f"Invalid action '{word}'", sequence, _word_position(sequence, offset + body_start, word)
+                )
+        offset += len(segment) + 1
+    raise ActionSequenceError("Malformed action sequence", sequence, 0)
+
+def _actions(body: str) -> Optional[Tuple[Action, ...]]:
+    """Actions in a street's text, or None if any word is not an action."""
+    words = body.replace("/", " ").split()
+    resolved = list(map(_word_actions.get, words))
+    if None in resolved:
+        resolved = [_word_action(word) for word in words]
+        if None in resolved:
+            return None
+    return tuple(resolved)
+
+@lru_cache(maxsize=ACTION_PARSE_CACHE_SIZE)
+def parse_sequence(sequence: str) -> ParsedSequence:
+    """Parse an action sequence in one pass. Raises ActionSequenceError (a ValueError)."""
+    parts = _STREET_SPLIT.split(sequence)
+    actions = _actions(parts[0])
+    if actions is None:
+        _raise_positioned_error(sequence)
+    streets = [Street("preflop", (), actions)]
+    name = "preflop"
+    for index in range(1, len(parts), 3):
+        next_name = parts[index].lower()
+        board = tuple(map(CARD_CODES.get, parts[index + 1].replace(" ", "").split(",")))
+        actions = _actions(parts[index + 2])
+        if (
+            actions is None
+            or next_name != _NEXT_STREET.get(name)
+            or len(board) != BOARD_SIZES[next_name]
+            or None in board
+        ):
+            _raise_positioned_error(sequence)
+        streets.append(Street(next_name, board, actions))
+        name = next_name
+    return ParsedSequence(tuple(streets))
+
+def parse_sequences(sequences: Iterable[str]) -> List[ParsedSequence]:
+    """Parse many sequences; repeated strings are served from the cache."""
+    return [parse_sequence(sequence) for sequence in sequences]
+
+def parse_action(token: str) -> Action:
+    """Parse a single action token such as 'r200' or 'Player1:c'."""
+    action = _word_action(token.strip())
+    if action is None:
+        raise ActionSequenceError(f"Invalid action '{token}'", token, 0)
+    return action
+
+def parse_cache_stats() -> dict:
+    info = parse_sequence.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
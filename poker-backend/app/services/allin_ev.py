@@ -0,0 +1,79 @@
+"""
+All-in EV of stored hands.
+
+When a hand ends with two players all-in before the river, the result of the
+runout is luck. all_in_ev replays the hand to the last action and values each
+player's share of the contested pot by their equity on that street instead:
+``ev = equity * pot + uncontested chips - invested``. ``luck`` is what the
+stored winnings made of it (winnings - ev).
+
+Preflop, equity is read from the precomputed class matrix (app/services/preflop.py):
+one lookup, averaged over the suits of the two starting-hand classes. Without
+a matrix file, and on later streets, it is computed by compute_equity (every
+runout is enumerated from the flop on).
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from app.models.hand import HandData
+from app.services.cards import parse_cards
+from app.services.equity import compute_equity
+from app.services.hand_replay import build_replay
+from app.services.preflop import class_index, heads_up_equity
+
+STREET_BY_BOARD = {0: "preflop", 3: "flop", 4: "turn", 5: "river"}
+
+@dataclass
+class AllInPlayerEV:
+    equity: float # Share of the contested pot at the all-in
+    invested: int # Chips put in, uncalled chips included
+    ev: float # Expected net result
+    winnings: int # Stored net result
+    luck: float # winnings - ev
+
+@dataclass
+class AllInEV:
+    street: str
+    board: List[str]
+    pot: int # Contested by the two players
+    source: str # 'matrix', 'exact' or 'monte_carlo'
+    players: Dict[str, AllInPlayerEV] = field(default_factory=dict)
+
+def all_in_ev(hand: HandData) -> AllInEV:
+    """
+    EV of the two players all-in at the end of the hand. Raises ValueError when
+    the hand did not end that way or their hole cards are not both known.
+    """
+    steps = build_replay(hand)
+    last = next((step for step in reversed(steps) if step["action"] is not None), None)
+    if last is None or len(last["active"]) != 2 or all(last["stacks"][player] for player in last["active"]):
+        raise ValueError("The hand did not end with two players all-in")
+    players = last["active"]
+    missing = [player for player in players if len(hand.hole_cards.get(player) or []) != 2]
+    if missing:
+        raise ValueError(f"Hole cards of {', '.join(missing)} are not known")
+
+    invested = {player: hand.stack_settings[player] - stack for player, stack in last["stacks"].items()}
+    matched = min(invested[player] for player in players)
+    pot = sum(min(amount, matched) for amount in invested.values())
+    # Chips above the matched amount only the bigger stack could win: its uncalled bet and dead money
+    uncontested = sum(amount - matched for amount in invested.values() if amount > matched)
+    covering = max(players, key=lambda player: invested[player])
+
+    board = last["board"]
+    street = STREET_BY_BOARD[len(board)]
+    first, second = (parse_cards(hand.hole_cards[player]) for player in players)
+    share = heads_up_equity(class_index(first), class_index(second)) if street == "preflop" else None
+    if share is not None:
+        shares, source = {players[0]: share, players[1]: 1 - share}, "matrix"
+    else:
+        result = compute_equity({player: hand.hole_cards[player] for player in players}, board)[-1]
+        shares = {player: result.players[player].equity for player in players}
+        source = "exact" if result.exact else "monte_carlo"
+
+    evs = {}
+    for player in players:
+        ev = shares[player] * pot + (uncontested if player == covering else 0) - invested[player]
+        winnings = hand.winnings.get(player, 0)
+        evs[player] = AllInPlayerEV(shares[player], invested[player], ev, winnings, winnings - ev)
+    return AllInEV(street, board, pot, source, evs)
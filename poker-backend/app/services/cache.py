@@ -0,0 +1,145 @@
+"""
+Key/value caches with size and TTL bounds.
+
+CacheBackend is the interface the read-through repository cache talks to.
+LocalCache is an in-process LRU and the default; RedisCache shares entries
+between workers and hosts when HAND_CACHE_URL points at a Redis server. Tests
+and benchmarks can pass any other CacheBackend implementation in their place.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional
+
+class CacheBackend:
+    """Interface for cache backends. Values are arbitrary picklable Python objects."""
+
+    # True when calls do network I/O; async callers then run them in the threadpool
+    blocking = False
+
+    def get(self, key: str) -> Optional[Any]:
+        """The cached value, or None when absent or expired."""
+        raise NotImplementedError
+
+    def set(self, key: str, value: Any, ttl: float):
+        """Store value for ttl seconds."""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        """Atomically increment an integer counter (created at 0) and return the new value."""
+        raise NotImplementedError
+
+    def counter(self, key: str) -> int:
+        """Current value of a counter maintained by incr (0 if never incremented)."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        """Backend counters such as size and evictions."""
+        return {}
+
+class LocalCache(CacheBackend):
+    """
+    Thread-safe in-process LRU. Entries expire after their TTL and the least
+    recently used entry is evicted once max_size entries are held. Counters are
+    never evicted or expired.
+    """
+
+    def __init__(self, max_size: int, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self._clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict() # key -> (expires_at, value)
+        self._counters: dict = {}
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self._clock():
+                del self._entries[key]
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (self._clock() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = self._counters.get(key, 0) + 1
+            self._counters[key] = value
+            return value
+
+    def counter(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "local",
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache on Redis. Size is bounded by the server's maxmemory policy
+    (use allkeys-lru); TTLs are enforced by Redis. Values are pickled, so only
+    point this at a Redis instance the API trusts.
+    """
+
+    blocking = True
+
+    def __init__(self, url: str, prefix: str = "poker:"):
+        import redis # Optional dependency, only needed when HAND_CACHE_URL is set
+        self._client = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self._client.get(self._prefix + key)
+        return pickle.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._client.set(self._prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), px=max(1, int(ttl * 1000)))
+
+    def delete(self, key: str):
+        self._client.delete(self._prefix + key)
+
+    def incr(self, key: str) -> int:
+        return int(self._client.incr(self._prefix + key))
+
+    def counter(self, key: str) -> int:
+        return int(self._client.get(self._prefix + key) or 0)
+
+    def clear(self):
+        for key in self._client.scan_iter(match=self._prefix + "*"):
+            self._client.delete(key)
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
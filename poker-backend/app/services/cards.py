@@ -0,0 +1,91 @@
+"""
+Card codec: the one compact card representation used inside the service.
+
+A card is an integer 0-51, ``rank * 4 + suit``, with ranks 0 (deuce) to 12
+(ace) and suits in ``SUITS`` order, so "2c" is 0 and "As" is 51. The parser
+emits board cards as codes, settlement and the evaluator work on codes, and
+hole cards are stored as a ``smallint[]`` (see encode_hole_cards). The string
+form ("As") only exists at the edges: the API, pokerkit and exports. Sets of
+cards are 52-bit masks (bit ``code``), so a duplicate check is one AND per card.
+"""
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+RANKS = "23456789TJQKA"
+SUITS = "cdhs"
+
+CARD_NAMES: Tuple[str, ...] = tuple(rank + suit for rank in RANKS for suit in SUITS) # Indexed by code
+CARD_CODES: Dict[str, int] = {name: code for code, name in enumerate(CARD_NAMES)}
+
+# Stored in place of the two codes of a player whose hole cards are unknown
+UNKNOWN_CARD = -1
+
+def card_to_int(card: str) -> int:
+    """'As' -> 51. Raises ValueError for anything that is not a rank followed by a suit."""
+    code = CARD_CODES.get(card) if isinstance(card, str) else None
+    if code is None:
+        raise ValueError(f"Invalid card '{card}'")
+    return code
+
+def int_to_card(value: int) -> str:
+    return CARD_NAMES[value]
+
+def parse_cards(cards: Iterable[str]) -> List[int]:
+    return [card_to_int(card) for card in cards]
+
+def card_names(codes: Iterable[int]) -> List[str]:
+    return [CARD_NAMES[code] for code in codes]
+
+def as_codes(cards: Iterable[Union[str, int]]) -> List[int]:
+    """Codes for cards given as codes or names; raises ValueError for anything else."""
+    codes = []
+    for card in cards:
+        if isinstance(card, int) and 0 <= card < 52:
+            codes.append(card)
+        else:
+            codes.append(card_to_int(card))
+    return codes
+
+def first_duplicate(codes: Sequence[int]) -> Optional[int]:
+    """The first card that appears twice, or None."""
+    seen = 0
+    for code in codes:
+        bit = 1 << code
+        if seen & bit:
+            return code
+        seen |= bit
+    return None
+
+# -- storage -------------------------------------------------------------------
+
+def hole_card_order(players: Iterable[str]) -> List[str]:
+    """
+    Player order of the stored hole card array: sorted by code point, which
+    PostgreSQL reproduces with COLLATE "C" (the JSONB key order of
+    stack_settings is not the order players were sent in).
+    """
+    return sorted(players)
+
+def encode_hole_cards(stack_settings: Mapping[str, int], hole_cards: Mapping[str, Sequence[str]]) -> List[int]:
+    """
+    Two codes per player in hole_card_order, UNKNOWN_CARD for players without
+    known cards: {"B": ["Kc", "Kd"], "A": []} -> [-1, -1, 45, 46].
+    """
+    codes = []
+    for player in hole_card_order(stack_settings):
+        cards = hole_cards.get(player)
+        if cards:
+            codes.extend(CARD_CODES[card] for card in cards)
+        else:
+            codes.extend((UNKNOWN_CARD, UNKNOWN_CARD))
+    return codes
+
+def decode_hole_cards(stack_settings: Mapping[str, int], codes: Optional[Sequence[int]]) -> Dict[str, List[str]]:
+    """The stored array back to {player: [card, card]}, for players whose cards are known."""
+    if not codes:
+        return {}
+    hole_cards = {}
+    for index, player in enumerate(hole_card_order(stack_settings)):
+        first, second = codes[2 * index], codes[2 * index + 1]
+        if first != UNKNOWN_CARD:
+            hole_cards[player] = [CARD_NAMES[first], CARD_NAMES[second]]
+    return hole_cards
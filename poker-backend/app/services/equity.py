@@ -0,0 +1,344 @@
+"""
+All-in equity, by Monte Carlo sampling or exact enumeration.
+
+For every street whose board is known, the missing board cards are either
+sampled uniformly from the rest of the deck in NumPy batches, or every
+possible runout is enumerated; each player's best hand is ranked with
+``evaluator.evaluate_batch``. Work is spread over a process pool. Sampling
+stops when the confidence interval of every player's equity is narrow enough,
+or when the iteration or time budget runs out.
+
+Exact results are memoized per process in an LRU keyed by the spot's
+canonical form: equity does not change when suits are relabelled, when the
+board is reordered or when players swap seats, so all of those map to one entry.
+
+Only players whose hole cards are known take part.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from functools import lru_cache
+from itertools import combinations, permutations
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from statistics import NormalDist
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    EQUITY_WORKERS,
+    EQUITY_BATCH_SIZE,
+    EQUITY_DEFAULT_ITERATIONS,
+    EQUITY_MAX_ITERATIONS,
+    EQUITY_DEFAULT_TIME_MS,
+    EQUITY_MAX_TIME_MS,
+    EQUITY_EXACT_MAX_RUNOUTS,
+    EQUITY_CACHE_SIZE,
+)
+from app.services.cards import first_duplicate
+from app.services.evaluator import evaluate_batch, parse_cards
+
+logger = logging.getLogger(__name__)
+
+# Street name and the number of board cards known on it
+STREET_BOARD_SIZES = (("preflop", 0), ("flop", 3), ("turn", 4), ("river", 5))
+
+# monte_carlo: always sample; exact: always enumerate; auto: enumerate from the flop on
+EquityMode = Literal["auto", "exact", "monte_carlo"]
+
+_SUIT_PERMUTATIONS = list(permutations(range(4)))
+
+@dataclass
+class PlayerEquity:
+    win: float # Probability of winning the whole pot
+    tie: float # Probability of splitting it
+    equity: float # Expected share of the pot (win + fractional ties)
+
+@dataclass
+class StreetEquity:
+    street: str
+    board: List[str]
+    iterations: int # Runouts evaluated (1 when the board is complete)
+    exact: bool # True when no sampling was needed
+    ci_half_width: float # Largest half-width of the players' equity confidence intervals
+    players: Dict[str, PlayerEquity] = field(default_factory=dict)
+
+@dataclass
+class EquityBudget:
+    max_iterations: int = EQUITY_DEFAULT_ITERATIONS
+    max_time_ms: int = EQUITY_DEFAULT_TIME_MS
+    target_ci: float = 0.005 # Stop once every equity is known to +/- this much
+    confidence: float = 0.95
+
+    def clamped(self) -> "EquityBudget":
+        return EquityBudget(
+            max_iterations=max(1, min(self.max_iterations, EQUITY_MAX_ITERATIONS)),
+            max_time_ms=max(1, min(self.max_time_ms, EQUITY_MAX_TIME_MS)),
+            target_ci=self.target_ci,
+            confidence=self.confidence,
+        )
+
+# -- sampling (runs in worker processes) ---------------------------------------
+
+def _showdown_totals(holes: np.ndarray, boards: np.ndarray) -> np.ndarray:
+    """
+    Ranks every player's hand on each of the (n, 5) boards and returns a
+    (4, players) array of sums: wins, ties, pot shares and squared pot shares.
+    """
+    n = len(boards)
+    strengths = np.empty((len(holes), n), dtype=np.uint16)
+    for player, hole in enumerate(holes):
+        strengths[player] = evaluate_batch(np.concatenate([np.broadcast_to(hole, (n, 2)), boards], axis=1))
+    winners = strengths == strengths.max(axis=0)
+    winner_count = winners.sum(axis=0)
+    shares = winners / winner_count
+    return np.stack([
+        (winners & (winner_count == 1)).sum(axis=1),
+        (winners & (winner_count > 1)).sum(axis=1),
+        shares.sum(axis=1),
+        (shares ** 2).sum(axis=1),
+    ]).astype(np.float64)
+
+def simulate_batch(holes: Sequence[Sequence[int]], board: Sequence[int], samples: int, seed) -> np.ndarray:
+    """Samples `samples` runouts of `board` and returns the _showdown_totals sums."""
+    holes = np.asarray(holes, dtype=np.int64)
+    board = np.asarray(board, dtype=np.int64)
+    missing = 5 - len(board)
+    deck = np.setdiff1d(np.arange(52), np.concatenate([holes.ravel(), board]))
+    rng = np.random.default_rng(seed)
+    # Random keys + argpartition draws `missing` distinct cards per row
+    keys = rng.random((samples, len(deck)))
+    picks = np.argpartition(keys, missing, axis=1)[:, :missing] if missing < len(deck) else np.argsort(keys, axis=1)
+    boards = np.concatenate([np.broadcast_to(board, (samples, len(board))), deck[picks]], axis=1)
+    return _showdown_totals(holes, boards)
+
+@lru_cache(maxsize=None)
+def _combination_indices(n: int, k: int) -> np.ndarray:
+    """All k-subsets of range(n) as a (comb(n, k), k) array, built once per process."""
+    if k == 0:
+        return np.zeros((1, 0), dtype=np.int64) # The one empty subset
+    return np.array(list(combinations(range(n), k)), dtype=np.int64)
+
+def enumerate_runouts(holes: Sequence[Sequence[int]], board: Sequence[int], first_cards: Sequence[int]) -> np.ndarray:
+    """
+    Evaluates every runout of `board` whose lowest new card is deck[i] for i in
+    first_cards, returning the _showdown_totals sums. Splitting first_cards
+    across workers partitions the full enumeration.
+    """
+    holes = np.asarray(holes, dtype=np.int64)
+    board = np.asarray(board, dtype=np.int64)
+    missing = 5 - len(board)
+    deck = np.setdiff1d(np.arange(52), np.concatenate([holes.ravel(), board]))
+    totals = np.zeros((4, len(holes)))
+    for first in first_cards:
+        tail = deck[first + 1:]
+        rest = tail[_combination_indices(len(tail), missing - 1)]
+        boards = np.concatenate([
+            np.broadcast_to(board, (len(rest), len(board))),
+            np.full((len(rest), 1), deck[first]),
+            rest,
+        ], axis=1)
+        totals += _showdown_totals(holes, boards)
+    return totals
+
+# -- process pool --------------------------------------------------------------
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def worker_count() -> int:
+    return EQUITY_WORKERS if EQUITY_WORKERS > 0 else (os.cpu_count() or 1)
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """Shared process pool, created on first use. None when configured for a single process."""
+    global _executor
+    if worker_count() <= 1:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a process that runs server threads is not safe
+            _executor = ProcessPoolExecutor(max_workers=worker_count(), mp_context=get_context("spawn"))
+        return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+def _run_jobs(function, jobs: List[tuple]) -> np.ndarray:
+    """Runs function(*job) for every job, on the pool when there is one, and sums the results."""
+    executor = get_executor()
+    if executor:
+        try:
+            futures = [executor.submit(function, *job) for job in jobs]
+            return sum(future.result() for future in futures)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool next time
+            logger.warning("Equity worker pool broke, finishing this request in-process")
+            shutdown_executor()
+    return sum(function(*job) for job in jobs)
+
+# -- estimation ----------------------------------------------------------------
+
+def _validate(hole_cards: Dict[str, Sequence[str]], board: Sequence[str]):
+    players = {player: cards for player, cards in hole_cards.items() if cards}
+    if len(players) < 2:
+        raise ValueError("Equity needs hole cards for at least two players")
+    for player, cards in players.items():
+        if len(cards) != 2:
+            raise ValueError(f"{player} must have exactly two hole cards")
+    if len(board) > 5 or len(board) in (1, 2):
+        raise ValueError(f"A board has 0, 3, 4 or 5 cards, got {len(board)}")
+    known = parse_cards([card for cards in players.values() for card in cards] + list(board)) # Raises ValueError for malformed cards
+    if first_duplicate(known) is not None:
+        raise ValueError("The same card appears more than once")
+    return players
+
+def canonical_spot(holes: Sequence[Sequence[int]], board: Sequence[int]) -> Tuple[tuple, tuple]:
+    """
+    Suit-isomorphic canonical form of a spot: the smallest (board, holes) key
+    over all 24 suit relabellings, with the board and the holes sorted. Returns
+    (key, suit permutation that produced it).
+    """
+    best = None
+    for permutation in _SUIT_PERMUTATIONS:
+        def relabel(card):
+            return (card & ~3) | permutation[card & 3]
+        key = (
+            tuple(sorted(relabel(card) for card in board)),
+            tuple(sorted(tuple(sorted(relabel(card) for card in hole)) for hole in holes)),
+        )
+        if best is None or key < best[0]:
+            best = (key, permutation)
+    return best
+
+@lru_cache(maxsize=EQUITY_CACHE_SIZE)
+def _exact_totals(board: tuple, holes: tuple) -> Tuple[int, tuple]:
+    """Enumerates a canonical spot; memoized, so the arguments must be canonical_spot keys."""
+    deck_size = 52 - len(board) - 2 * len(holes)
+    missing = 5 - len(board)
+    runouts = math.comb(deck_size, missing)
+    if runouts > EQUITY_EXACT_MAX_RUNOUTS:
+        raise ValueError(f"Exact equity needs {runouts} runouts, more than the limit of {EQUITY_EXACT_MAX_RUNOUTS}")
+    chunks = worker_count() if get_executor() else 1
+    first_cards = list(range(deck_size - missing + 1))
+    jobs = [(holes, board, first_cards[i::chunks]) for i in range(chunks) if first_cards[i::chunks]]
+    totals = _run_jobs(enumerate_runouts, jobs)
+    return runouts, tuple(map(tuple, totals))
+
+def _exact_equity(holes: List[List[int]], board: List[int]) -> Tuple[int, np.ndarray]:
+    """Exact totals for the players in `holes` order, served from the canonical-spot cache."""
+    (canonical_board, canonical_holes), permutation = canonical_spot(holes, board)
+    runouts, totals = _exact_totals(canonical_board, canonical_holes)
+    totals = np.asarray(totals)
+    # Map each player to their seat in the canonical key
+    order = [
+        canonical_holes.index(tuple(sorted((card & ~3) | permutation[card & 3] for card in hole)))
+        for hole in holes
+    ]
+    return runouts, totals[:, order]
+
+def exact_cache_stats() -> dict:
+    info = _exact_totals.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_ratio": info.hits / lookups if lookups else 0.0,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
+
+def clear_exact_cache():
+    _exact_totals.cache_clear()
+
+def _street_equity(
+    street: str,
+    players: Dict[str, Sequence[str]],
+    board: Sequence[str],
+    budget: EquityBudget,
+    deadline: float,
+    mode: EquityMode = "auto",
+) -> StreetEquity:
+    names = list(players)
+    holes = [parse_cards(players[name]) for name in names]
+    board_ints = parse_cards(board)
+
+    if len(board) == 5:
+        totals = _showdown_totals(np.asarray(holes), np.asarray([board_ints]))
+        return _to_street_equity(street, names, board, totals, 1, exact=True, ci_half_width=0.0)
+
+    if mode == "exact" or (mode == "auto" and len(board) >= 3):
+        runouts, totals = _exact_equity(holes, board_ints)
+        return _to_street_equity(street, names, board, totals, runouts, exact=True, ci_half_width=0.0)
+
+    z = NormalDist().inv_cdf((1 + budget.confidence) / 2)
+    workers = worker_count() if get_executor() else 1
+    seeds = np.random.SeedSequence()
+    totals = np.zeros((4, len(names)))
+    iterations = 0
+    half_width = math.inf
+    while True: # Always run at least one round, even on an exhausted budget
+        round_size = min(EQUITY_BATCH_SIZE * workers, budget.max_iterations - iterations)
+        sizes = [round_size // workers + (i < round_size % workers) for i in range(workers)]
+        sizes = [size for size in sizes if size]
+        child_seeds = seeds.spawn(len(sizes))
+        totals += _run_jobs(simulate_batch, [(holes, board_ints, size, seed) for size, seed in zip(sizes, child_seeds)])
+        iterations += round_size
+
+        # Normal-approximation CI of each player's mean pot share
+        mean = totals[2] / iterations
+        variance = np.maximum(totals[3] / iterations - mean ** 2, 0)
+        half_width = float(z * np.sqrt(variance / iterations).max())
+        if half_width <= budget.target_ci or iterations >= budget.max_iterations or time.monotonic() >= deadline:
+            break
+
+    return _to_street_equity(street, names, board, totals, iterations, exact=False, ci_half_width=half_width)
+
+def _to_street_equity(street, names, board, totals, iterations, exact, ci_half_width) -> StreetEquity:
+    return StreetEquity(
+        street=street,
+        board=list(board),
+        iterations=iterations,
+        exact=exact,
+        ci_half_width=ci_half_width,
+        players={
+            name: PlayerEquity(
+                win=float(totals[0][i] / iterations),
+                tie=float(totals[1][i] / iterations),
+                equity=float(totals[2][i] / iterations),
+            )
+            for i, name in enumerate(names)
+        },
+    )
+
+def compute_equity(
+    hole_cards: Dict[str, Sequence[str]],
+    board: Sequence[str],
+    budget: Optional[EquityBudget] = None,
+    mode: EquityMode = "auto",
+) -> List[StreetEquity]:
+    """
+    Equity of every player with known hole cards at each street the board
+    reaches (preflop, then flop/turn/river as far as `board` goes). The time
+    budget is shared by the sampled streets; enumerated streets are bounded by
+    EQUITY_EXACT_MAX_RUNOUTS instead. Raises ValueError for invalid input.
+    """
+    budget = (budget or EquityBudget()).clamped()
+    players = _validate(hole_cards, board)
+    streets = [(street, size) for street, size in STREET_BOARD_SIZES if size <= len(board)]
+    start = time.monotonic()
+    results = []
+    for position, (street, size) in enumerate(streets):
+        # Split what is left of the time budget evenly over the remaining streets
+        remaining = budget.max_time_ms / 1000 - (time.monotonic() - start)
+        deadline = time.monotonic() + max(remaining, 0) / (len(streets) - position)
+        results.append(_street_equity(street, players, board[:size], budget, deadline, mode))
+    return results
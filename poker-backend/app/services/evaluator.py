@@ -0,0 +1,347 @@
+"""
+Lookup-table hand evaluator for 5 to 7 cards.
+
+Cards are the integer codes of app/services/cards.py: ``rank * 4 + suit`` with
+ranks 0 (deuce) to 12 (ace) and suits in ``SUITS`` order. ``evaluate`` returns
+a dense strength from 1 (worst high card) to 7462 (royal flush); higher always
+wins and equal values tie.
+
+Two tables give every answer with a single lookup:
+
+- ``flush``: indexed by the 13-bit rank mask of a suit holding 5+ cards.
+  With at most 7 cards a flush can never be beaten by a full house or quads,
+  so this lookup alone is final.
+- ``non-flush``: indexed by a minimal perfect hash of the rank multiset
+  (how many cards of each rank), one block per card count.
+
+The tables are derived once, written to ``CACHE_DIR`` and memory-mapped on
+later loads, so every worker process shares the same pages. ``evaluate_batch``
+ranks whole NumPy arrays of hands against the same tables.
+"""
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from itertools import combinations
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import CACHE_DIR
+from app.services.cards import parse_cards
+
+logger = logging.getLogger(__name__)
+
+HAND_CATEGORIES = (
+    "high_card",
+    "pair",
+    "two_pair",
+    "three_of_a_kind",
+    "straight",
+    "flush",
+    "full_house",
+    "four_of_a_kind",
+    "straight_flush",
+)
+
+TABLE_FILE = "hand_ranks.v1.bin"
+_MAGIC = b"PKRANK01"
+_HEADER = struct.Struct("<8sII") # magic, non-flush entries, flush entries
+
+MIN_CARDS = 5
+MAX_CARDS = 7
+FLUSH_ENTRIES = 1 << 13
+
+# ways[n][k]: number of ways to give n ranks between 0 and 4 cards each, k cards in total
+_ways = [[0] * (MAX_CARDS + 1) for _ in range(14)]
+_ways[0][0] = 1
+for _n in range(1, 14):
+    for _k in range(MAX_CARDS + 1):
+        _ways[_n][_k] = sum(_ways[_n - 1][_k - c] for c in range(min(4, _k) + 1))
+
+# _hash_step[i][count][remaining]: perfect-hash contribution of holding `count`
+# cards of rank i while `remaining` cards are still to be placed on ranks i..12
+_hash_step = [
+    [
+        [sum(_ways[12 - i][rem - c] for c in range(count) if rem - c >= 0) for rem in range(MAX_CARDS + 1)]
+        for count in range(5)
+    ]
+    for i in range(13)
+]
+
+# Where the block of k-card multisets starts in the non-flush table
+_block_offset: Dict[int, int] = {}
+_offset = 0
+for _k in range(MIN_CARDS, MAX_CARDS + 1):
+    _block_offset[_k] = _offset
+    _offset += _ways[13][_k]
+NON_FLUSH_ENTRIES = _offset
+
+_STRAIGHTS = [0b1000000001111] + [0b11111 << low for low in range(9)] # wheel, then 6-high up to ace-high
+_CATEGORY_FLOOR: List[int] = [] # Lowest strength in each category, filled when tables are loaded
+
+def _multiset_hash(counts: Sequence[int], total: int) -> int:
+    index = 0
+    remaining = total
+    for rank, count in enumerate(counts):
+        if count:
+            index += _hash_step[rank][count][remaining]
+            remaining -= count
+    return index
+
+# -- table construction --------------------------------------------------------
+
+def _straight_high(mask: int) -> int:
+    """Index of the straight in _STRAIGHTS (0 = wheel) or -1."""
+    for high in range(len(_STRAIGHTS) - 1, -1, -1):
+        if mask & _STRAIGHTS[high] == _STRAIGHTS[high]:
+            return high
+    return -1
+
+def _five_card_key(counts: Sequence[int], flush: bool) -> Tuple[int, ...]:
+    """Orderable (category, tie-breakers...) key for a five-card hand."""
+    mask = sum(1 << rank for rank, count in enumerate(counts) if count)
+    straight = _straight_high(mask) if max(counts) == 1 else -1
+    if flush:
+        if straight >= 0:
+            return (8, straight)
+        return (5,) + tuple(sorted((r for r, c in enumerate(counts) if c), reverse=True))
+    if straight >= 0:
+        return (4, straight)
+    # Group by (count, rank), largest groups first
+    groups = sorted(((c, r) for r, c in enumerate(counts) if c), reverse=True)
+    shape = tuple(c for c, _ in groups)
+    category = {
+        (4, 1): 7,
+        (3, 2): 6,
+        (3, 1, 1): 3,
+        (2, 2, 1): 2,
+        (2, 1, 1, 1): 1,
+        (1, 1, 1, 1, 1): 0,
+    }[shape]
+    return (category,) + tuple(r for _, r in groups)
+
+def _multisets(total: int, ranks: int = 13):
+    """Yields every rank-count tuple (0-4 per rank) holding `total` cards."""
+    if ranks == 0:
+        if total == 0:
+            yield ()
+        return
+    for count in range(min(4, total) + 1):
+        for rest in _multisets(total - count, ranks - 1):
+            yield (count,) + rest
+
+def build_tables() -> Tuple[List[int], List[int]]:
+    """Derives (non_flush, flush) strength tables from scratch (about a second)."""
+    five_flush = {}
+    for ranks in combinations(range(13), 5):
+        counts = [0] * 13
+        for rank in ranks:
+            counts[rank] = 1
+        five_flush[sum(1 << r for r in ranks)] = _five_card_key(counts, True)
+    five_plain = {counts: _five_card_key(counts, False) for counts in _multisets(5)}
+
+    # Dense strengths: 1 for the worst five-card hand up to 7462
+    keys = sorted(set(five_flush.values()) | set(five_plain.values()))
+    strength = {key: i + 1 for i, key in enumerate(keys)}
+
+    flush = [0] * FLUSH_ENTRIES
+    for mask in sorted(range(FLUSH_ENTRIES), key=lambda m: bin(m).count("1")):
+        bits = bin(mask).count("1")
+        if bits == 5:
+            flush[mask] = strength[five_flush[mask]]
+        elif bits > 5:
+            # Best flush of 6-7 suited cards: drop the card that hurts least
+            flush[mask] = max(flush[mask & ~(1 << r)] for r in range(13) if mask >> r & 1)
+
+    non_flush = [0] * NON_FLUSH_ENTRIES
+    previous: Dict[Tuple[int, ...], int] = {}
+    for total in range(MIN_CARDS, MAX_CARDS + 1):
+        current = {}
+        for counts in _multisets(total):
+            if total == 5:
+                value = strength[five_plain[counts]]
+            else:
+                value = max(
+                    previous[counts[:r] + (counts[r] - 1,) + counts[r + 1:]]
+                    for r in range(13) if counts[r]
+                )
+            current[counts] = value
+            non_flush[_block_offset[total] + _multiset_hash(counts, total)] = value
+        previous = current
+    return non_flush, flush
+
+# -- disk cache ----------------------------------------------------------------
+
+class _Tables:
+    def __init__(self, buffer, non_flush, flush, source: str):
+        self.buffer = buffer # Keeps the mmap (or bytes) alive
+        self.non_flush = non_flush
+        self.flush = flush
+        self.source = source # 'mmap' or 'built'
+        # NumPy views for evaluate_batch (no copy when backed by the mmap)
+        self.non_flush_array = np.asarray(non_flush, dtype=np.uint16)
+        self.flush_array = np.asarray(flush, dtype=np.uint16)
+
+_tables: Optional[_Tables] = None
+_tables_lock = threading.Lock()
+
+def table_path(cache_dir: str = CACHE_DIR) -> str:
+    return os.path.join(cache_dir, TABLE_FILE)
+
+def _write_table_file(path: str, non_flush: List[int], flush: List[int]):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    payload = _HEADER.pack(_MAGIC, len(non_flush), len(flush))
+    payload += struct.pack(f"<{len(non_flush)}H", *non_flush)
+    payload += struct.pack(f"<{len(flush)}H", *flush)
+    # Write then rename, so concurrently starting workers never map a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".hand_ranks.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+def _map_table_file(path: str) -> Optional[_Tables]:
+    """Maps the cached table file, or returns None if it is missing or does not match."""
+    expected_size = _HEADER.size + 2 * (NON_FLUSH_ENTRIES + FLUSH_ENTRIES)
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != expected_size:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    if _HEADER.unpack_from(mapped) != (_MAGIC, NON_FLUSH_ENTRIES, FLUSH_ENTRIES):
+        mapped.close()
+        return None
+    if struct.pack("<H", 1) != b"\x01\x00":
+        mapped.close() # The file is little-endian; fall back to building on big-endian hosts
+        return None
+    view = memoryview(mapped)[_HEADER.size:].cast("H")
+    return _Tables(mapped, view[:NON_FLUSH_ENTRIES], view[NON_FLUSH_ENTRIES:], "mmap")
+
+def load_tables(cache_dir: Optional[str] = None) -> str:
+    """
+    Makes the lookup tables available, building and caching them on first use.
+    Returns 'mmap' when the cached file was mapped, 'built' when it was derived.
+    """
+    global _tables
+    with _tables_lock:
+        if _tables is not None and cache_dir is None:
+            return _tables.source
+        path = table_path(cache_dir or CACHE_DIR)
+        tables = _map_table_file(path)
+        if tables is None:
+            non_flush, flush = build_tables()
+            try:
+                _write_table_file(path, non_flush, flush)
+                tables = _map_table_file(path)
+            except OSError as e:
+                logger.warning("Could not cache hand rank table at %s: %s", path, e)
+            if tables is None:
+                tables = _Tables(None, non_flush, flush, "built")
+        if not _CATEGORY_FLOOR:
+            _CATEGORY_FLOOR[:] = _category_floors(tables.non_flush, tables.flush)
+        _tables = tables
+        return tables.source
+
+def _category_floors(non_flush, flush) -> List[int]:
+    """Recovers the lowest strength of each category from the tables themselves."""
+    def five(cards):
+        return evaluate_with(non_flush, flush, parse_cards(cards))
+    return [
+        five(["2c", "3d", "4h", "5s", "7c"]), # 7-high
+        five(["2c", "2d", "3h", "4s", "5c"]),
+        five(["2c", "2d", "3h", "3s", "4c"]),
+        five(["2c", "2d", "2h", "3s", "4c"]),
+        five(["Ac", "2d", "3h", "4s", "5c"]), # wheel
+        five(["2c", "3c", "4c", "5c", "7c"]),
+        five(["2c", "2d", "2h", "3s", "3c"]),
+        five(["2c", "2d", "2h", "2s", "3c"]),
+        five(["Ac", "2c", "3c", "4c", "5c"]), # steel wheel
+    ]
+
+def _get_tables() -> _Tables:
+    if _tables is None:
+        load_tables()
+    return _tables
+
+# -- evaluation ----------------------------------------------------------------
+
+def evaluate_with(non_flush, flush, cards: Sequence[int]) -> int:
+    counts = [0] * 13
+    suits = [0, 0, 0, 0]
+    suit_counts = [0, 0, 0, 0]
+    for card in cards:
+        rank = card >> 2
+        suit = card & 3
+        counts[rank] += 1
+        suits[suit] |= 1 << rank
+        suit_counts[suit] += 1
+    for suit in range(4):
+        if suit_counts[suit] >= 5:
+            return flush[suits[suit]]
+    total = len(cards)
+    return non_flush[_block_offset[total] + _multiset_hash(counts, total)]
+
+def evaluate(cards: Sequence[int]) -> int:
+    """Strength of the best five-card hand in 5-7 integer cards (higher is better)."""
+    if not MIN_CARDS <= len(cards) <= MAX_CARDS:
+        raise ValueError(f"Can only evaluate {MIN_CARDS} to {MAX_CARDS} cards, got {len(cards)}")
+    tables = _get_tables()
+    return evaluate_with(tables.non_flush, tables.flush, cards)
+
+def evaluate_cards(cards: Iterable[str]) -> int:
+    """Same as evaluate, for cards written like 'As'."""
+    return evaluate(parse_cards(cards))
+
+def hand_category(strength: int) -> str:
+    """Category name ('flush', 'two_pair', ...) of a strength returned by evaluate."""
+    _get_tables()
+    category = 0
+    for index, floor in enumerate(_CATEGORY_FLOOR):
+        if strength >= floor:
+            category = index
+    return HAND_CATEGORIES[category]
+
+_HASH_STEP_ARRAY = np.array(_hash_step, dtype=np.int64)
+_RANK_BITS = (1 << np.arange(13, dtype=np.int64))
+
+def evaluate_batch(cards: np.ndarray) -> np.ndarray:
+    """
+    Vectorized evaluate: ``cards`` is an (n, k) integer array of n hands with k
+    cards each (5 <= k <= 7). Returns an (n,) array of strengths.
+    """
+    cards = np.asarray(cards)
+    if cards.ndim != 2 or not MIN_CARDS <= cards.shape[1] <= MAX_CARDS:
+        raise ValueError(f"Expected an (n, {MIN_CARDS}-{MAX_CARDS}) card array, got shape {cards.shape}")
+    tables = _get_tables()
+    total = cards.shape[1]
+    ranks = cards >> 2
+    suits = cards & 3
+
+    rank_hits = ranks[:, :, None] == np.arange(13)
+    counts = rank_hits.sum(axis=1)
+    suit_hits = suits[:, :, None] == np.arange(4)
+    suit_counts = suit_hits.sum(axis=1)
+    flush_suit = suit_counts.argmax(axis=1)
+    is_flush = suit_counts[np.arange(len(cards)), flush_suit] >= 5
+    # Rank mask of the cards in the flush suit (only meaningful where is_flush)
+    in_flush_suit = suits == flush_suit[:, None]
+    flush_mask = np.where(in_flush_suit, _RANK_BITS[ranks], 0).sum(axis=1)
+
+    index = np.full(len(cards), _block_offset[total], dtype=np.int64)
+    remaining = np.full(len(cards), total, dtype=np.int64)
+    for rank in range(13):
+        count = counts[:, rank]
+        index += _HASH_STEP_ARRAY[rank, count, remaining]
+        remaining -= count
+
+    return np.where(is_flush, tables.flush_array[flush_mask], tables.non_flush_array[index])
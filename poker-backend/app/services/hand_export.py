@@ -0,0 +1,91 @@
+import csv
+import io
+import json
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator
+
+from app.models.hand import HandData
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+CSV_COLUMNS = ["id", "created_at", "stack_settings", "player_roles", "hole_cards", "action_sequence", "winnings"]
+
+def _hand_to_dict(hand: HandData) -> dict:
+    return {
+        "id": str(hand.id),
+        "created_at": hand.created_at.isoformat(),
+        "stack_settings": hand.stack_settings,
+        "player_roles": hand.player_roles,
+        "hole_cards": hand.hole_cards,
+        "action_sequence": hand.action_sequence,
+        "winnings": hand.winnings,
+    }
+
+def iter_ndjson(hands: Iterable[HandData], rows_per_chunk: int = 500) -> Iterator[bytes]:
+    """Serialize hands as newline-delimited JSON, yielding one bytes chunk per rows_per_chunk hands."""
+    buffer = []
+    for hand in hands:
+        buffer.append(json.dumps(_hand_to_dict(hand), separators=(",", ":")))
+        if len(buffer) >= rows_per_chunk:
+            yield ("\n".join(buffer) + "\n").encode()
+            buffer = []
+    if buffer:
+        yield ("\n".join(buffer) + "\n").encode()
+
+def iter_csv(hands: Iterable[HandData], rows_per_chunk: int = 500) -> Iterator[bytes]:
+    """Serialize hands as CSV (structured fields JSON-encoded), starting with a header row."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    for hand in hands:
+        data = _hand_to_dict(hand)
+        writer.writerow([
+            data["id"],
+            data["created_at"],
+            json.dumps(data["stack_settings"]),
+            json.dumps(data["player_roles"]),
+            json.dumps(data["hole_cards"]),
+            data["action_sequence"],
+            json.dumps(data["winnings"]),
+        ])
+        rows += 1
+        if rows >= rows_per_chunk:
+            yield out.getvalue().encode()
+            out.seek(0)
+            out.truncate()
+            rows = 0
+    if out.tell():
+        yield out.getvalue().encode()
+
+def iter_export(hands: Iterable[HandData], export_format: str) -> Iterator[bytes]:
+    """Dispatch to the serializer for export_format ('ndjson' or 'csv')."""
+    if export_format == "csv":
+        return iter_csv(hands)
+    return iter_ndjson(hands)
+
+async def aiter_export(hands: AsyncIterable[HandData], export_format: str, rows_per_chunk: int = 500) -> AsyncIterator[bytes]:
+    """
+    iter_export for an async stream of hands: rows_per_chunk hands are
+    gathered at a time and serialized by the same writers, so the output is
+    byte-for-byte identical.
+    """
+    serializer = iter_csv if export_format == "csv" else iter_ndjson
+    buffer = []
+    first = True
+    async for hand in hands:
+        buffer.append(hand)
+        if len(buffer) >= rows_per_chunk:
+            yield _serialize_chunk(serializer, buffer, first)
+            buffer = []
+            first = False
+    if buffer or first:
+        yield _serialize_chunk(serializer, buffer, first)
+
+def _serialize_chunk(serializer, hands: list, first: bool) -> bytes:
+    chunk = b"".join(serializer(hands, rows_per_chunk=len(hands) + 1))
+    if serializer is iter_csv and not first:
+        chunk = chunk.split(b"\r\n", 1)[1] # Header only once, at the top of the file
+    return chunk
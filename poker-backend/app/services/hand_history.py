@@ -0,0 +1,213 @@
+"""
+Converts PokerStars No-Limit Hold'em hand histories to the API hand format.
+
+A history file is a sequence of hands, each starting with a "PokerStars Hand
+#<number>:" line (HAND_START). parse_hand_history turns one hand's text into
+the fields of a HandCreateSchema: players in seat order with their starting
+stacks, the button as dealer, every hole card that was dealt to the hero or
+shown, and the betting as an action sequence.
+
+Stored hands are settled with the configured blinds (SMALL_BLIND/BIG_BLIND),
+so amounts are rescaled to make the hand's big blind BIG_BLIND and rounded to
+whole chips; all-in bets and raises become "allin" so rounding cannot leave a
+stack a chip short. Hands the format cannot express are rejected with
+HandHistoryError: antes, straddles, dead blinds, run-it-twice boards, and
+blinds in another ratio than SMALL_BLIND:BIG_BLIND.
+"""
+import re
+from datetime import datetime, timezone
+from decimal import ROUND_HALF_EVEN, Decimal, InvalidOperation
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from app.core.config import BIG_BLIND, SMALL_BLIND
+from app.services.settlement import seat_order
+
+SITE = "pokerstars"
+
+# Where each hand starts in a file; the UTF-8 byte order mark may precede the first one
+HAND_START = re.compile(rb"^(?:\xef\xbb\xbf)?PokerStars (?:Zoom )?(?:Hand|Game) #", re.MULTILINE)
+
+# PokerStars writes times in ET, sometimes after the player's local time
+EASTERN = ZoneInfo("America/New_York")
+
+_HEADER = re.compile(r"PokerStars (?:Zoom )?(?:Hand|Game) #(?P<number>\d+):\s*(?P<game>.*)")
+_PLAYED_AT = re.compile(r"(\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{2}:\d{2}) ET")
+_BUTTON = re.compile(r"Seat #(\d+) is the button")
+_SEAT = re.compile(r"Seat (?P<seat>\d+): (?P<name>.+?) \((?P<stack>\S+) in chips[^)]*\)(?P<note>.*)")
+_SECTION = re.compile(r"\*\*\* (?P<name>[A-Z ]+?) \*\*\*(?P<rest>.*)")
+_CARDS = re.compile(r"\[([^\]]*)\]")
+_DEALT = re.compile(r"Dealt to (?P<name>.+?) \[(?P<cards>[^\]]+)\]$")
+_SHOWN = re.compile(r"(?:shows|showed|mucked) \[(?P<cards>[^\]]+)\]")
+_SUMMARY_SEAT = re.compile(r"Seat (?P<seat>\d+): ")
+_POST = re.compile(r"posts (?P<blind>small blind|big blind) (?P<amount>\S+)$")
+_BET = re.compile(r"(?P<verb>folds|checks|calls|bets|raises)(?: (?P<amount>\S+))?(?: to (?P<to>\S+))?(?P<allin> and is all-in)?")
+
+_STREETS = {"FLOP": "Flop", "TURN": "Turn", "RIVER": "River"}
+_VERBS = {"folds": "f", "checks": "x", "calls": "c", "bets": "b", "raises": "r"}
+
+class HandHistoryError(ValueError):
+    """Raised for hands that are malformed or use features the hand format cannot express."""
+
+class HistoryHand(NamedTuple):
+    site: str
+    number: str # The site's hand number
+    played_at: Optional[datetime] # Naive UTC, None when the header has no ET time
+    stack_settings: Dict[str, int]
+    player_roles: Dict[str, str]
+    hole_cards: Dict[str, List[str]]
+    action_sequence: str
+
+    @property
+    def fields(self) -> dict:
+        """The hand as HandCreateSchema fields."""
+        return {
+            "stack_settings": self.stack_settings,
+            "player_roles": self.player_roles,
+            "hole_cards": self.hole_cards,
+            "action_sequence": self.action_sequence,
+        }
+
+def _money(text: Optional[str]) -> Decimal:
+    if text is None:
+        raise HandHistoryError("Missing amount")
+    try:
+        return Decimal(text.lstrip("$€£").replace(",", ""))
+    except InvalidOperation:
+        raise HandHistoryError(f"Invalid amount '{text}'") from None
+
+def _played_at(header: str) -> Optional[datetime]:
+    match = _PLAYED_AT.search(header)
+    if match is None:
+        return None
+    local = datetime.strptime(match.group(1), "%Y/%m/%d %H:%M:%S").replace(tzinfo=EASTERN)
+    return local.astimezone(timezone.utc).replace(tzinfo=None)
+
+def _actor(line: str, names: List[str]) -> Tuple[Optional[str], str]:
+    """Split 'Name: rest' for a seated player; names are tried longest first, since they may contain ': '."""
+    for name in names:
+        if line.startswith(name) and line.startswith(": ", len(name)):
+            return name, line[len(name) + 2:]
+    return None, line
+
+def parse_hand_history(text: str) -> HistoryHand:
+    """Parse one PokerStars hand. Raises HandHistoryError (a ValueError)."""
+    lines = [line.strip() for line in text.lstrip("\ufeff").strip().splitlines()]
+    header = _HEADER.match(lines[0]) if lines else None
+    if header is None:
+        raise HandHistoryError("Not a PokerStars hand history")
+    if "Hold'em No Limit" not in header.group("game"):
+        raise HandHistoryError(f"Unsupported game: {header.group('game').split(' - ')[0]}")
+
+    button = None
+    seats: Dict[int, str] = {}
+    stacks: Dict[str, Decimal] = {}
+    blinds: Dict[str, Tuple[str, Decimal]] = {}
+    hole_cards: Dict[str, List[str]] = {}
+    streets: List[Tuple[str, List[str], List[tuple]]] = [("preflop", [], [])] # (name, board, (verb, amount, all-in))
+    section = "seats"
+    names: List[str] = []
+
+    for line in lines[1:]:
+        if not line:
+            continue
+        marker = _SECTION.match(line)
+        if marker:
+            name = marker.group("name")
+            if name in _STREETS:
+                cards = _CARDS.findall(marker.group("rest"))
+                streets.append((_STREETS[name], cards[-1].split() if cards else [], []))
+                section = "betting"
+            elif name == "HOLE CARDS":
+                section = "betting"
+            elif name in ("SHOW DOWN", "SUMMARY"):
+                section = name.lower()
+            else:
+                raise HandHistoryError(f"Unsupported section '{name.title()}' (run-it-twice boards cannot be stored)")
+            continue
+
+        if section == "seats":
+            match = _BUTTON.search(line)
+            if match and button is None:
+                button = int(match.group(1))
+                continue
+            match = _SEAT.fullmatch(line)
+            if match:
+                if "sitting out" in match.group("note") or "out of hand" in match.group("note"):
+                    continue
+                seats[int(match.group("seat"))] = match.group("name")
+                stacks[match.group("name")] = _money(match.group("stack"))
+                names = sorted(stacks, key=len, reverse=True)
+                continue
+        elif section == "summary":
+            match = _SUMMARY_SEAT.match(line)
+            shown = _SHOWN.search(line)
+            if match and shown and int(match.group("seat")) in seats:
+                hole_cards[seats[int(match.group("seat"))]] = shown.group("cards").split()
+            continue
+
+        match = _DEALT.match(line)
+        if match:
+            if match.group("name") in stacks:
+                hole_cards[match.group("name")] = match.group("cards").split()
+            continue
+        player, rest = _actor(line, names)
+        if player is None:
+            continue # Table chat, joins, disconnections, returned bets, collections
+        if rest.startswith("posts "):
+            post = _POST.match(rest)
+            if post is None or post.group("blind") in blinds or section != "seats":
+                raise HandHistoryError(f"Unsupported post by {player}: '{rest}' (only one small and one big blind)")
+            blinds[post.group("blind")] = (player, _money(post.group("amount")))
+            continue
+        shown = _SHOWN.match(rest)
+        bet = _BET.match(rest) if section == "betting" else None
+        if shown:
+            hole_cards[player] = shown.group("cards").split()
+        elif bet:
+            verb = _VERBS[bet.group("verb")]
+            amount = bet.group("to") or bet.group("amount")
+            if verb in ("b", "r"):
+                if amount is None:
+                    raise HandHistoryError(f"{bet.group('verb').capitalize()} without an amount by {player}: '{rest}'")
+                streets[-1][2].append((verb, _money(amount), bool(bet.group("allin"))))
+            else:
+                streets[-1][2].append((verb, None, False))
+
+    if "small blind" not in blinds or "big blind" not in blinds:
+        raise HandHistoryError("Hands without both a small and a big blind are not supported")
+    (small_blind_player, small_blind), (big_blind_player, big_blind) = blinds["small blind"], blinds["big blind"]
+    if small_blind * BIG_BLIND != big_blind * SMALL_BLIND:
+        raise HandHistoryError(f"Blinds {small_blind}/{big_blind} are not in the {SMALL_BLIND}:{BIG_BLIND} ratio of stored hands")
+    scale = Decimal(BIG_BLIND) / big_blind
+
+    def chips(amount: Decimal) -> int:
+        return int((amount * scale).to_integral_value(ROUND_HALF_EVEN))
+
+    players = [seats[seat] for seat in sorted(seats)]
+    stack_settings = {player: chips(stacks[player]) for player in players}
+    if button in seats:
+        player_roles = {"dealer": seats[button], "sb": small_blind_player, "bb": big_blind_player}
+    else:
+        player_roles = {"sb": small_blind_player, "bb": big_blind_player} # Dead button
+    order = seat_order(stack_settings, player_roles)
+    expected = (order[-1], order[0]) if len(order) == 2 else (order[0], order[1]) # Heads-up the button posts the small blind
+    if (small_blind_player, big_blind_player) != expected:
+        raise HandHistoryError("Blinds were not posted by the players after the button")
+
+    segments = []
+    for name, board, actions in streets:
+        tokens = " ".join(
+            "allin" if all_in else f"{verb}{chips(amount)}" if amount is not None else verb
+            for verb, amount, all_in in actions
+        )
+        segments.append(tokens if name == "preflop" else f"{name}: [{','.join(board)}] {tokens}".rstrip())
+    return HistoryHand(
+        site=SITE,
+        number=header.group("number"),
+        played_at=_played_at(header.group("game")),
+        stack_settings=stack_settings,
+        player_roles=player_roles,
+        hole_cards={player: cards for player, cards in hole_cards.items() if player in stack_settings},
+        action_sequence=" / ".join(segments),
+    )
@@ -0,0 +1,354 @@
+"""
+Bulk import of hand-history text files (see app/services/hand_history.py).
+
+Input is read in IMPORT_READ_SIZE chunks and cut into hands as it streams in
+(HandSplitter), so memory stays flat whatever the file size. Hands are
+converted and settled on a process pool, IMPORT_BATCH_SIZE at a time, and each
+batch is stored with one create_hands_bulk transaction. An imported hand's ID
+is derived from the site's hand number, so importing a file twice stores every
+hand once: hands already stored are counted as duplicates.
+
+The CLI (app/jobs/import_hands.py) records in a Checkpoint the byte offset up
+to which each file has been stored, so an interrupted run resumes after the
+last committed batch, and a history file the client keeps appending to is
+picked up where the previous run stopped. A last hand that fails to convert
+and is not followed by a blank line is taken to be still being written: the
+checkpoint stays at its start, so the next run reads it again in full.
+"""
+import fnmatch
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field, replace
+from multiprocessing import get_context
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import IMPORT_BATCH_SIZE, IMPORT_READ_SIZE, IMPORT_WORKERS
+from app.models.hand import HandData
+from app.repositories.hand_repository import call_repository
+from app.schemas.hand import HandCreateSchema
+from app.services.hand_history import HAND_START, parse_hand_history
+from app.services.hand_logic import process_hand
+
+logger = logging.getLogger(__name__)
+
+# uuid5 namespace of imported hand IDs
+IMPORT_NAMESPACE = uuid.UUID("5b0f6f1e-2c53-4c7e-9a43-0d5f3e7b6a21")
+
+# Failed hands listed per file in the report (all of them are counted)
+MAX_REPORTED_ERRORS = 100
+
+# Hands per pool task: small enough to keep every worker busy on one batch
+SLICE_SIZE = 50
+
+# Longest HAND_START match, so a start split across two reads is still found
+_START_LOOKBEHIND = 40
+
+class HandImportError(RuntimeError):
+    """Raised when a batch cannot be stored; the checkpoint stays at the last stored batch."""
+
+class RawHand(NamedTuple):
+    offset: int # Byte offset of the hand in its file or upload
+    end: int
+    data: bytes
+
+class ConvertedHand(NamedTuple):
+    offset: int
+    end: int
+    hand: Optional[HandData]
+    error: Optional[str]
+
+@dataclass
+class ImportStats:
+    source: str
+    resumed_from: int = 0 # Byte offset the import started at (from the checkpoint)
+    bytes: int = 0 # Bytes read
+    hands: int = 0
+    imported: int = 0
+    duplicates: int = 0 # Already stored, e.g. by an earlier import of the same file
+    failed: int = 0
+    unfinished: int = 0 # Last hand still being written, left for the next checkpointed run
+    seconds: float = 0.0
+    errors: List[dict] = field(default_factory=list) # {"offset", "error"} for the first MAX_REPORTED_ERRORS failures
+
+    @property
+    def hands_per_second(self) -> float:
+        return self.hands / self.seconds if self.seconds else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.bytes / self.seconds / 1e6 if self.seconds else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "resumed_from": self.resumed_from,
+            "bytes": self.bytes,
+            "hands": self.hands,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "unfinished": self.unfinished,
+            "seconds": round(self.seconds, 3),
+            "hands_per_second": round(self.hands_per_second, 1),
+            "megabytes_per_second": round(self.megabytes_per_second, 3),
+            "errors": self.errors,
+        }
+
+class HandSplitter:
+    """
+    Cuts a byte stream into hands at every HAND_START line. Feed it chunks of
+    any size; a hand is returned once the next one starts (or at finish()).
+    Text before the first hand is skipped.
+    """
+
+    def __init__(self, offset: int = 0):
+        self._buffer = b""
+        self._offset = offset # Stream offset of _buffer[0]
+        self._started = False
+
+    def feed(self, data: bytes) -> List[RawHand]:
+        search_from = max(1, len(self._buffer) - _START_LOOKBEHIND)
+        self._buffer += data
+        if not self._started:
+            match = HAND_START.search(self._buffer)
+            if match is None:
+                keep = min(len(self._buffer), _START_LOOKBEHIND)
+                self._offset += len(self._buffer) - keep
+                self._buffer = self._buffer[len(self._buffer) - keep:]
+                return []
+            self._offset += match.start()
+            self._buffer = self._buffer[match.start():]
+            self._started = True
+            search_from = 1
+
+        hands = []
+        start = 0
+        for match in HAND_START.finditer(self._buffer, search_from):
+            hands.append(RawHand(self._offset + start, self._offset + match.start(), self._buffer[start:match.start()]))
+            start = match.start()
+        if start:
+            self._offset += start
+            self._buffer = self._buffer[start:]
+        return hands
+
+    def finish(self) -> List[RawHand]:
+        """The last hand of the stream."""
+        if not self._started or not self._buffer.strip():
+            return []
+        hand = RawHand(self._offset, self._offset + len(self._buffer), self._buffer)
+        self._offset, self._buffer = hand.end, b""
+        return [hand]
+
+def hand_id(site: str, number: str) -> uuid.UUID:
+    """Stable ID of an imported hand, the same on every import."""
+    return uuid.uuid5(IMPORT_NAMESPACE, f"{site}:{number}")
+
+def convert_hand(text: str) -> HandData:
+    """Parse and settle one hand history. Raises ValueError for hands that cannot be imported."""
+    history = parse_hand_history(text)
+    hand = process_hand(HandCreateSchema(**history.fields))
+    return replace(hand, id=hand_id(history.site, history.number), created_at=history.played_at or hand.created_at)
+
+def convert_hands(raw_hands: List[RawHand]) -> List[ConvertedHand]:
+    """Worker entry point: converts a slice of a batch, reporting failures per hand."""
+    converted = []
+    for raw in raw_hands:
+        try:
+            hand = convert_hand(raw.data.decode("utf-8-sig", errors="replace"))
+            converted.append(ConvertedHand(raw.offset, raw.end, hand, None))
+        except ValueError as e:
+            converted.append(ConvertedHand(raw.offset, raw.end, None, str(e)))
+    return converted
+
+# -- process pool --------------------------------------------------------------
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def worker_count() -> int:
+    return IMPORT_WORKERS if IMPORT_WORKERS > 0 else (os.cpu_count() or 1)
+
+def create_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    """A pool of `workers` processes, or None to convert in-process."""
+    if workers <= 1:
+        return None
+    # spawn: forking a process that runs server threads is not safe
+    return ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """The server's pool for POST /hands/import, created on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = create_executor(worker_count())
+        return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+def convert_batch(raw_hands: List[RawHand], executor: Optional[Executor]) -> List[ConvertedHand]:
+    """Converts a batch in SLICE_SIZE slices spread over the pool; results keep the input order."""
+    if executor is not None:
+        try:
+            futures = [executor.submit(convert_hands, raw_hands[i:i + SLICE_SIZE]) for i in range(0, len(raw_hands), SLICE_SIZE)]
+            return [hand for future in futures for hand in future.result()]
+        except BrokenProcessPool:
+            logger.warning("Import worker pool broke, converting this batch in-process")
+    return convert_hands(raw_hands)
+
+def _new_hands(converted: List[ConvertedHand], existing: Set[uuid.UUID], stats: ImportStats) -> List[HandData]:
+    """Counts the batch into stats and returns the hands to store (not failed, not stored yet, first copy only)."""
+    hands: Dict[uuid.UUID, HandData] = {}
+    for item in converted:
+        stats.hands += 1
+        if item.error is not None:
+            stats.failed += 1
+            if len(stats.errors) < MAX_REPORTED_ERRORS:
+                stats.errors.append({"offset": item.offset, "error": item.error})
+        elif item.hand.id in existing or item.hand.id in hands:
+            stats.duplicates += 1
+        else:
+            hands[item.hand.id] = item.hand
+    return list(hands.values())
+
+def _check_stored(stored: int, expected: int):
+    if stored != expected:
+        raise HandImportError("Database table 'hands' does not exist. Cannot save hands.")
+
+def _is_unfinished(raw: RawHand, converted: ConvertedHand) -> bool:
+    """A failed hand without the blank line that separates hands: probably cut off mid-write."""
+    return converted.error is not None and not raw.data.replace(b"\r", b"").rstrip(b" \t").endswith(b"\n\n")
+
+def _hand_ids(converted: List[ConvertedHand]) -> List[uuid.UUID]:
+    return [item.hand.id for item in converted if item.hand is not None]
+
+# -- files ---------------------------------------------------------------------
+
+class Checkpoint:
+    """
+    Byte offset up to which each file has been stored, kept in a JSON file
+    that is rewritten atomically after every batch.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets: Dict[str, int] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._offsets = json.load(f)
+
+    def offset(self, source: str) -> int:
+        """Where to resume `source`; a file now shorter than its checkpoint was replaced and starts over."""
+        offset = self._offsets.get(os.path.abspath(source), 0)
+        return offset if offset <= os.path.getsize(source) else 0
+
+    def update(self, source: str, offset: int):
+        self._offsets[os.path.abspath(source)] = offset
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(self._offsets, f, indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+
+def history_files(paths: Iterable[str], pattern: str = "*.txt") -> Iterator[str]:
+    """The given files, plus every file matching `pattern` under the given directories, in name order."""
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(fnmatch.filter(files, pattern)):
+                yield os.path.join(root, name)
+
+def _batches(chunks: Iterable[bytes], splitter: HandSplitter, stats: ImportStats, batch_size: int) -> Iterator[List[RawHand]]:
+    batch: List[RawHand] = []
+    for data in chunks:
+        stats.bytes += len(data)
+        batch.extend(splitter.feed(data))
+        while len(batch) >= batch_size:
+            yield batch[:batch_size]
+            batch = batch[batch_size:]
+    batch.extend(splitter.finish())
+    if batch:
+        yield batch
+
+def import_file(
+    path: str,
+    repo,
+    executor: Optional[Executor] = None,
+    checkpoint: Optional[Checkpoint] = None,
+    batch_size: int = IMPORT_BATCH_SIZE,
+    read_size: int = IMPORT_READ_SIZE,
+) -> ImportStats:
+    """
+    Import one history file through a synchronous repository, one transaction
+    per batch, resuming from and advancing `checkpoint` when given.
+    """
+    start = checkpoint.offset(path) if checkpoint else 0
+    stats = ImportStats(source=path, resumed_from=start)
+    started = time.perf_counter()
+    with open(path, "rb") as f:
+        f.seek(start)
+        chunks = iter(lambda: f.read(read_size), b"")
+        for raw_hands in _batches(chunks, HandSplitter(start), stats, batch_size):
+            converted = convert_batch(raw_hands, executor)
+            end = raw_hands[-1].end
+            # Only the last hand of the file (from HandSplitter.finish) can end where the reads ended
+            if checkpoint and end == start + stats.bytes and _is_unfinished(raw_hands[-1], converted[-1]):
+                converted, end = converted[:-1], raw_hands[-1].offset
+                stats.unfinished = 1
+            hands = _new_hands(converted, repo.existing_hand_ids(_hand_ids(converted)), stats)
+            if hands:
+                _check_stored(repo.create_hands_bulk(hands), len(hands))
+            stats.imported += len(hands)
+            if checkpoint:
+                checkpoint.update(path, end)
+            stats.seconds = time.perf_counter() - started
+    stats.seconds = time.perf_counter() - started
+    return stats
+
+async def import_stream(
+    chunks: AsyncIterator[bytes],
+    repo,
+    executor: Optional[Executor] = None,
+    source: str = "upload",
+    batch_size: int = IMPORT_BATCH_SIZE,
+) -> ImportStats:
+    """Import hand histories from a byte stream (an uploaded file) through either driver's repository."""
+    stats = ImportStats(source=source)
+    started = time.perf_counter()
+    splitter = HandSplitter()
+    pending: List[RawHand] = []
+
+    async def store(raw_hands: List[RawHand]):
+        # Conversion blocks on the pool (or runs in-process); keep it off the event loop
+        converted = await run_in_threadpool(convert_batch, raw_hands, executor)
+        existing = await call_repository(repo.existing_hand_ids, _hand_ids(converted))
+        hands = _new_hands(converted, existing, stats)
+        if hands:
+            _check_stored(await call_repository(repo.create_hands_bulk, hands), len(hands))
+        stats.imported += len(hands)
+
+    async for data in chunks:
+        stats.bytes += len(data)
+        pending.extend(splitter.feed(data))
+        while len(pending) >= batch_size:
+            await store(pending[:batch_size])
+            pending = pending[batch_size:]
+    pending.extend(splitter.finish())
+    if pending:
+        await store(pending)
+    stats.seconds = time.perf_counter() - started
+    return stats
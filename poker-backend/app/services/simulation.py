@@ -0,0 +1,400 @@
+"""
+Self-play simulation of No-Limit Hold'em hands.
+
+Every hand is played through the same pokerkit game settlement replays
+(settlement.new_state: configured blinds, manual dealing), with each seat's
+decisions made by one of POLICIES. The result is the hand in HandCreateSchema
+shape, so a simulated hand can be settled and stored like a submitted one and
+always replays to the same result.
+
+A job (POST /simulations) runs in the background of the worker that accepted
+it: chunks of SIMULATION_CHUNK_SIZE hands are spread over a process pool
+(SIMULATION_WORKERS), results are consumed in order, and with persist every
+chunk is settled in the pool and stored with one create_hands_bulk
+transaction. Progress and throughput (hands per second of wall time and per
+CPU-second of the workers, i.e. per core) are read from the job while it runs.
+
+Simulations are deterministic: hand ``i`` of a job with seed ``s`` draws its
+cards and decisions from ``random.Random(f"{s}:{i}")``, so a hand does not
+depend on how the job was split into chunks or on how many workers ran it.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+from typing import TYPE_CHECKING, Callable, Deque, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+from app.core.config import (
+    BIG_BLIND,
+    SIMULATION_CHUNK_SIZE,
+    SIMULATION_JOB_HISTORY,
+    SIMULATION_WORKERS,
+    SMALL_BLIND,
+)
+from app.repositories.hand_repository import call_repository
+from app.schemas.hand import HandCreateSchema
+from app.services.cards import card_names
+from app.services.evaluator import evaluate, hand_category
+from app.services.hand_logic import process_hand
+from app.services.settlement import new_state
+
+if TYPE_CHECKING:
+    from pokerkit import State # Imported by settlement on first use
+
+logger = logging.getLogger(__name__)
+
+STREET_NAMES = ("Flop", "Turn", "River")
+
+# A decision: ("f" | "c" | "r", raise-to amount or None). "c" checks when there is nothing to call.
+Decision = Tuple[str, Optional[int]]
+Policy = Callable[[random.Random, "State", List[int], List[int]], Decision]
+
+class SimulationConfig(NamedTuple):
+    players: int
+    stacks: Tuple[int, ...] # Starting stack per seat
+    policies: Tuple[str, ...] # Policy name per seat
+    seed: int
+    small_blind: int = SMALL_BLIND
+    big_blind: int = BIG_BLIND
+
+class ChunkResult(NamedTuple):
+    start: int # Index of the chunk's first hand in the job
+    hands: list # HandCreateSchema-shaped dicts, or settled HandData when the chunk was settled
+    failed: List[str] # Errors of hands that could not be settled
+    cpu_seconds: float # CPU time the worker spent on the chunk
+
+# -- policies ------------------------------------------------------------------
+
+def _raise_to(state: "State", amount: int) -> Decision:
+    """Raise (or bet) to amount, clamped to the legal range; call when raising is not allowed."""
+    if not state.can_complete_bet_or_raise_to():
+        return ("c", None)
+    low = state.min_completion_betting_or_raising_to_amount
+    high = state.max_completion_betting_or_raising_to_amount
+    return ("r", max(low, min(high, amount)))
+
+def _pot_raise(state: "State", fraction: float) -> Decision:
+    """Raise by `fraction` of the pot after calling."""
+    pot_after_call = state.total_pot_amount + state.checking_or_calling_amount
+    return _raise_to(state, max(state.bets) + int(pot_after_call * fraction))
+
+def _fold_or_check(state: "State") -> Decision:
+    return ("f", None) if state.checking_or_calling_amount else ("c", None)
+
+def calling_station(rng: random.Random, state: "State", hole: List[int], board: List[int]) -> Decision:
+    """Checks or calls every time."""
+    return ("c", None)
+
+def random_policy(rng: random.Random, state: "State", hole: List[int], board: List[int]) -> Decision:
+    """Folds, calls or raises half to twice the pot at random; never folds when checking is free."""
+    roll = rng.random()
+    if roll < 0.15:
+        return _fold_or_check(state)
+    if roll < 0.7:
+        return ("c", None)
+    return _pot_raise(state, rng.choice((0.5, 0.75, 1.0, 2.0)))
+
+def aggressive(rng: random.Random, state: "State", hole: List[int], board: List[int]) -> Decision:
+    """Raises the pot whenever it may."""
+    return _pot_raise(state, 1.0)
+
+def _preflop_playable(hole: List[int]) -> bool:
+    """Roughly the top fifth of starting hands: pairs of sevens and up, two broadway cards, or ace-nine and up."""
+    high, low = sorted((card >> 2 for card in hole), reverse=True)
+    return (high == low and high >= 5) or low >= 8 or (high == 12 and low >= 7)
+
+def tight(rng: random.Random, state: "State", hole: List[int], board: List[int]) -> Decision:
+    """Plays strong starting hands only, then bets two pair or better and calls with a pair."""
+    if not board:
+        if _preflop_playable(hole):
+            return _raise_to(state, 3 * max(state.bets)) if max(state.bets) <= state.blinds_or_straddles[-1] else ("c", None)
+        return _fold_or_check(state)
+    category = hand_category(evaluate(hole + board))
+    if category == "high_card":
+        return _fold_or_check(state)
+    if category == "pair":
+        return ("c", None)
+    return _pot_raise(state, 0.66)
+
+POLICIES: Dict[str, Policy] = {
+    "random": random_policy,
+    "calling_station": calling_station,
+    "aggressive": aggressive,
+    "tight": tight,
+}
+
+# -- simulation ----------------------------------------------------------------
+
+def _act(state: "State", decision: Decision) -> str:
+    """Apply a decision and return its action token."""
+    verb, amount = decision
+    if verb == "f" and state.can_fold():
+        state.fold()
+        return "f"
+    if verb == "r" and state.can_complete_bet_or_raise_to(amount):
+        token = f"{'r' if max(state.bets) else 'b'}{amount}"
+        state.complete_bet_or_raise_to(amount)
+        return token
+    token = "c" if state.checking_or_calling_amount else "x"
+    state.check_or_call()
+    return token
+
+def simulate_hand(config: SimulationConfig, index: int) -> dict:
+    """Play hand `index` of a job and return it as HandCreateSchema fields."""
+    rng = random.Random(f"{config.seed}:{index}")
+    names = [f"Player{seat + 1}" for seat in range(config.players)]
+    stack_settings = dict(zip(names, config.stacks))
+    player_roles = {"dealer": names[index % config.players]} # The button moves round the table
+    policies = {name: POLICIES[policy] for name, policy in zip(names, config.policies)}
+
+    state, players = new_state(stack_settings, player_roles, config.small_blind, config.big_blind)
+    deck = rng.sample(range(52), 52)
+    holes = {player: [deck.pop(), deck.pop()] for player in players}
+    for player in players:
+        state.deal_hole("".join(card_names(holes[player])))
+
+    board: List[int] = []
+    segments = [[]] # Action tokens per street, preflop first
+    headers = [""]
+    while state.status:
+        if state.actor_index is not None:
+            player = players[state.actor_index]
+            segments[-1].append(_act(state, policies[player](rng, state, holes[player], board)))
+            continue
+        if len(board) == 5 or sum(state.statuses) == 1:
+            break # Showdown or uncontested pot; settlement awards it
+        runout = sum(1 for active, stack in zip(state.statuses, state.stacks) if active and stack) <= 1
+        while True:
+            cards = [deck.pop() for _ in range(3 if not board else 1)]
+            board.extend(cards)
+            headers.append(f"{STREET_NAMES[len(headers) - 1]}: [{','.join(card_names(cards))}] ")
+            segments.append([])
+            # Nobody can bet any more: the rest of the board only goes into the sequence.
+            # Dealing it through pokerkit would first show and rank every hand, the costliest step.
+            if not runout or len(board) == 5:
+                break
+        if runout:
+            break
+        if state.can_burn_card("??"):
+            state.burn_card("??")
+        state.deal_board("".join(card_names(board[-len(cards):])))
+
+    sequence = " / ".join((header + " ".join(tokens)).strip() for header, tokens in zip(headers, segments))
+    return {
+        "stack_settings": stack_settings,
+        "player_roles": player_roles,
+        "hole_cards": {player: card_names(holes[player]) for player in names},
+        "action_sequence": sequence,
+    }
+
+def simulate_chunk(config: SimulationConfig, start: int, count: int, settle: bool = False) -> ChunkResult:
+    """
+    Worker entry point: simulate hands start..start+count-1. With settle the
+    hands are settled into HandData ready to store, as POST /hands/ would.
+    """
+    started = time.thread_time() # Per thread: chunks may share a process when no pool runs them
+    hands, failed = [], []
+    for index in range(start, start + count):
+        hand = simulate_hand(config, index)
+        if settle:
+            try:
+                hand = process_hand(HandCreateSchema(**hand))
+            except ValueError as e:
+                failed.append(f"Hand {index}: {e}")
+                continue
+        hands.append(hand)
+    return ChunkResult(start, hands, failed, time.thread_time() - started)
+
+def validate_config(players: int, stacks: Sequence[int], policies: Sequence[str], big_blind: int = BIG_BLIND):
+    """Raises ValueError for a configuration that cannot be simulated."""
+    if not 2 <= players <= 10:
+        raise ValueError(f"A table seats 2 to 10 players, got {players}")
+    if len(stacks) != players:
+        raise ValueError(f"Expected {players} stacks, got {len(stacks)}")
+    if min(stacks) < big_blind:
+        raise ValueError(f"Every stack must cover the big blind ({big_blind})")
+    unknown = sorted(set(policies) - set(POLICIES))
+    if unknown:
+        raise ValueError(f"Unknown policies {unknown}; expected any of {sorted(POLICIES)}")
+
+# -- jobs ----------------------------------------------------------------------
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def worker_count() -> int:
+    return SIMULATION_WORKERS if SIMULATION_WORKERS > 0 else (os.cpu_count() or 1)
+
+def get_executor() -> Optional[ProcessPoolExecutor]:
+    """The server's simulation pool, created on first use; None simulates in a thread."""
+    global _executor
+    with _executor_lock:
+        if _executor is None and worker_count() > 1:
+            # spawn: forking a process that runs server threads is not safe
+            _executor = ProcessPoolExecutor(max_workers=worker_count(), mp_context=get_context("spawn"))
+        return _executor
+
+def shutdown_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+class SimulationJob:
+    """One POST /simulations run: its configuration, progress and the background task playing it."""
+
+    def __init__(self, config: SimulationConfig, hands: int, persist: bool = False, keep_hands: int = 0, chunk_size: int = SIMULATION_CHUNK_SIZE):
+        self.id = uuid.uuid4()
+        self.config = config
+        self.hands = hands
+        self.persist = persist
+        self.keep_hands = keep_hands
+        self.chunk_size = max(1, chunk_size)
+        self.status = "pending" # pending, running, completed, failed, cancelled
+        self.workers = 1
+        self.done = 0 # Hands played, including the ones that failed to settle
+        self.stored = 0
+        self.failed = 0
+        self.errors: List[str] = [] # The first few settlement errors
+        self.error: Optional[str] = None # Why the job failed
+        self.cpu_seconds = 0.0
+        self.kept: list = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def progress(self) -> dict:
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = (self.finished_at or time.monotonic()) - self.started_at
+        return {
+            "id": self.id,
+            "status": self.status,
+            "players": self.config.players,
+            "stacks": list(self.config.stacks),
+            "policies": list(self.config.policies),
+            "seed": self.config.seed,
+            "hands": self.hands,
+            "persist": self.persist,
+            "done": self.done,
+            "stored": self.stored,
+            "failed": self.failed,
+            "progress": self.done / self.hands if self.hands else 1.0,
+            "workers": self.workers,
+            "elapsed_seconds": elapsed,
+            "cpu_seconds": self.cpu_seconds,
+            "hands_per_second": self.done / elapsed if elapsed else 0.0,
+            "hands_per_core_second": self.done / self.cpu_seconds if self.cpu_seconds else 0.0,
+            "errors": self.errors,
+            "error": self.error,
+        }
+
+    def start(self, repository, executor: Optional[ProcessPoolExecutor]):
+        self._task = asyncio.create_task(self.run(repository, executor), name=f"simulation-{self.id}")
+
+    def cancel(self) -> bool:
+        """Stop a running job; hands already stored stay stored. False when it had finished."""
+        if self._task is None or self.finished:
+            return False
+        self._task.cancel()
+        return True
+
+    async def wait(self):
+        if self._task is not None and not self._task.done():
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def _chunk(self, executor: Optional[ProcessPoolExecutor], start: int, count: int) -> ChunkResult:
+        loop = asyncio.get_running_loop()
+        if executor is not None:
+            try:
+                return await loop.run_in_executor(executor, simulate_chunk, self.config, start, count, self.persist)
+            except BrokenProcessPool:
+                logger.warning("Simulation worker pool broke, playing hands %d-%d in-process", start, start + count - 1)
+        return await loop.run_in_executor(None, simulate_chunk, self.config, start, count, self.persist)
+
+    async def run(self, repository, executor: Optional[ProcessPoolExecutor]):
+        """
+        Play every hand, keeping twice as many chunks in flight as there are
+        workers. Chunks are consumed in order, so stored hands and kept hands
+        follow the hand index.
+        """
+        self.status = "running"
+        self.started_at = time.monotonic()
+        self.workers = worker_count() if executor is not None else 1
+        starts = iter(range(0, self.hands, self.chunk_size))
+        pending: Deque[asyncio.Future] = deque()
+
+        def submit():
+            for start in starts:
+                pending.append(asyncio.ensure_future(self._chunk(executor, start, min(self.chunk_size, self.hands - start))))
+                return
+
+        try:
+            for _ in range(2 * self.workers):
+                submit()
+            while pending:
+                result = await pending.popleft()
+                submit()
+                if self.persist and result.hands:
+                    self.stored += await call_repository(repository.create_hands_bulk, result.hands)
+                if len(self.kept) < self.keep_hands:
+                    self.kept.extend(result.hands[:self.keep_hands - len(self.kept)])
+                self.failed += len(result.failed)
+                self.errors.extend(result.failed[:10 - len(self.errors)])
+                self.done += len(result.hands) + len(result.failed)
+                self.cpu_seconds += result.cpu_seconds
+            self.status = "completed"
+        except asyncio.CancelledError:
+            self.status = "cancelled"
+        except Exception as e:
+            logger.exception("Simulation %s failed after %d hands", self.id, self.done)
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            for future in pending:
+                future.cancel()
+            self.finished_at = time.monotonic()
+        progress = self.progress()
+        logger.info(
+            "Simulation %s %s: %d of %d hands in %.1fs (%.0f hands/s, %.0f hands/s per core, %d failed)",
+            self.id, self.status, self.done, self.hands, progress["elapsed_seconds"],
+            progress["hands_per_second"], progress["hands_per_core_second"], self.failed,
+        )
+
+# This worker's jobs, oldest first; finished ones beyond SIMULATION_JOB_HISTORY are forgotten
+_jobs: "OrderedDict[uuid.UUID, SimulationJob]" = OrderedDict()
+
+def start_job(job: SimulationJob, repository, executor: Optional[ProcessPoolExecutor]) -> SimulationJob:
+    _jobs[job.id] = job
+    job.start(repository, executor)
+    finished = [job_id for job_id, old in _jobs.items() if old.finished]
+    for job_id in finished[:max(0, len(finished) - SIMULATION_JOB_HISTORY)]:
+        del _jobs[job_id]
+    return job
+
+def get_job(job_id: uuid.UUID) -> Optional[SimulationJob]:
+    return _jobs.get(job_id)
+
+def list_jobs() -> List[SimulationJob]:
+    return list(_jobs.values())
+
+async def stop_simulations():
+    """Cancel running jobs and shut the pool down (called from the app lifespan)."""
+    for job in _jobs.values():
+        job.cancel()
+    for job in _jobs.values():
+        await job.wait()
+    shutdown_executor()
@@ -0,0 +1,30 @@
+"""
+Microbenchmark for action-sequence parsing.
+
+Usage (from poker-backend/):
+    python -m benchmarks.bench_action_parser [--sequences 50000]
+"""
+import argparse
+import time
+
+from app.services.action_parser import parse_sequence, parse_sequences
+
+def _sequence(i: int) -> str:
+    return f"f f r{100 + i % 500} c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b{400 + i % 97} f"
+
+def run(count: int, distinct: int) -> float:
+    sequences = [_sequence(i % distinct) for i in range(count)]
+    parse_sequence.cache_clear()
+    start = time.perf_counter()
+    parse_sequences(sequences)
+    return count / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sequences", type=int, default=50_000)
+    args = parser.parse_args()
+    print(f"Parsed {args.sequences} distinct sequences: {run(args.sequences, args.sequences):,.0f} sequences/s")
+    print(f"Parsed {args.sequences} sequences, 1% distinct: {run(args.sequences, max(1, args.sequences // 100)):,.0f} sequences/s")
+
+if __name__ == "__main__":
+    main()
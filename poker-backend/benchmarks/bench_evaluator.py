@@ -0,0 +1,32 @@
+"""
+Microbenchmark for the lookup-table hand evaluator.
+
+Usage (from poker-backend/):
+    python -m benchmarks.bench_evaluator [--hands 200000]
+"""
+import argparse
+import random
+import time
+
+from app.services.evaluator import evaluate, load_tables
+
+def run(hands: int, seed: int = 0) -> float:
+    rng = random.Random(seed)
+    deck = list(range(52))
+    samples = [rng.sample(deck, 7) for _ in range(hands)]
+    start = time.perf_counter()
+    for cards in samples:
+        evaluate(cards)
+    return hands / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hands", type=int, default=200_000)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    source = load_tables()
+    print(f"Tables loaded ({source}) in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(f"Evaluated {args.hands} 7-card hands: {run(args.hands):,.0f} hands/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Concurrent load against a running API, for comparing the sync (psycopg2) and
+async (asyncpg) request paths. Start the server once with DB_DRIVER=psycopg2 and
+once with DB_DRIVER=asyncpg and run the same command against each.
+
+Usage (from poker-backend/):
+    python -m benchmarks.bench_http [--url http://localhost:8000] [--requests 5000] [--concurrency 64] [--path /hands/?limit=20]
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+async def run(url: str, path: str, requests: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker(client: httpx.AsyncClient):
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            errors += response.status_code >= 400
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        await client.get(path) # Warm up
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", default="/hands/?limit=20")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    result = asyncio.run(run(args.url, args.path, args.requests, args.concurrency))
+    print(
+        f"GET {args.path} x{args.requests} at concurrency {args.concurrency}: "
+        f"{result['throughput']:,.0f} req/s, p50 {result['p50_ms']:.1f} ms, "
+        f"p99 {result['p99_ms']:.1f} ms, {result['errors']} errors"
+    )
+
+if __name__ == "__main__":
+    main()
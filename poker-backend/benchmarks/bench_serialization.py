@@ -0,0 +1,75 @@
+"""
+Microbenchmark for encoding hand list responses, per hand.
+
+"pydantic" is the previous path: a HandResponseSchema per hand, the list model,
+FastAPI's response_model validation and serialization (the real
+fastapi.routing.serialize_response), then JSONResponse. "direct" is the
+current path: the HandData dataclasses encoded by orjson in one call.
+
+Usage (from poker-backend/):
+    python -m benchmarks.bench_serialization [--sizes 1000 100000] [--repeat 3]
+"""
+import argparse
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import TypeAdapter
+
+from app.models.hand import HandData
+from app.schemas.hand import HandListResponseSchema, HandResponseSchema
+from app.services.hand_json import encode_hand_list
+
+_hand_list_adapter = TypeAdapter(List[HandResponseSchema])
+_response_field = create_model_field(name="Response_get_all_hands", type_=HandListResponseSchema, mode="serialization")
+
+def make_hands(count: int) -> List[HandData]:
+    players = [f"Player{i}" for i in range(1, 7)]
+    return [
+        HandData(
+            id=uuid.uuid4(),
+            created_at=datetime(2025, 1, 1, tzinfo=timezone.utc),
+            stack_settings={p: 1000 for p in players},
+            player_roles={"dealer": "Player1", "sb": "Player2", "bb": "Player3"},
+            hole_cards={p: ["Ah", "Kd"] for p in players},
+            action_sequence="f f f r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b400 f",
+            winnings={"Player1": 800, "Player2": -200, "Player3": -600, "Player4": 0, "Player5": 0, "Player6": 0},
+        )
+        for _ in range(count)
+    ]
+
+def encode_pydantic(hands: List[HandData]) -> bytes:
+    validated = _hand_list_adapter.validate_python(hands, from_attributes=True)
+    content = HandListResponseSchema(hands=validated, next_cursor=None)
+    return JSONResponse(asyncio.run(serialize_response(field=_response_field, response_content=content))).body
+
+def encode_direct(hands: List[HandData]) -> bytes:
+    return encode_hand_list(hands, None)
+
+def per_hand_us(encode, hands: List[HandData], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        encode(hands)
+        best = min(best, time.perf_counter() - start)
+    return best / len(hands) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    for size in args.sizes:
+        hands = make_hands(size)
+        assert encode_pydantic(hands) == encode_direct(hands) # Same bytes on the wire
+        before = per_hand_us(encode_pydantic, hands, args.repeat)
+        after = per_hand_us(encode_direct, hands, args.repeat)
+        print(f"{size:>7} hands: pydantic {before:6.2f} us/hand, direct {after:6.2f} us/hand ({before / after:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Microbenchmark for hand settlement throughput.
+
+Usage (from poker-backend/):
+    python -m benchmarks.bench_settlement [--hands 5000]
+"""
+import argparse
+import time
+
+from app.services.hand_logic import calculate_winnings
+
+HANDS = [
+    # Six-handed hand that goes to the river
+    (
+        {"Player1": 1000, "Player2": 1000, "Player3": 1000, "Player4": 1000, "Player5": 1000, "Player6": 1000},
+        {"dealer": "Player1", "sb": "Player2", "bb": "Player3"},
+        {"Player1": ["Ah", "Kd"], "Player2": ["Jd", "Js"], "Player3": ["7h", "8h"]},
+        "f f f r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b400 f",
+    ),
+    # Three-way all-in with a side pot
+    (
+        {"A": 300, "B": 1000, "C": 1000},
+        {"dealer": "C"},
+        {"A": ["As", "Ad"], "B": ["Kc", "Kd"], "C": ["Qh", "Qd"]},
+        "r300 c c / Flop: [2s,7d,9c] / b400 c / Turn: [3h] / x x / River: [4s] / x x",
+    ),
+    # Heads-up preflop fold
+    ({"A": 1000, "B": 1000}, {"dealer": "A"}, {}, "f"),
+]
+
+def run(hands: int) -> float:
+    start = time.perf_counter()
+    for i in range(hands):
+        stack_settings, player_roles, hole_cards, action_sequence = HANDS[i % len(HANDS)]
+        calculate_winnings(stack_settings, hole_cards, action_sequence, player_roles)
+    return hands / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--hands", type=int, default=5000)
+    args = parser.parse_args()
+    run(min(args.hands, 100)) # Warm up
+    print(f"Settled {args.hands} hands: {run(args.hands):,.0f} hands/s")
+
+if __name__ == "__main__":
+    main()
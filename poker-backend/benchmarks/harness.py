@@ -0,0 +1,160 @@
+"""
+Measurement and result files for the benchmark suite (benchmarks/suite.py).
+
+Every benchmark is timed over a fixed list of inputs, several times, with the
+garbage collector paused (as timeit does) and an optional setup step before
+each repeat to reset caches. The median per-operation time across repeats is
+the number that gets compared; min and max are kept to show the noise.
+
+Result files are JSON:
+
+    {
+      "format": 1,
+      "created_at": "...",
+      "environment": {"python": ..., "git_commit": ..., "packages": {...}, ...},
+      "parameters": {...},            # command-line settings of the run
+      "results": [
+        {"name": "micro.calculate_winnings", "unit": "us/op", "value": 812.4, ...},
+        {"name": "api.get_by_id[rows=10000]", "unit": "ms/request", "value": 1.9, "p95": ..., ...}
+      ]
+    }
+
+Lower "value" is better for every result, which is all compare() relies on.
+"""
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, Dict, List, Optional, Sequence
+
+RESULTS_FORMAT = 1
+
+PACKAGES = ("fastapi", "pydantic", "pokerkit", "orjson", "numpy", "psycopg2-binary", "asyncpg")
+
+def measure(
+    name: str,
+    fn: Callable,
+    inputs: Sequence,
+    repeat: int = 5,
+    setup: Optional[Callable[[], None]] = None,
+) -> dict:
+    """Time fn(item) for every item, repeat times; per-operation figures in microseconds."""
+    per_op = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            for item in inputs:
+                fn(item)
+            elapsed = time.perf_counter() - start
+        finally:
+            if gc_enabled:
+                gc.enable()
+        per_op.append(elapsed / len(inputs) * 1e6)
+    median = statistics.median(per_op)
+    return {
+        "name": name,
+        "unit": "us/op",
+        "value": median,
+        "min": min(per_op),
+        "max": max(per_op),
+        "ops_per_s": 1e6 / median,
+        "operations": len(inputs),
+        "repeat": repeat,
+    }
+
+def latency_summary(name: str, latencies: List[float], elapsed: float, **extra) -> dict:
+    """Request latencies (seconds) as milliseconds: median as the value, plus p95/p99 and throughput."""
+    ordered = sorted(latencies)
+    def percentile(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))] * 1000
+    return {
+        "name": name,
+        "unit": "ms/request",
+        "value": statistics.median(ordered) * 1000,
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+        "max": ordered[-1] * 1000,
+        "requests_per_s": len(ordered) / elapsed,
+        "requests": len(ordered),
+        **extra,
+    }
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], capture_output=True, text=True, check=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def environment() -> dict:
+    """What the numbers depend on: interpreter, machine, code revision and library versions."""
+    packages = {}
+    for package in PACKAGES:
+        try:
+            packages[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            packages[package] = None
+    status = _git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "git_commit": _git("rev-parse", "HEAD"),
+        "git_dirty": bool(status) if status is not None else None,
+        "packages": packages,
+    }
+
+def write_results(path: str, results: List[dict], parameters: dict):
+    document = {
+        "format": RESULTS_FORMAT,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "environment": environment(),
+        "parameters": parameters,
+        "results": results,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
+        f.write("\n")
+
+def load_results(path: str) -> Dict[str, dict]:
+    """A result file's results keyed by benchmark name."""
+    with open(path) as f:
+        document = json.load(f)
+    if document.get("format") != RESULTS_FORMAT:
+        raise ValueError(f"{path}: unsupported results format {document.get('format')!r}")
+    return {result["name"]: result for result in document["results"]}
+
+def compare(baseline: Dict[str, dict], current: List[dict], threshold: float) -> List[dict]:
+    """
+    Benchmarks present in both runs with their change in value (positive is
+    slower); "regression" is set when a result got slower by more than threshold
+    (0.10 = 10%). Results whose units differ are skipped.
+    """
+    rows = []
+    for result in current:
+        before = baseline.get(result["name"])
+        if before is None or before["unit"] != result["unit"] or not before["value"]:
+            continue
+        change = result["value"] / before["value"] - 1
+        rows.append({
+            "name": result["name"],
+            "unit": result["unit"],
+            "baseline": before["value"],
+            "current": result["value"],
+            "change": change,
+            "regression": change > threshold,
+        })
+    return rows
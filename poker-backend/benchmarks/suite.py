@@ -0,0 +1,274 @@
+"""
+Benchmark suite: microbenchmarks of the hot functions and end-to-end API
+scenarios, written to a JSON results file for comparison between releases.
+
+Microbenchmarks (per call, on a fixed, seeded set of distinct hands; the
+action-sequence parse cache is cleared before each repeat so parsing is
+measured rather than cache hits):
+    process_hand, parse_action_sequence, calculate_winnings,
+    HandRepository._row_to_hand_data
+
+API scenarios (per request, through the full FastAPI stack in-process with
+TestClient, at each --sizes table size, bypassing the read-through cache so the
+storage path is measured):
+    create (POST /hands/), get_by_id (GET /hands/{id}),
+    list (GET /hands/?limit=50), list_deep (a cursor page from mid-table)
+
+The API runs against an in-memory stand-in repository by default. With
+--backend postgres it uses the real HandRepository on DATABASE_URL, which must
+point at a scratch database: the suite migrates it and EMPTIES the hands and
+player_stats tables before seeding each size.
+
+Usage (from poker-backend/):
+    python -m benchmarks.suite [--only micro|api] [--sizes 1000 10000] [--output bench-results.json]
+    python -m benchmarks.suite --compare baseline.json [--threshold 0.10]
+    DATABASE_URL=postgresql://... python -m benchmarks.suite --backend postgres --sizes 10000 100000
+
+With --compare the run is checked against an earlier results file and the
+exit status is 1 if any benchmark got slower by more than --threshold.
+"""
+import argparse
+import bisect
+import random
+import sys
+import time
+import uuid
+from dataclasses import replace
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from benchmarks.harness import compare, latency_summary, load_results, measure, write_results
+
+from app.models.hand import HandData, HandFilters, HandPage
+from app.repositories.hand_repository import HandRepository, decode_cursor, encode_cursor
+from app.schemas.hand import HandCreateSchema
+from app.services.action_parser import parse_sequence
+from app.services.hand_logic import calculate_winnings, parse_action_sequence, process_hand
+
+SIX_PLAYERS = {f"Player{i}": 1000 for i in range(1, 7)}
+
+def _six_max(i: int) -> dict:
+    # Raise and flop bet sizes vary so 20,000 hands are all distinct; every variant is legal
+    return dict(
+        stack_settings=SIX_PLAYERS,
+        player_roles={"dealer": "Player1", "sb": "Player2", "bb": "Player3"},
+        hole_cards={"Player1": ["Ah", "Kd"], "Player2": ["Jd", "Js"], "Player3": ["7h", "8h"]},
+        action_sequence=f"f f f r{100 + i % 200} c c / Flop: [Ks,Qd,Jc] / x b{100 + i // 200 % 100} c f / Turn: [2h] / x x / River: [8s] / x b400 f",
+    )
+
+def _side_pot(i: int) -> dict:
+    return dict(
+        stack_settings={"A": 300, "B": 1000, "C": 1000},
+        player_roles={"dealer": "C"},
+        hole_cards={"A": ["As", "Ad"], "B": ["Kc", "Kd"], "C": ["Qh", "Qd"]},
+        action_sequence=f"r300 c c / Flop: [2s,7d,9c] / b{100 + i % 600} c / Turn: [3h] / x x / River: [4s] / x x",
+    )
+
+def _heads_up_fold(i: int) -> dict:
+    return dict(stack_settings={"A": 1000, "B": 1000}, player_roles={"dealer": "A"}, hole_cards={}, action_sequence=f"r{80 + i % 900} f")
+
+TEMPLATES = (_six_max, _six_max, _side_pot, _heads_up_fold) # Weighted towards full six-handed hands
+
+def hand_inputs(count: int) -> List[dict]:
+    """count distinct hand payloads, the same on every run."""
+    return [TEMPLATES[i % len(TEMPLATES)](i // len(TEMPLATES)) for i in range(count)]
+
+def stored_hands(count: int, variants: int, seed: int) -> List[HandData]:
+    """
+    count settled hands, one second apart, cloned from `variants` distinct
+    payloads (settling every seeded row would dominate the setup time).
+    """
+    rng = random.Random(seed)
+    templates = [HandData(winnings=calculate_winnings(**_settle_args(payload)), **payload) for payload in hand_inputs(variants)]
+    start = datetime(2025, 1, 1)
+    return [
+        replace(
+            templates[i % len(templates)],
+            id=uuid.UUID(int=rng.getrandbits(128), version=4),
+            created_at=start + timedelta(seconds=i),
+        )
+        for i in range(count)
+    ]
+
+def _settle_args(payload: dict) -> dict:
+    return {key: payload[key] for key in ("stack_settings", "hole_cards", "action_sequence", "player_roles")}
+
+def _row(hand: HandData) -> dict:
+    """A row as psycopg2 returns it: native UUID and datetime, decoded JSONB."""
+    return {
+        "id": hand.id,
+        "created_at": hand.created_at,
+        "stack_settings": hand.stack_settings,
+        "player_roles": hand.player_roles,
+        "hole_cards": hand.hole_cards,
+        "action_sequence": hand.action_sequence,
+        "winnings": hand.winnings,
+    }
+
+def run_micro(operations: int, repeat: int, seed: int) -> List[dict]:
+    payloads = hand_inputs(operations)
+    schemas = [HandCreateSchema(**payload) for payload in payloads]
+    sequences = [payload["action_sequence"] for payload in payloads]
+    settle_args = [_settle_args(payload) for payload in payloads]
+    rows = [_row(hand) for hand in stored_hands(operations, variants=50, seed=seed)]
+    repository = HandRepository()
+    clear_parse_cache = parse_sequence.cache_clear
+
+    # One untimed pass so lazily built tables (evaluator ranks, game templates) are in place
+    for args in settle_args[:20]:
+        calculate_winnings(**args)
+
+    return [
+        measure("micro.process_hand", process_hand, schemas, repeat, setup=clear_parse_cache),
+        measure("micro.parse_action_sequence", parse_action_sequence, sequences, repeat, setup=clear_parse_cache),
+        measure("micro.calculate_winnings", lambda args: calculate_winnings(**args), settle_args, repeat, setup=clear_parse_cache),
+        measure("micro.row_to_hand_data", repository._row_to_hand_data, rows, repeat),
+    ]
+
+
+class MemoryHandRepository:
+    """
+    In-process stand-in for HandRepository: hands by id plus a list kept in
+    (created_at, id) order for keyset pages. Filters are not supported.
+    """
+    table_exists = True
+
+    def __init__(self):
+        self._by_id: Dict[uuid.UUID, HandData] = {}
+        self._keys: List[tuple] = []
+        self._hands: List[HandData] = []
+
+    def reset(self):
+        self.__init__()
+
+    def create_hand(self, hand: HandData) -> HandData:
+        key = (hand.created_at, str(hand.id))
+        index = bisect.bisect(self._keys, key)
+        self._keys.insert(index, key)
+        self._hands.insert(index, hand)
+        self._by_id[hand.id] = hand
+        return hand
+
+    def create_hands_bulk(self, hands: List[HandData], page_size: int = 1000) -> int:
+        for hand in hands:
+            self.create_hand(hand)
+        return len(hands)
+
+    def get_hand_by_id(self, hand_id: uuid.UUID) -> Optional[HandData]:
+        return self._by_id.get(hand_id)
+
+    def get_hands_page(self, limit: int, cursor: Optional[str] = None, filters: Optional[HandFilters] = None) -> HandPage:
+        end = len(self._keys) if cursor is None else bisect.bisect_left(self._keys, decode_cursor(cursor))
+        start = max(0, end - limit)
+        hands = self._hands[start:end][::-1]
+        next_cursor = encode_cursor(hands[-1].created_at, hands[-1].id) if start > 0 and hands else None
+        return HandPage(hands=hands, next_cursor=next_cursor)
+
+
+class PostgresTarget:
+    """The real repository on DATABASE_URL, emptied before each table size."""
+
+    def __init__(self):
+        from app.db.database import get_db_cursor, initialize_database
+        initialize_database()
+        self._get_db_cursor = get_db_cursor
+        self.repository = HandRepository()
+
+    def reset(self):
+        with self._get_db_cursor(commit=True) as cursor:
+            cursor.execute("TRUNCATE hands, player_stats CASCADE")
+            cursor.execute("ANALYZE hands")
+
+
+def _timed_requests(client, method: str, paths: List[str], json_bodies: Optional[List[dict]] = None) -> tuple:
+    latencies = []
+    start = time.perf_counter()
+    for i, path in enumerate(paths):
+        request_start = time.perf_counter()
+        response = client.request(method, path, json=json_bodies[i] if json_bodies else None)
+        latencies.append(time.perf_counter() - request_start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} failed with {response.status_code}: {response.text[:200]}")
+    return latencies, time.perf_counter() - start
+
+def run_api(backend: str, sizes: List[int], requests: int, seed: int) -> List[dict]:
+    from fastapi.testclient import TestClient
+    from app.api.hand import get_hand_repository
+    from app.main import app
+
+    if backend == "postgres":
+        target = PostgresTarget()
+        repository = target.repository
+    else:
+        target = repository = MemoryHandRepository()
+    app.dependency_overrides[get_hand_repository] = lambda: repository
+    client = TestClient(app) # No lifespan: the target was set up above
+    rng = random.Random(seed)
+    payloads = hand_inputs(requests)
+    results = []
+    try:
+        for size in sizes:
+            target.reset()
+            hands = stored_hands(size, variants=200, seed=seed + size)
+            for chunk in range(0, size, 5000):
+                repository.create_hands_bulk(hands[chunk:chunk + 5000])
+            label = f"[rows={size}]"
+            extra = {"backend": backend, "rows": size}
+
+            if hands:
+                ids = [str(rng.choice(hands).id) for _ in range(requests)]
+                _timed_requests(client, "GET", [f"/hands/{i}" for i in ids[:20]]) # Warm up
+                results.append(latency_summary(f"api.get_by_id{label}", *_timed_requests(client, "GET", [f"/hands/{i}" for i in ids]), **extra))
+
+            results.append(latency_summary(f"api.list{label}", *_timed_requests(client, "GET", ["/hands/?limit=50"] * requests), **extra))
+
+            if hands:
+                middle = sorted(hands, key=lambda hand: (hand.created_at, str(hand.id)))[size // 2]
+                deep = f"/hands/?limit=50&cursor={encode_cursor(middle.created_at, middle.id)}"
+                results.append(latency_summary(f"api.list_deep{label}", *_timed_requests(client, "GET", [deep] * requests), **extra))
+
+            results.append(latency_summary(f"api.create{label}", *_timed_requests(client, "POST", ["/hands/"] * requests, payloads), **extra))
+    finally:
+        app.dependency_overrides.pop(get_hand_repository, None)
+    return results
+
+def _print_results(results: List[dict]):
+    for result in results:
+        if result["unit"] == "us/op":
+            print(f"{result['name']:<40} {result['value']:10.2f} us/op  ({result['ops_per_s']:,.0f} ops/s)")
+        else:
+            print(f"{result['name']:<40} {result['value']:10.3f} ms p50  {result['p95']:8.3f} ms p95  ({result['requests_per_s']:,.0f} req/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--only", choices=["micro", "api"], help="Run one group only")
+    parser.add_argument("--operations", type=int, default=2000, help="Calls per microbenchmark repeat")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backend", choices=["memory", "postgres"], default="memory", help="Storage behind the API scenarios")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000], help="Table sizes for the API scenarios")
+    parser.add_argument("--requests", type=int, default=500, help="Requests per API scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench-results.json")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown before a result counts as a regression")
+    args = parser.parse_args()
+
+    results = []
+    if args.only in (None, "micro"):
+        results += run_micro(args.operations, args.repeat, args.seed)
+    if args.only in (None, "api"):
+        results += run_api(args.backend, args.sizes, args.requests, args.seed)
+    _print_results(results)
+    write_results(args.output, results, vars(args))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        rows = compare(load_results(args.compare), results, args.threshold)
+        for row in rows:
+            flag = "REGRESSION" if row["regression"] else ""
+            print(f"{row['name']:<40} {row['baseline']:10.3f} -> {row['current']:10.3f} {row['unit']:<10} {row['change']:+7.1%} {flag}")
+        if any(row["regression"] for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
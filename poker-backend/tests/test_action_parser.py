@@ -0,0 +1,92 @@
+import pytest
+
+from app.services.action_parser import (
+    Action,
+    ActionSequenceError,
+    parse_action,
+    parse_cache_stats,
+    parse_sequence,
+)
+from app.services.cards import parse_cards
+from app.services.hand_logic import calculate_winnings, parse_action_sequence
+from app.services.settlement import SettlementError
+
+SEQUENCE = "r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b1000 f"
+
+
+def test_parses_typed_actions_and_board():
+    parsed = parse_sequence(SEQUENCE)
+    assert [street.name for street in parsed.streets] == ["preflop", "flop", "turn", "river"]
+    preflop = parsed.street("preflop")
+    assert preflop.actions[0] == Action(verb="r", amount=200)
+    assert [action.token for action in parsed.street("flop").actions] == ["x", "b400", "c", "f"]
+    assert parsed.street("flop").board == tuple(parse_cards(["Ks", "Qd", "Jc"]))
+    assert parsed.board == tuple(parse_cards(["Ks", "Qd", "Jc", "2h", "8s"])) # Codes, see app/services/cards.py
+
+
+def test_actor_prefix():
+    actions = parse_sequence("Player4:f Player5:r120 allin").street("preflop").actions
+    assert [(action.actor, action.verb, action.amount) for action in actions] == [
+        ("Player4", "f", None),
+        ("Player5", "r", 120),
+        (None, "allin", None),
+    ]
+
+
+def test_segments_on_one_street_are_concatenated():
+    parsed = parse_sequence("r200 / c c / Flop: [Ks,Qd,Jc] / x / x")
+    assert [action.token for action in parsed.street("preflop").actions] == ["r200", "c", "c"]
+    assert [action.token for action in parsed.street("flop").actions] == ["x", "x"]
+
+
+def test_only_dealt_streets_are_returned():
+    parsed = parse_sequence("f")
+    assert [street.name for street in parsed.streets] == ["preflop"]
+    assert parsed.street("flop") is None and parsed.board == ()
+
+
+@pytest.mark.parametrize("sequence, position, message", [
+    ("r200 c q", 7, "Invalid action 'q'"),
+    ("r200 c c / Flop: [Ks,Qd,Zz]", 24, "Invalid card 'Zz'"),
+    ("r200 c c / Flop: [Ks,Qd]", 18, "deals 3 card"),
+    ("r200 c c / Turn: [2h]", 11, "Turn cannot follow the preflop"),
+    ("c x / Flop: [Ks,Qd,Jc] / Flop: [2h,3h,4h]", 25, "Flop cannot follow the flop"),
+    ("b", 0, "Invalid action 'b'"),
+    ("r200 c c / Flop [Ks,Qd,Jc]", 11, "Invalid action 'Flop'"),
+])
+def test_errors_report_position(sequence, position, message):
+    with pytest.raises(ActionSequenceError, match=message) as excinfo:
+        parse_sequence(sequence)
+    assert excinfo.value.position == position
+    assert f"at position {position}" in str(excinfo.value)
+
+
+def test_parse_action():
+    assert parse_action("Player1:b400") == Action(verb="b", amount=400, actor="Player1")
+    with pytest.raises(ValueError):
+        parse_action("b")
+
+
+def test_repeated_sequences_are_cached():
+    before = parse_cache_stats()["hits"]
+    sequence = "c x / Flop: [9s,8s,7s] / x x"
+    assert parse_sequence(sequence) is parse_sequence(sequence)
+    assert parse_cache_stats()["hits"] == before + 1
+
+
+def test_legacy_dict_form():
+    assert parse_action_sequence(SEQUENCE) == {
+        "preflop": ["r200", "c", "c"],
+        "flop": ["x", "b400", "c", "f"],
+        "turn": ["x", "x"],
+        "river": ["x", "b1000", "f"],
+        "community_cards": {"flop": ["Ks", "Qd", "Jc"], "turn": ["2h"], "river": ["8s"]},
+    }
+
+
+def test_settlement_checks_named_actors():
+    stacks = {"A": 1000, "B": 1000}
+    # Heads-up the button (A) acts first preflop
+    assert calculate_winnings(stacks, {}, "A:f", {"dealer": "A"}) == {"A": -20, "B": 20}
+    with pytest.raises(SettlementError, match="B acted on preflop but it was A's turn"):
+        calculate_winnings(stacks, {}, "B:f", {"dealer": "A"})
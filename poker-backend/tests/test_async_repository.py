@@ -0,0 +1,145 @@
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.db.migrations import LATEST_VERSION
+from app.models.hand import HandData, HandFilters, HandPage
+from app.repositories import hand_repository
+from app.repositories.async_hand_repository import AsyncHandRepository, numbered_placeholders
+from app.repositories.hand_repository import HandRepository, encode_cursor, get_repository
+from app.services.cards import encode_hole_cards
+from app.services.hand_export import aiter_export, iter_export
+
+client = TestClient(app)
+
+hand = HandData(
+    stack_settings={"A": 1000, "B": 1000},
+    player_roles={"dealer": "A"},
+    hole_cards={"A": ["As", "Ad"], "B": ["Kc", "Kd"]},
+    action_sequence="f",
+    winnings={"A": 20, "B": -20},
+)
+
+def _row(h: HandData) -> dict:
+    return {
+        "id": h.id,
+        "created_at": h.created_at.replace(tzinfo=timezone.utc),
+        "stack_settings": h.stack_settings,
+        "player_roles": h.player_roles,
+        "hole_cards": encode_hole_cards(h.stack_settings, h.hole_cards),
+        "action_sequence": h.action_sequence,
+        "winnings": h.winnings,
+    }
+
+@pytest.fixture
+def async_repository():
+    """An async repository double, as selected by DB_DRIVER=asyncpg."""
+    repo = AsyncMock(spec=AsyncHandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: repo
+    yield repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+@pytest.fixture
+def fake_connection():
+    """Patch the asyncpg pool with a single fake connection."""
+    conn = MagicMock()
+    conn.fetchval = AsyncMock(return_value=True)
+    conn.fetchrow = AsyncMock()
+    conn.fetch = AsyncMock()
+
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    with patch("app.repositories.async_hand_repository.async_connection", connection):
+        yield conn
+
+def test_numbered_placeholders():
+    assert numbered_placeholders("stack_settings ? %s AND pot >= %s LIMIT %s") == "stack_settings ? $1 AND pot >= $2 LIMIT $3"
+
+def test_async_repository_is_awaited_by_endpoints(async_repository):
+    """Endpoints await async repository methods instead of dispatching them to the threadpool."""
+    async_repository.get_hand_by_id.return_value = hand
+    async_repository.get_hands_page.return_value = HandPage(hands=[hand])
+
+    assert client.get(f"/hands/{hand.id}").json()["id"] == str(hand.id)
+    assert client.get("/hands/").json()["hands"][0]["id"] == str(hand.id)
+    async_repository.get_hand_by_id.assert_awaited_once_with(hand.id)
+    async_repository.get_hands_page.assert_awaited_once()
+
+def test_async_batch_insert(async_repository):
+    async_repository.create_hands_bulk.return_value = 1
+    payload = {k: v for k, v in vars(hand).items() if k in ("stack_settings", "player_roles", "hole_cards", "action_sequence")}
+    response = client.post("/hands/batch", json=[payload])
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    async_repository.create_hands_bulk.assert_awaited_once()
+
+def test_async_export_matches_sync_export(async_repository):
+    hands = [hand, HandData(action_sequence="f", winnings={"A": -20, "B": 20})]
+
+    async def stream(**kwargs):
+        for h in hands:
+            yield h
+    async_repository.iter_hands = stream
+
+    response = client.get("/hands/export?format=csv")
+    assert response.status_code == 200
+    assert response.content == b"".join(iter_export(hands, "csv"))
+
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+def test_aiter_export_chunks_match_iter_export(export_format):
+    hands = [HandData(action_sequence=str(i)) for i in range(7)]
+
+    async def stream():
+        for h in hands:
+            yield h
+
+    async def collect():
+        return [chunk async for chunk in aiter_export(stream(), export_format, rows_per_chunk=3)]
+
+    assert b"".join(asyncio.run(collect())) == b"".join(iter_export(hands, export_format))
+
+def test_async_get_hands_page_translates_cursor_and_filters(fake_connection):
+    created_at = datetime(2024, 1, 2, 3, 4, 5)
+    fake_connection.fetch.return_value = [_row(hand), _row(hand)]
+    cursor = encode_cursor(created_at, hand.id)
+
+    page = asyncio.run(AsyncHandRepository().get_hands_page(limit=1, cursor=cursor, filters=HandFilters(player="A", min_pot=10)))
+
+    sql, *params = fake_connection.fetch.call_args.args
+    assert "stack_settings ? $1" in sql and "pot >= $2" in sql and "(created_at, id) < ($3, $4)" in sql and "LIMIT $5" in sql
+    assert params[:2] == ["A", 10]
+    assert params[2].tzinfo is not None # Naive timestamps are bound as UTC
+    assert params[3] == hand.id and params[4] == 2
+    assert page.hands[0].id == hand.id
+    assert page.next_cursor is not None
+
+def test_async_get_hand_by_id_missing_table(fake_connection):
+    fake_connection.fetchval.return_value = False
+    repo = AsyncHandRepository()
+    assert asyncio.run(repo.get_hand_by_id(hand.id)) is None
+    assert repo.schema_state()["table_exists"] is False
+    assert not fake_connection.fetchrow.called
+
+def test_async_refresh_schema_state_reads_version(fake_connection):
+    fake_connection.fetchval.side_effect = [True, True, LATEST_VERSION]
+    repo = AsyncHandRepository()
+    assert asyncio.run(repo.refresh_schema_state()) is True
+    assert repo.schema_state()["version"] == LATEST_VERSION
+    assert not repo.schema_refresh_due
+
+def test_get_repository_follows_db_driver():
+    with patch.object(hand_repository, "_repository", None), patch.object(hand_repository, "DB_DRIVER", "asyncpg"):
+        assert isinstance(get_repository(), AsyncHandRepository)
+    with patch.object(hand_repository, "_repository", None), patch.object(hand_repository, "DB_DRIVER", "psycopg2"):
+        assert isinstance(get_repository(), HandRepository)
+    with patch.object(hand_repository, "_repository", None), patch.object(hand_repository, "DB_DRIVER", "mysql"):
+        with pytest.raises(ValueError):
+            get_repository()
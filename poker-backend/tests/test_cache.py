@@ -0,0 +1,130 @@
+import asyncio
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.models.hand import HandData, HandPage
+from app.repositories.async_hand_repository import AsyncHandRepository
+from app.repositories.cached_hand_repository import CachedHandRepository
+from app.repositories.hand_repository import HandRepository
+from app.services.cache import LocalCache
+
+client = TestClient(app)
+
+hand = HandData(
+    stack_settings={"A": 1000, "B": 1000},
+    player_roles={"dealer": "A"},
+    hole_cards={"A": ["As", "Ad"], "B": ["Kc", "Kd"]},
+    action_sequence="f",
+    winnings={"A": 20, "B": -20},
+)
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def cached_repository():
+    """A cached repository over a sync repository double, installed as the API dependency."""
+    inner = MagicMock(spec=HandRepository)
+    inner.table_exists = True
+    repo = CachedHandRepository(inner, LocalCache(100))
+    app.dependency_overrides[get_hand_repository] = lambda: repo
+    yield repo, inner
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+def test_local_cache_evicts_least_recently_used():
+    cache = LocalCache(2)
+    cache.set("a", 1, ttl=60)
+    cache.set("b", 2, ttl=60)
+    assert cache.get("a") == 1 # "b" is now the least recently used
+    cache.set("c", 3, ttl=60)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_local_cache_expires_entries():
+    clock = FakeClock()
+    cache = LocalCache(10, clock=clock)
+    cache.set("a", 1, ttl=5)
+    clock.now = 4.9
+    assert cache.get("a") == 1
+    clock.now = 5.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1 and cache.stats()["size"] == 0
+
+def test_local_cache_counters():
+    cache = LocalCache(1)
+    assert cache.counter("gen") == 0
+    assert cache.incr("gen") == 1 and cache.incr("gen") == 2
+    cache.set("x", 1, ttl=60)
+    cache.set("y", 2, ttl=60) # Evicting entries never touches counters
+    assert cache.counter("gen") == 2
+
+def test_hand_lookup_is_served_from_cache(cached_repository):
+    repo, inner = cached_repository
+    inner.get_hand_by_id.return_value = hand
+
+    for _ in range(3):
+        response = client.get(f"/hands/{hand.id}")
+        assert response.status_code == 200
+        assert response.json()["id"] == str(hand.id)
+
+    inner.get_hand_by_id.assert_called_once_with(hand.id)
+    stats = client.get("/hands/cache").json()
+    assert stats["enabled"] is True
+    assert stats["hand_hits"] == 2 and stats["hand_misses"] == 1
+    assert stats["backend"] == "local"
+
+def test_missing_hand_is_not_cached(cached_repository):
+    repo, inner = cached_repository
+    inner.get_hand_by_id.return_value = None
+    assert client.get(f"/hands/{uuid.uuid4()}").status_code == 404
+    assert repo.cache_stats()["size"] == 0
+
+def test_first_page_cached_and_invalidated_by_insert(cached_repository):
+    repo, inner = cached_repository
+    inner.get_hands_page.return_value = HandPage(hands=[hand])
+    inner.create_hands_bulk.return_value = 1
+
+    client.get("/hands/?limit=10")
+    client.get("/hands/?limit=10")
+    assert inner.get_hands_page.call_count == 1
+    client.get("/hands/?limit=10&player=A") # Different filters, different entry
+    assert inner.get_hands_page.call_count == 2
+
+    payload = {k: vars(hand)[k] for k in ("stack_settings", "player_roles", "hole_cards", "action_sequence")}
+    assert client.post("/hands/batch", json=[payload]).json()["created"] == 1
+    client.get("/hands/?limit=10")
+    assert inner.get_hands_page.call_count == 3
+    assert repo.cache_stats()["invalidations"] == 1
+
+def test_cursor_pages_bypass_cache(cached_repository):
+    repo, inner = cached_repository
+    inner.get_hands_page.return_value = HandPage(hands=[hand])
+    asyncio.run(repo.get_hands_page(limit=10, cursor="abc"))
+    asyncio.run(repo.get_hands_page(limit=10, cursor="abc"))
+    assert inner.get_hands_page.call_count == 2
+
+def test_created_hand_is_written_through():
+    inner = AsyncMock(spec=AsyncHandRepository)
+    inner.create_hand.return_value = hand
+    repo = CachedHandRepository(inner, LocalCache(10))
+
+    asyncio.run(repo.create_hand(hand))
+    assert asyncio.run(repo.get_hand_by_id(hand.id)) is hand
+    assert not inner.get_hand_by_id.called
+
+def test_cache_stats_when_disabled():
+    app.dependency_overrides[get_hand_repository] = lambda: MagicMock(spec=HandRepository)
+    try:
+        assert client.get("/hands/cache").json()["enabled"] is False
+    finally:
+        app.dependency_overrides.pop(get_hand_repository, None)
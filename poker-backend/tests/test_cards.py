@@ -0,0 +1,84 @@
+import psycopg2
+import pytest
+from psycopg2.extras import Json
+
+from app.db.migrations import HOLE_CARD_CODES_VERSION, LATEST_VERSION
+from app.repositories.async_hand_repository import AsyncHandRepository
+from app.repositories.hand_repository import HandRepository, row_hole_cards
+from app.models.hand import HandData
+from app.services.cards import (
+    CARD_CODES,
+    CARD_NAMES,
+    UNKNOWN_CARD,
+    as_codes,
+    card_to_int,
+    decode_hole_cards,
+    encode_hole_cards,
+    first_duplicate,
+)
+from app.services.settlement import SettlementError, settle_hand
+
+def test_codes_round_trip():
+    assert len(CARD_NAMES) == 52 and len(set(CARD_NAMES)) == 52
+    assert card_to_int("2c") == 0 and card_to_int("As") == 51
+    assert all(CARD_CODES[name] == code for code, name in enumerate(CARD_NAMES))
+    assert as_codes(["Kd", 3, "2c"]) == [CARD_CODES["Kd"], 3, 0]
+
+@pytest.mark.parametrize("card", ["", "A", "1s", "Ax", "as", "AsK", 52, -1, None])
+def test_invalid_cards_are_rejected(card):
+    with pytest.raises(ValueError):
+        as_codes([card])
+
+def test_first_duplicate():
+    assert first_duplicate(as_codes(["As", "Kd", "Qh"])) is None
+    assert first_duplicate(as_codes(["As", "Kd", "As", "Kd"])) == CARD_CODES["As"]
+
+def test_hole_cards_storage_round_trip():
+    stacks = {"B": 1000, "a": 1000, "A": 1000}
+    hole_cards = {"B": ["Kc", "Kd"], "A": ["As", "Ad"]}
+    codes = encode_hole_cards(stacks, hole_cards)
+    # Byte order, as PostgreSQL sorts with COLLATE "C": "A" < "B" < "a"
+    assert codes == [CARD_CODES["As"], CARD_CODES["Ad"], CARD_CODES["Kc"], CARD_CODES["Kd"], UNKNOWN_CARD, UNKNOWN_CARD]
+    assert decode_hole_cards(stacks, codes) == {"A": ["As", "Ad"], "B": ["Kc", "Kd"]}
+    assert decode_hole_cards(stacks, None) == {}
+
+def test_repository_stores_codes_and_reads_either_form():
+    hand = HandData(stack_settings={"A": 1000, "B": 1000}, hole_cards={"B": ["Kc", "Kd"]}, winnings={"A": -20, "B": 20})
+    stored = HandRepository()._hand_params(hand)[4]
+    assert stored == [UNKNOWN_CARD, UNKNOWN_CARD, CARD_CODES["Kc"], CARD_CODES["Kd"]]
+    assert row_hole_cards({"stack_settings": hand.stack_settings, "hole_cards": stored}) == {"B": ["Kc", "Kd"]}
+    # A row read before migration 7 has swapped the column
+    assert row_hole_cards({"stack_settings": hand.stack_settings, "hole_cards": {"B": ["Kc", "Kd"]}}) == {"B": ["Kc", "Kd"]}
+
+@pytest.mark.parametrize("repository", [HandRepository, AsyncHandRepository])
+def test_hole_cards_are_written_as_json_until_migration_7(repository):
+    hand = HandData(stack_settings={"A": 1000, "B": 1000}, hole_cards={"B": ["Kc", "Kd"]}, winnings={"A": -20, "B": 20})
+    repo = repository()
+    repo._schema_version = HOLE_CARD_CODES_VERSION - 1
+    params = repo._hand_params(hand) if repository is HandRepository else repo._hand_values(hand)
+    stored = params[4]
+    assert (stored.adapted if isinstance(stored, Json) else stored) == {"B": ["Kc", "Kd"]}
+    repo._schema_version = HOLE_CARD_CODES_VERSION
+    params = repo._hand_params(hand) if repository is HandRepository else repo._hand_values(hand)
+    assert params[4] == [UNKNOWN_CARD, UNKNOWN_CARD, CARD_CODES["Kc"], CARD_CODES["Kd"]]
+
+def test_failed_write_behind_the_schema_rechecks_it():
+    # Another worker may have swapped the column since this one cached version 6
+    repo = HandRepository()
+    repo._table_exists, repo._schema_version = True, HOLE_CARD_CODES_VERSION - 1
+    repo._on_query_error(psycopg2.errors.InvalidTextRepresentation("malformed array literal"))
+    assert repo._table_exists is None
+    # A current schema keeps its cached state on errors that are about the data
+    repo._table_exists, repo._schema_version = True, LATEST_VERSION
+    repo._on_query_error(psycopg2.errors.InvalidTextRepresentation("malformed array literal"))
+    assert repo._table_exists is True
+
+@pytest.mark.parametrize("hole_cards, streets, message", [
+    ({"A": ["As", "Xx"]}, {}, "Invalid hole cards"),
+    ({"A": ["As"]}, {}, "exactly two"),
+    ({"A": ["As", "Kd"], "B": ["As", "Qd"]}, {}, "Card As appears more than once"),
+    ({"A": ["As", "Kd"]}, {"flop": {"board": [CARD_CODES["Kd"], 0, 1], "actions": []}}, "Card Kd appears more than once"),
+])
+def test_settlement_validates_cards_through_the_codec(hole_cards, streets, message):
+    with pytest.raises(SettlementError, match=message):
+        settle_hand({"A": 1000, "B": 1000}, {"dealer": "A"}, hole_cards, {"preflop": {"actions": ["f"]}, **streets})
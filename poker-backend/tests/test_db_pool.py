@@ -0,0 +1,163 @@
+import sys
+import threading
+import time
+
+import psycopg2.extensions
+import pytest
+
+from app.db.pool import ConnectionPool, PoolClosedError, PoolTimeoutError
+
+
+class FakeInfo:
+    transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, query, params=None):
+        if self.conn.broken:
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """Minimal stand-in for a psycopg2 connection."""
+
+    def __init__(self):
+        self.closed = 0
+        self.autocommit = False
+        self.broken = False
+        self.rollbacks = 0
+        self.info = FakeInfo()
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConnection()
+        created.append(conn)
+        return conn
+
+    options = dict(min_size=1, max_size=2, timeout=0.2, max_lifetime=60, health_check_idle=30)
+    options.update(kwargs)
+    return ConnectionPool("fake://", connect=connect, **options), created
+
+
+def test_open_prefills_min_size():
+    pool, created = make_pool(min_size=2, max_size=4)
+    pool.open()
+    assert len(created) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_connections_are_reused():
+    pool, created = make_pool()
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert len(created) == 1
+    assert pool.stats()["checkouts"] == 2
+
+
+def test_checkout_timeout_when_exhausted():
+    pool, _ = make_pool(max_size=1, timeout=0.05)
+    conn = pool.getconn()
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+    assert pool.stats()["timeouts"] == 1
+    pool.putconn(conn)
+
+
+def test_waiter_gets_returned_connection():
+    pool, _ = make_pool(max_size=1, timeout=2)
+    conn = pool.getconn()
+    result = {}
+
+    def waiter():
+        result["conn"] = pool.getconn()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    time.sleep(0.05)
+    pool.putconn(conn)
+    thread.join(1)
+    assert result["conn"] is conn
+
+
+def test_expired_connections_are_replaced():
+    pool, created = make_pool(max_lifetime=0.01)
+    with pool.connection():
+        pass
+    time.sleep(0.02)
+    with pool.connection() as conn:
+        assert conn is created[1]
+    assert created[0].closed
+
+
+def test_failed_health_check_discards_connection():
+    pool, created = make_pool(health_check_idle=0)
+    with pool.connection():
+        pass
+    created[0].broken = True
+    with pool.connection() as conn:
+        assert conn is created[1]
+    assert pool.stats()["health_check_failures"] == 1
+
+
+def test_open_transaction_is_rolled_back_on_return():
+    pool, created = make_pool()
+    conn = pool.getconn()
+    conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    pool.putconn(conn)
+    assert conn.rollbacks == 1
+
+
+def test_closed_pool_rejects_checkout():
+    pool, created = make_pool()
+    pool.open()
+    pool.close()
+    assert created[0].closed
+    with pytest.raises(PoolClosedError):
+        pool.getconn()
+
+
+def test_counters_are_consistent_under_concurrency():
+    pool, created = make_pool(max_size=4, timeout=5)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+
+    def churn():
+        for _ in range(200):
+            conn = pool.getconn()
+            pool.putconn(conn, discard=True)
+
+    try:
+        threads = [threading.Thread(target=churn) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    stats = pool.stats()
+    assert stats["connections_opened"] == stats["connections_closed"] == len(created) == 1600
+    assert stats["size"] == 0
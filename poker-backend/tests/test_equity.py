@@ -0,0 +1,193 @@
+import uuid
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.hand import get_hand_repository
+from app.main import app
+from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository
+from app.services import equity
+from app.services.equity import EquityBudget, canonical_spot, clear_exact_cache, compute_equity, exact_cache_stats
+from app.services.evaluator import parse_cards
+
+client = TestClient(app)
+
+ACES_VS_KINGS = {"Player1": ["As", "Ad"], "Player2": ["Kc", "Kd"]}
+
+
+@pytest.fixture(autouse=True)
+def single_process(monkeypatch):
+    monkeypatch.setattr(equity, "EQUITY_WORKERS", 1)
+
+
+def test_preflop_equity_is_estimated():
+    streets = compute_equity(ACES_VS_KINGS, [], EquityBudget(max_iterations=50_000))
+    assert [street.street for street in streets] == ["preflop"]
+    preflop = streets[0]
+    assert not preflop.exact
+    # Aces are about an 82% favourite over kings
+    assert preflop.players["Player1"].equity == pytest.approx(0.82, abs=0.02)
+    assert preflop.players["Player1"].equity + preflop.players["Player2"].equity == pytest.approx(1)
+
+
+def test_every_known_street_is_reported():
+    streets = compute_equity(ACES_VS_KINGS, ["Kh", "7d", "2c", "3s", "9h"], EquityBudget(max_iterations=5_000))
+    assert [street.street for street in streets] == ["preflop", "flop", "turn", "river"]
+    assert streets[1].board == ["Kh", "7d", "2c"]
+    river = streets[-1]
+    assert river.exact and river.iterations == 1
+    assert river.players["Player2"].win == 1.0
+
+
+def test_split_pot_counts_as_tie():
+    streets = compute_equity(
+        {"A": ["2c", "3d"], "B": ["2h", "3s"]},
+        ["Ah", "Kh", "Qh", "Jd", "Tc"],
+        EquityBudget(max_iterations=1_000),
+    )
+    river = streets[-1].players
+    assert river["A"].tie == 1.0 and river["A"].equity == 0.5
+
+
+def test_iteration_budget_is_respected():
+    streets = compute_equity(ACES_VS_KINGS, [], EquityBudget(max_iterations=1_000, target_ci=0.0001))
+    assert streets[0].iterations == 1_000
+
+
+def test_stops_at_target_confidence_interval(monkeypatch):
+    monkeypatch.setattr(equity, "EQUITY_BATCH_SIZE", 1_000)
+    streets = compute_equity(ACES_VS_KINGS, [], EquityBudget(max_iterations=1_000_000, target_ci=0.02))
+    assert streets[0].iterations < 1_000_000
+    assert streets[0].ci_half_width <= 0.02
+
+
+@pytest.mark.parametrize("hole_cards, board", [
+    ({"A": ["As", "Ad"]}, []),
+    ({"A": ["As", "Ad"], "B": ["As", "Kd"]}, []),
+    ({"A": ["As", "Ad"], "B": ["Kc", "Kd"]}, ["2c"]),
+    ({"A": ["As", "Ad"], "B": ["Kc", "Xd"]}, []),
+])
+def test_invalid_input_is_rejected(hole_cards, board):
+    with pytest.raises(ValueError):
+        compute_equity(hole_cards, board)
+
+
+def test_process_pool(monkeypatch):
+    monkeypatch.setattr(equity, "EQUITY_WORKERS", 2)
+    monkeypatch.setattr(equity, "EQUITY_BATCH_SIZE", 2_000)
+    try:
+        streets = compute_equity(
+            ACES_VS_KINGS, ["2s", "7d", "9c"], EquityBudget(max_iterations=8_000, target_ci=0.0001), mode="monte_carlo"
+        )
+        clear_exact_cache()
+        pooled = compute_equity({"A": ["Qs", "Qd"], "B": ["Jc", "Tc"]}, ["2s", "7d", "9c"], EquityBudget(max_iterations=1_000))
+    finally:
+        equity.shutdown_executor()
+    assert [street.iterations for street in streets] == [8_000, 8_000]
+    # Chunked enumeration across workers covers every runout exactly once
+    monkeypatch.setattr(equity, "EQUITY_WORKERS", 1)
+    clear_exact_cache()
+    local = compute_equity({"A": ["Qs", "Qd"], "B": ["Jc", "Tc"]}, ["2s", "7d", "9c"], EquityBudget(max_iterations=1_000))
+    assert pooled[1].iterations == local[1].iterations == 990
+    assert pooled[1].players["A"] == local[1].players["A"]
+
+
+def test_exact_equity_enumerates_every_runout():
+    streets = compute_equity(ACES_VS_KINGS, ["Kh", "7d", "2c", "3s"], mode="exact")
+    preflop, flop, turn = streets
+    assert all(street.exact and street.ci_half_width == 0 for street in streets)
+    assert (preflop.iterations, flop.iterations, turn.iterations) == (1_712_304, 990, 44)
+    assert preflop.players["Player1"].equity == pytest.approx(0.8195, abs=0.0005)
+    # Kings flopped a set; only the two remaining aces save Player1 on the river
+    assert turn.players["Player1"].win == pytest.approx(2 / 44)
+
+
+def test_auto_mode_enumerates_from_the_flop():
+    preflop, flop = compute_equity(ACES_VS_KINGS, ["2s", "7d", "9c"], EquityBudget(max_iterations=1_000))
+    assert not preflop.exact and preflop.iterations == 1_000
+    assert flop.exact and flop.iterations == 990
+
+
+def test_canonical_spot_ignores_suits_seats_and_board_order():
+    key, _ = canonical_spot([parse_cards(["As", "Ad"]), parse_cards(["Kc", "Kd"])], parse_cards(["2s", "7d", "9c"]))
+    relabelled, _ = canonical_spot([parse_cards(["Kh", "Ks"]), parse_cards(["Ah", "Ac"])], parse_cards(["9s", "2c", "7h"]))
+    assert key == relabelled
+
+
+def test_isomorphic_spots_hit_the_cache():
+    clear_exact_cache()
+    first = compute_equity({"A": ["As", "Ad"], "B": ["Kc", "Kd"]}, ["2s", "7d", "9c"], mode="exact")
+    # Same spot with suits relabelled (s<->c, d<->h) and seats swapped
+    second = compute_equity({"X": ["Kh", "Ks"], "Y": ["Ac", "Ah"]}, ["2c", "7h", "9s"], mode="exact")
+    stats = exact_cache_stats()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["size"] == 2
+    assert second[1].players["Y"].equity == first[1].players["A"].equity
+
+
+def test_exact_runout_limit(monkeypatch):
+    monkeypatch.setattr(equity, "EQUITY_EXACT_MAX_RUNOUTS", 1_000)
+    clear_exact_cache()
+    with pytest.raises(ValueError, match="limit"):
+        compute_equity(ACES_VS_KINGS, [], mode="exact")
+
+
+def test_equity_cache_endpoint():
+    response = client.get("/equity/cache")
+    assert response.status_code == 200
+    assert set(response.json()) == {"hits", "misses", "hit_ratio", "size", "max_size"}
+
+
+def test_equity_endpoint_reads_board_from_action_sequence():
+    response = client.post("/equity/", json={
+        "hole_cards": ACES_VS_KINGS,
+        "action_sequence": "r200 c / Flop: [2s,7d,9c] / x x",
+        "max_iterations": 2_000,
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert [street["street"] for street in data["streets"]] == ["preflop", "flop"]
+    assert data["streets"][1]["board"] == ["2s", "7d", "9c"]
+    assert set(data["streets"][1]["players"]["Player1"]) == {"win", "tie", "equity"}
+
+
+def test_equity_endpoint_rejects_duplicate_cards():
+    response = client.post("/equity/", json={"hole_cards": {"A": ["As", "Ad"], "B": ["As", "Kd"]}})
+    assert response.status_code == 400
+
+
+def test_equity_for_stored_hand():
+    hand = HandData(
+        id=uuid.uuid4(),
+        created_at=datetime.utcnow(),
+        stack_settings={"Player1": 1000, "Player2": 1000},
+        player_roles={"dealer": "Player1"},
+        hole_cards=ACES_VS_KINGS,
+        action_sequence="c x / Flop: [2s,7d,9c] / x x / Turn: [3h] / x x / River: [4s] / x x",
+        winnings={"Player1": 40, "Player2": -40},
+    )
+    repo = MagicMock(spec=HandRepository)
+    repo.get_hand_by_id.return_value = hand
+    app.dependency_overrides[get_hand_repository] = lambda: repo
+    try:
+        response = client.post(f"/equity/hands/{hand.id}", json={"max_iterations": 1_000})
+    finally:
+        app.dependency_overrides.pop(get_hand_repository, None)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["hand_id"] == str(hand.id)
+    assert [street["street"] for street in data["streets"]] == ["preflop", "flop", "turn", "river"]
+    assert data["streets"][-1]["players"]["Player1"]["win"] == 1.0
+
+
+def test_equity_for_missing_hand():
+    repo = MagicMock(spec=HandRepository)
+    repo.get_hand_by_id.return_value = None
+    app.dependency_overrides[get_hand_repository] = lambda: repo
+    try:
+        response = client.post(f"/equity/hands/{uuid.uuid4()}")
+    finally:
+        app.dependency_overrides.pop(get_hand_repository, None)
+    assert response.status_code == 404
@@ -0,0 +1,85 @@
+import random
+
+import pytest
+from pokerkit import StandardHighHand
+
+from app.services import evaluator
+from app.services.cards import card_to_int, int_to_card
+from app.services.evaluator import (
+    TABLE_FILE,
+    evaluate,
+    evaluate_cards,
+    hand_category,
+    load_tables,
+)
+
+DECK = [int_to_card(i) for i in range(52)]
+
+
+def pokerkit_hand(cards):
+    return StandardHighHand.from_game("".join(cards[:2]), "".join(cards[2:]))
+
+
+def test_card_round_trip():
+    assert card_to_int("2c") == 0
+    assert card_to_int("As") == 51
+    assert [int_to_card(card_to_int(card)) for card in DECK] == DECK
+    with pytest.raises(ValueError):
+        card_to_int("1x")
+
+
+@pytest.mark.parametrize("count", [5, 6, 7])
+def test_ordering_matches_pokerkit(count):
+    rng = random.Random(count)
+    for _ in range(300):
+        first = rng.sample(DECK, count)
+        second = rng.sample(DECK, count)
+        expected_first, expected_second = pokerkit_hand(first), pokerkit_hand(second)
+        actual_first, actual_second = evaluate_cards(first), evaluate_cards(second)
+        assert (actual_first > actual_second) == (expected_first > expected_second), (first, second)
+        assert (actual_first == actual_second) == (expected_first == expected_second), (first, second)
+
+
+@pytest.mark.parametrize("cards, category", [
+    (["2c", "3d", "4h", "5s", "7c", "9d", "Jh"], "high_card"),
+    (["Ac", "Ad", "4h", "5s", "7c", "9d", "Jh"], "pair"),
+    (["Ac", "Ad", "4h", "4s", "7c", "7d", "Jh"], "two_pair"),
+    (["Ac", "Ad", "Ah", "5s", "7c", "9d", "Jh"], "three_of_a_kind"),
+    (["Ac", "2d", "3h", "4s", "5c", "9d", "Jh"], "straight"),
+    (["2h", "5h", "7h", "9h", "Jh", "Js", "Jd"], "flush"),
+    (["Ac", "Ad", "Ah", "Ks", "Kc", "Kd", "Jh"], "full_house"),
+    (["Ac", "Ad", "Ah", "As", "Kc", "Kd", "Kh"], "four_of_a_kind"),
+    (["9h", "Th", "Jh", "Qh", "Kh", "Ah", "As"], "straight_flush"),
+])
+def test_hand_category(cards, category):
+    assert hand_category(evaluate_cards(cards)) == category
+
+
+def test_strength_range():
+    assert evaluate_cards(["2c", "3d", "4h", "5s", "7c"]) == 1
+    assert evaluate_cards(["Ts", "Js", "Qs", "Ks", "As"]) == 7462
+
+
+def test_rejects_wrong_card_count():
+    with pytest.raises(ValueError):
+        evaluate([0, 1, 2, 3])
+
+
+def test_table_is_cached_and_mapped(tmp_path):
+    try:
+        load_tables(str(tmp_path))
+        assert (tmp_path / TABLE_FILE).exists()
+        assert load_tables(str(tmp_path)) == "mmap"
+        assert evaluate_cards(["Ts", "Js", "Qs", "Ks", "As"]) == 7462
+    finally:
+        evaluator._tables = None
+
+
+def test_corrupt_table_is_rebuilt(tmp_path):
+    (tmp_path / TABLE_FILE).write_bytes(b"garbage")
+    try:
+        load_tables(str(tmp_path))
+        assert (tmp_path / TABLE_FILE).stat().st_size > 100_000
+        assert evaluate_cards(["2c", "3d", "4h", "5s", "7c"]) == 1
+    finally:
+        evaluator._tables = None
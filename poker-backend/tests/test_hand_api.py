@@ -1,8 +1,14 @@
+import csv
+import io
+import json
 import pytest
 from fastapi.testclient import TestClient
 from app.main import app
+from app.api.hand import get_hand_repository
+from app.db.migrations import LATEST_VERSION
 from app.repositories.hand_repository import HandRepository
-from app.models.hand import HandData
+from app.models.hand import HandData, HandFilters, HandPage
+from app.repositories.hand_repository import encode_cursor, decode_cursor
 import uuid
 from datetime import datetime
 from unittest.mock import patch, MagicMock
@@ -16,27 +22,27 @@ mock_hand_data = HandData(
     created_at=datetime.utcnow(),
     stack_settings={"Player1": 1000, "Player2": 1000, "Player3": 1000, "Player4": 1000, "Player5": 1000, "Player6": 1000},
     player_roles={"dealer": "Player1", "sb": "Player2", "bb": "Player3"},
-    hole_cards={"Player1": ["Ah", "Kd"], "Player2": ["Jc", "Js"], "Player3": ["7h", "8h"], 
+    hole_cards={"Player1": ["Ah", "Kd"], "Player2": ["Jd", "Js"], "Player3": ["7h", "8h"], 
                 "Player4": ["2c", "3d"], "Player5": ["Qh", "Td"], "Player6": ["5s", "5c"]},
-    action_sequence="r200 c c / Flop: [Ks,Qd,Jc] / b400 c / Turn: [2h] / x x / River: [8s] / x b1000 f",
-    winnings={"Player1": 1500, "Player2": -1000, "Player3": -500, "Player4": 0, "Player5": 0, "Player6": 0}
+    action_sequence="f f f r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b400 f",
+    winnings={"Player1": 800, "Player2": -200, "Player3": -600, "Player4": 0, "Player5": 0, "Player6": 0}
 )
 
 mock_hand_request = {
     "stack_settings": {"Player1": 1000, "Player2": 1000, "Player3": 1000, "Player4": 1000, "Player5": 1000, "Player6": 1000},
     "player_roles": {"dealer": "Player1", "sb": "Player2", "bb": "Player3"},
-    "hole_cards": {"Player1": ["Ah", "Kd"], "Player2": ["Jc", "Js"], "Player3": ["7h", "8h"], 
+    "hole_cards": {"Player1": ["Ah", "Kd"], "Player2": ["Jd", "Js"], "Player3": ["7h", "8h"], 
                   "Player4": ["2c", "3d"], "Player5": ["Qh", "Td"], "Player6": ["5s", "5c"]},
-    "action_sequence": "r200 c c / Flop: [Ks,Qd,Jc] / b400 c / Turn: [2h] / x x / River: [8s] / x b1000 f"
+    "action_sequence": "f f f r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b400 f"
 }
 
 @pytest.fixture
 def mock_repository():
     """Create a mock repository for testing."""
-    with patch('app.api.hand.get_hand_repository') as mock_get_repo:
-        mock_repo = MagicMock(spec=HandRepository)
-        mock_get_repo.return_value = mock_repo
-        yield mock_repo
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
 
 def test_read_root():
     """Test the root endpoint."""
@@ -44,10 +50,61 @@ def test_read_root():
     assert response.status_code == 200
     assert response.json() == {"status": "ok", "message": "Welcome to the Poker Hand API"}
 
+def test_readiness_reports_cached_schema_state():
+    """Readiness answers from the cached schema state without probing the database."""
+    repo = HandRepository()
+    repo._table_exists = True
+    repo._schema_version = LATEST_VERSION
+    with patch('app.main.get_repository', return_value=repo), \
+         patch('app.main.startup_report', return_value=MagicMock(complete=True, as_dict=lambda: {})), \
+         patch('app.repositories.hand_repository.check_table_exists') as mock_check:
+        response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["schema"]["table_exists"] is True
+    assert response.json()["schema"]["version"] == LATEST_VERSION
+    assert not mock_check.called
+
+def test_readiness_not_ready_when_table_missing():
+    """Readiness fails while the hands table is missing."""
+    repo = HandRepository()
+    repo._table_exists = False
+    with patch('app.main.get_repository', return_value=repo), \
+         patch('app.repositories.hand_repository.check_table_exists', return_value=False):
+        response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not_ready"
+
+def test_readiness_rereads_schema_version():
+    """A schema migrated outside this worker (init.sql, another worker) is picked up after the recheck interval."""
+    repo = HandRepository()
+    ready_report = MagicMock(complete=True, as_dict=lambda: {})
+    with patch('app.main.get_repository', return_value=repo), \
+         patch('app.main.startup_report', return_value=ready_report), \
+         patch('app.repositories.hand_repository.check_table_exists', return_value=True), \
+         patch('app.repositories.hand_repository.check_schema_version', return_value=LATEST_VERSION - 1) as mock_version:
+        assert client.get("/ready").status_code == 503
+        assert mock_version.call_count == 1
+
+        # Within the recheck interval the cached state answers
+        mock_version.return_value = LATEST_VERSION
+        assert client.get("/ready").status_code == 503
+        assert mock_version.call_count == 1
+
+        repo._schema_checked_monotonic -= 3600
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["schema"]["version"] == LATEST_VERSION
+        assert mock_version.call_count == 2
+
+        # Once current, readiness stops querying
+        repo._schema_checked_monotonic -= 3600
+        assert client.get("/ready").status_code == 200
+        assert mock_version.call_count == 2
+
 def test_get_all_hands(mock_repository):
-    """Test getting all hands."""
+    """Test getting the first page of hands."""
     # Setup mock
-    mock_repository.get_all_hands.return_value = [mock_hand_data]
+    mock_repository.get_hands_page.return_value = HandPage(hands=[mock_hand_data], next_cursor="abc")
     
     # Make request
     response = client.get("/hands/")
@@ -56,7 +113,64 @@ def test_get_all_hands(mock_repository):
     assert response.status_code == 200
     assert "hands" in response.json()
     assert len(response.json()["hands"]) == 1
-    assert mock_repository.get_all_hands.called
+    assert response.json()["next_cursor"] == "abc"
+    assert mock_repository.get_hands_page.called
+
+def test_get_all_hands_passes_cursor_and_filters(mock_repository):
+    """Pagination and filter query parameters are forwarded to the repository."""
+    mock_repository.get_hands_page.return_value = HandPage(hands=[])
+    cursor = encode_cursor(mock_hand_data.created_at, mock_hand_data.id)
+
+    response = client.get("/hands/", params={"limit": 10, "cursor": cursor, "player": "Player1", "min_pot": 100})
+
+    assert response.status_code == 200
+    assert response.json()["next_cursor"] is None
+    mock_repository.get_hands_page.assert_called_once_with(
+        limit=10,
+        cursor=cursor,
+        filters=HandFilters(player="Player1", min_pot=100),
+    )
+
+def test_get_all_hands_rejects_bad_cursor(mock_repository):
+    """A malformed continuation token is a client error."""
+    response = client.get("/hands/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+    assert not mock_repository.get_hands_page.called
+
+def test_get_all_hands_limit_is_bounded(mock_repository):
+    """Page sizes above the maximum are rejected."""
+    response = client.get("/hands/", params={"limit": 100000})
+    assert response.status_code == 422
+
+def test_cursor_round_trip():
+    """Cursors encode the keyset position opaquely and decode back to it."""
+    cursor = encode_cursor(mock_hand_data.created_at, mock_hand_data.id)
+    assert decode_cursor(cursor) == (mock_hand_data.created_at, str(mock_hand_data.id))
+
+def test_export_hands_ndjson(mock_repository):
+    """Export streams one JSON document per line."""
+    mock_repository.iter_hands.return_value = iter([mock_hand_data, mock_hand_data])
+
+    response = client.get("/hands/export", params={"player": "Player1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = response.text.strip().split("\n")
+    assert len(lines) == 2
+    assert json.loads(lines[0])["id"] == str(mock_hand_data.id)
+    assert mock_repository.iter_hands.call_args.kwargs["filters"] == HandFilters(player="Player1")
+
+def test_export_hands_csv(mock_repository):
+    """CSV export starts with a header row."""
+    mock_repository.iter_hands.return_value = iter([mock_hand_data])
+
+    response = client.get("/hands/export", params={"format": "csv"})
+
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert rows[0][0] == "id"
+    assert rows[1][0] == str(mock_hand_data.id)
+    assert json.loads(rows[1][6]) == mock_hand_data.winnings
 
 def test_get_hand_by_id(mock_repository):
     """Test getting a hand by ID."""
@@ -132,3 +246,48 @@ def test_create_hand_server_error(mock_process_hand, mock_repository):
     assert "Failed to save" in response.json()["detail"]
     mock_process_hand.assert_called_once()
     mock_repository.create_hand.assert_called_once()
+
+def test_create_hands_batch(mock_repository):
+    """A JSON array batch is validated per item and stored in one bulk call."""
+    mock_repository.create_hands_bulk.side_effect = lambda hands: len(hands)
+    invalid_hand = {"stack_settings": {"Player1": 1000}}
+
+    response = client.post("/hands/batch", json=[mock_hand_request, invalid_hand, mock_hand_request])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 2
+    assert body["failed"] == 1
+    assert [result["status"] for result in body["results"]] == ["created", "error", "created"]
+    assert body["results"][1]["error"]
+    mock_repository.create_hands_bulk.assert_called_once()
+    assert len(mock_repository.create_hands_bulk.call_args.args[0]) == 2
+
+def test_create_hands_batch_ndjson(mock_repository):
+    """NDJSON bodies are accepted and malformed lines are reported per item."""
+    mock_repository.create_hands_bulk.side_effect = lambda hands: len(hands)
+    body = json.dumps(mock_hand_request) + "\n{not json\n"
+
+    response = client.post("/hands/batch", content=body, headers={"Content-Type": "application/x-ndjson"})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["status"] == "created"
+    assert results[1]["status"] == "error"
+    assert "Invalid JSON line" in results[1]["error"]
+
+def test_create_hands_batch_database_failure(mock_repository):
+    """A failed bulk insert marks every otherwise-valid hand as failed."""
+    mock_repository.create_hands_bulk.side_effect = RuntimeError("connection lost")
+
+    response = client.post("/hands/batch", json=[mock_hand_request, mock_hand_request])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["created"] == 0
+    assert all("connection lost" in result["error"] for result in body["results"])
+
+def test_create_hands_batch_requires_array(mock_repository):
+    """A JSON body that is not an array is rejected."""
+    response = client.post("/hands/batch", json=mock_hand_request)
+    assert response.status_code == 400
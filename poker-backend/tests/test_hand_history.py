@@ -0,0 +1,241 @@
+from datetime import datetime
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository, get_import_executor
+from app.repositories.hand_repository import HandRepository
+from app.services.hand_history import HandHistoryError, parse_hand_history
+from app.services.hand_import import (
+    Checkpoint,
+    HandSplitter,
+    convert_batch,
+    create_executor,
+    hand_id,
+    history_files,
+    import_file,
+)
+
+client = TestClient(app)
+
+SHOWDOWN = """PokerStars Hand #243751627421:  Hold'em No Limit ($0.01/$0.02 USD) - 2023/04/01 14:03:12 CET [2023/04/01 8:03:12 ET]
+Table 'Aase III' 6-max Seat #1 is the button
+Seat 1: Alice ($2 in chips)
+Seat 3: Bob: the Builder ($1.50 in chips)
+Seat 4: Carol ($0.80 in chips)
+Seat 6: Dave ($2.20 in chips) is sitting out
+Bob: the Builder: posts small blind $0.01
+Carol: posts big blind $0.02
+*** HOLE CARDS ***
+Dealt to Alice [As Kd]
+Dave said, "Carol: folds"
+Alice: raises $0.04 to $0.06
+Bob: the Builder: calls $0.05
+Carol: raises $0.74 to $0.80 and is all-in
+Alice: calls $0.74
+Bob: the Builder: folds
+*** FLOP *** [Ks Qd Jc]
+*** TURN *** [Ks Qd Jc] [2h]
+*** RIVER *** [Ks Qd Jc 2h] [8s]
+*** SHOW DOWN ***
+Alice: shows [As Kd] (a pair of Kings)
+Carol: shows [Qc Qh] (three of a kind, Queens)
+Carol collected $1.63 from pot
+*** SUMMARY ***
+Total pot $1.66 | Rake $0.03
+Board [Ks Qd Jc 2h 8s]
+Seat 1: Alice (button) showed [As Kd] and lost with a pair of Kings
+Seat 3: Bob: the Builder (small blind) folded before Flop
+Seat 4: Carol (big blind) showed [Qc Qh] and won ($1.63) with three of a kind, Queens
+"""
+
+HEADS_UP = """PokerStars Hand #243751627422:  Hold'em No Limit ($0.01/$0.02 USD) - 2023/04/01 14:04:00 CET [2023/04/01 8:04:00 ET]
+Table 'Aase III' 6-max Seat #3 is the button
+Seat 1: Alice ($1.20 in chips)
+Seat 3: Carol ($3.20 in chips)
+Carol: posts small blind $0.01
+Alice: posts big blind $0.02
+*** HOLE CARDS ***
+Dealt to Alice [7h 2c]
+Carol: raises $0.04 to $0.06
+Alice: folds
+Uncalled bet ($0.04) returned to Carol
+Carol collected $0.04 from pot
+*** SUMMARY ***
+Total pot $0.04 | Rake $0
+Seat 1: Alice (big blind) folded before Flop
+Seat 3: Carol (button) (small blind) collected ($0.04)
+"""
+
+def _file(*hands: str) -> bytes:
+    return b"\xef\xbb\xbf" + "\n\n\n".join(hands).encode()
+
+class FakeRepository:
+    def __init__(self):
+        self.stored = {}
+        self.batches = 0
+
+    def existing_hand_ids(self, hand_ids):
+        return set(hand_ids) & set(self.stored)
+
+    def create_hands_bulk(self, hands):
+        self.batches += 1
+        self.stored.update((hand.id, hand) for hand in hands)
+        return len(hands)
+
+def test_showdown_is_converted_and_rescaled():
+    history = parse_hand_history(SHOWDOWN)
+    assert history.number == "243751627421"
+    assert history.played_at == datetime(2023, 4, 1, 12, 3, 12) # 8:03 ET in UTC
+    # $0.02 is the 40-chip big blind; Dave sits out; names may contain ': '
+    assert history.stack_settings == {"Alice": 4000, "Bob: the Builder": 3000, "Carol": 1600}
+    assert history.player_roles == {"dealer": "Alice", "sb": "Bob: the Builder", "bb": "Carol"}
+    assert history.hole_cards == {"Alice": ["As", "Kd"], "Carol": ["Qc", "Qh"]}
+    assert history.action_sequence == "r120 c allin c f / Flop: [Ks,Qd,Jc] / Turn: [2h] / River: [8s]"
+
+def test_heads_up_button_posts_the_small_blind():
+    history = parse_hand_history(HEADS_UP)
+    assert history.player_roles["dealer"] == "Carol"
+    assert history.action_sequence == "r120 f"
+
+@pytest.mark.parametrize("edit, message", [
+    (lambda text: text.replace("Hold'em No Limit", "Omaha Pot Limit"), "Unsupported game"),
+    (lambda text: text.replace("Carol: posts big blind $0.02", "Carol: posts big blind $0.02\nAlice: posts the ante $0.01"), "Unsupported post"),
+    (lambda text: text.replace("posts small blind $0.01", "posts small blind $0.02").replace("posts big blind $0.02", "posts big blind $0.05"), "ratio"),
+    (lambda text: text.replace("*** FLOP ***", "*** FIRST FLOP ***"), "run-it-twice"),
+    (lambda text: "Full Tilt Poker Game #1", "Not a PokerStars"),
+])
+def test_unsupported_hands_are_rejected(edit, message):
+    with pytest.raises(HandHistoryError, match=message):
+        parse_hand_history(edit(SHOWDOWN))
+
+def test_splitter_handles_any_chunk_size():
+    data = b"garbage before the first hand\n" + _file(SHOWDOWN, HEADS_UP)
+    for size in (1, 7, 64, len(data)):
+        splitter = HandSplitter()
+        hands = [hand for i in range(0, len(data), size) for hand in splitter.feed(data[i:i + size])] + splitter.finish()
+        assert len(hands) == 2
+        assert [data[hand.offset:hand.end] for hand in hands] == [hand.data for hand in hands]
+        assert hands[1].data.startswith(b"PokerStars Hand #243751627422") and hands[1].end == len(data)
+
+def test_import_file_batches_checkpoints_and_skips_stored_hands(tmp_path):
+    path = tmp_path / "Aase III.txt"
+    path.write_bytes(_file(SHOWDOWN, HEADS_UP))
+    repo = FakeRepository()
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    stats = import_file(str(path), repo, checkpoint=checkpoint, batch_size=1, read_size=100)
+    assert (stats.hands, stats.imported, stats.failed, repo.batches) == (2, 2, 0, 2)
+    stored = repo.stored[hand_id("pokerstars", "243751627421")]
+    assert stored.winnings == {"Alice": -1600, "Bob: the Builder": -120, "Carol": 1720}
+    assert Checkpoint(checkpoint.path).offset(str(path)) == path.stat().st_size
+
+    # Hands appended later are picked up from the checkpoint
+    with open(path, "ab") as f:
+        f.write(b"\n\n" + SHOWDOWN.replace("243751627421", "243751627499").encode())
+    stats = import_file(str(path), repo, checkpoint=checkpoint)
+    assert stats.resumed_from > 0 and (stats.hands, stats.imported) == (1, 1)
+
+    # Without a checkpoint the file is read again, but nothing is stored twice
+    stats = import_file(str(path), repo)
+    assert (stats.hands, stats.imported, stats.duplicates) == (3, 0, 3)
+
+def test_hand_being_written_is_read_again_from_the_checkpoint(tmp_path):
+    path = tmp_path / "Aase III.txt"
+    written = _file(SHOWDOWN, HEADS_UP)
+    cut = written.index(b"Alice: folds")
+    path.write_bytes(written[:cut])
+    repo = FakeRepository()
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    stats = import_file(str(path), repo, checkpoint=checkpoint)
+    assert (stats.hands, stats.imported, stats.failed, stats.unfinished) == (1, 1, 0, 1)
+    assert checkpoint.offset(str(path)) == written.index(b"PokerStars Hand #243751627422")
+
+    # The client finishes writing the hand
+    with open(path, "ab") as f:
+        f.write(written[cut:])
+    stats = import_file(str(path), repo, checkpoint=checkpoint)
+    assert (stats.hands, stats.imported, stats.failed, stats.unfinished) == (1, 1, 0, 0)
+    assert hand_id("pokerstars", "243751627422") in repo.stored
+    assert checkpoint.offset(str(path)) == len(written)
+
+def test_hand_cut_mid_line_is_read_again_from_the_checkpoint(tmp_path):
+    path = tmp_path / "Aase III.txt"
+    written = _file(SHOWDOWN, HEADS_UP)
+    cut = written.index(b"Carol: raises", written.index(b"PokerStars Hand #243751627422")) + len(b"Carol: raises")
+    path.write_bytes(written[:cut])
+    repo = FakeRepository()
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+
+    stats = import_file(str(path), repo, checkpoint=checkpoint)
+    assert (stats.imported, stats.failed, stats.unfinished) == (1, 0, 1)
+
+    with open(path, "ab") as f:
+        f.write(written[cut:])
+    stats = import_file(str(path), repo, checkpoint=checkpoint)
+    assert (stats.hands, stats.imported, stats.failed) == (1, 1, 0)
+
+def test_bet_without_an_amount_is_rejected():
+    with pytest.raises(HandHistoryError, match="without an amount"):
+        parse_hand_history(HEADS_UP.replace("Carol: raises $0.04 to $0.06", "Carol: raises"))
+
+def test_failed_last_hand_followed_by_a_blank_line_is_final(tmp_path):
+    path = tmp_path / "hands.txt"
+    broken = HEADS_UP.replace("Alice: folds", "Alice: checks")
+    path.write_bytes(_file(SHOWDOWN, broken) + b"\n\n")
+    checkpoint = Checkpoint(str(tmp_path / "checkpoint.json"))
+    stats = import_file(str(path), FakeRepository(), checkpoint=checkpoint)
+    assert (stats.imported, stats.failed, stats.unfinished) == (1, 1, 0)
+    assert checkpoint.offset(str(path)) == path.stat().st_size
+
+def test_failed_hands_are_reported_with_their_offset(tmp_path):
+    path = tmp_path / "hands.txt"
+    broken = HEADS_UP.replace("243751627422", "243751627423").replace("Alice: folds", "Alice: checks")
+    path.write_bytes(_file(SHOWDOWN, broken))
+    stats = import_file(str(path), FakeRepository())
+    assert (stats.imported, stats.failed) == (1, 1)
+    assert stats.errors[0]["offset"] == path.read_bytes().index(b"PokerStars Hand #243751627423")
+    assert "Illegal check" in stats.errors[0]["error"]
+
+def test_pool_conversion_matches_in_process():
+    splitter = HandSplitter()
+    raw = splitter.feed(_file(SHOWDOWN, HEADS_UP)) + splitter.finish()
+    executor = create_executor(2)
+    try:
+        pooled = convert_batch(raw, executor)
+    finally:
+        executor.shutdown()
+    assert [item.hand.winnings for item in pooled] == [item.hand.winnings for item in convert_batch(raw, None)]
+
+def test_history_files(tmp_path):
+    (tmp_path / "b").mkdir()
+    for name in ("b/2.txt", "1.txt", "notes.md"):
+        (tmp_path / name).write_text("")
+    assert [p.replace(str(tmp_path), "") for p in history_files([str(tmp_path)])] == ["/1.txt", "/b/2.txt"]
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    mock_repo.existing_hand_ids.return_value = set()
+    mock_repo.create_hands_bulk.side_effect = lambda hands: len(hands)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    app.dependency_overrides[get_import_executor] = lambda: None
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+    app.dependency_overrides.pop(get_import_executor, None)
+
+def test_import_endpoint(mock_repository):
+    response = client.post("/hands/import?source=Aase.txt", content=_file(SHOWDOWN, HEADS_UP), headers={"Content-Type": "text/plain"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["source"] == "Aase.txt"
+    assert (body["hands"], body["imported"], body["failed"]) == (2, 2, 0)
+    stored = mock_repository.create_hands_bulk.call_args.args[0]
+    assert [hand.id for hand in stored] == [hand_id("pokerstars", "243751627421"), hand_id("pokerstars", "243751627422")]
+
+def test_import_endpoint_without_table(mock_repository):
+    mock_repository.create_hands_bulk.side_effect = lambda hands: 0
+    assert client.post("/hands/import", content=_file(HEADS_UP)).status_code == 500
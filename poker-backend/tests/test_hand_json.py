@@ -0,0 +1,36 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.models.hand import HandData
+from app.schemas.hand import HandListResponseSchema, HandResponseSchema
+from app.services.hand_json import HandJSONResponse, encode_hand, encode_hand_list
+
+def _hand(created_at: datetime) -> HandData:
+    return HandData(
+        id=uuid.uuid4(),
+        created_at=created_at,
+        stack_settings={"Jürgen": 1000, "B": 1000},
+        player_roles={"dealer": "Jürgen"},
+        hole_cards={"Jürgen": ["As", "Ad"], "B": ["Kc", "Kd"]},
+        action_sequence="f",
+        winnings={"Jürgen": 20, "B": -20},
+    )
+
+@pytest.mark.parametrize("created_at", [
+    datetime(2025, 1, 2, 3, 4, 5),
+    datetime(2025, 1, 2, 3, 4, 5, 678901),
+    datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+    datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone(timedelta(hours=2))),
+])
+def test_direct_encoding_matches_response_models(created_at):
+    """The fast path must produce exactly the bytes the response_model path did."""
+    hand = _hand(created_at)
+    assert encode_hand(hand) == HandResponseSchema.model_validate(hand).model_dump_json().encode()
+    expected = HandListResponseSchema(hands=[HandResponseSchema.model_validate(hand)], next_cursor="abc")
+    assert encode_hand_list([hand], "abc") == expected.model_dump_json().encode()
+
+def test_response_passes_encoded_bytes_through():
+    body = encode_hand_list([], None)
+    assert HandJSONResponse(body).body == body == b'{"hands":[],"next_cursor":null}'
@@ -0,0 +1,102 @@
+import asyncio
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.models.hand import HandData, ReplayPage
+from app.repositories.cached_hand_repository import CachedHandRepository
+from app.repositories.hand_repository import HandRepository
+from app.services.cache import LocalCache
+from app.services.hand_logic import calculate_winnings
+from app.services.hand_replay import build_replay
+
+client = TestClient(app)
+
+SIDE_POT = dict(
+    stack_settings={"A": 300, "B": 1000, "C": 1000},
+    player_roles={"dealer": "C"},
+    hole_cards={"A": ["As", "Ad"], "B": ["Kc", "Kd"], "C": ["Qh", "Qd"]},
+    action_sequence="r300 c c / Flop: [2s,7d,9c] / b400 c / Turn: [3h] / x x / River: [4s] / x x",
+)
+hand = HandData(winnings=calculate_winnings(SIDE_POT["stack_settings"], SIDE_POT["hole_cards"], SIDE_POT["action_sequence"], SIDE_POT["player_roles"]), **SIDE_POT)
+
+def test_replay_starts_with_blinds_posted():
+    first = build_replay(hand)[0]
+    assert first["step"] == 0 and first["action"] is None
+    assert first["bets"] == {"A": 20, "B": 40, "C": 0} and first["pot"] == 60
+    assert first["to_act"] == "C" # Under the gun is the button three-handed
+    assert first["legal"] == {"fold": True, "call": 40, "raise_to": [80, 1000]}
+
+def test_replay_has_a_step_per_action_and_board():
+    steps = build_replay(hand)
+    assert len(steps) == 1 + 9 + 3 # Deal, nine actions, three boards
+    assert [s["step"] for s in steps] == list(range(len(steps)))
+    assert [(s["actor"], s["action"]) for s in steps[1:4]] == [("C", "r300"), ("A", "c"), ("B", "c")]
+    flop = steps[4]
+    assert flop["street"] == "flop" and flop["board"] == ["2s", "7d", "9c"] and flop["to_act"] == "B"
+    assert flop["legal"]["raise_to"] == [40, 700] and not flop["legal"]["fold"]
+
+def test_replay_ends_with_the_settled_pot():
+    last = build_replay(hand)[-1]
+    assert last["pot"] == 1700 and last["to_act"] is None and last["legal"] is None
+    assert last["stacks"] == {"A": 0, "B": 300, "C": 300}
+    assert len(last["board"]) == 5
+
+def test_replay_tracks_folds():
+    folded = HandData(stack_settings={"A": 1000, "B": 1000, "C": 1000}, player_roles={"dealer": "C"}, action_sequence="r100 f c / Flop: [2s,7d,9c] / x b100 f")
+    steps = build_replay(folded)
+    assert steps[2]["active"] == ["B", "C"]
+    assert steps[-1]["active"] == ["C"] and steps[-1]["pot"] == 320 # The uncalled bet is still on the table
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+def test_first_request_computes_and_stores_replay(mock_repository):
+    mock_repository.get_replay_steps.return_value = None
+    mock_repository.get_hand_by_id.return_value = hand
+    response = client.get(f"/hands/{hand.id}/replay?start=4&end=6")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["hand_id"] == str(hand.id) and body["total_steps"] == 13
+    assert [s["step"] for s in body["steps"]] == [4, 5]
+    (hand_id, stored), _ = mock_repository.save_replay_steps.call_args
+    assert hand_id == hand.id and len(stored) == 13
+
+def test_stored_replay_is_read_by_range(mock_repository):
+    steps = build_replay(hand)
+    mock_repository.get_replay_steps.return_value = ReplayPage(total_steps=len(steps), steps=steps[10:])
+    response = client.get(f"/hands/{hand.id}/replay?start=10")
+    assert response.status_code == 200
+    assert [s["step"] for s in response.json()["steps"]] == [10, 11, 12]
+    mock_repository.get_replay_steps.assert_called_once_with(hand.id, 10, None)
+    assert not mock_repository.get_hand_by_id.called
+    assert not mock_repository.save_replay_steps.called
+
+def test_replay_of_missing_hand(mock_repository):
+    mock_repository.get_replay_steps.return_value = None
+    mock_repository.get_hand_by_id.return_value = None
+    assert client.get(f"/hands/{uuid.uuid4()}/replay").status_code == 404
+
+def test_replay_of_unreplayable_hand(mock_repository):
+    mock_repository.get_replay_steps.return_value = None
+    mock_repository.get_hand_by_id.return_value = HandData(stack_settings={"A": 1000, "B": 1000}, action_sequence="c")
+    assert client.get(f"/hands/{uuid.uuid4()}/replay").status_code == 422
+    assert not mock_repository.save_replay_steps.called
+
+def test_cached_replay_is_sliced_in_memory():
+    inner = MagicMock(spec=HandRepository)
+    repo = CachedHandRepository(inner, LocalCache(10))
+    steps = build_replay(hand)
+    asyncio.run(repo.save_replay_steps(hand.id, steps))
+    page = asyncio.run(repo.get_replay_steps(hand.id, 2, 5))
+    assert page.total_steps == 13 and [s["step"] for s in page.steps] == [2, 3, 4]
+    assert not inner.get_replay_steps.called
+    assert repo.cache_stats()["replay_hits"] == 1
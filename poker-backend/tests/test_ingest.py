@@ -0,0 +1,243 @@
+import asyncio
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository
+from app.services.hand_json import dumps
+from app.services.ingest import IngestQueueFullError, IngestWriter, Spool, decode_hand, get_ingest_writer
+
+client = TestClient(app)
+
+PAYLOAD = {"stack_settings": {"A": 1000, "B": 1000}, "player_roles": {"dealer": "A"}, "hole_cards": {}, "action_sequence": "f"}
+
+def _hand(**kwargs) -> HandData:
+    return HandData(stack_settings={"A": 1000, "B": 1000}, player_roles={"dealer": "A"}, action_sequence="f", winnings={"A": -20, "B": 20}, **kwargs)
+
+class FakeRepository:
+    """Async stand-in recording each group commit; `fail` decides per call whether to raise."""
+
+    def __init__(self, fail=None, stored=()):
+        self.batches = []
+        self.fail = fail
+        self.stored = set(stored)
+
+    async def create_hands_bulk(self, hands):
+        error = self.fail(hands) if self.fail else None
+        if error:
+            raise error
+        self.batches.append([hand.id for hand in hands])
+        self.stored.update(hand.id for hand in hands)
+        return len(hands)
+
+    async def existing_hand_ids(self, hand_ids):
+        return self.stored & set(hand_ids)
+
+def test_hands_are_committed_in_groups():
+    repo = FakeRepository()
+    hands = [_hand() for _ in range(7)]
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=3, flush_interval=0.01, queue_size=100)
+        await writer.start()
+        for hand in hands:
+            await writer.submit(hand)
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert [len(batch) for batch in repo.batches] == [3, 3, 1]
+    assert [i for batch in repo.batches for i in batch] == [hand.id for hand in hands]
+    assert stats["committed"] == 7 and stats["batches"] == 3 and stats["queued"] == 0
+
+def test_partial_group_is_flushed_after_the_interval():
+    repo = FakeRepository()
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=100, flush_interval=0.02, queue_size=100)
+        await writer.start()
+        hand = _hand()
+        await writer.submit(hand)
+        assert writer.status(hand.id) == {"status": "queued"}
+        await asyncio.sleep(0.1)
+        assert repo.batches == [[hand.id]] # Stored without waiting for a full group
+        assert writer.status(hand.id) is None
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+def test_full_queue_refuses_hands():
+    async def scenario():
+        writer = IngestWriter(FakeRepository(), batch_size=10, flush_interval=1, queue_size=2)
+        await writer.start()
+        await writer.submit(_hand())
+        await writer.submit(_hand())
+        with pytest.raises(IngestQueueFullError):
+            await writer.submit(_hand())
+        stats = writer.stats()
+        await writer.stop()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["accepted"] == 2 and stats["rejected"] == 1
+
+def test_connection_errors_are_retried():
+    calls = []
+    def fail(hands):
+        calls.append(len(hands))
+        return psycopg2.OperationalError("server closed the connection") if len(calls) == 1 else None
+    repo = FakeRepository(fail=fail)
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=10, flush_interval=0, queue_size=10)
+        await writer.start()
+        await writer.submit(_hand())
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert calls == [1, 1] and len(repo.batches) == 1
+    assert stats["retries"] == 1 and stats["failed"] == 0 and "OperationalError" in stats["last_error"]
+
+def test_commit_lost_with_the_connection_is_not_repeated():
+    """The server committed but the client saw the connection drop: the retry finds the hands stored."""
+    class CommitThenDrop(FakeRepository):
+        async def create_hands_bulk(self, hands):
+            if any(hand.id in self.stored for hand in hands):
+                raise psycopg2.errors.UniqueViolation("duplicate key value violates unique constraint")
+            await super().create_hands_bulk(hands)
+            if len(self.batches) == 1:
+                raise psycopg2.OperationalError("server closed the connection unexpectedly")
+            return len(hands)
+
+    repo = CommitThenDrop()
+    hands = [_hand() for _ in range(3)]
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=3, flush_interval=1, queue_size=10)
+        await writer.start()
+        for hand in hands:
+            await writer.submit(hand)
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert repo.batches == [[hand.id for hand in hands]]
+    stats = writer.stats()
+    assert stats["retries"] == 1 and stats["failed"] == 0 and stats["committed"] == 3
+    assert all(writer.status(hand.id) is None for hand in hands)
+
+def test_rejected_hand_is_isolated_from_its_group():
+    bad = _hand()
+    repo = FakeRepository(fail=lambda hands: ValueError("invalid input syntax") if any(h.id == bad.id for h in hands) else None)
+    good = [_hand() for _ in range(4)]
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=5, flush_interval=1, queue_size=10)
+        await writer.start()
+        for hand in good[:2] + [bad] + good[2:]:
+            await writer.submit(hand)
+        await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert repo.stored == {hand.id for hand in good}
+    assert writer.status(bad.id) == {"status": "failed", "error": "ValueError: invalid input syntax"}
+    assert writer.stats()["failed"] == 1 and writer.stats()["committed"] == 4
+
+def test_spool_is_removed_once_hands_are_stored(tmp_path):
+    repo = FakeRepository()
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=10, flush_interval=0, queue_size=10, spool=Spool(str(tmp_path)))
+        await writer.start()
+        await writer.submit(_hand())
+        assert len(os.listdir(tmp_path)) == 1
+        await writer.stop()
+
+    asyncio.run(scenario())
+    assert len(repo.stored) == 1 and os.listdir(tmp_path) == []
+
+def test_spool_left_by_a_dead_process_is_replayed(tmp_path):
+    already_stored, pending = _hand(), _hand()
+    with open(tmp_path / "1234-dead.spool", "wb") as f:
+        f.write(dumps(already_stored) + b"\n" + dumps(pending) + b"\n" + b'{"id": "torn')
+    repo = FakeRepository(stored={already_stored.id})
+
+    async def scenario():
+        writer = IngestWriter(repo, batch_size=10, flush_interval=0, queue_size=10, spool=Spool(str(tmp_path)))
+        await writer.start()
+        await writer.stop()
+        return writer.stats()
+
+    stats = asyncio.run(scenario())
+    assert repo.batches == [[pending.id]] # Hands committed before the crash are not stored twice
+    assert stats["recovered"] == 2
+    assert os.listdir(tmp_path) == []
+
+def test_spool_record_round_trip():
+    hand = _hand(hole_cards={"A": ["As", "Kd"]})
+    assert decode_hand(dumps(hand)) == hand
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+@pytest.fixture
+def mock_writer():
+    writer = MagicMock(spec=IngestWriter)
+    app.dependency_overrides[get_ingest_writer] = lambda: writer
+    yield writer
+    app.dependency_overrides.pop(get_ingest_writer, None)
+
+def test_create_hand_is_queued(mock_repository, mock_writer):
+    response = client.post("/hands/", json=PAYLOAD)
+    assert response.status_code == 202
+    queued = mock_writer.submit.call_args.args[0]
+    assert response.json() == {"id": str(queued.id), "status": "queued"}
+    assert response.headers["location"] == f"/hands/ingest/{queued.id}"
+    assert queued.winnings == {"A": -20, "B": 20} # Settled before it was queued
+    mock_repository.create_hand.assert_not_called()
+
+def test_create_hand_with_full_queue_returns_503(mock_repository, mock_writer):
+    mock_writer.submit.side_effect = IngestQueueFullError("2 hands are waiting to be written")
+    response = client.post("/hands/", json=PAYLOAD)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+def test_create_hand_before_the_writer_starts_returns_503(mock_repository):
+    with patch("app.api.hand.INGEST_MODE", "async"):
+        response = client.post("/hands/", json=PAYLOAD)
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    mock_repository.create_hand.assert_not_called()
+
+def test_invalid_hand_is_rejected_before_queueing(mock_repository, mock_writer):
+    response = client.post("/hands/", json={**PAYLOAD, "action_sequence": "zz"})
+    assert response.status_code == 400
+    mock_writer.submit.assert_not_called()
+
+def test_ingest_status(mock_repository, mock_writer):
+    hand_id = uuid.uuid4()
+    mock_writer.status.return_value = {"status": "queued"}
+    assert client.get(f"/hands/ingest/{hand_id}").json() == {"id": str(hand_id), "status": "queued", "error": None}
+
+    mock_writer.status.return_value = None
+    mock_repository.get_hand_by_id.return_value = HandData(id=hand_id)
+    assert client.get(f"/hands/ingest/{hand_id}").json()["status"] == "stored"
+
+    mock_repository.get_hand_by_id.return_value = None
+    assert client.get(f"/hands/ingest/{hand_id}").status_code == 404
+
+def test_ingest_stats_in_sync_mode():
+    assert client.get("/hands/ingest").json()["mode"] == "sync"
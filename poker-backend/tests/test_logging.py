@@ -0,0 +1,118 @@
+import logging
+import queue
+import uuid
+from unittest.mock import MagicMock
+
+import orjson
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.core.log import (
+    ContextFilter,
+    DroppingQueueHandler,
+    JSONFormatter,
+    RateLimitFilter,
+    RequestIdMiddleware,
+    parse_levels,
+)
+from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository
+
+client = TestClient(app)
+
+def _record(msg="boom %s", args=("x",), lineno=10, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("app.test", logging.ERROR, "/app/test.py", lineno, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+def test_rate_limit_suppresses_repeats_per_call_site():
+    now = [0.0]
+    limit = RateLimitFilter(limit=2, window=60, clock=lambda: now[0])
+    assert [limit.filter(_record()) for _ in range(5)] == [True, True, False, False, False]
+    assert limit.filter(_record(lineno=11)) # Another call site has its own budget
+    assert limit.suppressed_total == 3
+
+    now[0] = 61
+    record = _record()
+    assert limit.filter(record)
+    assert record.suppressed == 3 # The next record through reports what was dropped
+
+def test_json_formatter_fields():
+    record = _record(request_id="req-1", suppressed=4, hand_id="abc")
+    entry = orjson.loads(JSONFormatter().format(record))
+    assert entry["level"] == "ERROR"
+    assert entry["logger"] == "app.test"
+    assert entry["message"] == "boom x"
+    assert entry["request_id"] == "req-1"
+    assert entry["suppressed"] == 4
+    assert entry["hand_id"] == "abc" # Fields passed via extra=
+    assert entry["ts"].endswith("Z")
+
+def test_queue_handler_drops_when_full():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    args = ["mutable"]
+    handler.handle(_record(args=(args,)))
+    args.append("changed")
+    handler.handle(_record())
+    assert handler.dropped == 1
+    queued = handler.queue.get_nowait()
+    assert queued.msg == "boom ['mutable']" and queued.args is None # Resolved in the caller
+
+def test_parse_levels():
+    assert parse_levels(" app.db=debug, uvicorn=WARNING ,") == {"app.db": logging.DEBUG, "uvicorn": logging.WARNING}
+    assert parse_levels("") == {}
+    for spec in ("app.db", "app.db=LOUD", "=INFO"):
+        with pytest.raises(ValueError):
+            parse_levels(spec)
+
+def test_request_id_is_echoed_or_generated(mock_repository):
+    mock_repository.get_hand_by_id.return_value = HandData()
+    response = client.get(f"/hands/{uuid.uuid4()}", headers={"X-Request-ID": "client-42"})
+    assert response.headers["x-request-id"] == "client-42"
+
+    generated = client.get(f"/hands/{uuid.uuid4()}", headers={"X-Request-ID": "bad id\twith spaces"})
+    assert len(generated.headers["x-request-id"]) == 32 # Unsafe values are replaced
+
+def test_request_id_is_stamped_on_records_from_the_threadpool():
+    logger = logging.getLogger("app.test_request_id")
+    collect = _Collect()
+    collect.addFilter(ContextFilter())
+    logger.addHandler(collect)
+
+    traced = FastAPI()
+    traced.add_middleware(RequestIdMiddleware)
+
+    def work():
+        logger.warning("inside")
+
+    @traced.get("/work")
+    async def work_endpoint():
+        await run_in_threadpool(work)
+        return {}
+
+    try:
+        response = TestClient(traced).get("/work", headers={"X-Request-ID": "abc-123"})
+        logger.warning("outside")
+    finally:
+        logger.removeHandler(collect)
+    assert response.headers["x-request-id"] == "abc-123"
+    assert [(r.getMessage(), r.request_id) for r in collect.records] == [("inside", "abc-123"), ("outside", None)]
@@ -0,0 +1,101 @@
+import re
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.core.metrics import Histogram, MetricsMiddleware, Registry, db_operation, server_timing, span
+from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository
+
+client = TestClient(app)
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Value of one sample in a /metrics body (labels must match exactly, in order)."""
+    label_text = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    pattern = "^" + re.escape(f"{name}{{{label_text}}}" if labels else name) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    assert match, f"{name} {labels} not in metrics"
+    return float(match.group(1))
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+def test_histogram_rendering():
+    registry = Registry()
+    latency = registry.register(Histogram("op_seconds", "Op time.", ("op",), buckets=(0.1, 1)))
+    latency.labels('say "hi"').observe(0.05)
+    latency.labels('say "hi"').observe(0.5)
+    latency.labels('say "hi"').observe(5)
+    text = registry.render()
+    assert "# TYPE op_seconds histogram" in text
+    assert 'op_seconds_bucket{op="say \\"hi\\"",le="0.1"} 1' in text
+    assert 'op_seconds_bucket{op="say \\"hi\\"",le="1.0"} 2' in text
+    assert 'op_seconds_bucket{op="say \\"hi\\"",le="+Inf"} 3' in text
+    assert 'op_seconds_count{op="say \\"hi\\""} 3' in text
+    assert 'op_seconds_sum{op="say \\"hi\\""} 5.55' in text
+
+def test_requests_are_recorded_per_route_template(mock_repository):
+    mock_repository.get_hand_by_id.return_value = HandData()
+    labels = dict(method="GET", route="/hands/{hand_id}", status="200")
+    before = client.get("/metrics").text
+    count = _sample(before, "http_request_duration_seconds_count", **labels) if "/hands/{hand_id}" in before else 0
+
+    client.get(f"/hands/{uuid.uuid4()}")
+    client.get(f"/hands/{uuid.uuid4()}")
+    client.get(f"/no/such/{uuid.uuid4()}")
+    text = client.get("/metrics").text
+    assert _sample(text, "http_request_duration_seconds_count", **labels) == count + 2
+    assert _sample(text, "http_request_duration_seconds_count", method="GET", route="unmatched", status="404") >= 1
+    assert "/no/such/" not in text # Raw paths never become labels
+
+def test_process_hand_duration(mock_repository):
+    mock_repository.create_hand.side_effect = lambda hand: hand
+    before = _sample(client.get("/metrics").text, "process_hand_seconds_count")
+    payload = {"stack_settings": {"A": 1000, "B": 1000}, "player_roles": {"dealer": "A"}, "hole_cards": {}, "action_sequence": "f"}
+    assert client.post("/hands/", json=payload).status_code == 201
+    assert _sample(client.get("/metrics").text, "process_hand_seconds_count") == before + 1
+
+def test_pool_statistics_are_exported():
+    stats = {"min_size": 1, "max_size": 10, "size": 3, "idle": 2, "in_use": 1, "waiting": 0, "checkouts": 42, "timeouts": 1,
+             "connections_opened": 3, "connections_closed": 0, "health_check_failures": 0, "wait_time_total": 0.2, "closed": False}
+    with patch("app.api.metrics.get_pool_stats", return_value=stats):
+        text = client.get("/metrics").text
+    assert _sample(text, "db_pool_connections", state="in_use") == 1
+    assert _sample(text, "db_pool_checkouts_total") == 42
+    assert _sample(text, "db_pool_timeouts_total") == 1
+
+def test_server_timing_header():
+    assert server_timing([("db", 0.002), ("settle", 0.010), ("db", 0.001)], 0.0155) == \
+        'db;dur=3.00;desc="2x", settle;dur=10.00;desc="1x", total;dur=15.50'
+
+def test_trace_spans_reach_the_header_from_the_threadpool():
+    @db_operation("lookup")
+    def lookup():
+        return 1
+
+    traced = FastAPI()
+    traced.add_middleware(MetricsMiddleware, trace=True)
+
+    @traced.get("/traced")
+    async def traced_endpoint():
+        with span("compute"):
+            pass
+        return {"value": await run_in_threadpool(lookup)}
+
+    response = TestClient(traced).get("/traced")
+    timing = response.headers["server-timing"]
+    assert timing.startswith('compute;dur=') and 'db;dur=' in timing and "total;dur=" in timing
+
+def test_no_trace_header_by_default(mock_repository):
+    mock_repository.get_hand_by_id.return_value = HandData()
+    assert "server-timing" not in client.get(f"/hands/{uuid.uuid4()}").headers
@@ -0,0 +1,244 @@
+import uuid
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pytest
+
+from app.db import migrations
+from app.db.migrations import (
+    BACKFILL_BATCH_SIZE,
+    LATEST_VERSION,
+    MIGRATION_LOCK_ID,
+    MIGRATIONS,
+    Migration,
+    run_migrations,
+)
+from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository
+from app.services.cards import encode_hole_cards
+
+
+class RecordingCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._result = None
+
+    def execute(self, query, params=None):
+        self.conn.log.append((" ".join(query.split()), params, self.conn.autocommit))
+        if "MAX(version)" in query:
+            self._result = [(self.conn.version,)]
+        elif "information_schema.columns" in query:
+            self._result = list(self.conn.column_types.items())
+        elif "WITH batch" in query:
+            self._result = [self.conn.batches.pop(0) if self.conn.batches else (None, 0)]
+        elif "pg_index" in query:
+            self._result = [(1,)] if params[0] in self.conn.invalid_indexes else []
+        else:
+            self._result = None
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class RecordingConnection:
+    """Autocommit psycopg2 connection double that records every statement."""
+
+    def __init__(self, version=0, column_types=None, batches=None, invalid_indexes=()):
+        self.version = version
+        self.column_types = column_types or {}
+        self.batches = list(batches or [])
+        self.invalid_indexes = set(invalid_indexes)
+        self.autocommit = True
+        self.log = []
+
+    def cursor(self):
+        return RecordingCursor(self)
+
+    def commit(self):
+        self.log.append(("COMMIT", None, self.autocommit))
+
+    def rollback(self):
+        self.log.append(("ROLLBACK", None, self.autocommit))
+
+    def statements(self, fragment=""):
+        return [query for query, _, _ in self.log if fragment in query]
+
+
+def recording_migrations(applied):
+    return [
+        Migration(version, f"step_{version}", lambda conn, version=version: applied.append(version))
+        for version in (1, 2, 3)
+    ]
+
+
+def test_pending_migrations_are_applied_in_order():
+    applied = []
+    conn = RecordingConnection(version=0)
+    with patch.object(migrations, "MIGRATIONS", recording_migrations(applied)):
+        assert run_migrations(conn) == 3
+    assert applied == [1, 2, 3]
+    recorded = [params for query, params, _ in conn.log if query.startswith("INSERT INTO schema_migrations")]
+    assert recorded == [(1, "step_1"), (2, "step_2"), (3, "step_3")]
+
+
+def test_applied_versions_are_skipped():
+    applied = []
+    conn = RecordingConnection(version=2)
+    with patch.object(migrations, "MIGRATIONS", recording_migrations(applied)):
+        assert run_migrations(conn) == 3
+    assert applied == [3]
+    assert len(conn.statements("INSERT INTO schema_migrations")) == 1
+
+
+def test_up_to_date_schema_applies_nothing():
+    conn = RecordingConnection(version=LATEST_VERSION)
+    assert run_migrations(conn) == LATEST_VERSION
+    assert not conn.statements("INSERT INTO schema_migrations")
+
+
+def test_advisory_lock_wraps_the_run():
+    conn = RecordingConnection(version=0)
+    with patch.object(migrations, "MIGRATIONS", recording_migrations([])):
+        run_migrations(conn)
+    assert conn.log[0][:2] == ("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_ID,))
+    assert conn.log[-1][:2] == ("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+
+
+def test_advisory_lock_is_released_when_a_migration_fails():
+    def broken(conn):
+        raise RuntimeError("disk full")
+
+    conn = RecordingConnection(version=0)
+    with patch.object(migrations, "MIGRATIONS", [Migration(1, "ok", lambda conn: None), Migration(2, "broken", broken)]):
+        with pytest.raises(RuntimeError):
+            run_migrations(conn)
+    assert conn.log[-1][:2] == ("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_ID,))
+    # The failed version is not recorded, so the next run retries it
+    assert [params for query, params, _ in conn.log if query.startswith("INSERT INTO schema_migrations")] == [(1, "ok")]
+
+
+def test_versions_are_unique_and_increasing():
+    versions = [migration.version for migration in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert LATEST_VERSION == versions[-1]
+
+
+def test_backfill_walks_the_primary_key_in_batches():
+    first, second = uuid.uuid4(), uuid.uuid4()
+    conn = RecordingConnection(batches=[(first, BACKFILL_BATCH_SIZE), (second, 10)])
+    with conn.cursor() as cursor:
+        migrations._backfill_in_batches(cursor, "id = hands.id")
+    params = [params for query, params, _ in conn.log]
+    assert params == [(BACKFILL_BATCH_SIZE,), (first, BACKFILL_BATCH_SIZE), (second, BACKFILL_BATCH_SIZE)]
+    assert "WHERE id > %s" not in conn.log[0][0] and "WHERE id > %s" in conn.log[1][0]
+
+
+def test_native_type_conversion_expands_backfills_and_swaps():
+    conn = RecordingConnection(column_types={
+        "id": "text", "created_at": "timestamp with time zone", "stack_settings": "text",
+        "player_roles": "text", "hole_cards": "text", "action_sequence": "text", "winnings": "text",
+    })
+    migrations._convert_to_native_types(conn)
+    queries = [query for query, _, _ in conn.log]
+
+    def position(fragment):
+        return next(i for i, query in enumerate(queries) if fragment in query)
+
+    # expand
+    for column, native in migrations.NATIVE_COLUMN_TYPES.items():
+        assert f"ALTER TABLE hands ADD COLUMN IF NOT EXISTS {column}_native {native.upper()};" in queries
+    assert "NEW.id_native := NEW.id::uuid;" in queries[position("CREATE OR REPLACE FUNCTION hands_sync_native_columns")]
+    # expand, then backfill, then the concurrent index, then the locked swap
+    assert position("CREATE TRIGGER hands_sync_native_columns") < position("WITH batch")
+    assert position("WITH batch") < position("CREATE UNIQUE INDEX CONCURRENTLY") < position("LOCK TABLE hands")
+    swap = queries[position("LOCK TABLE hands"):]
+    assert swap[-1] == "COMMIT"
+    assert "ALTER TABLE hands RENAME COLUMN winnings_native TO winnings;" in swap
+    assert "ALTER TABLE hands ADD CONSTRAINT hands_pkey PRIMARY KEY USING INDEX hands_id_native_key;" in swap
+    # The swap runs in one transaction; everything else on the autocommit connection
+    assert all(not autocommit for query, _, autocommit in conn.log[position("LOCK TABLE hands"):])
+    assert all(autocommit for query, _, autocommit in conn.log[:position("LOCK TABLE hands")])
+    assert conn.autocommit is True
+
+
+def test_invalid_index_from_an_interrupted_build_is_rebuilt():
+    conn = RecordingConnection(column_types={"id": "text"}, invalid_indexes={"hands_id_native_key"})
+    migrations._convert_to_native_types(conn)
+    queries = conn.statements()
+    drop = queries.index("DROP INDEX CONCURRENTLY IF EXISTS hands_id_native_key;")
+    assert drop < queries.index("CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS hands_id_native_key ON hands (id_native);")
+
+def test_valid_indexes_are_kept():
+    conn = RecordingConnection()
+    migrations._create_indexes(conn)
+    assert len(conn.statements("pg_index")) == 4
+    assert not conn.statements("DROP INDEX")
+
+def test_native_type_conversion_resumes_after_expand():
+    # A run stopped after the expand step: only the shadow columns left tell what is pending
+    conn = RecordingConnection(column_types={"id": "uuid", "winnings": "text", "winnings_native": "jsonb"})
+    migrations._convert_to_native_types(conn)
+    queries = conn.statements()
+    assert "ALTER TABLE hands RENAME COLUMN winnings_native TO winnings;" in queries
+    assert not conn.statements("id_native")
+
+
+def test_native_type_conversion_skips_native_tables():
+    conn = RecordingConnection(column_types=dict(migrations.NATIVE_COLUMN_TYPES))
+    migrations._convert_to_native_types(conn)
+    assert conn.statements() == ["SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s;"]
+
+
+def test_failed_swap_is_rolled_back():
+    class FailingCommit(RecordingConnection):
+        def commit(self):
+            raise RuntimeError("lock timeout")
+
+    conn = FailingCommit(column_types={"winnings": "text"})
+    with pytest.raises(RuntimeError):
+        migrations._convert_to_native_types(conn)
+    assert conn.log[-1][0] == "ROLLBACK"
+    assert conn.autocommit is True
+
+
+def test_native_row_is_read_without_parsing():
+    hand_id = uuid.uuid4()
+    created_at = datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+    stacks = {"A": 1000, "B": 1000}
+    hole_cards = {"A": ["As", "Kd"], "B": ["Qc", "Qd"]}
+    row = {
+        "id": hand_id,
+        "created_at": created_at,
+        "stack_settings": stacks,
+        "player_roles": {"dealer": "A"},
+        "hole_cards": encode_hole_cards(stacks, hole_cards),
+        "action_sequence": "f",
+        "winnings": {"A": -20, "B": 20},
+    }
+    hand = HandRepository()._row_to_hand_data(row)
+    assert hand == HandData(
+        id=hand_id, created_at=created_at, stack_settings=stacks, player_roles={"dealer": "A"},
+        hole_cards=hole_cards, action_sequence="f", winnings={"A": -20, "B": 20},
+    )
+    assert hand.id is hand_id and hand.created_at is created_at
+
+
+def test_null_and_pre_encoding_columns_are_read():
+    # NULL JSONB columns, and hole cards still stored as JSONB before migration 7
+    row = {
+        "id": uuid.uuid4(), "created_at": datetime.now(timezone.utc), "stack_settings": None,
+        "player_roles": None, "hole_cards": {"A": ["As", "Kd"]}, "action_sequence": None, "winnings": None,
+    }
+    hand = HandRepository()._row_to_hand_data(row)
+    assert hand.stack_settings == {} and hand.player_roles == {} and hand.winnings == {}
+    assert hand.hole_cards == {"A": ["As", "Kd"]}
+    assert hand.action_sequence == ""
@@ -0,0 +1,136 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.api.hand import get_hand_repository
+from app.models.hand import HandData
+from app.models.player_stats import PlayerStats
+from app.repositories.hand_repository import HandRepository, PLAYER_STATS_UPSERT, player_stats_rows
+from app.services.action_parser import parse_sequence
+from app.services.cards import card_names
+from app.services.hand_logic import calculate_winnings
+from app.services.player_stats import PlayerHandStats, _walk, hand_stats, summarize
+from app.services.settlement import seat_order
+
+client = TestClient(app)
+
+SIX_MAX = dict(
+    stack_settings={"Player1": 1000, "Player2": 1000, "Player3": 1000, "Player4": 1000, "Player5": 1000, "Player6": 1000},
+    player_roles={"dealer": "Player1", "sb": "Player2", "bb": "Player3"},
+    hole_cards={"Player1": ["Ah", "Kd"], "Player2": ["Jd", "Js"], "Player3": ["7h", "8h"]},
+    action_sequence="f f f r200 c c / Flop: [Ks,Qd,Jc] / x b400 c f / Turn: [2h] / x x / River: [8s] / x b400 f",
+)
+SIDE_POT = dict(
+    stack_settings={"A": 300, "B": 1000, "C": 1000},
+    player_roles={"dealer": "C"},
+    hole_cards={"A": ["As", "Ad"], "B": ["Kc", "Kd"], "C": ["Qh", "Qd"]},
+    action_sequence="r300 c c / Flop: [2s,7d,9c] / b400 c / Turn: [3h] / x x / River: [4s] / x x",
+)
+HEADS_UP = dict(
+    stack_settings={"A": 1000, "B": 1000},
+    player_roles={"dealer": "A"},
+    hole_cards={"A": ["As", "Kd"], "B": ["Qc", "Qd"]},
+    action_sequence="c x / Flop: [2s,7d,9c] / b100 r300 c / Turn: [3h] / b200 allin c / River: [4s]",
+)
+SHORT_ALLIN = dict(
+    stack_settings={"A": 1000, "B": 1000, "C": 150},
+    player_roles={"dealer": "A"},
+    hole_cards={"A": ["As", "Kd"], "B": ["Qc", "Qd"], "C": ["2h", "2d"]},
+    action_sequence="r100 c allin c c / Flop: [5s,7d,9c] / x b200 f / Turn: [Jh] / River: [Qs]",
+)
+
+def _hand(spec: dict) -> HandData:
+    winnings = calculate_winnings(spec["stack_settings"], spec["hole_cards"], spec["action_sequence"], spec["player_roles"])
+    return HandData(winnings=winnings, **spec)
+
+def _with_actors(spec: dict) -> str:
+    """Rewrite the sequence with every action prefixed by the player the walk attributes it to."""
+    players = seat_order(spec["stack_settings"], spec["player_roles"])
+    streets = parse_sequence(spec["action_sequence"]).streets
+    names = iter(players[seat] for _, seat, *_ in _walk(players, [spec["stack_settings"][p] for p in players], streets, 20, 40))
+    segments = []
+    for street in streets:
+        header = f"{street.name.capitalize()}: [{','.join(card_names(street.board))}] " if street.board else ""
+        segments.append(header + " ".join(f"{next(names)}:{action.token}" for action in street.actions))
+    return " / ".join(segments)
+
+@pytest.mark.parametrize("spec", [SIX_MAX, SIDE_POT, HEADS_UP, SHORT_ALLIN])
+def test_walk_agrees_with_pokerkit_turn_order(spec):
+    """Settlement rejects an action credited to the wrong player, so this cross-checks the light walk."""
+    calculate_winnings(spec["stack_settings"], spec["hole_cards"], _with_actors(spec), spec["player_roles"])
+
+def test_hand_stats_six_max():
+    stats = hand_stats(_hand(SIX_MAX))
+    # Player1 raised preflop, called the flop bet and bet the river
+    assert stats["Player1"] == PlayerHandStats(1, 800, 1, 1, 1, 1, 0, 0)
+    # The blinds called the raise; Player3 led the flop
+    assert stats["Player2"] == PlayerHandStats(1, -200, 1, 0, 0, 0, 0, 0)
+    assert stats["Player3"] == PlayerHandStats(1, -600, 1, 0, 1, 0, 0, 0)
+    assert stats["Player4"] == PlayerHandStats(hands=1)
+
+def test_hand_stats_showdown():
+    stats = hand_stats(_hand(SIDE_POT))
+    assert all(s.showdowns == 1 for s in stats.values())
+    assert stats["A"].showdowns_won == 1 and stats["B"].showdowns_won == 1 # B takes the side pot
+    assert stats["C"].showdowns_won == 0
+    assert stats["B"].postflop_aggressive == 1 and stats["C"].postflop_passive == 1
+
+def test_big_blind_check_is_not_vpip():
+    stats = hand_stats(_hand(HEADS_UP))
+    assert stats["A"].vpip_hands == 1 # Button limped
+    assert stats["B"].vpip_hands == 0 and stats["B"].pfr_hands == 0
+
+def test_player_stats_rows_are_summed_sorted_and_skip_bad_hands():
+    bad = HandData(stack_settings={"A": 1000, "B": 1000}, action_sequence="r100 Zz")
+    rows = player_stats_rows([_hand(SIDE_POT), _hand(SIDE_POT), bad])
+    assert [row[0] for row in rows] == ["A", "B", "C"]
+    assert rows[0][1:3] == (2, 2 * _hand(SIDE_POT).winnings["A"])
+
+def test_summarize_rates():
+    summary = summarize(PlayerStats("A", hands=4, vpip_hands=2, pfr_hands=1, postflop_aggressive=3, showdowns=2, showdowns_won=1))
+    assert summary["vpip"] == 0.5 and summary["pfr"] == 0.25
+    assert summary["aggression_factor"] is None # No calls
+    assert summary["showdown_frequency"] == 0.5 and summary["showdown_win_rate"] == 0.5
+
+def test_create_hand_upserts_stats_in_the_same_transaction():
+    cursor = MagicMock()
+    cursor.fetchone.return_value = None
+    repo = HandRepository()
+    repo._table_exists = True
+    with patch("app.repositories.hand_repository.get_db_cursor") as get_cursor, \
+         patch("app.repositories.hand_repository.psycopg2.extras.execute_values") as execute_values:
+        get_cursor.return_value.__enter__.return_value = cursor
+        repo.create_hand(_hand(SIX_MAX))
+    get_cursor.assert_called_once_with(commit=True)
+    (used_cursor, sql, rows), _ = execute_values.call_args
+    assert used_cursor is cursor and sql == PLAYER_STATS_UPSERT.format(values="%s")
+    assert len(rows) == 6
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+
+def test_player_stats_endpoint(mock_repository):
+    mock_repository.get_player_stats.return_value = PlayerStats("A", hands=10, net_winnings=500, vpip_hands=3, postflop_aggressive=2, postflop_passive=1)
+    response = client.get("/players/A/stats")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["hands"] == 10 and body["vpip"] == 0.3 and body["aggression_factor"] == 2.0
+    mock_repository.get_player_stats.assert_called_once_with("A")
+
+def test_player_stats_unknown_player(mock_repository):
+    mock_repository.get_player_stats.return_value = None
+    assert client.get("/players/nobody/stats").status_code == 404
+
+def test_leaderboard(mock_repository):
+    mock_repository.get_leaderboard.return_value = [PlayerStats("A", hands=5, net_winnings=900), PlayerStats("B", hands=9, net_winnings=-50)]
+    response = client.get("/leaderboard?limit=2")
+    assert response.status_code == 200
+    assert [(p["rank"], p["player_id"]) for p in response.json()["players"]] == [(1, "A"), (2, "B")]
+    mock_repository.get_leaderboard.assert_called_once_with(2, "net_winnings")
+    assert client.get("/leaderboard?order_by=vpip").status_code == 422
@@ -0,0 +1,152 @@
+import uuid
+from unittest.mock import MagicMock
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.hand import get_hand_repository
+from app.main import app
+from app.repositories.hand_repository import HandRepository
+from app.schemas.hand import HandCreateSchema
+from app.services import equity, preflop
+from app.services.allin_ev import all_in_ev
+from app.services.evaluator import evaluate_batch, parse_cards
+from app.services.hand_logic import process_hand
+from app.services.preflop import (
+    CLASS_NAMES,
+    COMBO_CLASSES,
+    COMBOS,
+    build_matrix,
+    class_index,
+    count_boards,
+    heads_up_equity,
+    load_matrix,
+    multiway_equity,
+    parse_class,
+    sample_multiway,
+    write_matrix,
+)
+
+client = TestClient(app)
+
+@pytest.fixture(scope="module")
+def sampled_matrix():
+    return build_matrix(boards=300, multiway_samples=0, seed=1)
+
+@pytest.fixture
+def matrix_file(tmp_path, sampled_matrix):
+    write_matrix(str(tmp_path / preflop.MATRIX_FILE), sampled_matrix)
+    assert load_matrix(str(tmp_path)) == "mmap"
+    yield sampled_matrix
+    preflop._matrix = None
+
+@pytest.fixture
+def no_matrix(tmp_path):
+    assert load_matrix(str(tmp_path)) == "missing"
+    yield
+    preflop._matrix = None
+
+@pytest.fixture(autouse=True)
+def single_process(monkeypatch):
+    monkeypatch.setattr(equity, "EQUITY_WORKERS", 1)
+
+def test_classes():
+    assert len(set(CLASS_NAMES)) == 169
+    assert CLASS_NAMES[class_index(parse_cards(["Ah", "Kh"]))] == "AKs"
+    assert CLASS_NAMES[class_index(parse_cards(["Kd", "Ah"]))] == "AKo"
+    assert CLASS_NAMES[class_index(parse_cards(["7c", "7s"]))] == "77"
+    assert parse_class("kas") == parse_class("AKs")
+    assert sum(COMBO_CLASSES == parse_class("AKo")) == 12
+    with pytest.raises(ValueError):
+        parse_class("AK")
+
+def test_board_counts_match_every_pair_of_hands():
+    boards = np.array([parse_cards(["2c", "7d", "Jh", "Qs", "Ac"]), parse_cards(["5h", "6h", "7h", "8h", "Kd"])])
+    weights = np.array([1, 3])
+    totals = count_boards(boards, weights)
+
+    expected = np.zeros((3, 169, 169), dtype=np.int64)
+    disjoint = ~(COMBOS[:, None, :, None] == COMBOS[None, :, None, :]).any(axis=(2, 3))
+    rows, cols = np.broadcast_to(COMBO_CLASSES[:, None], disjoint.shape), np.broadcast_to(COMBO_CLASSES, disjoint.shape)
+    for board, weight in zip(boards, weights):
+        valid = ~np.isin(COMBOS, board).any(axis=1)
+        strengths = np.full(len(COMBOS), -1)
+        strengths[valid] = evaluate_batch(np.concatenate([COMBOS[valid], np.broadcast_to(board, (valid.sum(), 5))], axis=1))
+        pairs = valid[:, None] & valid[None, :] & disjoint
+        for total, counted in zip(expected, ((strengths[:, None] > strengths) & pairs, (strengths[:, None] == strengths) & pairs, pairs)):
+            np.add.at(total, (rows, cols), counted * weight)
+    assert (totals == expected).all()
+
+def test_sampled_matrix(sampled_matrix):
+    shares = sampled_matrix.heads_up
+    assert np.allclose(shares + shares.T, 1)
+    aces, kings = parse_class("AA"), parse_class("KK")
+    assert shares[aces, kings] == pytest.approx(0.82, abs=0.04)
+    assert sampled_matrix.multiway[aces, 0] == pytest.approx(0.85, abs=0.03) # Against one random hand
+
+def test_multiway_equity_is_sampled():
+    assert sample_multiway(parse_class("AA"), 3, 4000, seed=1) == pytest.approx(0.64, abs=0.03)
+
+def test_matrix_file_is_mapped(matrix_file):
+    aces, kings = parse_class("AA"), parse_class("KK")
+    assert heads_up_equity(aces, kings) == pytest.approx(matrix_file.heads_up[aces, kings], abs=1e-4)
+    assert multiway_equity(aces, 1) == pytest.approx(matrix_file.multiway[aces, 0], abs=1e-4)
+    assert multiway_equity(aces, 3) is None # Built without the sampled columns
+
+def test_lookups_without_a_matrix(no_matrix):
+    assert heads_up_equity(0, 1) is None
+    assert client.get("/equity/preflop", params={"hand": "AA", "vs": "KK"}).status_code == 503
+
+def test_preflop_endpoint(matrix_file):
+    response = client.get("/equity/preflop", params={"hand": "KK", "vs": "aa"})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["hand"], body["vs"], body["opponents"], body["exact"]) == ("KK", "AA", 1, False)
+    assert body["equity"] == pytest.approx(1 - matrix_file.heads_up[parse_class("AA"), parse_class("KK")], abs=1e-4)
+    assert client.get("/equity/preflop", params={"hand": "XYs"}).status_code == 400
+
+def _all_in_hand(sequence):
+    return process_hand(HandCreateSchema(
+        stack_settings={"A": 1000, "B": 3000, "C": 2000},
+        player_roles={"dealer": "A"},
+        hole_cards={"A": ["As", "Ad"], "B": ["Kc", "Kd"], "C": ["2c", "7d"]},
+        action_sequence=sequence,
+    ))
+
+def test_preflop_all_in_ev(matrix_file):
+    # B shoves over A's raise, C calls for less, A folds: B's 1000 above C's stack is returned
+    hand = _all_in_hand("r100 allin c f / Flop: [2h,3h,4s] / Turn: [9c] / River: [Td]")
+    result = all_in_ev(hand)
+    assert (result.street, result.source, result.pot) == ("preflop", "matrix", 4100)
+    kings, junk = result.players["B"], result.players["C"]
+    assert (kings.invested, junk.invested) == (2000, 2000)
+    assert kings.equity == pytest.approx(heads_up_equity(parse_class("KK"), parse_class("72o")))
+    assert kings.ev + junk.ev == pytest.approx(100) # A's dead raise
+    assert kings.luck == pytest.approx(kings.winnings - kings.ev)
+
+def test_flop_all_in_ev_is_enumerated():
+    hand = _all_in_hand("f c x / Flop: [2h,3h,Ks] / b100 allin c / Turn: [9c] / River: [Td]")
+    result = all_in_ev(hand)
+    assert (result.street, result.source, result.board) == ("flop", "exact", ["2h", "3h", "Ks"])
+    assert result.players["B"].equity + result.players["C"].equity == pytest.approx(1)
+    assert result.players["B"].ev == pytest.approx(result.players["B"].equity * 4000 - 2000)
+
+def test_all_in_ev_needs_an_all_in():
+    with pytest.raises(ValueError, match="two players all-in"):
+        all_in_ev(_all_in_hand("r100 f f"))
+
+def test_all_in_ev_endpoint(matrix_file):
+    hand = _all_in_hand("r100 allin c f / Flop: [2h,3h,4s] / Turn: [9c] / River: [Td]")
+    mock_repo = MagicMock(spec=HandRepository)
+    mock_repo.get_hand_by_id.side_effect = lambda hand_id: hand if hand_id == hand.id else None
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    try:
+        response = client.get(f"/equity/hands/{hand.id}/allin")
+        assert response.status_code == 200
+        body = response.json()
+        assert body["source"] == "matrix"
+        assert set(body["players"]) == {"B", "C"}
+        assert client.get(f"/equity/hands/{uuid.uuid4()}/allin").status_code == 404
+    finally:
+        app.dependency_overrides.pop(get_hand_repository, None)
@@ -0,0 +1,95 @@
+import pytest
+
+from app.services.hand_logic import calculate_winnings
+from app.services.settlement import SettlementError, seat_order, settle_hand
+
+HEADS_UP = {"A": 1000, "B": 1000}
+
+
+def test_seat_order_puts_dealer_last():
+    stacks = {"P1": 1000, "P2": 1000, "P3": 1000, "P4": 1000}
+    assert seat_order(stacks, {"dealer": "P2"}) == ["P3", "P4", "P1", "P2"]
+    assert seat_order(stacks, {"sb": "P2"}) == ["P2", "P3", "P4", "P1"]
+    assert seat_order(stacks) == ["P1", "P2", "P3", "P4"]
+
+
+def test_heads_up_showdown():
+    winnings = calculate_winnings(
+        HEADS_UP,
+        {"A": ["As", "Kd"], "B": ["2c", "2d"]},
+        "c x / Flop: [Ks,Qd,Jc] / x x / Turn: [2h] / x x / River: [8s] / x x",
+        {"dealer": "A"},
+    )
+    # The button limps and checks down; pocket twos make a set on the turn
+    assert winnings == {"A": -40, "B": 40}
+
+
+def test_preflop_fold_without_hole_cards():
+    winnings = calculate_winnings(HEADS_UP, {}, "f", {"dealer": "A"})
+    assert winnings == {"A": -20, "B": 20}
+
+
+def test_side_pot():
+    result = settle_hand(
+        {"A": 300, "B": 1000, "C": 1000},
+        {"dealer": "C"},
+        {"A": ["As", "Ad"], "B": ["Kc", "Kd"], "C": ["Qh", "Qd"]},
+        {
+            "preflop": {"actions": ["r300", "c", "c"]},
+            "flop": {"board": ["2s", "7d", "9c"], "actions": ["b400", "c"]},
+            "turn": {"board": ["3h"], "actions": ["x", "x"]},
+            "river": {"board": ["4s"], "actions": ["x", "x"]},
+        },
+    )
+    # A wins the main pot (900), B wins the side pot (800)
+    assert result.winnings == {"A": 600, "B": 100, "C": -700}
+    assert result.pot == 1700
+
+
+def test_split_pot():
+    winnings = calculate_winnings(
+        HEADS_UP,
+        {"A": ["As", "Kd"], "B": ["Ac", "Kh"]},
+        "r200 c / Flop: [2s,7d,9c] / x x / Turn: [3h] / x x / River: [8s] / x x",
+        {"dealer": "A"},
+    )
+    assert winnings == {"A": 0, "B": 0}
+
+
+def test_showdown_requires_hole_cards():
+    with pytest.raises(SettlementError, match="hole cards missing"):
+        calculate_winnings(
+            HEADS_UP,
+            {"B": ["2c", "2d"]},
+            "c x / Flop: [Ks,Qd,Jc] / x x / Turn: [2h] / x x / River: [8s] / x x",
+            {"dealer": "A"},
+        )
+
+
+def test_all_in_runout_is_dealt():
+    # All-in on the turn: the river still has to be dealt before the showdown
+    hole_cards = {"A": ["As", "Kd"], "B": ["Qc", "Qd"]}
+    sequence = "c x / Flop: [2s,7d,9c] / b100 r300 c / Turn: [3h] / b200 allin c"
+    assert calculate_winnings(HEADS_UP, hole_cards, sequence + " / River: [Ks]", {"dealer": "A"}) == {"A": 1000, "B": -1000}
+    with pytest.raises(SettlementError, match="before the hand is complete"):
+        calculate_winnings(HEADS_UP, hole_cards, sequence, {"dealer": "A"})
+
+
+def test_incomplete_sequence_is_rejected():
+    with pytest.raises(SettlementError, match="before the hand is complete"):
+        calculate_winnings(HEADS_UP, {"A": ["As", "Kd"], "B": ["2c", "2d"]}, "c x / Flop: [Ks,Qd,Jc] / x", {"dealer": "A"})
+
+
+def test_illegal_action_is_rejected():
+    with pytest.raises(SettlementError, match="Illegal check"):
+        calculate_winnings(HEADS_UP, {}, "r200 x", {"dealer": "A"})
+
+
+def test_duplicate_cards_are_rejected():
+    with pytest.raises(SettlementError, match="more than once"):
+        calculate_winnings(
+            HEADS_UP,
+            {"A": ["As", "Kd"], "B": ["As", "2d"]},
+            "f",
+            {"dealer": "A"},
+        )
@@ -0,0 +1,120 @@
+import asyncio
+import uuid
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.core.config import BIG_BLIND
+from app.api.hand import get_hand_repository
+from app.api.simulations import get_simulation_executor
+from app.models.hand import HandData
+from app.repositories.hand_repository import HandRepository
+from app.schemas.hand import HandCreateSchema
+from app.services.hand_logic import process_hand
+from app.services.simulation import (
+    POLICIES,
+    SimulationConfig,
+    SimulationJob,
+    simulate_chunk,
+    simulate_hand,
+    validate_config,
+)
+
+client = TestClient(app)
+
+def _config(players=6, policies=("random",), seed=7):
+    return SimulationConfig(players, (10000,) * players, tuple(policies[seat % len(policies)] for seat in range(players)), seed)
+
+def test_simulated_hands_are_deterministic_and_independent_of_chunking():
+    config = _config()
+    whole = simulate_chunk(config, 0, 40).hands
+    split = simulate_chunk(config, 0, 15).hands + simulate_chunk(config, 15, 25).hands
+    assert whole == split
+    assert simulate_hand(config, 3) == whole[3]
+    assert simulate_hand(_config(seed=8), 3) != whole[3]
+
+@pytest.mark.parametrize("players", [2, 6, 9])
+@pytest.mark.parametrize("policy", sorted(POLICIES))
+def test_simulated_hands_settle(players, policy):
+    result = simulate_chunk(_config(players, (policy,)), 0, 30, settle=True)
+    assert result.failed == []
+    for hand in result.hands:
+        assert isinstance(hand, HandData)
+        assert sum(hand.winnings.values()) == 0
+
+def test_simulated_hand_shape():
+    hand = simulate_hand(_config(players=3), 1)
+    assert set(hand["stack_settings"]) == {"Player1", "Player2", "Player3"}
+    assert hand["player_roles"] == {"dealer": "Player2"} # The button moves one seat per hand
+    assert all(len(cards) == 2 for cards in hand["hole_cards"].values())
+    process_hand(HandCreateSchema(**hand)) # Accepted exactly like a submitted hand
+
+def test_calling_stations_see_the_whole_board():
+    hand = simulate_hand(_config(policies=("calling_station",)), 0)
+    assert "River: [" in hand["action_sequence"]
+    assert "f" not in hand["action_sequence"].split(" / ")[0].split()
+
+def test_validate_config():
+    with pytest.raises(ValueError, match="2 to 10"):
+        validate_config(11, [10000] * 11, ["random"] * 11)
+    with pytest.raises(ValueError, match="big blind"):
+        validate_config(2, [10000, 1], ["random"] * 2)
+    with pytest.raises(ValueError, match="Unknown policies"):
+        validate_config(2, [10000] * 2, ["random", "bluffer"])
+
+def test_job_stores_every_hand_in_order():
+    repo = MagicMock(spec=HandRepository)
+    repo.create_hands_bulk.side_effect = lambda hands: len(hands)
+    job = SimulationJob(_config(), hands=25, persist=True, keep_hands=5, chunk_size=10)
+
+    async def scenario():
+        await job.run(repo, None)
+
+    asyncio.run(scenario())
+    assert job.status == "completed"
+    assert [len(call.args[0]) for call in repo.create_hands_bulk.call_args_list] == [10, 10, 5]
+    progress = job.progress()
+    assert progress["done"] == progress["stored"] == 25
+    assert progress["hands_per_core_second"] > 0
+    assert [hand.action_sequence for hand in job.kept] == [simulate_hand(job.config, i)["action_sequence"] for i in range(5)]
+
+def test_job_reports_a_failed_store():
+    repo = MagicMock(spec=HandRepository)
+    repo.create_hands_bulk.side_effect = RuntimeError("disk full")
+    job = SimulationJob(_config(), hands=10, persist=True, chunk_size=5)
+    asyncio.run(job.run(repo, None))
+    assert job.status == "failed"
+    assert job.error == "disk full"
+    assert job.stored == 0
+
+@pytest.fixture
+def mock_repository():
+    mock_repo = MagicMock(spec=HandRepository)
+    app.dependency_overrides[get_hand_repository] = lambda: mock_repo
+    app.dependency_overrides[get_simulation_executor] = lambda: None
+    yield mock_repo
+    app.dependency_overrides.pop(get_hand_repository, None)
+    app.dependency_overrides.pop(get_simulation_executor, None)
+
+def test_start_simulation(mock_repository):
+    response = client.post("/simulations/", json={"players": 4, "hands": 20, "policies": ["tight", "aggressive"], "seed": 3})
+    assert response.status_code == 202
+    body = response.json()
+    assert response.headers["location"] == f"/simulations/{body['id']}"
+    assert body["policies"] == ["tight", "aggressive", "tight", "aggressive"]
+    assert body["stacks"] == [100 * BIG_BLIND] * 4
+    assert body["seed"] == 3
+    status = client.get(f"/simulations/{body['id']}").json()
+    assert status["id"] == body["id"]
+    assert body["id"] in [job["id"] for job in client.get("/simulations/").json()["simulations"]]
+
+def test_start_simulation_rejects_bad_settings(mock_repository):
+    assert client.post("/simulations/", json={"players": 2, "hands": 5, "policies": ["bluffer"]}).status_code == 400
+    assert client.post("/simulations/", json={"players": 3, "hands": 5, "stacks": [10000, 10000]}).status_code == 400
+    assert client.post("/simulations/", json={"hands": 0}).status_code == 422
+
+def test_unknown_simulation():
+    assert client.get(f"/simulations/{uuid.uuid4()}").status_code == 404
+    assert client.delete(f"/simulations/{uuid.uuid4()}").status_code == 404
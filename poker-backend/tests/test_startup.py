@@ -0,0 +1,158 @@
+import asyncio
+import subprocess
+import sys
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.startup import MAX_RETRY_DELAY, phase, reset_startup_report, startup_report
+from app.db.database import initialize_database
+from app.db.migrations import LATEST_VERSION
+from app.main import app
+from app.repositories.hand_repository import HandRepository
+
+client = TestClient(app)
+
+def test_liveness():
+    response = client.get("/live")
+    assert response.status_code == 200
+    assert response.json() == {"status": "alive"}
+
+def test_not_ready_until_startup_completes():
+    repo = HandRepository()
+    repo._table_exists = True
+    repo._schema_version = LATEST_VERSION
+    reset_startup_report(0.5)
+    with patch("app.main.get_repository", return_value=repo):
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["startup"]["status"] == "starting"
+        assert response.json()["startup"]["phases"] == {"imports": 0.5}
+
+        startup_report().finish()
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["startup"]["status"] == "complete"
+
+def test_failed_phase_is_recorded_and_startup_continues():
+    reset_startup_report()
+
+    def broken():
+        raise RuntimeError("database is down")
+
+    async def ok():
+        return "done"
+
+    async def scenario():
+        return await phase("migrations", broken), await phase("schema_state", ok)
+
+    assert asyncio.run(scenario()) == (None, "done")
+    report = startup_report().as_dict()
+    assert report["errors"] == {"migrations": "database is down"}
+    assert list(report["phases"]) == ["imports", "migrations", "schema_state"]
+
+def test_retryable_phase_runs_until_it_succeeds():
+    reset_startup_report()
+    attempts = []
+
+    def migrate():
+        attempts.append(len(attempts))
+        if len(attempts) < 3:
+            raise ConnectionRefusedError("database is starting up")
+        return LATEST_VERSION
+
+    async def no_wait(delay):
+        assert delay <= MAX_RETRY_DELAY
+
+    async def scenario():
+        with patch("app.core.startup.asyncio.sleep", side_effect=no_wait) as sleep:
+            result = await phase("migrations", migrate, retry=(OSError,))
+        return result, [call.args[0] for call in sleep.call_args_list]
+
+    result, delays = asyncio.run(scenario())
+    assert result == LATEST_VERSION
+    assert delays == [0.5, 1.0]
+    report = startup_report().as_dict()
+    assert "migrations" in report["phases"]
+    assert report["errors"] == {} # Cleared once the phase succeeded
+
+def test_migrations_are_retried_while_the_database_is_down():
+    """A failed migration reaches the report and keeps startup (and readiness) waiting until it succeeds."""
+    repo = MagicMock(spec=HandRepository)
+    repo.refresh_schema_state.return_value = True
+    down = threading.Event()
+    down.set()
+
+    def migrate():
+        if down.is_set():
+            raise psycopg2.OperationalError("could not connect to server: Connection refused")
+        return LATEST_VERSION
+
+    with patch("app.main.init_pool"), \
+         patch("app.main.initialize_database", side_effect=migrate) as mock_migrate, \
+         patch("app.main.get_repository", return_value=repo), \
+         patch("app.main.load_tables", return_value="mmap"), \
+         patch("app.main.load_matrix", return_value="mmap"), \
+         patch("app.main.warm_up_settlement"), \
+         patch("app.main.close_pool"), \
+         patch("app.core.startup.MAX_RETRY_DELAY", 0.01):
+        with TestClient(app):
+            deadline = time.monotonic() + 5
+            while "migrations" not in startup_report().errors and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert "Connection refused" in startup_report().errors["migrations"]
+            assert startup_report().status == "starting"
+            down.clear()
+            while not startup_report().complete and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert startup_report().complete
+    assert mock_migrate.call_count >= 2
+    assert startup_report().errors == {}
+
+def test_initialize_database_raises():
+    with patch("app.db.database.get_db_connection", side_effect=psycopg2.OperationalError("connection refused")):
+        with pytest.raises(psycopg2.OperationalError):
+            initialize_database()
+
+def test_background_startup():
+    """The app serves /live while the phases run, then reports every phase."""
+    repo = MagicMock(spec=HandRepository)
+    repo.refresh_schema_state.return_value = True
+
+    def slow_migrations():
+        time.sleep(0.2)
+
+    with patch("app.main.init_pool"), \
+         patch("app.main.initialize_database", side_effect=slow_migrations), \
+         patch("app.main.get_repository", return_value=repo), \
+         patch("app.main.load_tables", return_value="mmap"), \
+         patch("app.main.load_matrix", return_value="mmap"), \
+         patch("app.main.warm_up_settlement"), \
+         patch("app.main.close_pool"):
+        with TestClient(app) as live_client:
+            assert live_client.get("/live").status_code == 200
+            assert startup_report().status == "starting"
+            deadline = time.monotonic() + 5
+            while not startup_report().complete and time.monotonic() < deadline:
+                time.sleep(0.02)
+    report = startup_report().as_dict()
+    assert report["status"] == "complete"
+    assert set(report["phases"]) == {"imports", "db_pool", "migrations", "schema_state", "evaluator_table", "preflop_matrix", "pokerkit"}
+    assert report["phases"]["migrations"] >= 0.2
+    assert report["errors"] == {}
+    repo.refresh_schema_state.assert_called_once()
+
+def test_startup_metrics():
+    reset_startup_report(0.25)
+    startup_report().finish()
+    body = client.get("/metrics").text
+    assert "startup_complete 1" in body
+    assert 'startup_phase_seconds{phase="imports"} 0.25' in body
+
+def test_pokerkit_is_imported_lazily():
+    code = "import sys, app.main; assert 'pokerkit' not in sys.modules; app.main.warm_up_settlement(); assert 'pokerkit' in sys.modules"
+    subprocess.run([sys.executable, "-c", code], check=True)